@@ -17,10 +17,13 @@
 #  limitations under the License.
 ###############################################################################
 
+import collections
+import datetime
 import diskcache
 import errno
 import getpass
 import glob
+import hashlib
 import json
 import logging
 import mimetypes
@@ -29,9 +32,13 @@ import re
 import requests
 import shutil
 import six
+import sys
 import tempfile
+import threading
+import time
 
 from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
 from requests_toolbelt import MultipartEncoder
 
 __version__ = '2.4.0'
@@ -39,6 +46,10 @@ __license__ = 'Apache 2.0'
 
 DEFAULT_PAGE_LIMIT = 50  # Number of results to fetch per request
 REQ_BUFFER_SIZE = 65536  # Chunk size when iterating a download body
+# Suffix of the files that downloads are written to until they complete
+PARTIAL_DOWNLOAD_SUFFIX = '.girder_partial'
+# Bytes received between saves of a resumable download's progress
+PARTIAL_DOWNLOAD_SAVE_INTERVAL = 1024 * 1024 * 8
 
 _safeNameRegex = re.compile(r'^[/\\]+')
 
@@ -55,6 +66,27 @@ def _compareDicts(x, y):
     return len(x) == len(y) == len(set(x.items()) & set(y.items()))
 
 
+def _fileVersion(file):
+    """
+    Return the fields of a Girder file document that change with its contents.
+    """
+    return {
+        'size': file.get('size'),
+        'sha512': file.get('sha512'),
+        'updated': file.get('updated', file.get('created'))
+    }
+
+
+def _isTransientError(exc):
+    """
+    Return whether a failed request may succeed if it is sent again.
+    """
+    if isinstance(exc, HttpError):
+        return exc.status >= 500
+    return isinstance(exc, (
+        requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
 def _safeMakedirs(path):
     """
     Wraps os.makedirs in such a way that it will not raise exceptions if the
@@ -115,6 +147,205 @@ class _NoopProgressReporter(object):
         pass
 
 
+class _LockedProgressReporter(object):
+    """
+    Wraps a progress reporter so that it can be updated from several threads.
+    """
+
+    def __init__(self, reporter):
+        self.reporter = reporter
+        self._lock = threading.Lock()
+
+    def update(self, chunkSize):
+        with self._lock:
+            self.reporter.update(chunkSize)
+
+
+class _WorkerPool(object):
+    """
+    A fixed number of worker threads running tasks from a bounded queue, so
+    that walking a large tree never gets far ahead of the transfers. Tasks
+    may submit further tasks, which are queued without blocking.
+
+    The first task to fail stops the pool: queued tasks are skipped, and the
+    exception is raised by the next call to :py:meth:`submit`, :py:meth:`wait`
+    or :py:meth:`close`.
+    """
+
+    def __init__(self, jobs):
+        self._tasks = collections.deque()
+        self._maxQueued = jobs * 2
+        self._active = 0
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._threads = [threading.Thread(target=self._work) for _ in range(jobs)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._tasks and not self._closed:
+                    self._condition.wait()
+                if not self._tasks:
+                    return
+                func, args, kwargs = self._tasks.popleft()
+                self._active += 1
+                self._condition.notify_all()
+            try:
+                if self._error is None:
+                    func(*args, **kwargs)
+            except Exception:
+                if self._error is None:
+                    self._error = sys.exc_info()
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+    def _raiseError(self):
+        if self._error is not None:
+            six.reraise(*self._error)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue a call of ``func`` with the given arguments. Callers other than
+        the pool's own tasks block while the queue is full.
+        """
+        self._raiseError()
+        with self._condition:
+            if threading.current_thread() not in self._threads:
+                while len(self._tasks) >= self._maxQueued:
+                    self._condition.wait()
+            self._tasks.append((func, args, kwargs))
+            self._condition.notify_all()
+
+    def wait(self):
+        """
+        Wait until every submitted task has finished.
+        """
+        with self._condition:
+            while self._tasks or self._active:
+                self._condition.wait()
+        self._raiseError()
+
+    def close(self):
+        """
+        Wait for the submitted tasks and stop the worker threads.
+        """
+        try:
+            self.wait()
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            for thread in self._threads:
+                thread.join()
+
+
+class _DownloadJob(object):
+    """
+    The options and worker pool shared by the tasks of one download.
+    """
+
+    def __init__(self, pool=None, resume=False, sync=False):
+        self.pool = pool
+        self.resume = resume
+        self.sync = sync
+        self.partials = set()
+
+
+class _PartialDownload(object):
+    """
+    A file being downloaded to ``path``. The data is written to a partial file
+    next to it, divided into segments that can be fetched with separate range
+    requests. The bytes received in each segment are saved to a state file, so
+    that an interrupted download can be continued from where it stopped.
+    """
+
+    def __init__(self, file, path):
+        self.file = file
+        self.path = path
+        self.partialPath = path + PARTIAL_DOWNLOAD_SUFFIX
+        self.statePath = self.partialPath + '.json'
+        self.version = _fileVersion(file)
+        self.segments = []
+        self._lock = threading.Lock()
+
+    def open(self, resume, segmentSize=None):
+        """
+        Continue the saved download of this version of the file if ``resume``
+        is True and there is one, otherwise start a new one.
+
+        :param segmentSize: The size of the segments to divide a new download
+            into, or None to download it as one segment.
+        """
+        state = None
+        if resume and os.path.isfile(self.partialPath):
+            try:
+                with open(self.statePath) as fh:
+                    state = json.load(fh)
+            except (IOError, OSError, ValueError):
+                pass
+        if state and state.get('fileId') == self.file['_id'] and \
+                state.get('version') == self.version:
+            self.segments = state['segments']
+            return
+
+        size = self.file['size']
+        # An empty file has no segments, so it is finished as soon as it is created
+        segmentSize = segmentSize or max(size, 1)
+        self.segments = [
+            [start, min(start + segmentSize, size), 0] for start in range(0, size, segmentSize)]
+        _safeMakedirs(os.path.dirname(self.path))
+        with open(self.partialPath, 'wb') as fh:
+            fh.truncate(size)
+        self._save()
+
+    def pending(self):
+        """
+        Return the indices of the segments that are not yet complete.
+        """
+        return [index for index, (start, end, received) in enumerate(self.segments)
+                if start + received < end]
+
+    def update(self, index, received):
+        """
+        Record the bytes received in a segment, which must already be written
+        to the partial file.
+
+        :returns: Whether every segment is now complete.
+        """
+        with self._lock:
+            self.segments[index][2] = received
+            self._save()
+            return not self.pending()
+
+    def _save(self):
+        with open(self.statePath, 'w') as fh:
+            json.dump({
+                'fileId': self.file['_id'],
+                'version': self.version,
+                'segments': self.segments
+            }, fh)
+
+    def remove(self):
+        for path in (self.partialPath, self.statePath):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def finish(self):
+        """
+        Move the completed download to its destination.
+        """
+        os.remove(self.statePath)
+        shutil.move(self.partialPath, self.path)
+
+
 # Used for fast non-multipart upload
 class _ProgressBytesIO(six.BytesIO):
     def __init__(self, *args, **kwargs):
@@ -163,6 +394,17 @@ class GirderClient(object):
 
     # The current maximum chunk size for uploading file chunks
     MAX_CHUNK_SIZE = 1024 * 1024 * 64
+    # Files of at least this size that are uploaded in chunks are hashed first,
+    # so the server can skip the upload if it already has their contents
+    MIN_DEDUP_SIZE = 1024 * 1024
+    # The longest wait in seconds before retrying a failed file transfer
+    MAX_RETRY_DELAY = 30
+    # The number of times a resumable download continues after an error
+    MAX_DOWNLOAD_RETRIES = 5
+    # Files of at least this many segments are downloaded with several range
+    # requests at once when downloading with more than one job
+    DOWNLOAD_SEGMENT_SIZE = 1024 * 1024 * 64
+    MIN_RANGED_DOWNLOAD_SEGMENTS = 4
 
     DEFAULT_API_ROOT = 'api/v1'
     DEFAULT_HOST = 'localhost'
@@ -251,6 +493,9 @@ class GirderClient(object):
         self._serverApiDescription = {}
         self.incomingMetadata = {}
         self.localMetadata = {}
+        self.incomingManifest = {}
+        self.localManifest = {}
+        self._localManifestItems = None
 
         if cacheSettings is None:
             self.cache = None
@@ -288,13 +533,29 @@ class GirderClient(object):
 
         :param session: An existing :class:`requests.Session` object, or None.
         """
-        self._session = session if session else requests.Session()
+        self._session = session if session else self._createSession()
 
         yield self._session
 
         self._session.close()
         self._session = None
 
+    def _createSession(self, poolSize=None):
+        """
+        Create the :class:`requests.Session` used by :py:meth:`session`.
+
+        :param poolSize: The number of connections to keep open for each host,
+            which should be at least the number of threads sharing the session.
+            If None, the requests default is used.
+        :type poolSize: int or None
+        """
+        session = requests.Session()
+        if poolSize:
+            adapter = HTTPAdapter(pool_maxsize=poolSize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        return session
+
     def authenticate(self, username=None, password=None, interactive=False, apiKey=None):
         """
         Authenticate to Girder, storing the token that comes back to be used in
@@ -374,6 +635,47 @@ class GirderClient(object):
         version = description.get('info', {}).get('version')
         return version.split('.') if version else None
 
+    def _serverHasRoute(self, route):
+        """
+        Return whether the server's API description lists a route, such as
+        ``/folder/{id}/manifest``.
+        """
+        return route in self.getServerAPIDescription().get('paths', {})
+
+    def _serverRouteHasParam(self, route, method, param):
+        """
+        Return whether the server's API description lists a parameter of a
+        route, such as ``sha512`` of ``POST /file``.
+        """
+        description = self.getServerAPIDescription().get('paths', {}).get(route, {})
+        return param in {p.get('name') for p in description.get(method, {}).get('parameters', [])}
+
+    def _contentHash(self, stream, size):
+        """
+        Compute the SHA-512 hash of the next ``size`` bytes of a stream and
+        rewind it, if the stream is large enough for the server to be asked to
+        deduplicate it, the server supports that, and the stream is seekable.
+        Otherwise, return None.
+        """
+        if size < self.MIN_DEDUP_SIZE or not self._serverRouteHasParam('/file', 'post', 'sha512'):
+            return None
+        try:
+            start = stream.tell()
+        except (AttributeError, IOError, OSError, ValueError):
+            return None
+        checksum = hashlib.sha512()
+        remaining = size
+        while remaining > 0:
+            data = stream.read(min(REQ_BUFFER_SIZE * 16, remaining))
+            if not data:
+                break
+            if isinstance(data, six.text_type):
+                data = data.encode('utf8')
+            checksum.update(data)
+            remaining -= len(data)
+        stream.seek(start)
+        return checksum.hexdigest()
+
     def getServerAPIDescription(self, useCached=True):
         """
         Fetch server RESTful API description.
@@ -486,7 +788,7 @@ class GirderClient(object):
             **kwargs)
 
         # If success, return the json object. Otherwise throw an exception.
-        if result.status_code in (200, 201):
+        if result.status_code in (200, 201, 206):
             if jsonResp:
                 return result.json()
             else:
@@ -794,6 +1096,35 @@ class GirderClient(object):
 
         return self.listResource('folder', params, limit=limit, offset=offset)
 
+    def getFolderManifest(self, folderId, modifiedSince=None):
+        """
+        This is a generator that will yield a record for a folder and for each
+        folder, item and file in its subtree, read from a single streamed
+        request. Each record has a ``type`` of 'folder', 'item' or 'file' and a
+        ``path`` relative to the folder. Folders come before their contents,
+        and each item is followed by its files. This requires a server that
+        provides the ``folder/{id}/manifest`` endpoint.
+
+        :param folderId: The ID of the folder.
+        :param modifiedSince: If set, only list the folders, and the items with
+            their files, that changed after this UTC time.
+        :type modifiedSince: datetime.datetime or str
+        """
+        params = {}
+        if isinstance(modifiedSince, datetime.datetime):
+            modifiedSince = modifiedSince.isoformat()
+        if modifiedSince:
+            params['modifiedSince'] = modifiedSince
+
+        resp = self.sendRestRequest('GET', 'folder/%s/manifest' % folderId, params,
+                                    stream=True, jsonResp=False)
+        try:
+            for line in resp.iter_lines():
+                if line:
+                    yield json.loads(line.decode('utf8'))
+        finally:
+            resp.close()
+
     def getFolderAccess(self, folderId):
         """
         Retrieves a folder's access by its ID.
@@ -847,7 +1178,7 @@ class GirderClient(object):
         return (None, False)
 
     def uploadFileToItem(self, itemId, filepath, reference=None, mimeType=None, filename=None,
-                         progressCallback=None):
+                         progressCallback=None, chunkJobs=1):
         """
         Uploads a file to an item, in chunks.
         If ((the file already exists in the item with the same name and size)
@@ -864,6 +1195,10 @@ class GirderClient(object):
             with progress information. It passes a single positional argument
             to the callable which is a dict of information about progress.
         :type progressCallback: callable
+        :param chunkJobs: If greater than 1 and the file is stored in an S3
+            assetstore, send up to this many chunks of it at once directly to
+            S3. Other assetstores receive one chunk at a time.
+        :type chunkJobs: int
         :returns: the file that was created.
         """
         if filename is None:
@@ -906,17 +1241,25 @@ class GirderClient(object):
             }
             if reference:
                 params['reference'] = reference
+            with open(filepath, 'rb') as f:
+                sha512 = self._contentHash(f, filesize)
+            if sha512:
+                params['sha512'] = sha512
             obj = self.post('file', params)
             if '_id' not in obj:
                 raise Exception(
                     'After creating an upload token for a new file, expected '
                     'an object with an id. Got instead: ' + json.dumps(obj))
+            if obj.get('_modelType') == 'file':
+                # The server already had the contents
+                return obj
 
         with open(filepath, 'rb') as f:
-            return self._uploadContents(obj, f, filesize, progressCallback=progressCallback)
+            return self._uploadContents(
+                obj, f, filesize, progressCallback=progressCallback, chunkJobs=chunkJobs)
 
     def uploadStreamToFolder(self, folderId, stream, filename, size, reference=None, mimeType=None,
-                             progressCallback=None):
+                             progressCallback=None, chunkJobs=1):
         """
         Uploads a file-like object to a folder, creating a new item in the process. If
         the file has 0 bytes, no uploading will be performed, and no item will
@@ -933,6 +1276,10 @@ class GirderClient(object):
         :param progressCallback: If passed, will be called after each chunk
             with progress information. It passes a single positional argument
             to the callable which is a dict of information about progress.
+        :param chunkJobs: If greater than 1 and the file is stored in an S3
+            assetstore, send up to this many chunks of it at once directly to
+            S3. Other assetstores receive one chunk at a time.
+        :type chunkJobs: int
         """
         params = {
             'parentType': 'folder',
@@ -953,17 +1300,24 @@ class GirderClient(object):
                 return self.post(
                     'file', params, data=_ProgressBytesIO(chunk, reporter=reporter))
 
+        sha512 = self._contentHash(stream, size)
+        if sha512:
+            params['sha512'] = sha512
         obj = self.post('file', params)
 
         if '_id' not in obj:
             raise Exception(
                 'After creating an upload token for a new file, expected '
                 'an object with an id. Got instead: ' + json.dumps(obj))
+        if obj.get('_modelType') == 'file':
+            # The server already had the contents
+            return obj
 
-        return self._uploadContents(obj, stream, size, progressCallback=progressCallback)
+        return self._uploadContents(
+            obj, stream, size, progressCallback=progressCallback, chunkJobs=chunkJobs)
 
     def uploadFileToFolder(self, folderId, filepath, reference=None, mimeType=None, filename=None,
-                           progressCallback=None):
+                           progressCallback=None, chunkJobs=1):
         """
         Uploads a file to a folder, creating a new item in the process.  If
         the file has 0 bytes, no uploading will be performed, and no item will
@@ -980,6 +1334,10 @@ class GirderClient(object):
             with progress information. It passes a single positional argument
             to the callable which is a dict of information about progress.
         :type progressCallback: callable
+        :param chunkJobs: If greater than 1 and the file is stored in an S3
+            assetstore, send up to this many chunks of it at once directly to
+            S3. Other assetstores receive one chunk at a time.
+        :type chunkJobs: int
         :returns: the file that was created.
         """
         if filename is None:
@@ -994,9 +1352,9 @@ class GirderClient(object):
 
         with open(filepath, 'rb') as f:
             return self.uploadStreamToFolder(folderId, f, filename, filesize, reference, mimeType,
-                                             progressCallback)
+                                             progressCallback, chunkJobs=chunkJobs)
 
-    def _uploadContents(self, uploadObj, stream, size, progressCallback=None):
+    def _uploadContents(self, uploadObj, stream, size, progressCallback=None, chunkJobs=1):
         """
         Uploads contents of a file.
 
@@ -1012,60 +1370,176 @@ class GirderClient(object):
             with progress information. It passes a single positional argument
             to the callable which is a dict of information about progress.
         :type progressCallback: callable
+        :param chunkJobs: The number of chunks to send at once to assetstores
+            that accept chunks out of order.
+        :type chunkJobs: int
         """
+        if (chunkJobs > 1 and uploadObj.get('behavior') == 's3' and
+                uploadObj['s3'].get('chunked')):
+            return self._uploadS3Parts(uploadObj, stream, size, chunkJobs, progressCallback)
+
         offset = 0
         uploadId = uploadObj['_id']
 
-        with self.progressReporterCls(label=uploadObj.get('name', ''), length=size) as reporter:
+        try:
+            with self.progressReporterCls(label=uploadObj.get('name', ''), length=size) as reporter:
 
-            while True:
-                chunk = stream.read(min(self.MAX_CHUNK_SIZE, (size - offset)))
+                while True:
+                    chunk = stream.read(min(self.MAX_CHUNK_SIZE, (size - offset)))
 
-                if not chunk:
-                    break
+                    if not chunk:
+                        break
 
-                if isinstance(chunk, six.text_type):
-                    chunk = chunk.encode('utf8')
+                    if isinstance(chunk, six.text_type):
+                        chunk = chunk.encode('utf8')
 
-                if self.getServerVersion() >= ['2', '2']:
-                    uploadObj = self.post(
-                        'file/chunk?offset=%d&uploadId=%s' % (offset, uploadId),
-                        data=_ProgressBytesIO(chunk, reporter=reporter))
-                else:
-                    # Prior to version 2.2 the server only supported multipart uploads
-                    parameters = {
-                        'offset': offset,
-                        'uploadId': uploadId
-                    }
+                    if self.getServerVersion() >= ['2', '2']:
+                        uploadObj = self.post(
+                            'file/chunk?offset=%d&uploadId=%s' % (offset, uploadId),
+                            data=_ProgressBytesIO(chunk, reporter=reporter))
+                    else:
+                        # Prior to version 2.2 the server only supported multipart uploads
+                        parameters = {
+                            'offset': offset,
+                            'uploadId': uploadId
+                        }
 
-                    m = _ProgressMultiPartEncoder(
-                        reporter=reporter,
-                        fields={'chunk': ('chunk', chunk, 'application/octet-stream')},
-                    )
+                        m = _ProgressMultiPartEncoder(
+                            reporter=reporter,
+                            fields={'chunk': ('chunk', chunk, 'application/octet-stream')},
+                        )
 
-                    uploadObj = self.post('file/chunk', parameters=parameters,
-                                          data=m, headers={'Content-Type': m.content_type})
+                        uploadObj = self.post('file/chunk', parameters=parameters,
+                                              data=m, headers={'Content-Type': m.content_type})
+
+                    if '_id' not in uploadObj:
+                        raise Exception(
+                            'After uploading a file chunk, did not receive object with _id. '
+                            'Got instead: ' + json.dumps(uploadObj))
+
+                    offset += len(chunk)
+
+                    if callable(progressCallback):
+                        progressCallback({
+                            'current': offset,
+                            'total': size
+                        })
+        except requests.RequestException:
+            # The upload cannot be continued, so it is removed before the
+            # error is raised, rather than left behind when it is retried
+            self._cancelUpload(uploadId)
+            raise
 
-                if '_id' not in uploadObj:
-                    raise Exception(
-                        'After uploading a file chunk, did not receive object with _id. '
-                        'Got instead: ' + json.dumps(uploadObj))
+        if offset != size:
+            self.delete('file/upload/' + uploadId)
+            raise IncorrectUploadLengthError(
+                'Expected upload to be %d bytes, but received %d.' % (size, offset),
+                upload=uploadObj)
 
-                offset += len(chunk)
+        return uploadObj
 
-                if callable(progressCallback):
+    def _cancelUpload(self, uploadId):
+        """
+        Remove an upload that failed, without masking the error that stopped it.
+        """
+        try:
+            self.delete('file/upload/' + uploadId)
+        except requests.RequestException as e:
+            _logger.warning('Could not remove the failed upload %s: %s', uploadId, e)
+
+    def _uploadS3Parts(self, uploadObj, stream, size, chunkJobs, progressCallback=None):
+        """
+        Upload the contents of a file directly to an S3 assetstore using the
+        multipart protocol. Girder signs a request for each part, and since S3
+        accepts parts in any order, several parts are sent at once.
+
+        :param uploadObj: The upload object, which must have the ``s3`` behavior.
+        :type uploadObj: dict
+        :param stream: Readable stream object.
+        :type stream: file-like
+        :param size: The length of the file.
+        :type size: int
+        :param chunkJobs: The number of parts to send at once.
+        :type chunkJobs: int
+        :param progressCallback: If passed, will be called after each part
+            with progress information.
+        :type progressCallback: callable
+        """
+        uploadId = uploadObj['_id']
+        request = uploadObj['s3']['request']
+        chunkLength = uploadObj['s3']['chunkLength']
+        resp = self._requestFunc(request['method'])(request['url'], headers=request['headers'])
+        resp.raise_for_status()
+        s3UploadId = re.search(r'<UploadId>(.*)</UploadId>', resp.text).group(1)
+        eTags = {}
+        progress = {'current': 0}
+        lock = threading.Lock()
+
+        def sendPart(partNumber, chunk, reporter):
+            signed = self.post('file/chunk', parameters={
+                'offset': 0,
+                'uploadId': uploadId
+            }, data={
+                'chunk': json.dumps({
+                    's3UploadId': s3UploadId,
+                    'partNumber': partNumber,
+                    'contentLength': len(chunk)
+                })
+            })['s3']['request']
+            resp = self._requestFunc(signed['method'])(signed['url'], data=chunk)
+            resp.raise_for_status()
+            eTags[partNumber] = resp.headers['ETag']
+            reporter.update(len(chunk))
+            if callable(progressCallback):
+                with lock:
+                    progress['current'] += len(chunk)
                     progressCallback({
-                        'current': offset,
+                        'current': progress['current'],
                         'total': size
                     })
 
+        pool = _WorkerPool(chunkJobs)
+        offset = 0
+        try:
+            with self.progressReporterCls(
+                    label=uploadObj.get('name', ''), length=size) as reporter:
+                reporter = _LockedProgressReporter(reporter)
+                partNumber = 1
+                while offset < size:
+                    chunk = stream.read(min(chunkLength, size - offset))
+                    if not chunk:
+                        break
+                    if isinstance(chunk, six.text_type):
+                        chunk = chunk.encode('utf8')
+                    pool.submit(sendPart, partNumber, chunk, reporter)
+                    offset += len(chunk)
+                    partNumber += 1
+                pool.close()
+        except Exception:
+            excInfo = sys.exc_info()
+            try:
+                pool.close()
+            except Exception:
+                pass
+            self._cancelUpload(uploadId)
+            six.reraise(*excInfo)
+
         if offset != size:
             self.delete('file/upload/' + uploadId)
             raise IncorrectUploadLengthError(
                 'Expected upload to be %d bytes, but received %d.' % (size, offset),
                 upload=uploadObj)
 
-        return uploadObj
+        file = self.post('file/completion', parameters={'uploadId': uploadId})
+        finalize = file.pop('s3FinalizeRequest')
+        body = ''.join(
+            '<Part><PartNumber>%d</PartNumber><ETag>%s</ETag></Part>' % (number, eTags[number])
+            for number in sorted(eTags))
+        resp = self._requestFunc(finalize['method'])(
+            finalize['url'], headers=finalize['headers'],
+            data='<CompleteMultipartUpload>%s</CompleteMultipartUpload>' % body)
+        resp.raise_for_status()
+        return file
 
     def uploadFile(self, parentId, stream, name, size, parentType='item',
                    progressCallback=None, reference=None, mimeType=None):
@@ -1104,11 +1578,17 @@ class GirderClient(object):
         }
         if reference is not None:
             params['reference'] = reference
+        sha512 = self._contentHash(stream, size)
+        if sha512:
+            params['sha512'] = sha512
         obj = self.post('file', params)
         if '_id' not in obj:
             raise Exception(
                 'After creating an upload token for a new file, expected '
                 'an object with an id. Got instead: ' + json.dumps(obj))
+        if obj.get('_modelType') == 'file':
+            # The server already had the contents
+            return obj
 
         return self._uploadContents(obj, stream, size, progressCallback=progressCallback)
 
@@ -1204,13 +1684,22 @@ class GirderClient(object):
         path = 'file/%s/download' % fileId
         return self.sendRestRequest('get', path, stream=True, jsonResp=False)
 
-    def downloadFile(self, fileId, path, created=None):
+    def downloadFile(self, fileId, path, created=None, resume=False):
         """
         Download a file to the given local path or file-like object.
 
         :param fileId: The ID of the Girder file to download.
         :param path: The path to write the file to, or a file-like object.
+        :param resume: If True and ``path`` is a filename, the data is kept in
+            a partial file next to ``path`` until the download completes. A
+            download interrupted by an error continues from where it stopped,
+            both within this call and when it is called again.
+        :type resume: bool
         """
+        if resume and isinstance(path, six.string_types):
+            file = self.getFile(fileId)
+            return self._runDownload(1, True, False, self._downloadFileResumable, file, path)
+
         created = created or self.getFile(fileId)['created']
         cacheKey = '\n'.join([self.urlBase, fileId, created])
 
@@ -1252,6 +1741,185 @@ class GirderClient(object):
             # delete the temp file
             os.remove(tmp.name)
 
+    def _runDownload(self, jobs, resume, sync, func, *args):
+        """
+        Run a download function with a :py:class:`_DownloadJob` as its first
+        argument, using a pool of ``jobs`` threads if ``jobs`` is more than 1.
+        Unless resuming, partial files are removed if the download fails.
+        """
+        job = _DownloadJob(_WorkerPool(jobs) if jobs > 1 else None, resume, sync)
+        progressReporterCls = self.progressReporterCls
+        try:
+            if job.pool is None:
+                return func(job, *args)
+            self.progressReporterCls = _NoopProgressReporter
+            if self._session is None:
+                with self.session(self._createSession(poolSize=jobs)):
+                    func(job, *args)
+                    job.pool.close()
+            else:
+                func(job, *args)
+                job.pool.close()
+        except Exception:
+            excInfo = sys.exc_info()
+            if job.pool is not None:
+                try:
+                    job.pool.close()
+                except Exception:
+                    pass
+            if not resume:
+                for partial in job.partials:
+                    partial.remove()
+            six.reraise(*excInfo)
+        finally:
+            self.progressReporterCls = progressReporterCls
+
+    def _downloadFileTo(self, job, file, path):
+        """
+        Download a file as part of a download job, skipping it when syncing if
+        the local manifest shows it is already present.
+        """
+        if job.sync and self._isDownloadCurrent(file, path):
+            self._recordDownload(file, path)
+        elif job.pool is None and not job.resume:
+            self.downloadFile(file['_id'], path, created=file['created'])
+            self._recordDownload(file, path)
+        else:
+            self._downloadFileResumable(job, file, path)
+
+    def _downloadFileResumable(self, job, file, path):
+        """
+        Download a file through a partial file. Large files are divided into
+        segments that the job's workers download at the same time.
+        """
+        cacheKey = '\n'.join([self.urlBase, file['_id'], file['created']])
+        if self.cache is not None:
+            fp = self.cache.get(cacheKey, read=True)
+            if fp:
+                with fp:
+                    self._copyFile(fp, path)
+                self._recordDownload(file, path)
+                return
+
+        segmentSize = None
+        if (job.pool is not None and
+                file['size'] >= self.DOWNLOAD_SEGMENT_SIZE * self.MIN_RANGED_DOWNLOAD_SEGMENTS):
+            segmentSize = self.DOWNLOAD_SEGMENT_SIZE
+        partial = _PartialDownload(file, path)
+        partial.open(job.resume, segmentSize)
+        job.partials.add(partial)
+        pending = partial.pending()
+        if not pending:
+            self._finishDownload(job, partial, cacheKey)
+        for index in pending:
+            self._runTask(job.pool, self._downloadSegment, job, partial, index, cacheKey)
+
+    def _downloadSegment(self, job, partial, index, cacheKey):
+        """
+        Download the rest of one segment of a partial download with a range
+        request, continuing after transient errors if the job is resumable.
+        """
+        start, end, received = partial.segments[index]
+        saved = received
+        attempt = 0
+        path = 'file/%s/download' % partial.file['_id']
+        with self.progressReporterCls(
+                label=os.path.basename(partial.path), length=end - start - received) as reporter, \
+                open(partial.partialPath, 'r+b') as fh:
+            while start + received < end:
+                try:
+                    req = self.sendRestRequest(
+                        'get', path, headers={'Range': 'bytes=%d-%d' % (start + received, end - 1)},
+                        stream=True, jsonResp=False)
+                    if req.status_code != 206 and (start + received or end < partial.file['size']):
+                        raise Exception('The server did not honor a range request for %s.' % path)
+                    fh.seek(start + received)
+                    for chunk in req.iter_content(chunk_size=REQ_BUFFER_SIZE):
+                        chunk = chunk[:end - start - received]
+                        fh.write(chunk)
+                        received += len(chunk)
+                        reporter.update(len(chunk))
+                        if received - saved >= PARTIAL_DOWNLOAD_SAVE_INTERVAL:
+                            fh.flush()
+                            partial.update(index, received)
+                            saved = received
+                    if start + received < end:
+                        raise requests.ConnectionError('The download of %s ended early.' % path)
+                except requests.RequestException as e:
+                    fh.flush()
+                    partial.update(index, received)
+                    saved = received
+                    if not job.resume or attempt >= self.MAX_DOWNLOAD_RETRIES or \
+                            not _isTransientError(e):
+                        raise
+                    _logger.warning('Download failed, continuing (%d of %d): %s',
+                                    attempt + 1, self.MAX_DOWNLOAD_RETRIES, e)
+                    time.sleep(min(2 ** attempt, self.MAX_RETRY_DELAY))
+                    attempt += 1
+        if partial.update(index, received):
+            self._finishDownload(job, partial, cacheKey)
+
+    def _finishDownload(self, job, partial, cacheKey):
+        if self.cache is not None:
+            with open(partial.partialPath, 'rb') as fp:
+                self.cache.set(cacheKey, fp, read=True)
+        partial.finish()
+        job.partials.discard(partial)
+        self._recordDownload(partial.file, partial.path)
+
+    def _recordDownload(self, file, path):
+        """
+        Add a downloaded file to the manifest saved by :py:meth:`saveLocalMetadata`.
+        """
+        entry = {'itemId': file.get('itemId'), 'path': os.path.abspath(path)}
+        entry.update(_fileVersion(file))
+        self.incomingManifest[file['_id']] = entry
+
+    def _isDownloadCurrent(self, file, path, entry=None):
+        """
+        Return whether the local manifest shows that this version of a file was
+        already downloaded to ``path``, and the local file still has its size.
+        """
+        entry = entry or self.localManifest.get(file['_id'])
+        if not entry or entry['path'] != os.path.abspath(path):
+            return False
+        if any(entry.get(key) != value for key, value in six.viewitems(_fileVersion(file))):
+            return False
+        return os.path.isfile(path) and os.path.getsize(path) == file['size']
+
+    def _isItemDownloaded(self, itemId, files=None):
+        """
+        Return whether the local manifest records every file of an item and
+        those files are still present, carrying the records over to the new
+        manifest. The caller has already found the item itself unchanged.
+
+        :param files: The item's files as the server lists them. If given, the
+            manifest must record exactly these files at their current version.
+            Otherwise the files are not listed, and only the recorded files
+            are checked; a change that leaves the item's size and update time
+            alone, such as replacing a file's contents with as many bytes, is
+            then not noticed.
+        """
+        if self._localManifestItems is None:
+            self._localManifestItems = collections.defaultdict(list)
+            for fileId, entry in six.viewitems(self.localManifest):
+                self._localManifestItems[entry['itemId']].append((fileId, entry))
+        entries = dict(self._localManifestItems.get(itemId, ()))
+        if files is None:
+            for entry in six.viewvalues(entries):
+                path = entry['path']
+                if not os.path.isfile(path) or os.path.getsize(path) != entry['size']:
+                    return False
+        else:
+            if set(entries) != {file['_id'] for file in files}:
+                return False
+            for file in files:
+                entry = entries[file['_id']]
+                if not self._isDownloadCurrent(file, entry['path'], entry):
+                    return False
+        self.incomingManifest.update(entries)
+        return True
+
     def downloadFileAsIterator(self, fileId, chunkSize=REQ_BUFFER_SIZE):
         """
         Download a file streaming the contents as an iterator.
@@ -1266,7 +1934,7 @@ class GirderClient(object):
 
         return req.iter_content(chunk_size=chunkSize)
 
-    def downloadItem(self, itemId, dest, name=None):
+    def downloadItem(self, itemId, dest, name=None, jobs=1, resume=False):
         """
         Download an item from Girder into a local folder. Each file in the
         item will be placed into the directory specified by the dest parameter.
@@ -1278,7 +1946,16 @@ class GirderClient(object):
         :param dest: The destination directory to write the item into.
         :param name: If the item name is known in advance, you may pass it here
             which will save a lookup to the server.
+        :param jobs: The number of files, or ranges of large files, to
+            download at once.
+        :type jobs: int
+        :param resume: Whether to continue interrupted downloads of files, as
+            described in :py:meth:`downloadFile`.
+        :type resume: bool
         """
+        self._runDownload(jobs, resume, False, self._downloadItem, itemId, dest, name)
+
+    def _downloadItem(self, job, itemId, dest, name=None):
         if name is None:
             item = self.get('item/' + itemId)
             name = item['name']
@@ -1293,27 +1970,25 @@ class GirderClient(object):
 
             if first:
                 if len(files) == 1 and files[0]['name'] == name:
-                    self.downloadFile(
-                        files[0]['_id'],
-                        os.path.join(dest, self.transformFilename(name)),
-                        created=files[0]['created'])
+                    self._runTask(
+                        job.pool, self._downloadFileTo, job, files[0],
+                        os.path.join(dest, self.transformFilename(name)))
                     break
                 else:
                     dest = os.path.join(dest, self.transformFilename(name))
                     _safeMakedirs(dest)
 
             for file in files:
-                self.downloadFile(
-                    file['_id'],
-                    os.path.join(dest, self.transformFilename(file['name'])),
-                    created=file['created'])
+                self._runTask(
+                    job.pool, self._downloadFileTo, job, file,
+                    os.path.join(dest, self.transformFilename(file['name'])))
 
             first = False
             offset += len(files)
             if len(files) < DEFAULT_PAGE_LIMIT:
                 break
 
-    def downloadFolderRecursive(self, folderId, dest, sync=False):
+    def downloadFolderRecursive(self, folderId, dest, sync=False, jobs=1, resume=False):
         """
         Download a folder recursively from Girder into a local directory.
 
@@ -1323,10 +1998,24 @@ class GirderClient(object):
         :type dest: str
         :param sync: If True, check if item exists in local metadata
             cache and skip download provided that metadata is identical.
+            Files of changed items are skipped if the local manifest shows
+            the same size and sha512 were already downloaded.
         :type sync: bool
+        :param jobs: The number of items, files, or ranges of large files to
+            download at once.
+        :type jobs: int
+        :param resume: Whether to continue interrupted downloads of files, as
+            described in :py:meth:`downloadFile`.
+        :type resume: bool
         """
+        self._runDownload(jobs, resume, sync, self._downloadFolderRecursive, folderId, dest)
+
+    def _downloadFolderRecursive(self, job, folderId, dest):
         offset = 0
         folderId = self._checkResourcePath(folderId)
+        if self._serverHasRoute('/folder/{id}/manifest'):
+            return self._downloadFolderManifest(job, folderId, dest)
+
         while True:
             folders = self.get('folder', parameters={
                 'limit': DEFAULT_PAGE_LIMIT,
@@ -1339,7 +2028,7 @@ class GirderClient(object):
                 local = os.path.join(dest, self.transformFilename(folder['name']))
                 _safeMakedirs(local)
 
-                self.downloadFolderRecursive(folder['_id'], local, sync=sync)
+                self._downloadFolderRecursive(job, folder['_id'], local)
 
             offset += len(folders)
             if len(folders) < DEFAULT_PAGE_LIMIT:
@@ -1357,16 +2046,64 @@ class GirderClient(object):
             for item in items:
                 _id = item['_id']
                 self.incomingMetadata[_id] = item
-                if (sync and _id in self.localMetadata and
-                        _compareDicts(item, self.localMetadata[_id])):
+                if (job.sync and _id in self.localMetadata and
+                        _compareDicts(item, self.localMetadata[_id]) and
+                        self._isItemDownloaded(_id)):
                     continue
-                self.downloadItem(item['_id'], dest, name=item['name'])
+                self._runTask(job.pool, self._downloadItem, job, item['_id'], dest, item['name'])
 
             offset += len(items)
             if len(items) < DEFAULT_PAGE_LIMIT:
                 break
 
-    def downloadResource(self, resourceId, dest, resourceType='folder', sync=False):
+    def _downloadFolderManifest(self, job, folderId, dest):
+        """
+        Download a folder recursively using the streamed manifest of its
+        subtree, rather than listing each folder and item in turn.
+        """
+        dirs = {}
+        item = None
+        files = []
+        for record in self.getFolderManifest(folderId):
+            if record['type'] == 'folder':
+                if not dirs:
+                    dirs[record['_id']] = dest
+                    continue
+                local = os.path.join(
+                    dirs[record['parentId']], self.transformFilename(record['name']))
+                _safeMakedirs(local)
+                dirs[record['_id']] = local
+            elif record['type'] == 'item':
+                if item is not None:
+                    self._downloadManifestItem(job, item, files, dirs[item['folderId']])
+                item, files = record, []
+            elif record['type'] == 'file':
+                files.append(record)
+        if item is not None:
+            self._downloadManifestItem(job, item, files, dirs[item['folderId']])
+
+    def _downloadManifestItem(self, job, item, files, dest):
+        _id = item['_id']
+        self.incomingMetadata[_id] = item
+        if (job.sync and _id in self.localMetadata and
+                _compareDicts(item, self.localMetadata[_id]) and
+                self._isItemDownloaded(_id, files)):
+            return
+
+        if len(files) == 1 and files[0]['name'] == item['name']:
+            return self._runTask(
+                job.pool, self._downloadFileTo, job, files[0],
+                os.path.join(dest, self.transformFilename(item['name'])))
+
+        dest = os.path.join(dest, self.transformFilename(item['name']))
+        _safeMakedirs(dest)
+        for file in files:
+            self._runTask(
+                job.pool, self._downloadFileTo, job, file,
+                os.path.join(dest, self.transformFilename(file['name'])))
+
+    def downloadResource(self, resourceId, dest, resourceType='folder', sync=False, jobs=1,
+                         resume=False):
         """
         Download a collection, user, or folder recursively from Girder into a local directory.
 
@@ -1381,44 +2118,62 @@ class GirderClient(object):
         :param sync: If True, check if items exist in local metadata
             cache and skip download if the metadata is identical.
         :type sync: bool
-        """
+        :param jobs: The number of items, files, or ranges of large files to
+            download at once.
+        :type jobs: int
+        :param resume: Whether to continue interrupted downloads of files, as
+            described in :py:meth:`downloadFile`.
+        :type resume: bool
+        """
+        if resourceType not in ('folder', 'collection', 'user'):
+            raise Exception('Invalid resource type: %s' % resourceType)
+        self._runDownload(
+            jobs, resume, sync, self._downloadResource, resourceId, dest, resourceType)
+
+    def _downloadResource(self, job, resourceId, dest, resourceType):
         if resourceType == 'folder':
-            self.downloadFolderRecursive(resourceId, dest, sync)
-        elif resourceType in ('collection', 'user'):
-            offset = 0
-            resourceId = self._checkResourcePath(resourceId)
-            while True:
-                folders = self.get('folder', parameters={
-                    'limit': DEFAULT_PAGE_LIMIT,
-                    'offset': offset,
-                    'parentType': resourceType,
-                    'parentId': resourceId
-                })
+            return self._downloadFolderRecursive(job, resourceId, dest)
+
+        offset = 0
+        resourceId = self._checkResourcePath(resourceId)
+        while True:
+            folders = self.get('folder', parameters={
+                'limit': DEFAULT_PAGE_LIMIT,
+                'offset': offset,
+                'parentType': resourceType,
+                'parentId': resourceId
+            })
 
-                for folder in folders:
-                    local = os.path.join(dest, self.transformFilename(folder['name']))
-                    _safeMakedirs(local)
+            for folder in folders:
+                local = os.path.join(dest, self.transformFilename(folder['name']))
+                _safeMakedirs(local)
 
-                    self.downloadFolderRecursive(folder['_id'], local, sync=sync)
+                self._downloadFolderRecursive(job, folder['_id'], local)
 
-                offset += len(folders)
-                if len(folders) < DEFAULT_PAGE_LIMIT:
-                    break
-        else:
-            raise Exception('Invalid resource type: %s' % resourceType)
+            offset += len(folders)
+            if len(folders) < DEFAULT_PAGE_LIMIT:
+                break
 
     def saveLocalMetadata(self, dest):
         """
-        Dumps item metadata collected during a folder download.
+        Dumps item metadata collected during a folder download, along with a
+        manifest of the downloaded files.
 
         :param dest: The local download destination.
         """
         with open(os.path.join(dest, '.girder_metadata'), 'w') as fh:
             fh.write(json.dumps(self.incomingMetadata))
 
+        manifest = {}
+        for fileId, entry in six.viewitems(self.incomingManifest):
+            manifest[fileId] = dict(entry, path=os.path.relpath(entry['path'], dest))
+        with open(os.path.join(dest, '.girder_manifest'), 'w') as fh:
+            fh.write(json.dumps(manifest))
+
     def loadLocalMetadata(self, dest):
         """
-        Reads item metadata from a local folder.
+        Reads item metadata and the manifest of downloaded files from a local
+        folder.
 
         :param dest: The local download destination.
         """
@@ -1429,6 +2184,16 @@ class GirderClient(object):
         except (IOError, OSError):
             print('Local metadata does not exists. Falling back to download.')
 
+        try:
+            with open(os.path.join(dest, '.girder_manifest'), 'r') as fh:
+                manifest = json.loads(fh.read())
+        except (IOError, OSError, ValueError):
+            manifest = {}
+        self.localManifest = {
+            fileId: dict(entry, path=os.path.abspath(os.path.join(dest, entry['path'])))
+            for fileId, entry in six.viewitems(manifest)}
+        self._localManifestItems = None
+
     def inheritAccessControlRecursive(self, ancestorFolderId, access=None, public=None):
         """
         Take the access control and public value of a folder and recursively
@@ -1544,8 +2309,30 @@ class GirderClient(object):
 
         return item
 
+    def _uploadWithRetries(self, retries, func, *args, **kwargs):
+        """
+        Call an upload function, calling it again if it fails with a connection
+        error or a server error, up to ``retries`` more times. A failed upload
+        removes its incomplete upload from the server, so nothing is left
+        behind by the attempts before the last.
+        """
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except requests.RequestException as e:
+                if attempt == retries or not _isTransientError(e):
+                    raise
+                _logger.warning('Upload failed, retrying (%d of %d): %s', attempt + 1, retries, e)
+                time.sleep(min(2 ** attempt, self.MAX_RETRY_DELAY))
+
+    def _runTask(self, pool, func, *args, **kwargs):
+        if pool is None:
+            func(*args, **kwargs)
+        else:
+            pool.submit(func, *args, **kwargs)
+
     def _uploadAsItem(self, localFile, parentFolderId, filePath, reuseExisting=False, dryRun=False,
-                      reference=None):
+                      reference=None, retries=0, chunkJobs=1):
         """Function for doing an upload of a file as an item.
         :param localFile: name of local file to upload
         :param parentFolderId: id of parent folder in Girder
@@ -1553,6 +2340,8 @@ class GirderClient(object):
         :param reuseExisting: boolean indicating whether to accept an existing item
             of the same name in the same location, or create a new one instead
         :param reference: Option reference to send along with the upload.
+        :param retries: The number of times to retry uploading the file.
+        :param chunkJobs: The number of chunks to send at once to S3 assetstores.
         """
         if not self.progressReporterCls.reportProgress:
             print('Uploading Item from %s' % localFile)
@@ -1565,16 +2354,18 @@ class GirderClient(object):
             if reuseExisting or len(self._itemUploadCallbacks) or os.path.getsize(filePath) == 0:
                 currentItem = self.loadOrCreateItem(
                     os.path.basename(localFile), parentFolderId, reuseExisting)
-                self.uploadFileToItem(
-                    currentItem['_id'], filePath, filename=localFile, reference=reference)
+                self._uploadWithRetries(
+                    retries, self.uploadFileToItem, currentItem['_id'], filePath,
+                    filename=localFile, reference=reference, chunkJobs=chunkJobs)
                 for callback in self._itemUploadCallbacks:
                     callback(currentItem, filePath)
             else:
-                self.uploadFileToFolder(
-                    parentFolderId, filePath, filename=localFile, reference=reference)
+                self._uploadWithRetries(
+                    retries, self.uploadFileToFolder, parentFolderId, filePath,
+                    filename=localFile, reference=reference, chunkJobs=chunkJobs)
 
     def _uploadFolderAsItem(self, localFolder, parentFolderId, reuseExisting=False, blacklist=None,
-                            dryRun=False, reference=None):
+                            dryRun=False, reference=None, retries=0, chunkJobs=1):
         """
         Take a folder and use its base name as the name of a new item. Then,
         upload its containing files into the new item as bitstreams.
@@ -1584,6 +2375,8 @@ class GirderClient(object):
         :param reuseExisting: boolean indicating whether to accept an existing item
             of the same name in the same location, or create a new one instead
         :param reference: Option reference to send along with the upload.
+        :param retries: The number of times to retry uploading each file.
+        :param chunkJobs: The number of chunks to send at once to S3 assetstores.
         """
         blacklist = blacklist or []
         print('Creating Item from folder %s' % localFolder)
@@ -1603,14 +2396,17 @@ class GirderClient(object):
             print('Adding file %s, (%d of %d) to Item' % (currentFile, ind + 1, filecount))
 
             if not dryRun:
-                self.uploadFileToItem(item['_id'], filepath, filename=currentFile)
+                self._uploadWithRetries(
+                    retries, self.uploadFileToItem, item['_id'], filepath, filename=currentFile,
+                    chunkJobs=chunkJobs)
 
         if not dryRun:
             for callback in self._itemUploadCallbacks:
                 callback(item, localFolder)
 
     def _uploadFolderRecursive(self, localFolder, parentId, parentType, leafFoldersAsItems=False,
-                               reuseExisting=False, blacklist=None, dryRun=False, reference=None):
+                               reuseExisting=False, blacklist=None, dryRun=False, reference=None,
+                               pool=None, retries=0, chunkJobs=1):
         """
         Function to recursively upload a folder and all of its descendants.
 
@@ -1622,6 +2418,9 @@ class GirderClient(object):
         :param reuseExisting: boolean indicating whether to accept an existing item
             of the same name in the same location, or create a new one instead
         :param reference: Option reference to send along with the upload.
+        :param pool: If passed, items are uploaded by this :py:class:`_WorkerPool`.
+        :param retries: The number of times to retry uploading each file.
+        :param chunkJobs: The number of chunks to send at once to S3 assetstores.
         """
         blacklist = blacklist or []
         if leafFoldersAsItems and self._hasOnlyFiles(localFolder):
@@ -1630,7 +2429,9 @@ class GirderClient(object):
                     ('Attempting to upload a folder as an item under a %s. '
                      % parentType) + 'Items can only be added to folders.')
             else:
-                self._uploadFolderAsItem(localFolder, parentId, reuseExisting, dryRun=dryRun)
+                self._runTask(
+                    pool, self._uploadFolderAsItem, localFolder, parentId, reuseExisting,
+                    dryRun=dryRun, retries=retries, chunkJobs=chunkJobs)
         else:
             filename = os.path.basename(localFolder)
             if filename in blacklist:
@@ -1661,24 +2462,35 @@ class GirderClient(object):
                     # pass that as the parent_type
                     self._uploadFolderRecursive(
                         fullEntry, folder['_id'], 'folder', leafFoldersAsItems, reuseExisting,
-                        dryRun=dryRun, reference=reference)
+                        dryRun=dryRun, reference=reference, pool=pool, retries=retries,
+                        chunkJobs=chunkJobs)
                 else:
-                    self._uploadAsItem(
-                        entry, folder['_id'], fullEntry, reuseExisting, dryRun=dryRun,
-                        reference=reference)
-
-            if not dryRun:
+                    self._runTask(
+                        pool, self._uploadAsItem, entry, folder['_id'], fullEntry, reuseExisting,
+                        dryRun=dryRun, reference=reference, retries=retries, chunkJobs=chunkJobs)
+
+            if not dryRun and self._folderUploadCallbacks:
+                if pool is not None:
+                    # Folder callbacks expect the folder's contents to be uploaded
+                    pool.wait()
                 for callback in self._folderUploadCallbacks:
                     callback(folder, localFolder)
 
     def upload(self, filePattern, parentId, parentType='folder', leafFoldersAsItems=False,
-               reuseExisting=False, blacklist=None, dryRun=False, reference=None):
+               reuseExisting=False, blacklist=None, dryRun=False, reference=None, jobs=1,
+               retries=0, chunkJobs=1):
         """
         Upload a pattern of files.
 
         This will recursively walk down every tree in the file pattern to
         create a hierarchy on the server under the parentId.
 
+        When ``jobs`` is greater than 1, folders are still created in order,
+        but items are created and their files uploaded by a pool of threads
+        sharing a pool of HTTP connections. Item upload callbacks are then
+        called from those threads, and progress is reported per item rather
+        than with progress bars.
+
         :param filePattern: a glob pattern for files that will be uploaded,
             recursively copying any file folder structures.  If this is a list
             or tuple each item in it will be used in turn.
@@ -1698,36 +2510,84 @@ class GirderClient(object):
         :type dryRun: bool
         :param reference: Option reference to send along with the upload.
         :type reference: str
+        :param jobs: The number of items to upload at once.
+        :type jobs: int
+        :param retries: The number of times to restart the upload of a file
+            after a connection error or server error.
+        :type retries: int
+        :param chunkJobs: The number of chunks of each file to send at once
+            to S3 assetstores, which accept chunks out of order.
+        :type chunkJobs: int
         """
         filePatternList = filePattern if isinstance(filePattern, (list, tuple)) else [filePattern]
         blacklist = blacklist or []
-        empty = True
         parentId = self._checkResourcePath(parentId)
-        for pattern in filePatternList:
-            for currentFile in glob.iglob(pattern):
-                empty = False
-                currentFile = os.path.normpath(currentFile)
-                filename = os.path.basename(currentFile)
-                if filename in blacklist:
-                    if dryRun:
-                        print('Ignoring file %s as it is blacklisted' % filename)
-                    continue
-                if os.path.isfile(currentFile):
-                    if parentType != 'folder':
-                        raise Exception(
-                            'Attempting to upload an item under a %s. Items can only be added to '
-                            'folders.' % parentType)
-                    else:
-                        self._uploadAsItem(
-                            os.path.basename(currentFile), parentId, currentFile, reuseExisting,
-                            dryRun=dryRun, reference=reference)
-                else:
-                    self._uploadFolderRecursive(
-                        currentFile, parentId, parentType, leafFoldersAsItems, reuseExisting,
-                        blacklist=blacklist, dryRun=dryRun, reference=reference)
+        if dryRun or jobs * chunkJobs <= 1:
+            empty = self._uploadPatterns(
+                filePatternList, parentId, parentType, leafFoldersAsItems, reuseExisting,
+                blacklist, dryRun, reference, None, retries, chunkJobs)
+        else:
+            empty = self._uploadConcurrently(
+                filePatternList, parentId, parentType, leafFoldersAsItems, reuseExisting,
+                blacklist, reference, jobs, retries, chunkJobs)
         if empty:
             print('No matching files: ' + repr(filePattern))
 
+    def _uploadConcurrently(self, filePatternList, parentId, parentType, leafFoldersAsItems,
+                            reuseExisting, blacklist, reference, jobs, retries, chunkJobs):
+        progressReporterCls = self.progressReporterCls
+        pool = _WorkerPool(jobs) if jobs > 1 else None
+        try:
+            if jobs > 1:
+                self.progressReporterCls = _NoopProgressReporter
+            if self._session is None:
+                with self.session(self._createSession(poolSize=jobs * chunkJobs)):
+                    return self._uploadPatterns(
+                        filePatternList, parentId, parentType, leafFoldersAsItems,
+                        reuseExisting, blacklist, False, reference, pool, retries, chunkJobs)
+            else:
+                return self._uploadPatterns(
+                    filePatternList, parentId, parentType, leafFoldersAsItems, reuseExisting,
+                    blacklist, False, reference, pool, retries, chunkJobs)
+        finally:
+            self.progressReporterCls = progressReporterCls
+
+    def _uploadPatterns(self, filePatternList, parentId, parentType, leafFoldersAsItems,
+                        reuseExisting, blacklist, dryRun, reference, pool, retries, chunkJobs):
+        """
+        Upload each path matching the patterns, returning whether none matched.
+        """
+        empty = True
+        try:
+            for pattern in filePatternList:
+                for currentFile in glob.iglob(pattern):
+                    empty = False
+                    currentFile = os.path.normpath(currentFile)
+                    filename = os.path.basename(currentFile)
+                    if filename in blacklist:
+                        if dryRun:
+                            print('Ignoring file %s as it is blacklisted' % filename)
+                        continue
+                    if os.path.isfile(currentFile):
+                        if parentType != 'folder':
+                            raise Exception(
+                                'Attempting to upload an item under a %s. Items can only be '
+                                'added to folders.' % parentType)
+                        else:
+                            self._runTask(
+                                pool, self._uploadAsItem, filename, parentId, currentFile,
+                                reuseExisting, dryRun=dryRun, reference=reference,
+                                retries=retries, chunkJobs=chunkJobs)
+                    else:
+                        self._uploadFolderRecursive(
+                            currentFile, parentId, parentType, leafFoldersAsItems, reuseExisting,
+                            blacklist=blacklist, dryRun=dryRun, reference=reference, pool=pool,
+                            retries=retries, chunkJobs=chunkJobs)
+        finally:
+            if pool is not None:
+                pool.close()
+        return empty
+
     def _checkResourcePath(self, objId):
         if isinstance(objId, six.string_types) and objId.startswith('/'):
             obj = self.resourceLookup(objId, test=True)
@@ -19,7 +19,7 @@
 import click
 import logging
 import requests
-from requests.adapters import HTTPAdapter
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from six.moves.http_client import HTTPConnection
 import sys
 import types
@@ -96,11 +96,18 @@ class GirderCli(GirderClient):
         elif username:
             self.authenticate(username, password, interactive=interactive)
 
+    def _createSession(self, poolSize=None):
+        session = super(GirderCli, self)._createSession(poolSize)
+        session.verify = self.sslVerify
+        if self.retries:
+            session.mount(self.urlBase, HTTPAdapter(
+                max_retries=self.retries, pool_maxsize=poolSize or DEFAULT_POOLSIZE))
+        return session
+
     def sendRestRequest(self, *args, **kwargs):
-        with self.session() as session:
-            session.verify = self.sslVerify
-            if self.retries:
-                session.mount(self.urlBase, HTTPAdapter(max_retries=self.retries))
+        if self._session is not None:
+            return super(GirderCli, self).sendRestRequest(*args, **kwargs)
+        with self.session():
             return super(GirderCli, self).sendRestRequest(*args, **kwargs)
 
 
@@ -311,16 +318,20 @@ _short_help = 'Download files from Girder'
     _short_help, _common_help.replace('LOCAL_FOLDER', 'LOCAL_FOLDER (default: ".")')))
 @_CommonParameters(additional_parent_types=[
     'collection', 'user', 'item', 'file'], path_default='.')
+@click.option('--jobs', default=1, type=click.IntRange(1), show_default=True,
+              help='number of files, or ranges of large files, to download at once')
+@click.option('--resume', is_flag=True,
+              help='continue interrupted downloads instead of starting them over')
 @click.pass_obj
-def _download(gc, parent_type, parent_id, local_folder):
+def _download(gc, parent_type, parent_id, local_folder, jobs, resume):
     if parent_type == 'auto':
         parent_type = _lookup_parent_type(gc, parent_id)
     if parent_type == 'item':
-        gc.downloadItem(parent_id, local_folder)
+        gc.downloadItem(parent_id, local_folder, jobs=jobs, resume=resume)
     elif parent_type == 'file':
-        gc.downloadFile(parent_id, local_folder)
+        gc.downloadFile(parent_id, local_folder, resume=resume)
     else:
-        gc.downloadResource(parent_id, local_folder, parent_type)
+        gc.downloadResource(parent_id, local_folder, parent_type, jobs=jobs, resume=resume)
 
 
 _short_help = 'Synchronize local folder with remote Girder folder'
@@ -328,12 +339,16 @@ _short_help = 'Synchronize local folder with remote Girder folder'
 
 @main.command('localsync', short_help=_short_help, help='%s\n\n%s' % (_short_help, _common_help))
 @_CommonParameters(additional_parent_types=[])
+@click.option('--jobs', default=1, type=click.IntRange(1), show_default=True,
+              help='number of files, or ranges of large files, to download at once')
+@click.option('--resume', is_flag=True,
+              help='continue interrupted downloads instead of starting them over')
 @click.pass_obj
-def _localsync(gc, parent_type, parent_id, local_folder):
+def _localsync(gc, parent_type, parent_id, local_folder, jobs, resume):
     if parent_type != 'folder':
         raise Exception('localsync command only accepts parent-type of folder')
     gc.loadLocalMetadata(local_folder)
-    gc.downloadFolderRecursive(parent_id, local_folder, sync=True)
+    gc.downloadFolderRecursive(parent_id, local_folder, sync=True, jobs=jobs, resume=resume)
     gc.saveLocalMetadata(local_folder)
 
 
@@ -355,15 +370,23 @@ _short_help = 'Upload files to Girder'
               help='comma-separated list of filenames to ignore')
 @click.option('--reference', default=None,
               help='optional reference to send along with the upload')
+@click.option('--jobs', default=1, type=click.IntRange(1), show_default=True,
+              help='number of items to upload at once')
+@click.option('--chunk-jobs', default=1, type=click.IntRange(1), show_default=True,
+              help='number of chunks of each file to send at once to S3 assetstores')
+@click.option('--file-retries', default=0, type=click.IntRange(0), show_default=True,
+              help='number of times to restart the upload of a file after an error')
 @click.pass_obj
 def _upload(gc, parent_type, parent_id, local_folder,
-            leaf_folders_as_items, reuse, blacklist, dry_run, reference):
+            leaf_folders_as_items, reuse, blacklist, dry_run, reference, jobs, chunk_jobs,
+            file_retries):
     if parent_type == 'auto':
         parent_type = _lookup_parent_type(gc, parent_id)
     gc.upload(
         local_folder, parent_id, parent_type,
         leafFoldersAsItems=leaf_folders_as_items, reuseExisting=reuse,
-        blacklist=blacklist.split(','), dryRun=dry_run, reference=reference)
+        blacklist=blacklist.split(','), dryRun=dry_run, reference=reference, jobs=jobs,
+        retries=file_retries, chunkJobs=chunk_jobs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import collections
+import datetime
+import errno
+import json
+import socket
+import time
+
+from girder import logger
+from girder.api.v1.notification import DEFAULT_STREAM_TIMEOUT, sseMessage
+from girder.constants import SettingKey, TokenScope
+from girder.exceptions import GirderException
+from girder.models.notification import Notification
+from girder.models.setting import Setting
+from girder.models.token import Token
+from girder.utility.notification_broker import broker as notificationBroker
+from six.moves import http_cookies, urllib
+
+try:
+    import selectors
+except ImportError:
+    selectors = None
+
+MAX_REQUEST_SIZE = 16 * 1024
+# Clients that stop reading are disconnected once this much output is pending
+MAX_PENDING_OUTPUT = 1024 * 1024
+# Seconds a finished connection has to read its remaining output
+CLOSE_GRACE_PERIOD = 10
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+    431: 'Request Header Fields Too Large', 503: 'Service Unavailable'}
+
+
+class _Connection(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self.request = b''
+        self.output = b''
+        self.subscription = None
+        self.since = None
+        self.sent = {}
+        self.deadline = None
+        self.timeout = DEFAULT_STREAM_TIMEOUT
+        self.closing = False
+        self.closed = False
+
+
+class NotificationStreamServer(object):
+    """
+    Serves ``GET /api/v1/notification/stream`` with the same behavior as the
+    REST endpoint, but from a single thread multiplexing all of its
+    connections, so open streams do not each hold a CherryPy worker thread.
+
+    Notifications are received from the process-wide notification broker.
+    Authenticating a connection and sending its backlog query the database
+    from the server thread; after that, idle connections cost only a socket.
+    """
+
+    def __init__(self, address, backlog=1024, broker=notificationBroker):
+        """
+        Creates but does not start a notification stream server.
+
+        :param address: Hostname and port for the server to bind to.
+        :type address: (str, int) tuple
+        :param backlog: The listen backlog of the server socket.
+        :type backlog: int
+        :param broker: The notification broker to subscribe to.
+        """
+        if selectors is None:
+            raise GirderException('The notification stream server requires Python 3.')
+        self.broker = broker
+        self.connections = set()
+        self.selector = selectors.DefaultSelector()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(address)
+        self.socket.listen(backlog)
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+        self.selector.register(self.socket, selectors.EVENT_READ, (self._accept, None))
+        # The broker delivers from its own thread, so notifications are queued
+        # and the server thread is woken through a socket pair.
+        self._pending = collections.deque()
+        self._wakeReader, self._wakeWriter = socket.socketpair()
+        self._wakeReader.setblocking(False)
+        self._wakeWriter.setblocking(False)
+        self.selector.register(self._wakeReader, selectors.EVENT_READ, (self._drain, None))
+        self._stopped = False
+
+    def serve_forever(self):
+        """
+        Serve connections until :py:meth:`shutdown` is called.
+        """
+        while not self._stopped:
+            now = time.time()
+            deadlines = [conn.deadline for conn in self.connections if conn.deadline is not None]
+            timeout = max(0, min(deadlines + [now + 1]) - now)
+            for key, mask in self.selector.select(timeout):
+                handler, conn = key.data
+                try:
+                    handler(conn, mask)
+                except Exception:
+                    logger.exception('Notification stream error')
+                    if conn is not None:
+                        self._close(conn)
+            now = time.time()
+            for conn in list(self.connections):
+                if conn.deadline is not None and conn.deadline <= now:
+                    if conn.closing:
+                        self._close(conn)
+                    else:
+                        self._finish(conn)
+
+    def shutdown(self):
+        self._stopped = True
+        self._wake()
+
+    def server_close(self):
+        for conn in list(self.connections):
+            self._close(conn)
+        self.selector.close()
+        self.socket.close()
+        self._wakeReader.close()
+        self._wakeWriter.close()
+
+    def _wake(self):
+        try:
+            self._wakeWriter.send(b'\0')
+        except socket.error:
+            pass  # The wake socket is already full, so the server will wake anyway
+
+    def _accept(self, _, mask):
+        try:
+            sock, _ = self.socket.accept()
+        except socket.error:
+            return
+        sock.setblocking(False)
+        conn = _Connection(sock)
+        self.connections.add(conn)
+        self.selector.register(sock, selectors.EVENT_READ, (self._handle, conn))
+
+    def _handle(self, conn, mask):
+        if mask & selectors.EVENT_WRITE:
+            self._flush(conn)
+        if mask & selectors.EVENT_READ and not conn.closed:
+            try:
+                data = conn.sock.recv(4096)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                data = b''
+            if not data:
+                self._close(conn)
+            elif conn.subscription is None and not conn.closing:
+                conn.request += data
+                if b'\r\n\r\n' in conn.request:
+                    self._open(conn)
+                elif len(conn.request) > MAX_REQUEST_SIZE:
+                    self._error(conn, 431, 'Request too large.')
+
+    def _drain(self, _, mask):
+        try:
+            while self._wakeReader.recv(4096):
+                pass
+        except socket.error:
+            pass
+        while self._pending:
+            conn, notification = self._pending.popleft()
+            if not conn.closed and not conn.closing:
+                self._sendNotification(conn, notification)
+
+    def _open(self, conn):
+        head = conn.request.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = head[0].split(' ', 2)
+        except ValueError:
+            return self._error(conn, 400, 'Invalid request.')
+        headers = {}
+        for line in head[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        url = urllib.parse.urlparse(target)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+
+        if method != 'GET' or not url.path.rstrip('/').endswith('/notification/stream'):
+            return self._error(conn, 404, 'No matching route.')
+
+        tokenStr = params.get('token') or headers.get('girder-token')
+        if not tokenStr and 'cookie' in headers:
+            cookie = http_cookies.SimpleCookie(headers['cookie'])
+            if 'girderToken' in cookie:
+                tokenStr = cookie['girderToken'].value
+        token, user = Token().loadWithUser(tokenStr) if tokenStr else (None, None)
+        if token is None:
+            return self._error(conn, 401, 'You must be logged in or have a valid auth token.')
+        if (token['expires'] < datetime.datetime.utcnow() or
+                not Token().hasScope(token, TokenScope.USER_AUTH)):
+            user = None
+
+        if not Setting().get(SettingKey.ENABLE_NOTIFICATION_STREAM):
+            return self._error(conn, 503, 'The notification stream is not enabled.')
+
+        try:
+            conn.timeout = int(params.get('timeout', DEFAULT_STREAM_TIMEOUT))
+            if 'since' in params:
+                conn.since = datetime.datetime.utcfromtimestamp(int(params['since']))
+        except ValueError:
+            return self._error(conn, 400, 'Invalid timeout or since parameter.')
+
+        self._send(conn, self._head(200, 'text/event-stream', headers.get('origin')))
+        conn.subscription = self.broker.subscribe(
+            user, token, callback=lambda notification: self._queue(conn, notification))
+        conn.deadline = time.time() + conn.timeout
+        for notification in Notification().get(user, conn.since, token=token):
+            self._sendNotification(conn, notification)
+
+    def _queue(self, conn, notification):
+        self._pending.append((conn, notification))
+        self._wake()
+
+    def _sendNotification(self, conn, notification):
+        if conn.since is not None and notification['updated'] <= conn.since:
+            return
+        if conn.sent.get(notification['_id'], datetime.datetime.min) >= notification['updated']:
+            return
+        conn.sent[notification['_id']] = notification['updated']
+        conn.deadline = time.time() + conn.timeout
+        self._send(conn, sseMessage(notification).encode('utf8'))
+
+    def _head(self, status, contentType, origin=None):
+        lines = [
+            'HTTP/1.1 %d %s' % (status, STATUS_TEXT[status]),
+            'Content-Type: %s' % contentType,
+            'Cache-Control: no-cache',
+            'Connection: close']
+        allowed = Setting().get(SettingKey.CORS_ALLOW_ORIGIN)
+        if origin and allowed:
+            allowedList = [o.strip() for o in allowed.split(',')]
+            lines.append('Access-Control-Allow-Credentials: true')
+            if len(allowedList) == 1:
+                lines.append('Access-Control-Allow-Origin: %s' % allowedList[0])
+            elif origin in allowedList:
+                lines.append('Access-Control-Allow-Origin: %s' % origin)
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def _error(self, conn, status, message):
+        body = json.dumps({'message': message, 'type': 'rest'}).encode('utf8')
+        self._send(conn, self._head(status, 'application/json') + body)
+        self._finish(conn)
+
+    def _send(self, conn, data):
+        conn.output += data
+        if len(conn.output) > MAX_PENDING_OUTPUT:
+            return self._close(conn)
+        self._flush(conn)
+
+    def _flush(self, conn):
+        if conn.closed:
+            return
+        try:
+            while conn.output:
+                sent = conn.sock.send(conn.output)
+                conn.output = conn.output[sent:]
+        except socket.error as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return self._close(conn)
+        if not conn.output and conn.closing:
+            return self._close(conn)
+        events = selectors.EVENT_READ
+        if conn.output:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(conn.sock, events, (self._handle, conn))
+
+    def _finish(self, conn):
+        """
+        Close a connection once its pending output has been written.
+        """
+        conn.closing = True
+        conn.deadline = time.time() + CLOSE_GRACE_PERIOD
+        if conn.subscription is not None:
+            conn.subscription.close()
+        self._flush(conn)
+
+    def _close(self, conn):
+        if conn.closed:
+            return
+        conn.closed = True
+        if conn.subscription is not None:
+            conn.subscription.close()
+        self.connections.discard(conn)
+        self.selector.unregister(conn.sock)
+        conn.sock.close()
@@ -36,7 +36,6 @@ from girder.constants import SettingKey, TokenScope, SortDir
 from girder.exceptions import AccessException, GirderException, ValidationException, RestException
 from girder.models.setting import Setting
 from girder.models.token import Token
-from girder.models.user import User
 from girder.utility import toBool, config, JsonEncoder, optionalArgumentDecorator
 from girder.utility._cache import requestCache
 from girder.utility.model_importer import ModelImporter
@@ -158,21 +157,41 @@ def getCurrentToken(allowCookie=None):
         passed, it will default to False unless the access.cookie decorator is used.
     :type allowCookie: bool
     """
+    tokenStr = _getTokenString(allowCookie)
+    if not tokenStr:
+        return None
+
+    return Token().load(tokenStr, force=True, objectId=False)
+
+
+def _getTokenString(allowCookie=None):
+    """
+    Return the token string passed with the current request, or None. See
+    :py:func:`getCurrentToken` for the meaning of ``allowCookie``.
+    """
     if allowCookie is None:
         allowCookie = getattr(cherrypy.request, 'girderAllowCookie', False)
 
-    tokenStr = None
     if 'token' in cherrypy.request.params:  # Token as a parameter
-        tokenStr = cherrypy.request.params.get('token')
+        return cherrypy.request.params.get('token')
     elif 'Girder-Token' in cherrypy.request.headers:
-        tokenStr = cherrypy.request.headers['Girder-Token']
+        return cherrypy.request.headers['Girder-Token']
     elif allowCookie and 'girderToken' in cherrypy.request.cookie:
-        tokenStr = cherrypy.request.cookie['girderToken'].value
+        return cherrypy.request.cookie['girderToken'].value
+    return None
 
-    if not tokenStr:
-        return None
 
-    return Token().load(tokenStr, force=True, objectId=False)
+def _getCurrentTokenAndUser():
+    """
+    Resolve the current token and the user that owns it, using the cached
+    token resolution when available.
+
+    :returns: a tuple of (token, user); either may be None.
+    """
+    tokenStr = _getTokenString()
+    if not tokenStr:
+        return None, None
+    return Token().loadWithUser(tokenStr)
 
 
 def getCurrentUser(returnToken=False):
@@ -194,7 +213,7 @@ def getCurrentUser(returnToken=False):
     if event.defaultPrevented and len(event.responses) > 0:
         return event.responses[0]
 
-    token = getCurrentToken()
+    token, user = _getCurrentTokenAndUser()
 
     def retVal(user, token):
         setCurrentUser(user)
@@ -214,7 +233,6 @@ def getCurrentUser(returnToken=False):
         except AccessException:
             return retVal(None, token)
 
-        user = User().load(token['userId'], force=True)
         return retVal(user, token)
 
 
@@ -700,6 +718,60 @@ def _setCommonCORSHeaders():
             setResponseHeader(key, origin)
 
 
+class _RouteNode(object):
+    """
+    A node of the trie of a resource's routes for one HTTP method.  Each node
+    matches one path component, either exactly through ``static`` or any
+    value through ``wildcard``.  ``route`` is the ``(route, handler,
+    wildcards)`` tuple that matches a path ending at this node, where
+    ``wildcards`` lists the position and name of each wildcard.
+    """
+    __slots__ = ('static', 'wildcard', 'route')
+
+    def __init__(self):
+        self.static = {}
+        self.wildcard = None
+        self.route = None
+
+    def add(self, route, handler):
+        node = self
+        for component in route:
+            if component[0] == ':':
+                if node.wildcard is None:
+                    node.wildcard = _RouteNode()
+                node = node.wildcard
+            else:
+                node = node.static.setdefault(component, _RouteNode())
+        if node.route is None:
+            node.route = (route, handler, [
+                (i, component[1:]) for i, component in enumerate(route) if component[0] == ':'])
+
+    def match(self, path):
+        """
+        Find the route for a path, preferring exact components to wildcards
+        from the start of the path, and falling back to wildcards when the
+        exact branch has no match.
+        """
+        node, index, length = self, 0, len(path)
+        fallbacks = []
+        while True:
+            if index == length:
+                if node.route is not None:
+                    return node.route
+            else:
+                child = node.static.get(path[index])
+                if child is None:
+                    child = node.wildcard
+                elif node.wildcard is not None:
+                    fallbacks.append((node.wildcard, index + 1))
+                if child is not None:
+                    node, index = child, index + 1
+                    continue
+            if not fallbacks:
+                return None
+            node, index = fallbacks.pop()
+
+
 class Resource(ModelImporter):
     """
     All REST resources should inherit from this class, which provides utilities
@@ -710,6 +782,8 @@ class Resource(ModelImporter):
     def __init__(self):
         self._routes = collections.defaultdict(
             lambda: collections.defaultdict(list))
+        # Tries of the routes by method, compiled when first matched
+        self._routeTries = {}
 
     def _ensureInit(self):
         """
@@ -758,6 +832,7 @@ class Resource(ModelImporter):
                 break
         else:
             nLengthRoutes.append((route, handler))
+        self._routeTries.pop(method.lower(), None)
 
         # Now handle the api doc if the handler has any attached
         if resource is None and hasattr(self, 'resourceName'):
@@ -818,6 +893,7 @@ class Resource(ModelImporter):
                 handler = registeredHandler
                 del nLengthRoutes[i]
                 break
+        self._routeTries.pop(method.lower(), None)
 
         # Remove the api doc
         if resource is None:
@@ -924,9 +1000,11 @@ class Resource(ModelImporter):
         routeStr = '/'.join((resource, '/'.join(route))).rstrip('/')
         eventPrefix = '.'.join(('rest', method, routeStr))
 
-        event = events.trigger('.'.join((eventPrefix, 'before')),
-                               kwargs, pre=self._defaultAccess)
-        if event.defaultPrevented and len(event.responses) > 0:
+        # Most routes have no event handlers, so only trigger bound events
+        eventName = '.'.join((eventPrefix, 'before'))
+        event = events.trigger(
+            eventName, kwargs, pre=self._defaultAccess) if events.isBound(eventName) else None
+        if event is not None and event.defaultPrevented and len(event.responses) > 0:
             val = event.responses[0]
         else:
             self._defaultAccess(handler)
@@ -936,10 +1014,12 @@ class Resource(ModelImporter):
         # return value of the API method that was called. You can
         # reassign the return value completely by adding a response to
         # the event and calling preventDefault() on it.
-        kwargs['returnVal'] = val
-        event = events.trigger('.'.join((eventPrefix, 'after')), kwargs)
-        if event.defaultPrevented and len(event.responses) > 0:
-            val = event.responses[0]
+        eventName = '.'.join((eventPrefix, 'after'))
+        if events.isBound(eventName):
+            kwargs['returnVal'] = val
+            event = events.trigger(eventName, kwargs)
+            if event.defaultPrevented and len(event.responses) > 0:
+                val = event.responses[0]
 
         return val
 
@@ -962,15 +1042,18 @@ class Resource(ModelImporter):
         if not self._routes:
             raise GirderException('No routes defined for resource')
 
-        for route, handler in self._routes[method][len(path)]:
-            wildcards = {}
-            for routeComponent, pathComponent in six.moves.zip(route, path):
-                if routeComponent[0] == ':':  # Wildcard token
-                    wildcards[routeComponent[1:]] = pathComponent
-                elif routeComponent != pathComponent:  # Exact match token
-                    break
-            else:
-                return route, handler, wildcards
+        trie = self._routeTries.get(method)
+        if trie is None:
+            trie = _RouteNode()
+            for nLengthRoutes in six.viewvalues(self._routes[method]):
+                for route, handler in nLengthRoutes:
+                    trie.add(route, handler)
+            self._routeTries[method] = trie
+
+        match = trie.match(path)
+        if match is not None:
+            route, handler, wildcards = match
+            return route, handler, {name: path[i] for i, name in wildcards}
 
         raise RestException('No matching route for "%s %s"' % (method.upper(), '/'.join(path)))
 
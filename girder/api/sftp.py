@@ -20,19 +20,28 @@
 import paramiko
 import six
 import stat
+import sys
+import threading
 import time
 
+from concurrent import futures
+from dogpile.cache.api import NO_VALUE
 from girder import logger
 from girder.exceptions import AccessException, ValidationException, ResourcePathNotFound
 from girder.models.file import File
 from girder.models.folder import Folder
 from girder.models.item import Item
 from girder.models.user import User
+from girder.utility._cache import LRUMemoryBackend
 from girder.utility.path import lookUpPath
 from girder.utility.model_importer import ModelImporter
 from six.moves import socketserver
 
 MAX_BUF_LEN = 10 * 1024 * 1024
+MAX_CONNECTIONS = 0  # The most concurrent connections; 0 for no limit
+WORKERS = 8  # The number of threads that accept and negotiate connections
+STAT_CACHE_SIZE = 10000  # The most paths to cache per session
+STAT_CACHE_TTL = 10  # The number of seconds to cache each path
 
 
 def _handleErrors(fun):
@@ -80,6 +89,49 @@ def _stat(doc, model):
     return info
 
 
+class _Listing(list):
+    """
+    A directory listing whose entries are generated as the SFTP server sends
+    them.  The server sends a listing in batches by repeatedly taking slices
+    from its start, so only the entries that have been sent are generated and
+    large folders start listing immediately.
+    """
+    def __init__(self, entries, buffered=None):
+        super(_Listing, self).__init__()
+        self._entries = entries
+        self._buffered = buffered or []
+
+    def _fill(self, count=None):
+        while count is None or len(self._buffered) < count:
+            try:
+                self._buffered.append(next(self._entries))
+            except StopIteration:
+                break
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.step is None and (index.start or 0) >= 0:
+            start = index.start or 0
+            if index.stop is None or index.stop >= sys.maxsize:
+                self._fill(start)
+                return _Listing(self._entries, self._buffered[start:])
+            if index.stop >= 0:
+                self._fill(index.stop)
+                return self._buffered[index]
+        self._fill()
+        return self._buffered[index]
+
+    def __getslice__(self, start, stop):  # pragma: no cover
+        return self.__getitem__(slice(start, stop))
+
+    def __len__(self):
+        self._fill()
+        return len(self._buffered)
+
+    def __iter__(self):
+        self._fill()
+        return iter(self._buffered)
+
+
 class _FileHandle(paramiko.SFTPHandle):
     def __init__(self, file):
         """
@@ -98,9 +150,8 @@ class _FileHandle(paramiko.SFTPHandle):
             raise IOError(
                 'Requested chunk length (%d) is larger than the maximum allowed.' % length)
 
-        if offset != self._handle.tell() and offset < self.file['size']:
-            self._handle.seek(offset)
-
+        # File handles read blocks by position, so seeking is cheap
+        self._handle.seek(offset)
         return self._handle.read(length)
 
     def stat(self):
@@ -114,49 +165,69 @@ class _FileHandle(paramiko.SFTPHandle):
 class _SftpServerAdapter(paramiko.SFTPServerInterface, ModelImporter):
     def __init__(self, server, *args, **kwargs):
         self.server = server
+        # Resources by path, including paths that were not found, which are
+        # cached as None.  Listing a folder caches the resources in it.
+        self._resources = LRUMemoryBackend({'max_size': STAT_CACHE_SIZE, 'ttl': STAT_CACHE_TTL})
         paramiko.SFTPServerInterface.__init__(self, server, *args, **kwargs)
 
-    def _list(self, model, document):
-        entries = []
+    def _lookUp(self, path):
+        path = path.rstrip('/')
+        obj = self._resources.get(path)
+        if obj is NO_VALUE:
+            try:
+                obj = lookUpPath(path, filter=False, user=self.server.girderUser)
+            except ResourcePathNotFound:
+                obj = None
+            self._resources.set(path, obj)
+        if obj is None:
+            raise ResourcePathNotFound('Path not found: %s' % path)
+        return obj
+
+    def _children(self, model, document):
         if model in ('collection', 'user', 'folder'):
             for folder in Folder().childFolders(
                     parent=document, parentType=model, user=self.server.girderUser):
-                entries.append(_stat(folder, 'folder'))
+                yield folder, 'folder'
 
         if model == 'folder':
             for item in Folder().childItems(document):
-                entries.append(_stat(item, 'item'))
+                yield item, 'item'
         elif model == 'item':
             for file in Item().childFiles(document):
-                entries.append(_stat(file, 'file'))
+                yield file, 'file'
 
-        return entries
+    def _list(self, path, docs):
+        for doc, model in docs:
+            info = _stat(doc, model)
+            self._resources.set(
+                '%s/%s' % (path, info.filename.decode('utf8')), {'model': model, 'document': doc})
+            yield info
 
     @_handleErrors
     def list_folder(self, path):
         path = path.rstrip('/')
-        entries = []
 
         if path == '':
+            entries = []
             for model in ('collection', 'user'):
                 info = paramiko.SFTPAttributes()
                 info.st_size = 0
                 info.st_mode = 0o777 | stat.S_IFDIR
                 info.filename = model.encode('utf8')
                 entries.append(info)
+            return entries
         elif path in ('/user', '/collection'):
             model = path[1:]
-            for doc in self.model(model).list(user=self.server.girderUser):
-                entries.append(_stat(doc, model))
+            docs = ((doc, model) for doc in self.model(model).list(user=self.server.girderUser))
         else:
-            obj = lookUpPath(path, filter=False, user=self.server.girderUser)
-            return self._list(obj['model'], obj['document'])
+            obj = self._lookUp(path)
+            docs = self._children(obj['model'], obj['document'])
 
-        return entries
+        return _Listing(self._list(path, docs))
 
     @_handleErrors
     def open(self, path, flags, attr):
-        obj = lookUpPath(path, filter=False, user=self.server.girderUser)
+        obj = self._lookUp(path)
 
         if obj['model'] != 'file':
             return paramiko.SFTP_NO_SUCH_FILE
@@ -179,7 +250,7 @@ class _SftpServerAdapter(paramiko.SFTPServerInterface, ModelImporter):
             info.filename = path[1:]
             return info
 
-        obj = lookUpPath(path, filter=False, user=self.server.girderUser)
+        obj = self._lookUp(path)
         return _stat(obj['document'], obj['model'])
 
     def lstat(self, path):
@@ -198,6 +269,7 @@ class _SftpRequestHandler(socketserver.BaseRequestHandler):
         securityOptions.compression = ('zlib@openssh.com', 'none')
 
         self.transport.add_server_key(self.server.hostKey)
+        self.server._addTransport(self.request, self.transport)
         self.transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _SftpServerAdapter)
 
     def handle(self):
@@ -234,23 +306,69 @@ class _ServerAdapter(paramiko.ServerInterface):
             return paramiko.AUTH_FAILED
 
 
-class SftpServer(socketserver.ThreadingTCPServer):
+class SftpServer(socketserver.TCPServer):
 
     allow_reuse_address = True
 
-    def __init__(self, address, hostKey):
+    def __init__(self, address, hostKey, maxConnections=MAX_CONNECTIONS, workers=WORKERS):
         """
         Creates but does not start a Girder SFTP server.
 
+        Connections are accepted and negotiated by a pool of worker threads;
+        once negotiated, each session is served by its SSH transport.
+
         :param address: Hostname and port for the server to bind to.
         :type address: (str, int) tuple
         :param hostKey: Private key for the server to use.
         :type hostKey: paramiko.RSAKey
+        :param maxConnections: The most concurrent connections to allow, or 0
+            for no limit.  Further connections are closed immediately.
+        :type maxConnections: int
+        :param workers: The number of threads negotiating new connections.
+        :type workers: int
         """
         self.hostKey = hostKey
+        self.maxConnections = maxConnections
+        self._connections = {}
+        self._connectionsLock = threading.Lock()
+        self._pool = futures.ThreadPoolExecutor(workers)
         paramiko.Transport.load_server_moduli()
 
         socketserver.TCPServer.__init__(self, address, _SftpRequestHandler)
 
+    def _addTransport(self, request, transport):
+        with self._connectionsLock:
+            self._connections[request] = transport
+
+    def verify_request(self, request, client_address):
+        with self._connectionsLock:
+            # Connections that are still being negotiated have no transport
+            self._connections = {
+                sock: transport for sock, transport in six.viewitems(self._connections)
+                if transport is None or transport.is_active()}
+            if self.maxConnections and len(self._connections) >= self.maxConnections:
+                logger.warning('SFTP connection from %s refused: too many connections' % (
+                    client_address, ))
+                request.close()
+                return False
+            self._connections[request] = None
+        return True
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._processRequest, request, client_address)
+
+    def _processRequest(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+            with self._connectionsLock:
+                self._connections.pop(request, None)
+            request.close()
+
+    def server_close(self):
+        socketserver.TCPServer.server_close(self)
+        self._pool.shutdown(wait=False)
+
     def shutdown_request(self, request):
         pass
@@ -144,12 +144,16 @@ class Assetstore(Resource):
         .param('fileExcludeRegex', 'If set, only filenames that do not match this regular '
                'expression will be imported. If a file matches both the include and exclude regex, '
                'it will be excluded.', required=False)
+        .param('jobs', 'The number of directories to import at once. The default '
+               'depends on the assetstore type.', dataType='integer', required=False)
         .errorResponse()
         .errorResponse('You are not an administrator.', 403)
     )
     def importData(self, assetstore, importPath, destinationId, destinationType, progress,
-                   leafFoldersAsItems, fileIncludeRegex, fileExcludeRegex):
+                   leafFoldersAsItems, fileIncludeRegex, fileExcludeRegex, jobs):
         user = self.getCurrentUser()
+        if jobs is not None and jobs < 1:
+            raise RestException('Jobs must be at least 1.')
         parent = self.model(destinationType).load(
             destinationId, user=user, level=AccessType.ADMIN, exc=True)
 
@@ -159,6 +163,7 @@ class Assetstore(Resource):
                     'fileIncludeRegex': fileIncludeRegex,
                     'fileExcludeRegex': fileExcludeRegex,
                     'importPath': importPath,
+                    'jobs': jobs
                 }, progress=ctx, user=user, leafFoldersAsItems=leafFoldersAsItems)
 
     @access.admin
@@ -24,6 +24,7 @@ from girder.constants import AccessType, TokenScope
 from girder.models.collection import Collection as CollectionModel
 from girder.exceptions import AccessException
 from girder.utility import ziputil
+from girder.utility.prefetch import prefetchFiles
 from girder.utility.progress import ProgressContext
 
 
@@ -113,20 +114,24 @@ class Collection(Resource):
         .modelParam('id', model=CollectionModel, level=AccessType.READ)
         .jsonParam('mimeFilter', 'JSON list of MIME types to include.', requireArray=True,
                    required=False)
+        .param('compression', 'How to compress the files in the archive: "store" them as they '
+               'are, "deflate" them, or choose for each file by its type with "auto".',
+               required=False, enum=['store', 'deflate', 'auto'], default='store')
         .produces('application/zip')
         .errorResponse('ID was invalid.')
         .errorResponse('Read access was denied for the collection.', 403)
     )
-    def downloadCollection(self, collection, mimeFilter):
+    def downloadCollection(self, collection, mimeFilter, compression):
         setResponseHeader('Content-Type', 'application/zip')
         setContentDisposition(collection['name'] + '.zip')
 
         def stream():
-            zip = ziputil.ZipGenerator(collection['name'])
-            for (path, file) in self._model.fileList(
-                    collection, user=self.getCurrentUser(), subpath=False, mimeFilter=mimeFilter):
-                for data in zip.addFile(file, path):
-                    yield data
+            zip = ziputil.ZipGenerator(
+                collection['name'], compression=ziputil.COMPRESSION[compression])
+            for data in zip.addFiles(prefetchFiles(self._model.fileList(
+                    collection, user=self.getCurrentUser(), subpath=False,
+                    mimeFilter=mimeFilter))):
+                yield data
             yield zip.footer()
         return stream
 
@@ -20,6 +20,7 @@
 import cherrypy
 import errno
 import os
+import re
 import six
 
 from ..describe import Description, autoDescribeRoute, describeRoute
@@ -92,12 +93,15 @@ class File(Resource):
                required=False)
         .param('assetstoreId', 'Direct the upload to a specific assetstore (admin-only).',
                required=False)
+        .param('sha512', 'The SHA-512 hash of the file\'s contents as a hex string. If the '
+               'assetstore already stores the same contents in a file you can read, the file '
+               'is created and returned without uploading its contents.', required=False)
         .errorResponse()
         .errorResponse('Write access was denied on the parent folder.', 403)
         .errorResponse('Failed to create upload.', 500)
     )
     def initUpload(self, parentType, parentId, name, size, mimeType, linkUrl, reference,
-                   assetstoreId):
+                   assetstoreId, sha512):
         """
         Before any bytes of the actual file are sent, a request should be made
         to initialize the upload. This creates the temporary record of the
@@ -122,6 +126,15 @@ class File(Resource):
                     user, message='You must be an admin to select a destination assetstore.')
                 assetstore = Assetstore().load(assetstoreId)
 
+            if sha512 is not None and size > 0:
+                if not re.match(r'^[0-9a-fA-F]{128}$', sha512):
+                    raise RestException('The sha512 parameter must be 128 hex digits.')
+                file = Upload().uploadExistingContent(
+                    user=user, name=name, parentType=parentType, parent=parent, size=size,
+                    sha512=sha512, mimeType=mimeType, reference=reference, assetstore=assetstore)
+                if file is not None:
+                    return self._model.filter(file, user)
+
             chunk = None
             if size > 0 and cherrypy.request.headers.get('Content-Length'):
                 ct = cherrypy.request.body.content_type.value
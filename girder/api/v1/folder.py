@@ -17,13 +17,17 @@
 #  limitations under the License.
 ###############################################################################
 
+import json
+import pytz
+
 from ..describe import Description, autoDescribeRoute
 from ..rest import Resource, filtermodel, setResponseHeader, setContentDisposition
 from girder.api import access
 from girder.constants import AccessType, TokenScope
 from girder.exceptions import RestException
 from girder.models.folder import Folder as FolderModel
-from girder.utility import ziputil
+from girder.utility import JsonEncoder, ziputil
+from girder.utility.prefetch import prefetchFiles
 from girder.utility.progress import ProgressContext
 
 
@@ -41,6 +45,7 @@ class Folder(Resource):
         self.route('GET', (':id', 'details'), self.getFolderDetails)
         self.route('GET', (':id', 'access'), self.getFolderAccess)
         self.route('GET', (':id', 'download'), self.downloadFolder)
+        self.route('GET', (':id', 'manifest'), self.getFolderManifest)
         self.route('GET', (':id', 'rootpath'), self.rootpath)
         self.route('POST', (), self.createFolder)
         self.route('PUT', (':id',), self.updateFolder)
@@ -124,11 +129,14 @@ class Folder(Resource):
         .modelParam('id', model=FolderModel, level=AccessType.READ)
         .jsonParam('mimeFilter', 'JSON list of MIME types to include.', required=False,
                    requireArray=True)
+        .param('compression', 'How to compress the files in the archive: "store" them as they '
+               'are, "deflate" them, or choose for each file by its type with "auto".',
+               required=False, enum=['store', 'deflate', 'auto'], default='store')
         .produces('application/zip')
         .errorResponse('ID was invalid.')
         .errorResponse('Read access was denied for the folder.', 403)
     )
-    def downloadFolder(self, folder, mimeFilter):
+    def downloadFolder(self, folder, mimeFilter, compression):
         """
         Returns a generator function that will be used to stream out a zip
         file containing this folder's contents, filtered by permissions.
@@ -138,14 +146,50 @@ class Folder(Resource):
         user = self.getCurrentUser()
 
         def stream():
-            zip = ziputil.ZipGenerator(folder['name'])
-            for (path, file) in self._model.fileList(
-                    folder, user=user, subpath=False, mimeFilter=mimeFilter):
-                for data in zip.addFile(file, path):
-                    yield data
+            zip = ziputil.ZipGenerator(
+                folder['name'], compression=ziputil.COMPRESSION[compression])
+            for data in zip.addFiles(prefetchFiles(self._model.fileList(
+                    folder, user=user, subpath=False, mimeFilter=mimeFilter))):
+                yield data
             yield zip.footer()
         return stream
 
+    @access.public(scope=TokenScope.DATA_READ)
+    @autoDescribeRoute(
+        Description('List the folders, items and files within a folder.')
+        .notes('The response is streamed as newline-delimited JSON, with one record per '
+               'line. Each record has a "type" of folder, item or file, and a "path" '
+               'relative to this folder, which is listed first. Folders precede their '
+               'contents and each item is followed by its files. Folders without read '
+               'access are omitted along with their contents.')
+        .modelParam('id', model=FolderModel, level=AccessType.READ)
+        .param('modifiedSince', 'Only list folders updated after this time, and items '
+               'that were updated or have files that were updated after it. Removed '
+               'resources are not reported.', required=False, dataType='dateTime')
+        .produces('application/x-ndjson')
+        .errorResponse('ID was invalid.')
+        .errorResponse('Read access was denied for the folder.', 403)
+    )
+    def getFolderManifest(self, folder, modifiedSince):
+        if modifiedSince is not None and modifiedSince.tzinfo is not None:
+            modifiedSince = modifiedSince.astimezone(pytz.UTC).replace(tzinfo=None)
+        setResponseHeader('Content-Type', 'application/x-ndjson')
+        records = self._model.manifest(
+            folder, user=self.getCurrentUser(), modifiedSince=modifiedSince)
+
+        def stream():
+            lines = []
+            size = 0
+            for record in records:
+                lines.append(json.dumps(record, cls=JsonEncoder) + '\n')
+                size += len(lines[-1])
+                if size >= 65536:
+                    yield ''.join(lines).encode('utf8')
+                    lines = []
+                    size = 0
+            yield ''.join(lines).encode('utf8')
+        return stream
+
     @access.user(scope=TokenScope.DATA_WRITE)
     @filtermodel(model=FolderModel)
     @autoDescribeRoute(
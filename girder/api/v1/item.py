@@ -20,6 +20,7 @@
 from ..describe import Description, autoDescribeRoute
 from ..rest import Resource, filtermodel, setResponseHeader, setContentDisposition
 from girder.utility import ziputil
+from girder.utility.prefetch import prefetchFiles
 from girder.constants import AccessType, TokenScope
 from girder.exceptions import RestException
 from girder.api import access
@@ -209,15 +210,14 @@ class Item(Resource):
     def deleteMetadata(self, item, fields):
         return self._model.deleteMetadata(item, fields)
 
-    def _downloadMultifileItem(self, item, user):
+    def _downloadMultifileItem(self, item, user, compression='store'):
         setResponseHeader('Content-Type', 'application/zip')
         setContentDisposition(item['name'] + '.zip')
 
         def stream():
-            zip = ziputil.ZipGenerator(item['name'])
-            for (path, file) in self._model.fileList(item, subpath=False):
-                for data in zip.addFile(file, path):
-                    yield data
+            zip = ziputil.ZipGenerator(item['name'], compression=ziputil.COMPRESSION[compression])
+            for data in zip.addFiles(prefetchFiles(self._model.fileList(item, subpath=False))):
+                yield data
             yield zip.footer()
         return stream
 
@@ -252,12 +252,16 @@ class Item(Resource):
         .param('extraParameters', 'Arbitrary data to send along with the '
                'download request, only applied for single file '
                'items.', required=False)
+        .param('compression', 'How to compress the files of a zip archive: "store" them as they '
+               'are, "deflate" them, or choose for each file by its type with "auto".',
+               required=False, enum=['store', 'deflate', 'auto'], default='store')
         # single file items could produce other types, too.
         .produces(['application/zip', 'application/octet-stream'])
         .errorResponse('ID was invalid.')
         .errorResponse('Read access was denied for the item.', 403)
     )
-    def download(self, item, offset, format, contentDisposition, extraParameters):
+    def download(self, item, offset, format, contentDisposition, extraParameters,
+                 compression):
         user = self.getCurrentUser()
         files = list(self._model.childFiles(item=item, limit=2))
         if format not in (None, '', 'zip'):
@@ -269,7 +273,7 @@ class Item(Resource):
                 files[0], offset, contentDisposition=contentDisposition,
                 extraParameters=extraParameters)
         else:
-            return self._downloadMultifileItem(item, user)
+            return self._downloadMultifileItem(item, user, compression)
 
     @access.user(scope=TokenScope.DATA_WRITE)
     @autoDescribeRoute(
@@ -29,14 +29,13 @@ from girder.exceptions import RestException
 from girder.models.notification import Notification as NotificationModel
 from girder.models.setting import Setting
 from girder.utility import JsonEncoder
+from girder.utility.notification_broker import broker
 from girder.api import access
 
 # If no timeout param is passed to stream, we default to this value
 DEFAULT_STREAM_TIMEOUT = 300
-# When new events are seen, we will poll at the minimum interval
-MIN_POLL_INTERVAL = 0.5
-# The interval increases when no new events are seen, capping at this value
-MAX_POLL_INTERVAL = 2
+# Streams wake up at least this often to check whether the server is stopping
+MAX_WAIT_INTERVAL = 2
 
 
 def sseMessage(event):
@@ -64,7 +63,7 @@ class Notification(Resource):
         .notes('This uses long-polling to keep the connection open for '
                'several minutes at a time (or longer) and should be requested '
                'with an EventSource object or other SSE-capable client. '
-               '<p>Notifications are returned within a few seconds of when '
+               '<p>Notifications are returned within a second of when '
                'they occur.  When no notification occurs for the timeout '
                'duration, the stream is closed. '
                '<p>This connection can stay open indefinitely long.')
@@ -90,21 +89,32 @@ class Notification(Resource):
             since = datetime.utcfromtimestamp(since)
 
         def streamGen():
-            lastUpdate = since
+            # Subscribe before reading the backlog so nothing is missed in between
+            subscription = broker.subscribe(user, token)
+            try:
+                for event in streamEvents(subscription):
+                    yield sseMessage(event)
+            finally:
+                subscription.close()
+
+        def streamEvents(subscription):
+            sent = {}
+            events = NotificationModel().get(user, since, token=token)
             start = time.time()
-            wait = MIN_POLL_INTERVAL
-            while cherrypy.engine.state == cherrypy.engine.states.STARTED:
-                wait = min(wait + MIN_POLL_INTERVAL, MAX_POLL_INTERVAL)
-                for event in NotificationModel().get(user, lastUpdate, token=token):
-                    if lastUpdate is None or event['updated'] > lastUpdate:
-                        lastUpdate = event['updated']
-                    wait = MIN_POLL_INTERVAL
+            while True:
+                for event in events:
+                    if since is not None and event['updated'] <= since:
+                        continue
+                    if event['_id'] in sent and sent[event['_id']] >= event['updated']:
+                        continue
+                    sent[event['_id']] = event['updated']
                     start = time.time()
-                    yield sseMessage(event)
-                if time.time() - start > timeout:
+                    yield event
+                remaining = timeout - (time.time() - start)
+                if (remaining <= 0 or
+                        cherrypy.engine.state != cherrypy.engine.states.STARTED):
                     break
-
-                time.sleep(wait)
+                events = subscription.wait(min(remaining, MAX_WAIT_INTERVAL))
         return streamGen
 
     @access.cookie
@@ -28,6 +28,7 @@ from girder.utility import parseTimestamp
 from girder.utility.search import getSearchModeHandler
 from girder.utility import ziputil
 from girder.utility import path as path_util
+from girder.utility.prefetch import prefetchFiles
 from girder.utility.progress import ProgressContext
 
 # Plugins can modify this set to allow other types to be searched
@@ -168,6 +169,9 @@ class Resource(BaseResource):
                    '"folder": [(folder id 1)]}.', requireObject=True)
         .param('includeMetadata', 'Include any metadata in JSON files in the '
                'archive.', required=False, dataType='boolean', default=False)
+        .param('compression', 'How to compress the files in the archive: "store" them as they '
+               'are, "deflate" them, or choose for each file by its type with "auto".',
+               required=False, enum=['store', 'deflate', 'auto'], default='store')
         .produces('application/zip')
         .errorResponse('Unsupported or unknown resource type.')
         .errorResponse('Invalid resources format.')
@@ -175,7 +179,7 @@ class Resource(BaseResource):
         .errorResponse('Resource not found.')
         .errorResponse('Read access was denied for a resource.', 403)
     )
-    def download(self, resources, includeMetadata):
+    def download(self, resources, includeMetadata, compression):
         """
         Returns a generator function that will be used to stream out a zip
         file containing the listed resource's contents, filtered by
@@ -193,16 +197,19 @@ class Resource(BaseResource):
         setResponseHeader('Content-Type', 'application/zip')
         setContentDisposition('Resources.zip')
 
-        def stream():
-            zip = ziputil.ZipGenerator()
+        def fileList():
             for kind in resources:
                 model = self.model(kind)
                 for id in resources[kind]:
                     doc = model.load(id=id, user=user, level=AccessType.READ)
-                    for (path, file) in model.fileList(
+                    for path, file in model.fileList(
                             doc=doc, user=user, includeMetadata=includeMetadata, subpath=True):
-                        for data in zip.addFile(file, path):
-                            yield data
+                        yield path, file
+
+        def stream():
+            zip = ziputil.ZipGenerator(compression=ziputil.COMPRESSION[compression])
+            for data in zip.addFiles(prefetchFiles(fileList())):
+                yield data
             yield zip.footer()
         return stream
 
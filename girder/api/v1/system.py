@@ -34,7 +34,7 @@ from girder.models.group import Group
 from girder.models.setting import Setting
 from girder.models.upload import Upload
 from girder.models.user import User
-from girder.utility import config, install, plugin_utilities, system
+from girder.utility import config, consistency, install, plugin_utilities, system
 from girder.utility.progress import ProgressContext
 from ..describe import API_VERSION, Description, autoDescribeRoute
 from ..rest import Resource
@@ -380,20 +380,15 @@ class System(Resource):
                'and corrects some issues, such as incorrect folder sizes.')
         .param('progress', 'Whether to record progress on this task.',
                required=False, dataType='boolean', default=False)
+        .param('dryRun', 'Only report the inconsistencies that are found rather than '
+               'correcting them.', required=False, dataType='boolean', default=False)
         .errorResponse('You are not a system administrator.', 403)
     )
-    def systemConsistencyCheck(self, progress):
+    def systemConsistencyCheck(self, progress, dryRun):
         user = self.getCurrentUser()
         title = 'Running system consistency check'
         with ProgressContext(progress, user=user, title=title) as pc:
-            results = {}
-            pc.update(title='Checking for orphaned records (Step 1 of 3)')
-            results['orphansRemoved'] = self._pruneOrphans(pc)
-            pc.update(title='Checking for incorrect base parents (Step 2 of 3)')
-            results['baseParentsFixed'] = self._fixBaseParents(pc)
-            pc.update(title='Checking for incorrect sizes (Step 3 of 3)')
-            results['sizesChanged'] = self._recalculateSizes(pc)
-            return results
+            return consistency.checkConsistency(pc, dryRun=dryRun)
         # TODO:
         # * check that all files are associated with an existing item
         # * check that all files exist within their assetstore and are the
@@ -530,49 +525,3 @@ class System(Resource):
                 grp['description'] = grpDoc['description']
 
         return acList
-
-    def _fixBaseParents(self, progress):
-        fixes = 0
-        models = ['folder', 'item']
-        steps = sum(self.model(model).find().count() for model in models)
-        progress.update(total=steps, current=0)
-        for model in models:
-            for doc in self.model(model).find():
-                progress.update(increment=1)
-                baseParent = self.model(model).parentsToRoot(doc, force=True)[0]
-                baseParentType = baseParent['type']
-                baseParentId = baseParent['object']['_id']
-                if (doc['baseParentType'] != baseParentType or
-                        doc['baseParentId'] != baseParentId):
-                    self.model(model).update({'_id': doc['_id']}, update={
-                        '$set': {
-                            'baseParentType': baseParentType,
-                            'baseParentId': baseParentId
-                        }})
-                    fixes += 1
-        return fixes
-
-    def _pruneOrphans(self, progress):
-        count = 0
-        models = ['folder', 'item', 'file']
-        steps = sum(self.model(model).find().count() for model in models)
-        progress.update(total=steps, current=0)
-        for model in models:
-            for doc in self.model(model).find():
-                progress.update(increment=1)
-                if self.model(model).isOrphan(doc):
-                    self.model(model).remove(doc)
-                    count += 1
-        return count
-
-    def _recalculateSizes(self, progress):
-        fixes = 0
-        models = ['collection', 'user']
-        steps = sum(self.model(model).find().count() for model in models)
-        progress.update(total=steps, current=0)
-        for model in models:
-            for doc in self.model(model).find():
-                progress.update(increment=1)
-                _, f = self.model(model).updateSize(doc)
-                fixes += f
-        return fixes
@@ -19,28 +19,36 @@
 
 import cherrypy
 import click
+import collections
 import errno
+import hashlib
 import fuse
 import os
 import six
 import stat
 import sys
+import tempfile
 import threading
 import time
 
+from dogpile.cache.api import NO_VALUE
+
 import girder
 from girder import events, logger, logprint
 from girder.constants import SettingKey
-from girder.exceptions import AccessException, ValidationException
+from girder.exceptions import AccessException, FilePathException, ValidationException
 from girder.models.file import File
 from girder.models.folder import Folder
 from girder.models.item import Item
 from girder.models.setting import Setting
-from girder.utility import config
+from girder.utility import config, mkdir
+from girder.utility._cache import LRUMemoryBackend
 from girder.utility.model_importer import ModelImporter
 from girder.utility import path as path_util
 from girder.utility.server import configureServer
 
+BLOCK_SIZE = 1024 * 1024  # The size of the blocks of the on-disk cache
+
 
 class ServerFuse(fuse.Operations):
     """
@@ -48,8 +56,14 @@ class ServerFuse(fuse.Operations):
     Girder resources via the resource path in a read-only manner.  It could be
     extended to expose metadata and other resources by extending the available
     paths.  Files can also be reached via a path shortcut of /file/<id>.
+
+    Resources, their attributes and directory listings are cached for
+    ``cacheTimeout`` seconds, which should match the attr_timeout and
+    entry_timeout options of the mount. Listing a directory caches the
+    resources within it, so that getting their attributes afterwards does
+    not query the database.
     """
-    def __init__(self, stat=None):
+    def __init__(self, stat=None, cacheTimeout=1.0, cacheSize=100000, blockCache=None):
         """
         Instantiate the operations class.  This sets up tracking for open
         files and file descriptor numbers (handles).
@@ -60,6 +74,11 @@ class ServerFuse(fuse.Operations):
             updated and a created time stamp, the ctime and mtime will also be
             taken from this.  If None, this defaults to the user of the Girder
             process's home directory,
+        :param cacheTimeout: the number of seconds to cache resources and
+            directory listings, or 0 to not cache them.
+        :param cacheSize: the most resources and listings to cache.
+        :param blockCache: a DiskBlockCache to read file contents through, or
+            None to not cache them.
         """
         super(ServerFuse, self).__init__()
         if not stat:
@@ -71,6 +90,9 @@ class ServerFuse(fuse.Operations):
         self.nextFH = 1
         self.openFiles = {}
         self.openFilesLock = threading.Lock()
+        self._cache = LRUMemoryBackend({
+            'max_size': cacheSize, 'ttl': cacheTimeout}) if cacheTimeout > 0 else None
+        self.blockCache = blockCache
 
     def __call__(self, op, path, *args, **kwargs):
         """
@@ -124,6 +146,30 @@ class ServerFuse(fuse.Operations):
             raise fuse.FuseOSError(errno.EROFS)
         return resource   # {model, document}
 
+    def _getCachedPath(self, path):
+        """
+        Given a fuse path, return the associated resource from the cache, or
+        look it up and cache it.  Paths that don't exist are cached, too.
+
+        :param path: path within the fuse.
+        :returns: a Girder resource dictionary.
+        """
+        path = path.rstrip('/')
+        if self._cache is None:
+            return self._getPath(path)
+        resource = self._cache.get(('resource', path))
+        if resource is NO_VALUE:
+            try:
+                resource = self._getPath(path)
+            except fuse.FuseOSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                resource = None
+            self._cache.set(('resource', path), resource)
+        if resource is None:
+            raise fuse.FuseOSError(errno.ENOENT)
+        return resource
+
     def _stat(self, doc, model):
         """
         Generate stat results for a resource.
@@ -179,21 +225,30 @@ class ServerFuse(fuse.Operations):
         :returns: a list of the names of resources within the specified
         document.
         """
-        entries = []
+        return [name for name, _, _ in self._listResources(doc, model)]
+
+    def _listResources(self, doc, model):
+        """
+        List the resources in a Girder user, collection, folder, or item.
+
+        :param doc: the girder resource document.
+        :param model: the girder model.
+        :returns: a generator of (name, document, model) tuples of the
+            resources within the specified document.
+        """
         if model in ('collection', 'user', 'folder'):
             folderList = Folder().find({
                 'parentId': doc['_id'],
                 'parentCollection': model.lower()
             })
             for folder in folderList:
-                entries.append(self._name(folder, 'folder'))
+                yield self._name(folder, 'folder'), folder, 'folder'
         if model == 'folder':
             for item in Folder().childItems(doc):
-                entries.append(self._name(item, 'item'))
+                yield self._name(item, 'item'), item, 'item'
         elif model == 'item':
             for file in Item().childFiles(doc):
-                entries.append(self._name(file, 'file'))
-        return entries
+                yield self._name(file, 'file'), file, 'file'
 
     # We don't handle extended attributes.
     getxattr = None
@@ -245,7 +300,7 @@ class ServerFuse(fuse.Operations):
             attr['st_mode'] = 0o500 | stat.S_IFDIR
             attr['st_size'] = 0
         else:
-            resource = self._getPath(path)
+            resource = self._getCachedPath(path)
             attr = self._stat(resource['document'], resource['model'])
         if attr.get('st_blksize') and attr.get('st_size'):
             attr['st_blocks'] = int(
@@ -268,10 +323,7 @@ class ServerFuse(fuse.Operations):
             if fh not in self.openFiles:
                 raise fuse.FuseOSError(errno.EBADF)
             info = self.openFiles[fh]
-        with info['lock']:
-            handle = info['handle']
-            handle.seek(offset)
-            return handle.read(size)
+        return info['handle'].pread(size, offset)
 
     def readdir(self, path, fh):
         """
@@ -286,14 +338,28 @@ class ServerFuse(fuse.Operations):
         result = [u'.', u'..']
         if path == '':
             result.extend([u'collection', u'user'])
-        elif path in ('/user', '/collection'):
-            model = path[1:]
-            docList = ModelImporter.model(model).find({}, sort=None)
-            for doc in docList:
-                result.append(self._name(doc, model))
-        else:
-            resource = self._getPath(path)
-            result.extend(self._list(resource['document'], resource['model']))
+            return result
+        entries = self._cache.get(('dir', path)) if self._cache is not None else NO_VALUE
+        if entries is NO_VALUE:
+            if path in ('/user', '/collection'):
+                model = path[1:]
+                docList = ModelImporter.model(model).find(
+                    {}, sort=None, fields=['login' if model == 'user' else 'name'])
+                entries = [self._name(doc, model) for doc in docList]
+            else:
+                resource = self._getCachedPath(path)
+                entries = []
+                resources = {}
+                for name, doc, model in self._listResources(
+                        resource['document'], resource['model']):
+                    entries.append(name)
+                    resources[('resource', path + '/' + name)] = {
+                        'model': model, 'document': doc}
+                if self._cache is not None:
+                    self._cache.set_multi(resources)
+            if self._cache is not None:
+                self._cache.set(('dir', path), entries)
+        result.extend(entries)
         return result
 
     def open(self, path, flags):
@@ -305,16 +371,20 @@ class ServerFuse(fuse.Operations):
             read only.
         :returns: a file descriptor.
         """
-        resource = self._getPath(path)
+        resource = self._getCachedPath(path)
         if resource['model'] != 'file':
             return super(ServerFuse, self).open(path, flags)
         if flags & (os.O_APPEND | os.O_ASYNC | os.O_CREAT | os.O_DIRECTORY |
                     os.O_EXCL | os.O_RDWR | os.O_TRUNC | os.O_WRONLY):
             raise fuse.FuseOSError(errno.EROFS)
+        localPath = self._localPath(resource['document'])
+        if localPath:
+            handle = _LocalFile(localPath)
+        else:
+            handle = _PositionalFile(resource['document'], self.blockCache)
         info = {
             'path': path,
-            'handle': File().open(resource['document']),
-            'lock': threading.Lock(),
+            'handle': handle,
         }
         with self.openFilesLock:
             fh = self.nextFH
@@ -322,6 +392,23 @@ class ServerFuse(fuse.Operations):
             self.openFiles[fh] = info
         return fh
 
+    def _localPath(self, doc):
+        """
+        Get the path of a file on the local file system from its assetstore.
+        The path of the file in a Girder mount is not used, since that could
+        be this mount.
+
+        :param doc: the file document.
+        :returns: the local path or None if the file is not local.
+        """
+        if not doc.get('assetstoreId'):
+            return None
+        try:
+            path = File().getAssetstoreAdapter(doc).getLocalFilePath(doc)
+        except (FilePathException, ValidationException):
+            return None
+        return path if path and os.path.isfile(path) else None
+
     def release(self, path, fh):
         """
         Release an open file handle.
@@ -331,14 +418,10 @@ class ServerFuse(fuse.Operations):
         :returns: a file descriptor.
         """
         with self.openFilesLock:
-            if fh in self.openFiles:
-                with self.openFiles[fh]['lock']:
-                    if 'handle' in self.openFiles[fh]:
-                        self.openFiles[fh]['handle'].close()
-                        del self.openFiles[fh]['handle']
-                    del self.openFiles[fh]
-            else:
-                return super(ServerFuse, self).release(path, fh)
+            info = self.openFiles.pop(fh, None)
+        if info is None:
+            return super(ServerFuse, self).release(path, fh)
+        info['handle'].close()
         return 0
 
     def destroy(self, path):
@@ -352,6 +435,189 @@ class ServerFuse(fuse.Operations):
         return super(ServerFuse, self).destroy(path)
 
 
+class DiskBlockCache(object):
+    """
+    A cache of blocks of file contents in a local directory.  The total size
+    of the cached blocks is capped, and the least recently used blocks are
+    removed when it is exceeded.  Blocks are keyed by the contents of a file,
+    so changed files are not read from stale blocks.
+    """
+    def __init__(self, path, maxSize, blockSize=BLOCK_SIZE):
+        """
+        :param path: the directory to store blocks in.  Blocks that are
+            already there are reused.
+        :param maxSize: the most bytes to store.
+        :param blockSize: the size of each block.
+        """
+        self.path = path
+        self.maxSize = maxSize
+        self.blockSize = blockSize
+        self.size = 0
+        self._blocks = collections.OrderedDict()
+        self._lock = threading.Lock()
+        mkdir(path)
+        existing = []
+        for name in os.listdir(path):
+            try:
+                stat = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            if name.endswith('.blk'):
+                existing.append((stat.st_atime, name, stat.st_size))
+        for _, name, size in sorted(existing):
+            self._blocks[name] = size
+            self.size += size
+        self._evict()
+
+    def _name(self, file, index):
+        if file.get('sha512'):
+            version = file['sha512'][:32]
+        else:
+            # A file's updated time also changes with its name or metadata, but
+            # its created time is reset whenever its contents are replaced
+            version = '%d-%s-%s' % (
+                file.get('size', 0), file.get('created'), file.get('assetstoreId'))
+            version = hashlib.sha1(version.encode('utf8')).hexdigest()
+        return '%s-%s-%d-%d.blk' % (file['_id'], version, self.blockSize, index)
+
+    def get(self, file, index):
+        """
+        Get a block of a file.
+
+        :param file: the file document.
+        :param index: the index of the block within the file.
+        :returns: the block's data or None if it is not cached.
+        """
+        name = self._name(file, index)
+        with self._lock:
+            if name not in self._blocks:
+                return None
+            self._blocks[name] = self._blocks.pop(name)
+        try:
+            with open(os.path.join(self.path, name), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            with self._lock:
+                self.size -= self._blocks.pop(name, 0)
+            return None
+
+    def put(self, file, index, data):
+        """
+        Store a block of a file, removing the least recently used blocks if
+        the cache is full.
+
+        :param file: the file document.
+        :param index: the index of the block within the file.
+        :param data: the block's data.
+        """
+        if len(data) > self.maxSize:
+            return
+        name = self._name(file, index)
+        try:
+            fd, tempPath = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tempPath, os.path.join(self.path, name))
+        except (IOError, OSError):
+            logger.exception('Failed to cache a block of file %s' % file['_id'])
+            return
+        with self._lock:
+            self.size += len(data) - self._blocks.pop(name, 0)
+            self._blocks[name] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.maxSize and self._blocks:
+            name, size = self._blocks.popitem(last=False)
+            self.size -= size
+            try:
+                os.unlink(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+
+class _LocalFile(object):
+    """
+    A read-only file on the local file system that is read with positional
+    reads, so concurrent reads do not wait on each other.
+    """
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDONLY)
+        self._lock = None if hasattr(os, 'pread') else threading.Lock()
+
+    def pread(self, size, offset):
+        if self._lock is None:
+            return os.pread(self._fd, size, offset)
+        with self._lock:  # pragma: no cover
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, size)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PositionalFile(object):
+    """
+    A read-only Girder file that is read with positional reads, optionally
+    through a DiskBlockCache.  Each read uses a file handle that no other read
+    is using, so concurrent reads fetch their ranges in parallel.  A read
+    prefers the idle handle that ended where it starts, so sequential readers
+    keep the read-ahead of their handle.
+    """
+    def __init__(self, file, blockCache=None):
+        self.file = file
+        self.blockCache = blockCache
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _readHandle(self, size, offset):
+        with self._lock:
+            handle = next((h for h in self._idle if h.tell() == offset), None)
+            if handle is None and self._idle:
+                handle = self._idle[0]
+            if handle is not None:
+                self._idle.remove(handle)
+        if handle is None:
+            handle = File().open(self.file)
+        try:
+            handle.seek(offset)
+            return handle.read(size)
+        finally:
+            with self._lock:
+                self._idle.append(handle)
+
+    def _block(self, index):
+        data = self.blockCache.get(self.file, index)
+        if data is None:
+            blockSize = self.blockCache.blockSize
+            data = self._readHandle(blockSize, index * blockSize)
+            self.blockCache.put(self.file, index, data)
+        return data
+
+    def pread(self, size, offset):
+        if self.blockCache is None:
+            return self._readHandle(size, offset)
+        end = min(offset + size, self.file['size'])
+        blockSize = self.blockCache.blockSize
+        data = []
+        while offset < end:
+            index = offset // blockSize
+            block = self._block(index)
+            if not block:
+                break
+            start = offset - index * blockSize
+            chunk = block[start:start + end - offset]
+            data.append(chunk)
+            offset += len(chunk)
+        return b''.join(data)
+
+    def close(self):
+        with self._lock:
+            handles, self._idle = self._idle, []
+        for handle in handles:
+            handle.close()
+
+
 class FUSELogError(fuse.FUSE):
     def __init__(self, operations, mountpoint, *args, **kwargs):
         """
@@ -427,15 +693,28 @@ def unmountServer(path, lazy=False, quiet=False):
     '-l', '-z', '--lazy', 'lazy', is_flag=True, default=False,
     help='Lazy unmount.')
 @click.option('--plugins', default=None, help='Comma separated list of plugins to import.')
-def main(path, database, fuseOptions, quiet, unmount, lazy, plugins):
+@click.option(
+    '--cache-timeout', 'cacheTimeout', type=float, default=1.0, show_default=True,
+    help='The number of seconds to cache file attributes and directory '
+         'listings.  0 disables caching.')
+@click.option(
+    '--block-cache', 'blockCache', type=click.Path(file_okay=False), default=None,
+    help='A directory to cache the contents of files in.')
+@click.option(
+    '--block-cache-size', 'blockCacheSize', type=int, default=1024 ** 3, show_default=True,
+    help='The most bytes to store in the block cache.')
+def main(path, database, fuseOptions, quiet, unmount, lazy, plugins, cacheTimeout,
+         blockCache, blockCacheSize):
     if unmount or lazy:
         result = unmountServer(path, lazy, quiet)
         sys.exit(result)
     mountServer(path=path, database=database, fuseOptions=fuseOptions,
-                quiet=quiet, plugins=plugins)
+                quiet=quiet, plugins=plugins, cacheTimeout=cacheTimeout,
+                blockCache=blockCache, blockCacheSize=blockCacheSize)
 
 
-def mountServer(path, database=None, fuseOptions=None, quiet=False, plugins=None):
+def mountServer(path, database=None, fuseOptions=None, quiet=False, plugins=None,
+                cacheTimeout=1.0, blockCache=None, blockCacheSize=1024 ** 3):
     """
     Perform the mount.
 
@@ -449,6 +728,11 @@ def mountServer(path, database=None, fuseOptions=None, quiet=False, plugins=None
     :param quiet: if True, suppress Girder logs.
     :param plugins: an optional list of plugins to enable.  If None, use the
         plugins that are configured.
+    :param cacheTimeout: the number of seconds that file attributes and
+        directory listings are cached, both by the kernel and by this process.
+    :param blockCache: a directory to cache file contents in, or None to not
+        cache them.
+    :param blockCacheSize: the most bytes to store in the block cache.
     """
     if quiet:
         curConfig = config.getConfig()
@@ -462,7 +746,9 @@ def mountServer(path, database=None, fuseOptions=None, quiet=False, plugins=None
     webroot, appconf = configureServer(plugins=plugins)
     girder._setupCache()
 
-    opClass = ServerFuse(stat=os.stat(path))
+    if blockCache:
+        blockCache = DiskBlockCache(blockCache, blockCacheSize)
+    opClass = ServerFuse(stat=os.stat(path), cacheTimeout=cacheTimeout, blockCache=blockCache)
     options = {
         # By default, we run in the background so the mount command returns
         # immediately.  If we run in the foreground, a SIGTERM will shut it
@@ -475,6 +761,9 @@ def mountServer(path, database=None, fuseOptions=None, quiet=False, plugins=None
         'use_ino': False,
         # read-only file system
         'ro': True,
+        # Let the kernel cache attributes and names as long as we do
+        'attr_timeout': cacheTimeout,
+        'entry_timeout': cacheTimeout,
     }
     if sys.platform != 'darwin':
         # Automatically unmount when we try to mount again
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright 2016 Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import click
+
+from girder import logprint
+from girder.api.notification_stream import NotificationStreamServer
+from girder.utility.notification_broker import broker
+
+DEFAULT_PORT = 8081
+
+
+@click.command(name='notificationd', short_help='Run the Girder notification stream service.',
+               help='Run the Girder notification stream service.')
+@click.option('-H', '--host', show_default=True, default='localhost',
+              help='The interface to bind to')
+@click.option('-p', '--port', show_default=True, default=DEFAULT_PORT, type=int,
+              help='The port to bind to')
+def main(port, host):
+    """
+    This is the entrypoint of the girder notificationd program. It should not be
+    called from python code.
+    """
+    server = NotificationStreamServer((host, port))
+    broker.start()
+    logprint.info('Girder notification stream service listening on %s:%d.' % (host, port))
+
+    try:
+        server.serve_forever()
+    except (SystemExit, KeyboardInterrupt):
+        pass
+    finally:
+        broker.stop()
+        server.server_close()
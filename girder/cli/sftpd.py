@@ -23,7 +23,7 @@ import paramiko
 import sys
 
 from girder import logprint
-from girder.api.sftp import SftpServer
+from girder.api.sftp import MAX_CONNECTIONS, SftpServer, WORKERS
 
 DEFAULT_PORT = 8022
 
@@ -37,7 +37,11 @@ DEFAULT_PORT = 8022
               help='The interface to bind to')
 @click.option('-p', '--port', show_default=True, default=DEFAULT_PORT, type=int,
               help='The port to bind to')
-def main(identity_file, port, host):
+@click.option('--max-connections', show_default=True, default=MAX_CONNECTIONS, type=int,
+              help='The most concurrent connections to allow, or 0 for no limit')
+@click.option('--workers', show_default=True, default=WORKERS, type=int,
+              help='The number of threads that accept new connections')
+def main(identity_file, port, host, max_connections, workers):
     """
     This is the entrypoint of the girder sftpd program. It should not be
     called from python code.
@@ -49,7 +53,7 @@ def main(identity_file, port, host):
             'Error: encrypted key files are not supported (%s).' % identity_file, file=sys.stderr)
         sys.exit(1)
 
-    server = SftpServer((host, port), hostKey)
+    server = SftpServer((host, port), hostKey, maxConnections=max_connections, workers=workers)
     logprint.info('Girder SFTP service listening on %s:%d.' % (host, port))
 
     try:
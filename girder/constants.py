@@ -160,6 +160,7 @@ class SettingKey(object):
     to sensible strings.
     """
     ADD_TO_GROUP_POLICY = 'core.add_to_group_policy'
+    ANCESTORS_MIGRATED = 'core.ancestors_migrated'
     API_KEYS = 'core.api_keys'
     BANNER_COLOR = 'core.banner_color'
     BRAND_NAME = 'core.brand_name'
@@ -197,6 +198,7 @@ class SettingDefault(object):
     """
     defaults = {
         SettingKey.ADD_TO_GROUP_POLICY: 'never',
+        SettingKey.ANCESTORS_MIGRATED: False,
         SettingKey.API_KEYS: True,
         SettingKey.BANNER_COLOR: '#3F3B3B',
         SettingKey.BRAND_NAME: 'Girder',
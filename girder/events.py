@@ -35,19 +35,29 @@ And if the event should be handled asynchronously, use:
 
     ``girder.events.daemon.trigger('event.name', info, callback)``
 
+Asynchronous events are run by a pool of worker threads configured in the
+``[events]`` section of the config file; see :py:class:`AsyncEventsPool`.
+
 For obvious reasons, the asynchronous method does not return a value to the
 caller. Instead, the caller may optionally pass the callback argument as a
 function to be called when the task is finished. That callback function will
 receive the Event object as its only argument.
 """
 
+import collections
 import contextlib
 import girder
 import threading
+import time
 
 from girder.utility import config
 from six.moves import queue
 
+#: Overflow policies for :py:class:`AsyncEventsPool` queues.
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP = 'drop'
+OVERFLOW_SPILL = 'spill'
+
 
 class Event(object):
     """
@@ -135,8 +145,10 @@ class ForegroundEventsDaemon(object):
 
 class AsyncEventsThread(threading.Thread):
     """
-    This class is used to execute the pipeline for events asynchronously.
-    This should not be invoked directly by callers; instead, they should use
+    This class is used to execute the pipeline for events asynchronously on a
+    single thread with an unbounded queue. It is kept for compatibility;
+    ``girder.events.daemon`` is now an :py:class:`AsyncEventsPool`. This should
+    not be invoked directly by callers; instead, they should use
     girder.events.daemon.trigger().
     """
     def __init__(self):
@@ -206,6 +218,234 @@ class AsyncEventsThread(threading.Thread):
         super(AsyncEventsThread, self).__del__()
 
 
+class AsyncEventsPool(object):
+    """
+    Executes asynchronous events on a pool of worker threads. This is the
+    default implementation of ``girder.events.daemon``.
+
+    Each event name has its own bounded queue, and at most ``concurrency``
+    workers (by default, all of them) run events of the same name at once, so
+    slow handlers cannot hold up events of other names. When a queue is full,
+    ``trigger`` applies the overflow policy:
+
+    * ``block`` waits until the queue has room. While the workers are not
+      running, as in processes that use the models without starting the
+      server, the event is queued beyond the limit instead, as events were
+      before the queues were bounded.
+    * ``drop`` discards the event and logs a warning.
+    * ``spill`` stores the event in the ``event_queue`` database collection,
+      from which it is reloaded as the queue drains. Events with a callback, or
+      whose info cannot be stored in the database, are blocked instead.
+
+    Triggering an event with the ``block`` policy from a handler can deadlock
+    if every worker is blocked the same way.
+    """
+    def __init__(self, workers=4, queueSize=1000, overflow=OVERFLOW_BLOCK, concurrency=None):
+        """
+        :param workers: The number of worker threads.
+        :type workers: int
+        :param queueSize: The maximum number of queued events per event name.
+        :type queueSize: int
+        :param overflow: The policy for full queues; one of 'block', 'drop' or
+            'spill'.
+        :type overflow: str
+        :param concurrency: Maps event names to the maximum number of workers
+            that may run them at once.
+        :type concurrency: dict
+        """
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP, OVERFLOW_SPILL):
+            raise ValueError('Invalid event queue overflow policy: %s' % overflow)
+        self.workers = workers
+        self.queueSize = queueSize
+        self.overflow = overflow
+        self.concurrency = dict(concurrency or {})
+
+        self._queues = collections.OrderedDict()
+        self._running = collections.Counter()
+        self._spilled = collections.Counter()
+        self._handled = collections.Counter()
+        self._failed = collections.Counter()
+        self._dropped = collections.Counter()
+        self._latency = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._terminate = False
+
+    def start(self):
+        """
+        Start the worker threads. Events spilled to the database by a previous
+        run are picked up again.
+        """
+        with self._condition:
+            if self._threads:
+                return
+            self._terminate = False
+            if self.overflow == OVERFLOW_SPILL:
+                for group in self._spillCollection().aggregate([
+                        {'$group': {'_id': '$eventName', 'count': {'$sum': 1}}}]):
+                    self._spilled[group['_id']] = group['count']
+                    # Workers only look for events under names they know of
+                    self._queues.setdefault(group['_id'], collections.deque())
+                self._condition.notify_all()
+            self._threads = [
+                threading.Thread(target=self._work, name='girder-events-%d' % i)
+                for i in range(self.workers)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        girder.logprint.info('Started %d asynchronous event workers.' % self.workers)
+
+    def stop(self):
+        """
+        Gracefully stops the workers. Each will finish the event it is
+        processing before stopping; queued events are not processed.
+        """
+        with self._condition:
+            self._terminate = True
+            threads, self._threads = self._threads, []
+            self._condition.notify_all()
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def trigger(self, eventName=None, info=None, callback=None):
+        """
+        Adds a new event on the queue to trigger asynchronously.
+
+        :param eventName: The event name to pass to the girder.events.trigger
+        :param info: The info object to pass to girder.events.trigger
+        :param callback: Optional callable to be called upon completion of
+            all bound event handlers. It takes one argument, which is the
+            event object itself.
+        """
+        with self._condition:
+            eventQueue = self._queues.setdefault(eventName, collections.deque())
+            if len(eventQueue) >= self.queueSize or self._spilled[eventName]:
+                if self.overflow == OVERFLOW_DROP:
+                    self._dropped[eventName] += 1
+                    girder.logger.warning(
+                        'Event queue for "%s" is full, dropping event.' % eventName)
+                    return
+                if (self.overflow == OVERFLOW_SPILL and callback is None and
+                        self._spill(eventName, info)):
+                    return
+                # Until the workers are started nothing would make room, so
+                # the event is queued regardless
+                while (len(eventQueue) >= self.queueSize and self._threads and
+                       not self._terminate):
+                    self._condition.wait()
+            eventQueue.append((eventName, info, callback))
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Return queue and handler metrics, keyed by event name: the number of
+        events queued, spilled to the database and running; the number handled,
+        failed and dropped; and the total and maximum handling time in seconds.
+        """
+        with self._condition:
+            return {
+                'workers': len(self._threads),
+                'queued': {name: len(q) for name, q in self._queues.items() if q},
+                'spilled': {name: n for name, n in self._spilled.items() if n},
+                'running': {name: n for name, n in self._running.items() if n},
+                'handled': dict(self._handled),
+                'failed': dict(self._failed),
+                'dropped': dict(self._dropped),
+                'latency': {name: dict(latency) for name, latency in self._latency.items()}
+            }
+
+    def _spillCollection(self):
+        from girder.models import getDbConnection
+
+        return getDbConnection().get_database()['event_queue']
+
+    def _spill(self, eventName, info):
+        from bson.errors import InvalidDocument
+
+        try:
+            self._spillCollection().insert_one({'eventName': eventName, 'info': info})
+        except InvalidDocument:
+            return False
+        self._spilled[eventName] += 1
+        return True
+
+    def _refill(self, eventName):
+        """
+        Move spilled events back into the queue for an event name while it has
+        room. Must be called holding the condition.
+        """
+        eventQueue = self._queues.setdefault(eventName, collections.deque())
+        while self._spilled[eventName] and len(eventQueue) < self.queueSize:
+            doc = self._spillCollection().find_one_and_delete(
+                {'eventName': eventName}, sort=[('_id', 1)])
+            if doc is None:
+                self._spilled[eventName] = 0
+                break
+            self._spilled[eventName] -= 1
+            eventQueue.append((eventName, doc['info'], None))
+
+    def _next(self):
+        """
+        Return the next event that may run, rotating between event names so
+        that each gets a turn. Must be called holding the condition.
+        """
+        for eventName in list(self._queues):
+            if self._spilled[eventName]:
+                self._refill(eventName)
+            eventQueue = self._queues[eventName]
+            limit = self.concurrency.get(eventName)
+            if eventQueue and (limit is None or self._running[eventName] < limit):
+                # Move this name to the back of the rotation
+                self._queues[eventName] = self._queues.pop(eventName)
+                return eventQueue.popleft()
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                item = None
+                while not self._terminate:
+                    item = self._next()
+                    if item is not None:
+                        break
+                    self._condition.wait()
+                if item is None:
+                    return
+                eventName, info, callback = item
+                self._running[eventName] += 1
+                # A queue slot is now free for blocked triggers
+                self._condition.notify_all()
+
+            start = time.time()
+            try:
+                if eventName is None:
+                    event = Event(None, info, async=True)
+                else:
+                    event = trigger(eventName, info, async=True, daemon=True)
+
+                if callable(callback):
+                    callback(event)
+                failed = False
+            except Exception:
+                # Must continue the event loop even if handler failed
+                girder.logger.exception('In handler for event "%s":' % eventName)
+                failed = True
+            elapsed = time.time() - start
+
+            with self._condition:
+                self._running[eventName] -= 1
+                self._handled[eventName] += 1
+                if failed:
+                    self._failed[eventName] += 1
+                latency = self._latency.setdefault(
+                    eventName, {'count': 0, 'totalTime': 0.0, 'maxTime': 0.0})
+                latency['count'] += 1
+                latency['totalTime'] += elapsed
+                latency['maxTime'] = max(latency['maxTime'], elapsed)
+                self._condition.notify_all()
+
+
 def bind(eventName, handlerName, handler):
     """
     Bind a listener (handler) to the event identified by eventName. It is
@@ -255,6 +495,17 @@ def unbind(eventName, handlerName):
             break
 
 
+def isBound(eventName):
+    """
+    Return whether any handler is bound to an event, so that callers can skip
+    preparing and triggering events that nothing listens to.
+
+    :param eventName: The name that identifies the event.
+    :type eventName: str
+    """
+    return bool(_mapping.get(eventName))
+
+
 def unbindAll():
     """
     Clears the entire event map. All bound listeners will be unbound.
@@ -329,4 +580,9 @@ def setupDaemon():
     if config.getConfig()['server'].get('disable_event_daemon', False):
         daemon = ForegroundEventsDaemon()
     else:
-        daemon = AsyncEventsThread()
+        eventsConfig = config.getConfig().get('events', {})
+        daemon = AsyncEventsPool(
+            workers=int(eventsConfig.get('workers', 4)),
+            queueSize=int(eventsConfig.get('queue_size', 1000)),
+            overflow=eventsConfig.get('overflow', OVERFLOW_BLOCK),
+            concurrency=eventsConfig.get('concurrency'))
@@ -23,6 +23,7 @@ import os
 from .model_base import AccessControlledModel
 from girder.constants import AccessType, SettingKey
 from girder.exceptions import ValidationException
+from girder.utility._cache import pathCacheKey
 from girder.utility.progress import noProgress
 
 
@@ -34,6 +35,8 @@ class Collection(AccessControlledModel):
 
     def initialize(self):
         self.name = 'collection'
+        self._cacheLoads = True
+        self._cacheKeyFields = ('_id', 'name')
         self.ensureIndices(['name'])
         self.ensureTextIndex({
             'name': 10,
@@ -43,6 +46,13 @@ class Collection(AccessControlledModel):
         self.exposeFields(level=AccessType.READ, fields={
             '_id', 'name', 'description', 'public', 'publicFlags', 'created', 'updated', 'size'})
 
+    def _cacheKeys(self, document):
+        # Changing a collection also invalidates the cached lookup of its path
+        keys = super(Collection, self)._cacheKeys(document)
+        if 'name' in document:
+            keys.append(pathCacheKey('collection', None, document['name']))
+        return keys
+
     def validate(self, doc):
         doc['name'] = doc['name'].strip()
         if doc['description']:
@@ -201,14 +211,16 @@ class Collection(AccessControlledModel):
 
         count = 1
         folderModel = Folder()
-        folders = folderModel.find({
+        query = {
             'parentId': doc['_id'],
             'parentCollection': 'collection'
-        }, fields=('access',))
+        }
 
-        if level is not None:
-            folders = self.filterResultsByPermission(
-                cursor=folders, user=user, level=level)
+        if level is None:
+            folders = folderModel.find(query, fields=('_id',))
+        else:
+            folders = folderModel.findWithPermissions(
+                query, fields=('_id',), user=user, level=level)
         count += sum(folderModel.subtreeCount(
             folder, includeItems=includeItems, user=user, level=level)
             for folder in folders)
@@ -259,13 +271,10 @@ class Collection(AccessControlledModel):
             from .folder import Folder
 
             folderModel = Folder()
-            cursor = folderModel.find({
+            folders = folderModel.findWithPermissions({
                 'parentId': doc['_id'],
                 'parentCollection': 'collection'
-            })
-
-            folders = self.filterResultsByPermission(
-                cursor=cursor, user=user, level=AccessType.ADMIN)
+            }, user=user, level=AccessType.ADMIN)
 
             for folder in folders:
                 folderModel.setAccessList(
@@ -315,19 +324,16 @@ class Collection(AccessControlledModel):
         """
         from .folder import Folder
 
-        fields = () if level is None else ('access', 'public')
-
         folderModel = Folder()
-        folders = folderModel.find({
+        query = {
             'parentId': collection['_id'],
             'parentCollection': 'collection'
-        }, fields=fields)
+        }
 
         if level is None:
-            return folders.count()
+            return folderModel.find(query, fields=()).count()
         else:
-            return sum(1 for _ in folderModel.filterResultsByPermission(
-                cursor=folders, user=user, level=level))
+            return folderModel.countWithPermissions(query, user=user, level=level)
 
     def updateSize(self, doc):
         """
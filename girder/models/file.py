@@ -29,6 +29,7 @@ from girder.exceptions import FilePathException, ValidationException
 from girder.models.setting import Setting
 from girder.utility import acl_mixin
 from girder.utility import path as path_util
+from girder.utility._cache import pathCacheKey
 
 
 class File(acl_mixin.AccessControlMixin, Model):
@@ -39,8 +40,10 @@ class File(acl_mixin.AccessControlMixin, Model):
         from girder.utility import assetstore_utilities
 
         self.name = 'file'
+        self._cacheDerived = True
+        self._cacheKeyFields = ('_id', 'itemId', 'name')
         self.ensureIndices(
-            ['itemId', 'assetstoreId', 'exts'] +
+            ['itemId', 'assetstoreId', 'exts', ([('itemId', 1), ('name', 1)], {})] +
             assetstore_utilities.fileIndexFields())
         self.ensureTextIndex({'name': 1})
         self.resourceColl = 'item'
@@ -74,8 +77,9 @@ class File(acl_mixin.AccessControlMixin, Model):
 
         if file['itemId']:
             item = Item().load(file['itemId'], force=True)
-            # files that are linkUrls might not have a size field
-            if 'size' in file:
+            # files that are linkUrls might not have a size field, and orphaned
+            # files have no item to update
+            if item is not None and 'size' in file:
                 self.propagateSizeChange(item, -file['size'], updateItemSize)
 
         Model.remove(self, file)
@@ -162,6 +166,11 @@ class File(acl_mixin.AccessControlMixin, Model):
         else:
             raise Exception('File has no known download mechanism.')
 
+    def _cacheKeys(self, document):
+        # Changing a file also invalidates the cached lookup of its path
+        return super(File, self)._cacheKeys(document) + [
+            pathCacheKey('item', document['itemId'], document['name'])]
+
     def validate(self, doc):
         if doc.get('assetstoreId') is None:
             if 'linkUrl' not in doc:
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import pymongo
+
+from .model_base import Model
+
+
+class FileContent(Model):
+    """
+    This model counts the references to each piece of content stored in a
+    content-addressed assetstore, keyed by the assetstore and the SHA-512 hash
+    of the content. It lets the assetstore decide whether content is still
+    used without searching the file collection.
+
+    Content stored before its references were counted has no document here;
+    its count is initialized from the file collection the first time it is
+    changed. Callers should serialize the changes to the count of a piece of
+    content with the deletion of its data.
+    """
+    def initialize(self):
+        self.name = 'file_content'
+        self.ensureIndex(([('assetstoreId', 1), ('sha512', 1)], {'unique': True}))
+
+    def validate(self, doc):
+        return doc
+
+    def _countFiles(self, query, excludeId=None):
+        from .file import File
+
+        query = dict(query, imported={'$ne': True})
+        if excludeId is not None:
+            query['_id'] = {'$ne': excludeId}
+        return File().find(query, fields=()).count()
+
+    def addReference(self, assetstore, sha512, fileId=None):
+        """
+        Record a new reference to a piece of content.
+
+        :param assetstore: The assetstore containing the content.
+        :type assetstore: dict
+        :param sha512: The SHA-512 hash of the content.
+        :type sha512: str
+        :param fileId: The ID of the file document that will refer to the
+            content, if it already exists.
+        :returns: The number of references to the content, including the new
+            one.
+        """
+        query = {'assetstoreId': assetstore['_id'], 'sha512': sha512}
+        doc = self.collection.find_one_and_update(
+            query, {'$inc': {'refCount': 1}}, return_document=pymongo.ReturnDocument.AFTER)
+        if doc is not None:
+            return doc['refCount']
+        refCount = self._countFiles(query, fileId) + 1
+        self.collection.update_one(query, {'$set': {'refCount': refCount}}, upsert=True)
+        return refCount
+
+    def removeReference(self, assetstore, sha512, fileId=None):
+        """
+        Remove a reference to a piece of content. Once no references remain,
+        its count is removed as well.
+
+        :param assetstore: The assetstore containing the content.
+        :type assetstore: dict
+        :param sha512: The SHA-512 hash of the content.
+        :type sha512: str
+        :param fileId: The ID of the file document that referred to the
+            content, which may not have been deleted yet.
+        :returns: The number of references remaining.
+        """
+        query = {'assetstoreId': assetstore['_id'], 'sha512': sha512}
+        doc = self.collection.find_one_and_update(
+            query, {'$inc': {'refCount': -1}}, return_document=pymongo.ReturnDocument.AFTER)
+        if doc is None:
+            refCount = self._countFiles(query, fileId)
+            if refCount > 0:
+                self.collection.update_one(query, {'$set': {'refCount': refCount}}, upsert=True)
+            return refCount
+        if doc['refCount'] <= 0:
+            self.collection.delete_one(dict(query, refCount={'$lte': 0}))
+        return max(doc['refCount'], 0)
@@ -17,20 +17,42 @@
 #  limitations under the License.
 ###############################################################################
 
+import collections
 import copy
 import datetime
 import json
 import os
 import six
+import threading
 
 from bson.objectid import ObjectId
 from .model_base import AccessControlledModel
-from girder import events
-from girder.constants import AccessType
+from girder import events, logger
+from girder.constants import AccessType, SettingKey
 from girder.exceptions import ValidationException, GirderException
+from girder.utility._cache import pathCacheKey
 from girder.utility.progress import noProgress, setResponseTimeLimit
 
 
+def _manifestPath(path, name):
+    return path + '/' + name if path else name
+
+
+def _isModifiedSince(doc, modifiedSince):
+    return modifiedSince is None or doc.get('updated', doc['created']) > modifiedSince
+
+
+def _manifestRecord(type, doc, path, fields):
+    record = {
+        'type': type,
+        '_id': doc['_id'],
+        'name': doc['name'],
+        'path': path
+    }
+    record.update((key, doc[key]) for key in fields + ('created', 'updated') if key in doc)
+    return record
+
+
 class Folder(AccessControlledModel):
     """
     Folders are used to store items and can also store other folders in
@@ -42,7 +64,11 @@ class Folder(AccessControlledModel):
 
     def initialize(self):
         self.name = 'folder'
-        self.ensureIndices(('parentId', 'name', 'lowerName',
+        self._cacheDerived = True
+        self._cacheKeyFields = ('_id', 'parentCollection', 'parentId', 'name')
+        self._ancestorsMigrated = False
+        self._ancestorsLock = threading.Lock()
+        self.ensureIndices(('parentId', 'name', 'lowerName', 'ancestors',
                             ([('parentId', 1), ('name', 1)], {})))
         self.ensureTextIndex({
             'name': 10,
@@ -54,6 +80,11 @@ class Folder(AccessControlledModel):
             'size', 'meta', 'parentId', 'parentCollection', 'creatorId',
             'baseParentType', 'baseParentId'))
 
+    def _cacheKeys(self, document):
+        # Changing a folder also invalidates the cached lookup of its path
+        return super(Folder, self)._cacheKeys(document) + [
+            pathCacheKey(document['parentCollection'], document['parentId'], document['name'])]
+
     def validate(self, doc, allowRename=False):
         """
         Validate the name and description of the folder, ensure that it is
@@ -78,6 +109,9 @@ class Folder(AccessControlledModel):
             raise GirderException('Invalid folder parent type: %s.' %
                                   doc['parentCollection'],
                                   'girder.models.folder.invalid-parent-type')
+        if 'ancestors' not in doc:
+            doc['ancestors'] = self._childAncestors(
+                {'_id': doc['parentId']}, doc['parentCollection'])
         name = doc['name']
         # If the folder already exists with the current name, don't check.
         # Although we don't want duplicate names, they can occur when there are
@@ -137,7 +171,7 @@ class Folder(AccessControlledModel):
         """
         # Ensure we include extra fields to do the migration below
         extraFields = {'baseParentId', 'baseParentType', 'parentId', 'parentCollection',
-                       'name', 'lowerName'}
+                       'name', 'lowerName', 'ancestors'}
         loadFields = self._supplementFields(fields, extraFields)
 
         doc = super(Folder, self).load(
@@ -159,27 +193,129 @@ class Folder(AccessControlledModel):
                 self.update({'_id': doc['_id']}, {'$set': {
                     'lowerName': doc['lowerName']
                 }})
+            if 'ancestors' not in doc:
+                doc['ancestors'] = self._childAncestors(
+                    {'_id': doc['parentId']}, doc['parentCollection'])
+                self.update({'_id': doc['_id']}, {'$set': {
+                    'ancestors': doc['ancestors']
+                }})
 
             self._removeSupplementalFields(doc, fields)
 
         return doc
 
-    def getSizeRecursive(self, folder):
+    def _childAncestors(self, parent, parentType='folder'):
+        """
+        Return the ``ancestors`` list for a child of the given parent. This is
+        the list of folder IDs from the top-level folder down to the parent
+        itself, or an empty list if the parent is a user or collection.
+
+        :param parent: The parent document. Only its ``_id`` is required.
+        :type parent: dict
+        :param parentType: The type of the parent ('folder', 'user', or
+            'collection').
+        :type parentType: str
         """
-        Calculate the total size of the folder by recursing into all of its
-        descendant folders.
+        if parentType != 'folder':
+            return []
+
+        ancestors = parent.get('ancestors')
+        if ancestors is None:
+            parent = self.load(parent['_id'], force=True, fields=['ancestors']) or parent
+            ancestors = parent.get('ancestors', [])
+
+        return list(ancestors) + [parent['_id']]
+
+    def _subtreeQuery(self, folder):
         """
-        size = folder['size']
+        Return a query matching the given folder and all of its descendant
+        folders.
+        """
+        self.ensureAncestors()
+        return {'$or': [{'_id': folder['_id']}, {'ancestors': folder['_id']}]}
 
-        q = {
-            'parentId': folder['_id'],
-            'parentCollection': 'folder'
-        }
+    def ensureAncestors(self):
+        """
+        Make sure that every folder and item has an ``ancestors`` field, which
+        queries over a subtree rely on. Databases created before the field
+        existed are migrated once with :py:meth:`rebuildAncestors`, which is
+        recorded in a setting so that later processes only read the setting.
+        The server calls this in the background on startup.
+        """
+        if self._ancestorsMigrated:
+            return
+
+        from .item import Item
+        from .setting import Setting
+
+        with self._ancestorsLock:
+            if self._ancestorsMigrated:
+                return
+            if not Setting().get(SettingKey.ANCESTORS_MIGRATED):
+                unmigrated = {'ancestors': {'$exists': False}}
+                if (self.findOne(unmigrated, fields=('_id',)) is not None or
+                        Item().findOne(unmigrated, fields=('_id',)) is not None):
+                    logger.info('Adding ancestors to folders and items')
+                    self.rebuildAncestors()
+                # Orphaned folders and items are not reached by the rebuild,
+                # so they must not cause it to run again
+                Setting().set(SettingKey.ANCESTORS_MIGRATED, True)
+            self._ancestorsMigrated = True
+
+    def rebuildAncestors(self, progress=noProgress, dryRun=False):
+        """
+        Recompute the ``ancestors`` field of every folder and item by walking
+        the hierarchy from the top-level folders down. This issues one update
+        per folder rather than one per document, and is used to migrate
+        databases created before the field existed.
+
+        :param progress: Progress context to update.
+        :type progress: :py:class:`girder.utility.progress.ProgressContext`
+        :param dryRun: If True, only count the documents that are incorrect.
+        :type dryRun: bool
+        :returns: The number of documents that were changed.
+        """
+        def fix(model, query, ancestors):
+            query['ancestors'] = {'$ne': ancestors}
+            if dryRun:
+                return model.find(query, fields=()).count()
+            return model.update(query, {'$set': {'ancestors': ancestors}}).modified_count
+
+        from .item import Item
 
-        for child in self.find(q):
-            size += self.getSizeRecursive(child)
+        itemModel = Item()
+        fixes = 0
+        progress.update(total=self.find({}, fields=()).count(), current=0)
+
+        stack = [(doc['_id'], []) for doc in self.find(
+            {'parentCollection': {'$ne': 'folder'}}, fields=('_id',))]
+        fixes += fix(self, {'parentCollection': {'$ne': 'folder'}}, [])
+
+        while stack:
+            folderId, ancestors = stack.pop()
+            progress.update(increment=1)
+            childAncestors = ancestors + [folderId]
+            fixes += fix(self, {'parentId': folderId, 'parentCollection': 'folder'},
+                         childAncestors)
+            fixes += fix(itemModel, {'folderId': folderId}, childAncestors)
+            stack.extend((child['_id'], childAncestors) for child in self.find({
+                'parentId': folderId,
+                'parentCollection': 'folder'
+            }, fields=('_id',)))
 
-        return size
+        return fixes
+
+    def getSizeRecursive(self, folder):
+        """
+        Calculate the total size of the folder and all of its descendant
+        folders.
+        """
+        result = list(self.collection.aggregate([
+            {'$match': self._subtreeQuery(folder)},
+            {'$group': {'_id': None, 'size': {'$sum': '$size'}}}
+        ]))
+
+        return result[0]['size'] if result else 0
 
     def setMetadata(self, folder, metadata, allowNull=False):
         """
@@ -244,7 +380,7 @@ class Folder(AccessControlledModel):
     def _updateDescendants(self, folderId, updateQuery):
         """
         This helper is used to update all items and folders underneath a
-        folder. This is expensive, so think carefully before using it.
+        folder.
 
         :param folderId: The _id of the folder at the root of the subtree.
         :param updateQuery: The mongo query to apply to all of the children of
@@ -253,20 +389,28 @@ class Folder(AccessControlledModel):
         """
         from .item import Item
 
-        self.update(query={
-            'parentId': folderId,
-            'parentCollection': 'folder'
-        }, update=updateQuery, multi=True)
-        Item().update(query={
-            'folderId': folderId,
-        }, update=updateQuery, multi=True)
+        self.ensureAncestors()
+        self.update(query={'ancestors': folderId}, update=updateQuery, multi=True)
+        Item().update(query={'ancestors': folderId}, update=updateQuery, multi=True)
 
-        q = {
-            'parentId': folderId,
-            'parentCollection': 'folder'
-        }
-        for child in self.find(q):
-            self._updateDescendants(child['_id'], updateQuery)
+    def _updateDescendantAncestors(self, folderId, oldAncestors, newAncestors):
+        """
+        Replace the ancestors of a moved folder within the ``ancestors`` list
+        of all items and folders underneath it.
+
+        :param folderId: The _id of the folder that was moved.
+        :param oldAncestors: The ancestors of the folder before the move.
+        :type oldAncestors: list
+        :param newAncestors: The ancestors of the folder after the move.
+        :type newAncestors: list
+        """
+        if oldAncestors:
+            self._updateDescendants(folderId, {'$pullAll': {'ancestors': oldAncestors}})
+        if newAncestors:
+            self._updateDescendants(folderId, {'$push': {'ancestors': {
+                '$each': newAncestors,
+                '$position': 0
+            }}})
 
     def _isAncestor(self, ancestor, descendant):
         """
@@ -281,15 +425,10 @@ class Folder(AccessControlledModel):
         if ancestor['_id'] == descendant['_id']:
             return True
 
-        if descendant['parentCollection'] != 'folder':
-            return False
+        if 'ancestors' not in descendant:
+            descendant = self.load(descendant['_id'], force=True, fields=['ancestors'])
 
-        descendant = self.load(descendant['parentId'], force=True)
-
-        if descendant is None:
-            return False
-
-        return self._isAncestor(ancestor, descendant)
+        return descendant is not None and ancestor['_id'] in descendant['ancestors']
 
     def move(self, folder, parent, parentType):
         """
@@ -303,13 +442,23 @@ class Folder(AccessControlledModel):
                            or folder).
         :type parentType: str
         """
+        self.ensureAncestors()
         if (parentType == 'folder' and (self._isAncestor(folder, parent) or
                                         folder['_id'] == parent['_id'])):
             raise ValidationException(
                 'You may not move a folder underneath itself.')
 
+        oldAncestors = folder.get('ancestors')
+        if oldAncestors is None:
+            oldAncestors = self._childAncestors(
+                {'_id': folder['parentId']}, folder['parentCollection'])
+
         folder['parentId'] = parent['_id']
         folder['parentCollection'] = parentType
+        folder['ancestors'] = self._childAncestors(parent, parentType)
+
+        if folder['ancestors'] != oldAncestors:
+            self._updateDescendantAncestors(folder['_id'], oldAncestors, folder['ancestors'])
 
         if parentType == 'folder':
             rootType, rootId = parent['baseParentType'], parent['baseParentId']
@@ -454,12 +603,8 @@ class Folder(AccessControlledModel):
         }
         q.update(filters)
 
-        # Perform the find; we'll do access-based filtering of the result set
-        # afterward.
-        cursor = self.find(q, sort=sort, **kwargs)
-
-        return self.filterResultsByPermission(
-            cursor=cursor, user=user, level=AccessType.READ, limit=limit, offset=offset)
+        return self.findWithPermissions(
+            q, sort=sort, user=user, level=AccessType.READ, limit=limit, offset=offset, **kwargs)
 
     def createFolder(self, parent, name, description='', parentType='folder',
                      public=None, creator=None, allowRename=False, reuseExisting=False):
@@ -527,6 +672,7 @@ class Folder(AccessControlledModel):
             'baseParentId': parent['baseParentId'],
             'baseParentType': parent['baseParentType'],
             'parentId': ObjectId(parent['_id']),
+            'ancestors': self._childAncestors(parent, parentType),
             'creatorId': creatorId,
             'created': now,
             'updated': now,
@@ -615,18 +761,15 @@ class Folder(AccessControlledModel):
         :param level: The required access level, or None to return the raw
             subfolder count.
         """
-        fields = () if level is None else ('access', 'public')
-
-        folders = self.find({
+        query = {
             'parentId': folder['_id'],
             'parentCollection': 'folder'
-        }, fields=fields)
+        }
 
         if level is None:
-            return folders.count()
+            return self.find(query, fields=()).count()
         else:
-            return sum(1 for _ in self.filterResultsByPermission(
-                cursor=folders, user=user, level=level))
+            return self.countWithPermissions(query, user=user, level=level)
 
     def subtreeCount(self, folder, includeItems=True, user=None, level=None):
         """
@@ -642,25 +785,126 @@ class Folder(AccessControlledModel):
         :param level: If filtering by permission, the required permission level.
         :type level: AccessLevel
         """
-        count = 1
+        from .item import Item
+
+        folderQuery, itemQuery = self._descendantQueries(folder, user, level)
+        count = 1 + self.find(folderQuery, fields=()).count()
 
         if includeItems:
-            count += self.countItems(folder)
+            count += Item().find(itemQuery, fields=()).count()
 
-        folders = self.find({
-            'parentId': folder['_id'],
-            'parentCollection': 'folder'
-        }, fields=('access',))
+        return count
+
+    def _descendantQueries(self, folder, user=None, level=None):
+        """
+        Return queries matching the descendant folders and the descendant items
+        of a folder. If a level is given, descendant folders the user cannot
+        access are excluded along with everything underneath them.
+        """
+        self.ensureAncestors()
+        folderQuery = {'ancestors': folder['_id']}
+        itemQuery = {'ancestors': folder['_id']}
 
         if level is not None:
-            folders = self.filterResultsByPermission(
-                cursor=folders, user=user, level=level)
+            clauses = self.permissionClauses(user=user, level=level)
+            hidden = [doc['_id'] for doc in self.find({
+                'ancestors': folder['_id'],
+                '$nor': [clauses]
+            }, fields=('_id',))] if clauses else []
+
+            if hidden:
+                folderQuery = {
+                    '$and': [folderQuery, {'ancestors': {'$nin': hidden}}],
+                    '_id': {'$nin': hidden}
+                }
+                itemQuery = {'$and': [itemQuery, {'ancestors': {'$nin': hidden}}]}
 
-        count += sum(self.subtreeCount(subfolder, includeItems=includeItems,
-                                       user=user, level=level)
-                     for subfolder in folders)
+        return folderQuery, itemQuery
 
-        return count
+    def manifest(self, folder, user=None, level=AccessType.READ, modifiedSince=None,
+                 batchSize=1000):
+        """
+        Generate a record for the given folder and for each folder, item and
+        file in its subtree, with paths relative to the folder. Rather than
+        querying each folder in turn, the subtree is read with one scan of the
+        descendant folders, one of the descendant items, and one query for the
+        files of each batch of items.
+
+        Folders are listed before their contents, and each item is directly
+        followed by its files. Every record has a ``type`` of 'folder', 'item'
+        or 'file', along with its ``_id``, ``name``, ``path``, ``created`` and
+        ``updated`` fields. Folder records also have ``parentId``, item
+        records ``folderId`` and ``size``, and file records ``itemId``,
+        ``size``, ``mimeType`` and, if computed, ``sha512``.
+
+        :param folder: The root of the subtree.
+        :type folder: dict
+        :param user: The user whose access is checked.
+        :type user: dict or None
+        :param level: The access level required on descendant folders. Folders
+            without it are omitted along with everything underneath them.
+        :type level: AccessType
+        :param modifiedSince: If set, only list the folders updated after this
+            time, and the items that were updated or have files that were
+            updated after it. Removed resources are not reported.
+        :type modifiedSince: datetime.datetime or None
+        :param batchSize: The number of items whose files are queried at once.
+        :type batchSize: int
+        """
+        from .item import Item
+
+        yield _manifestRecord('folder', folder, '', ('parentId',))
+
+        folderQuery, itemQuery = self._descendantQueries(folder, user, level)
+        paths = {folder['_id']: ''}
+        # Parents have fewer ancestors than their children, so sorting by depth
+        # resolves the path of each folder's parent before the folder itself.
+        folders = sorted(self.find(folderQuery, fields=(
+            '_id', 'name', 'parentId', 'ancestors', 'created', 'updated')),
+            key=lambda doc: len(doc['ancestors']))
+        for doc in folders:
+            if doc['parentId'] not in paths:
+                continue
+            paths[doc['_id']] = _manifestPath(paths[doc['parentId']], doc['name'])
+            if _isModifiedSince(doc, modifiedSince):
+                yield _manifestRecord('folder', doc, paths[doc['_id']], ('parentId',))
+        del folders
+
+        batch = []
+        for item in Item().find(itemQuery, fields=(
+                '_id', 'name', 'folderId', 'size', 'created', 'updated')):
+            if item['folderId'] in paths:
+                batch.append(item)
+            if len(batch) >= batchSize:
+                for record in self._manifestItems(batch, paths, modifiedSince):
+                    yield record
+                batch = []
+        for record in self._manifestItems(batch, paths, modifiedSince):
+            yield record
+
+    def _manifestItems(self, items, paths, modifiedSince):
+        """
+        Generate the manifest records of a batch of items and their files.
+        """
+        from .file import File
+
+        files = collections.defaultdict(list)
+        for file in File().find(
+                {'itemId': {'$in': [item['_id'] for item in items]}}, sort=[('_id', 1)],
+                fields=('_id', 'itemId', 'name', 'size', 'mimeType', 'sha512', 'created',
+                        'updated')):
+            files[file['itemId']].append(file)
+
+        for item in items:
+            itemFiles = files[item['_id']]
+            if not _isModifiedSince(item, modifiedSince) and not any(
+                    _isModifiedSince(file, modifiedSince) for file in itemFiles):
+                continue
+            path = _manifestPath(paths[item['folderId']], item['name'])
+            yield _manifestRecord('item', item, path, ('folderId', 'size'))
+            for file in itemFiles:
+                yield _manifestRecord('file', file, _manifestPath(path, file['name']), (
+                    'itemId', 'size', 'mimeType', 'sha512'))
 
     def fileList(self, doc, user=None, path='', includeMetadata=False,
                  subpath=True, mimeFilter=None, data=True):
@@ -870,13 +1114,10 @@ class Folder(AccessControlledModel):
             self, doc, access, user=user, save=save, force=force)
 
         if recurse:
-            cursor = self.find({
+            subfolders = self.findWithPermissions({
                 'parentId': doc['_id'],
                 'parentCollection': 'folder'
-            })
-
-            subfolders = self.filterResultsByPermission(
-                cursor=cursor, user=user, level=AccessType.ADMIN)
+            }, user=user, level=AccessType.ADMIN)
 
             for folder in subfolders:
                 self.setAccessList(
@@ -905,24 +1146,23 @@ class Folder(AccessControlledModel):
         """
         from .item import Item
 
-        size = 0
+        self.ensureAncestors()
         fixes = 0
-        # recursively fix child folders but don't include their size
-        children = self.find({
-            'parentId': doc['_id'],
-            'parentCollection': 'folder'
-        })
-        for child in children:
-            _, f = self.updateSize(child)
-            fixes += f
-        # get correct size from child items
+        # fix the size of every item in the subtree
         itemModel = Item()
-        for item in self.childItems(doc):
-            s, f = itemModel.updateSize(item)
-            size += s
+        for item in itemModel.find({'ancestors': doc['_id']}):
+            _, f = itemModel.updateSize(item)
             fixes += f
-        # fix value if incorrect
-        if size != doc.get('size'):
-            self.update({'_id': doc['_id']}, update={'$set': {'size': size}})
-            fixes += 1
-        return size, fixes
+        # sum the item sizes per folder in a single pass over the subtree
+        sizes = {result['_id']: result['size'] for result in itemModel.collection.aggregate([
+            {'$match': {'ancestors': doc['_id']}},
+            {'$group': {'_id': '$folderId', 'size': {'$sum': '$size'}}}
+        ])}
+        # fix folder values that are incorrect; child folders don't include
+        # the size of their own subfolders
+        for folder in self.find(self._subtreeQuery(doc), fields=('size',)):
+            size = sizes.get(folder['_id'], 0)
+            if size != folder.get('size'):
+                self.update({'_id': folder['_id']}, update={'$set': {'size': size}})
+                fixes += 1
+        return sizes.get(doc['_id'], 0), fixes
@@ -57,6 +57,7 @@ class Group(AccessControlledModel):
 
     def initialize(self):
         self.name = 'group'
+        self._cacheLoads = True
         self.ensureIndices(['lowerName'])
         self.ensureTextIndex({
             'name': 10,
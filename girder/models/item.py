@@ -30,6 +30,7 @@ from girder import logger
 from girder.constants import AccessType
 from girder.exceptions import ValidationException, GirderException
 from girder.utility import acl_mixin
+from girder.utility._cache import pathCacheKey
 
 
 class Item(acl_mixin.AccessControlMixin, Model):
@@ -40,7 +41,9 @@ class Item(acl_mixin.AccessControlMixin, Model):
 
     def initialize(self):
         self.name = 'item'
-        self.ensureIndices(('folderId', 'name', 'lowerName',
+        self._cacheDerived = True
+        self._cacheKeyFields = ('_id', 'folderId', 'name')
+        self.ensureIndices(('folderId', 'name', 'lowerName', 'ancestors',
                             ([('folderId', 1), ('name', 1)], {})))
         self.ensureTextIndex({
             'name': 10,
@@ -67,6 +70,11 @@ class Item(acl_mixin.AccessControlMixin, Model):
             value = str(value)
         return value.strip()
 
+    def _cacheKeys(self, document):
+        # Changing an item also invalidates the cached lookup of its path
+        return super(Item, self)._cacheKeys(document) + [
+            pathCacheKey('folder', document['folderId'], document['name'])]
+
     def validate(self, doc):
         from .folder import Folder
 
@@ -112,6 +120,9 @@ class Item(acl_mixin.AccessControlMixin, Model):
                 name = '%s (%d)' % (doc['name'], n)
 
         doc['lowerName'] = doc['name'].lower()
+
+        if 'ancestors' not in doc:
+            doc['ancestors'] = Folder()._childAncestors({'_id': doc['folderId']})
         return doc
 
     def load(self, id, level=AccessType.ADMIN, user=None, objectId=True,
@@ -124,7 +135,7 @@ class Item(acl_mixin.AccessControlMixin, Model):
         """
         # Ensure we include extra fields to do the migration below
         extraFields = {'baseParentId', 'baseParentType', 'parentId', 'parentCollection',
-                       'name', 'lowerName'}
+                       'name', 'lowerName', 'folderId', 'ancestors'}
         loadFields = self._supplementFields(fields, extraFields)
 
         doc = super(Item, self).load(
@@ -146,6 +157,13 @@ class Item(acl_mixin.AccessControlMixin, Model):
                 self.update({'_id': doc['_id']}, {'$set': {
                     'lowerName': doc['lowerName']
                 }})
+            if 'ancestors' not in doc:
+                from .folder import Folder
+
+                doc['ancestors'] = Folder()._childAncestors({'_id': doc['folderId']})
+                self.update({'_id': doc['_id']}, {'$set': {
+                    'ancestors': doc['ancestors']
+                }})
 
             self._removeSupplementalFields(doc, fields)
 
@@ -160,9 +178,12 @@ class Item(acl_mixin.AccessControlMixin, Model):
         :param folder: The folder to move the item into.
         :type folder: dict.
         """
+        from .folder import Folder
+
         self.propagateSizeChange(item, -item['size'])
 
         item['folderId'] = folder['_id']
+        item['ancestors'] = Folder()._childAncestors(folder)
         item['baseParentType'] = folder['baseParentType']
         item['baseParentId'] = folder['baseParentId']
 
@@ -280,6 +301,8 @@ class Item(acl_mixin.AccessControlMixin, Model):
 
         now = datetime.datetime.utcnow()
 
+        from .folder import Folder
+
         if not isinstance(creator, dict) or '_id' not in creator:
             # Internal error -- this shouldn't be called without a user.
             raise GirderException('Creator must be a user.',
@@ -295,6 +318,7 @@ class Item(acl_mixin.AccessControlMixin, Model):
             'name': self._validateString(name),
             'description': self._validateString(description),
             'folderId': ObjectId(folder['_id']),
+            'ancestors': Folder()._childAncestors(folder),
             'creatorId': creator['_id'],
             'baseParentType': folder['baseParentType'],
             'baseParentId': folder['baseParentId'],
@@ -32,6 +32,7 @@ from girder.constants import AccessType, CoreEventHandler, ACCESS_FLAGS, TEXT_SC
 from girder.external.mongodb_proxy import MongoProxy
 from girder.models import getDbConnection
 from girder.utility.model_importer import ModelImporter
+from girder.utility._cache import cache, cacheEnabled, cacheInvalidationChannel
 from girder.exceptions import AccessException, ValidationException
 # Import the GirderException since it was historically defined here
 from girder.exceptions import GirderException  # noqa
@@ -77,6 +78,15 @@ class Model(ModelImporter):
         self._textIndex = None
         self._textLanguage = None
         self.prefixSearchFields = ('lowerName', 'name')
+        self._cacheLoads = False
+        # Whether other entries of the shared cache are derived from the
+        # documents of this model, and must be invalidated when they change
+        self._cacheDerived = False
+        self._cacheKeyFields = ('_id',)
+        # Whether entries cached under keys computed from the other fields in
+        # _cacheKeyFields hold whole documents, rather than depending only on
+        # those fields
+        self._cacheFieldEntriesHoldDocuments = False
 
         self._filterKeys = {
             AccessType.READ: set(),
@@ -437,6 +447,8 @@ class Model(ModelImporter):
         except WriteError as e:
             raise ValidationException('Database save failed: %s' % e.details)
 
+        self._invalidateCache((document,))
+
         if triggerEvents:
             if isNew:
                 auditLogger.info('document.create', extra={
@@ -469,10 +481,13 @@ class Model(ModelImporter):
         :type multi: bool
         :returns: A pymongo UpdateResult object.
         """
+        affected = self._cachedDocuments(query, update)
         if multi:
-            return self.collection.update_many(query, update)
+            result = self.collection.update_many(query, update)
         else:
-            return self.collection.update_one(query, update)
+            result = self.collection.update_one(query, update)
+        self._invalidateCache(affected)
+        return result
 
     def increment(self, query, field, amount, **kwargs):
         """
@@ -509,7 +524,9 @@ class Model(ModelImporter):
             })
 
         if not event.defaultPrevented and not kwargsEvent.defaultPrevented:
-            return self.collection.delete_one({'_id': document['_id']})
+            result = self.collection.delete_one({'_id': document['_id']})
+            self._invalidateCache((document,))
+            return result
 
     def removeWithQuery(self, query):
         """
@@ -522,11 +539,104 @@ class Model(ModelImporter):
         """
         assert query
 
-        return self.collection.delete_many(query)
+        affected = self._cachedDocuments(query)
+        result = self.collection.delete_many(query)
+        self._invalidateCache(affected)
+        return result
+
+    def _cacheKey(self, value, field='_id'):
+        """
+        Return the key under which the document of this model whose ``field``
+        equals ``value`` is stored in the shared cache.
+        """
+        return 'girder.models.%s:%s|%s' % (self.name, field, value)
+
+    def _cacheKeys(self, document):
+        """
+        Return the cache keys that must be invalidated when a document changes.
+        Models that cache lookups by other fields should extend this, and list
+        those fields in ``self._cacheKeyFields``.
+
+        :param document: The document, containing at least the fields in
+            ``self._cacheKeyFields``, or only its ``_id`` if the change leaves
+            the entries keyed by the other fields valid.
+        :type document: dict
+        """
+        return [self._cacheKey(document['_id'])]
+
+    def _cachedDocuments(self, query, update=None):
+        """
+        Find the documents whose cache entries would be affected by a write
+        matching a query. This returns an empty list if no cache entries are
+        kept for the documents of this model. If loads are not cached, only
+        updates that change one of ``self._cacheKeyFields`` affect the cache.
+
+        Updates that leave the other key fields alone only affect the entries
+        keyed by ``_id``, so the returned documents may then contain only their
+        ``_id``, and are taken from the query without reading the database if
+        it selects documents by ``_id``.
+
+        :param query: The query of the write.
+        :type query: dict
+        :param update: The update specifier, if the write is an update.
+        :type update: dict or None
+        """
+        if not (self._cacheLoads or self._cacheDerived) or not cacheEnabled():
+            return []
+        keyFields = set(self._cacheKeyFields)
+        if update is not None:
+            fields = set()
+            for operator, spec in six.iteritems(update):
+                if not operator.startswith('$'):
+                    fields.add(operator)
+                    continue
+                fields.update(spec)
+                if operator == '$rename':
+                    fields.update(spec.values())
+            if not {field.split('.')[0] for field in fields} & (keyFields - {'_id'}):
+                if not self._cacheLoads:
+                    return []
+                if not self._cacheFieldEntriesHoldDocuments:
+                    keyFields = {'_id'}
+        ids = self._queryIds(query) if keyFields == {'_id'} else None
+        if ids is not None:
+            return [{'_id': id} for id in ids]
+        return list(self.collection.find(query, {field: True for field in keyFields}))
+
+    @staticmethod
+    def _queryIds(query):
+        """
+        Return the IDs a query selects if it only matches ``_id`` against a
+        value or an ``$in`` list, or None otherwise.
+        """
+        if list(query) != ['_id']:
+            return None
+        value = query['_id']
+        if isinstance(value, dict):
+            return list(value['$in']) if list(value) == ['$in'] else None
+        return [value]
+
+    def _invalidateCache(self, documents):
+        """
+        Remove documents from the shared cache of this process and notify other
+        processes to do the same.
+
+        :param documents: The changed documents.
+        :type documents: iterable of dict
+        """
+        if not (self._cacheLoads or self._cacheDerived) or not cacheEnabled():
+            return
+        keys = [key for doc in documents for key in self._cacheKeys(doc)]
+        if keys:
+            cache.delete_multi(keys)
+            cacheInvalidationChannel.publish(keys)
 
     def load(self, id, objectId=True, fields=None, exc=False):
         """
-        Fetch a single object from the database using its _id field.
+        Fetch a single object from the database using its _id field. For models
+        that set ``self._cacheLoads``, loads of the full document are served
+        from the shared cache, which is kept consistent by save, update and
+        remove.
 
         :param id: The value for searching the _id field.
         :type id: string or ObjectId
@@ -550,7 +660,12 @@ class Model(ModelImporter):
             except InvalidId:
                 raise ValidationException('Invalid ObjectId: %s' % id,
                                           field='id')
-        doc = self.findOne({'_id': id}, fields=fields)
+        if fields is None and self._cacheLoads and cacheEnabled():
+            doc = copy.deepcopy(cache.get_or_create(
+                self._cacheKey(id), lambda: self.findOne({'_id': id}),
+                should_cache_fn=lambda doc: doc is not None))
+        else:
+            doc = self.findOne({'_id': id}, fields=fields)
 
         if doc is None and exc is True:
             raise ValidationException('No such %s: %s' % (self.name, id),
@@ -900,9 +1015,11 @@ class AccessControlledModel(Model):
 
         event = events.trigger('model.%s.save' % self.name, doc)
         if not event.defaultPrevented:
+            query = {'_id': ObjectId(doc['_id'])}
+            affected = self._cachedDocuments(query, update)
             doc = self.collection.find_one_and_update(
-                {'_id': ObjectId(doc['_id'])}, update,
-                return_document=pymongo.ReturnDocument.AFTER)
+                query, update, return_document=pymongo.ReturnDocument.AFTER)
+            self._invalidateCache(affected + ([doc] if doc is not None else []))
             events.trigger('model.%s.save.after' % self.name, doc)
         return doc
 
@@ -1388,10 +1505,8 @@ class AccessControlledModel(Model):
         :param sort: The sort order
         :type sort: List of (key, order) tuples
         """
-        cursor = self.find({}, sort=sort)
-        return self.filterResultsByPermission(
-            cursor=cursor, user=user, level=AccessType.READ, limit=limit,
-            offset=offset)
+        return self.findWithPermissions(
+            {}, sort=sort, user=user, level=AccessType.READ, limit=limit, offset=offset)
 
     def copyAccessPolicies(self, src, dest, save=False):
         """
@@ -1413,6 +1528,133 @@ class AccessControlledModel(Model):
             dest = self.save(dest)
         return dest
 
+    def _canQueryPermissions(self):
+        """
+        Whether the access control semantics of this model can be expressed as
+        a MongoDB query. This is the case unless a subclass overrides
+        hasAccess or hasAccessFlags, in which case results must be filtered by
+        calling those methods on each document.
+        """
+        cls = type(self)
+        return all(
+            six.get_unbound_function(getattr(cls, name)) is
+            six.get_unbound_function(getattr(AccessControlledModel, name))
+            for name in ('hasAccess', 'hasAccessFlags'))
+
+    def permissionClauses(self, user=None, level=AccessType.READ, flags=None):
+        """
+        Build a MongoDB query clause that matches only documents on which the
+        given user has the given access level and access flags. This mirrors
+        the logic of hasAccess and hasAccessFlags.
+
+        :param user: The user to check policies against.
+        :type user: dict or None
+        :param level: The access level.
+        :type level: AccessType
+        :param flags: A flag or set of flags to test.
+        :type flags: flag identifier, or a list/set/tuple of them
+        :returns: A query dict, which is empty if no restriction is necessary.
+        """
+        if user is not None and user['admin']:
+            return {}
+
+        groupIds = user.get('groups', []) if user is not None else []
+
+        levelClauses = []
+        if level <= AccessType.READ:
+            levelClauses.append({'public': True})
+        if user is not None:
+            levelClauses.append({'access.users': {
+                '$elemMatch': {'id': user['_id'], 'level': {'$gte': level}}}})
+            if groupIds:
+                levelClauses.append({'access.groups': {
+                    '$elemMatch': {'id': {'$in': groupIds}, 'level': {'$gte': level}}}})
+        if not levelClauses:
+            # Nothing can be granted, so match no documents
+            return {'_id': {'$exists': False}}
+
+        clauses = [{'$or': levelClauses}]
+
+        if flags and not isinstance(flags, (list, tuple, set)):
+            flags = [flags]
+        for flag in flags or ():
+            flagClauses = [{'publicFlags': flag}]
+            if user is not None:
+                flagClauses.append({'access.users': {
+                    '$elemMatch': {'id': user['_id'], 'flags': flag}}})
+                if groupIds:
+                    flagClauses.append({'access.groups': {
+                        '$elemMatch': {'id': {'$in': groupIds}, 'flags': flag}}})
+            clauses.append({'$or': flagClauses})
+
+        if len(clauses) == 1:
+            return clauses[0]
+        return {'$and': clauses}
+
+    def _queryWithPermissions(self, query, user, level, flags=None):
+        """
+        Return a copy of a query with the permission clauses for the given user
+        and access level added to it.
+        """
+        query = dict(query or {})
+        clauses = self.permissionClauses(user=user, level=level, flags=flags)
+        if clauses:
+            query['$and'] = list(query.get('$and', [])) + [clauses]
+        return query
+
+    def findWithPermissions(self, query=None, offset=0, limit=0, timeout=None, fields=None,
+                            sort=None, user=None, level=AccessType.READ, flags=None,
+                            **kwargs):
+        """
+        Search the collection for documents that the user has the given level
+        of access and specified access flags on. When possible, the access
+        check is performed by the database, so offset and limit are applied
+        server-side. Models that override hasAccess or hasAccessFlags fall
+        back to filtering the results in Python via filterResultsByPermission.
+
+        The parameters are the same as Model.find, with the addition of:
+
+        :param user: The user to check policies against.
+        :type user: dict or None
+        :param level: The access level.
+        :type level: AccessType
+        :param flags: A flag or set of flags to test.
+        :type flags: flag identifier, or a list/set/tuple of them
+        :returns: A pymongo cursor, or a generator of documents when falling
+            back to Python-side filtering.
+        """
+        if self._canQueryPermissions():
+            return self.find(
+                self._queryWithPermissions(query, user, level, flags), offset=offset,
+                limit=limit, timeout=timeout, fields=fields, sort=sort, **kwargs)
+
+        cursor = self.find(query, timeout=timeout, fields=fields, sort=sort, **kwargs)
+        return self.filterResultsByPermission(
+            cursor, user=user, level=level, limit=limit, offset=offset, flags=flags)
+
+    def countWithPermissions(self, query=None, user=None, level=AccessType.READ, flags=None):
+        """
+        Count the documents matching a query that the user has the given level
+        of access and specified access flags on.
+
+        :param query: The search query (see general MongoDB docs for "find()")
+        :type query: dict
+        :param user: The user to check policies against.
+        :type user: dict or None
+        :param level: The access level.
+        :type level: AccessType
+        :param flags: A flag or set of flags to test.
+        :type flags: flag identifier, or a list/set/tuple of them
+        :returns: The number of matching documents.
+        :rtype: int
+        """
+        if self._canQueryPermissions():
+            return self.find(
+                self._queryWithPermissions(query, user, level, flags), fields=()).count()
+
+        return sum(1 for _ in self.findWithPermissions(
+            query, user=user, level=level, flags=flags))
+
     def filterResultsByPermission(self, cursor, user, level, limit=0, offset=0,
                                   removeKeys=(), flags=None):
         """
@@ -1475,6 +1717,11 @@ class AccessControlledModel(Model):
         :param level: The access level to require.
         :type level: girder.constants.AccessType
         """
+        if self._canQueryPermissions():
+            return Model.textSearch(
+                self, query=query, filters=self._queryWithPermissions(filters, user, level),
+                limit=limit, offset=offset, sort=sort, fields=fields)
+
         filters = filters or {}
 
         cursor = Model.textSearch(
@@ -1511,6 +1758,12 @@ class AccessControlledModel(Model):
         :returns: A pymongo cursor. It is left to the caller to build the
             results from the cursor.
         """
+        if self._canQueryPermissions():
+            return Model.prefixSearch(
+                self, query, filters=self._queryWithPermissions(filters, user, level),
+                limit=limit, offset=offset, sort=sort, fields=fields,
+                prefixSearchFields=prefixSearchFields)
+
         filters = filters or {}
 
         cursor = Model.prefixSearch(
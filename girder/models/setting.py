@@ -38,6 +38,10 @@ class Setting(Model):
     """
     def initialize(self):
         self.name = 'setting'
+        self._cacheLoads = True
+        self._cacheKeyFields = ('_id', 'key')
+        # Settings are looked up by key, so those entries hold the documents
+        self._cacheFieldEntriesHoldDocuments = True
         # We had been asking for an index on key, like so:
         #   self.ensureIndices(['key'])
         # We really want the index to be unique, which could be done:
@@ -99,13 +103,17 @@ class Setting(Model):
 
         return doc
 
-    @cache.cache_on_arguments()
+    def _cacheKeys(self, document):
+        return super(Setting, self)._cacheKeys(document) + [
+            self._cacheKey(document['key'], field='key')]
+
     def _get(self, key):
         """
-        This method is so built in caching decorators can be used without specifying
-        custom logic for dealing with the default kwarg of self.get.
+        Load a setting document through the shared cache. Missing settings are
+        cached as None, since most settings are never set.
         """
-        return self.findOne({'key': key})
+        return cache.get_or_create(
+            self._cacheKey(key, field='key'), lambda: self.findOne({'key': key}))
 
     def get(self, key, default='__default__'):
         """
@@ -146,7 +154,7 @@ class Setting(Model):
 
         setting = self.save(setting)
 
-        self._get.set(setting, self, key)
+        cache.set(self._cacheKey(key, field='key'), setting)
 
         return setting
 
@@ -158,7 +166,7 @@ class Setting(Model):
         :param key: The key identifying the setting to be removed.
         :type key: str
         """
-        self._get.invalidate(self, key)
+        cache.delete(self._cacheKey(key, field='key'))
         for setting in self.find({'key': key}):
             self.remove(setting)
 
@@ -364,6 +372,12 @@ class Setting(Model):
         if not isinstance(doc['value'], bool):
             raise ValidationException('API key setting must be boolean.', 'value')
 
+    @staticmethod
+    @setting_utilities.validator(SettingKey.ANCESTORS_MIGRATED)
+    def validateAncestorsMigrated(doc):
+        if not isinstance(doc['value'], bool):
+            raise ValidationException('Ancestors migrated setting must be boolean.', 'value')
+
     @staticmethod
     @setting_utilities.validator(SettingKey.ENABLE_PASSWORD_LOGIN)
     def validateEnablePasswordLogin(doc):
@@ -17,12 +17,17 @@
 #  limitations under the License.
 ###############################################################################
 
+import collections
+import copy
 import datetime
 import six
 
+from bson.objectid import ObjectId
+from dogpile.cache.api import NO_VALUE
 from girder.constants import AccessType, SettingKey, TokenScope
 from girder.exceptions import AccessException
 from girder.utility import genToken
+from girder.utility._cache import cache, cacheEnabled
 from .model_base import AccessControlledModel
 
 
@@ -32,8 +37,14 @@ class Token(AccessControlledModel):
     """
     def initialize(self):
         self.name = 'token'
+        self._cacheLoads = True
         self.ensureIndex(('expires', {'expireAfterSeconds': 0}))
         self.ensureIndex('apiKeyId')
+        self.resolutionStats = collections.Counter(hits=0, misses=0)
+
+    def _cacheKeys(self, document):
+        return super(Token, self)._cacheKeys(document) + [
+            self._cacheKey(document['_id'], field='resolution')]
 
     def validate(self, doc):
         # Remove any duplicate scopes
@@ -148,6 +159,48 @@ class Token(AccessControlledModel):
         if not self.hasScope(token, scope):
             raise AccessException('Invalid token scope, required: %s.' % (scope))
 
+    def loadWithUser(self, tokenStr):
+        """
+        Load a token along with the user it belongs to. When caching is enabled,
+        the pair is kept in the shared cache keyed by the token string, so
+        authenticating a request does not need to query the database. Cached
+        pairs are invalidated when the token or the user changes. Hits and
+        misses are counted in ``self.resolutionStats``.
+
+        :param tokenStr: The token string.
+        :type tokenStr: str
+        :returns: A (token, user) tuple. The token is None if it does not
+            exist, and the user is None if the token has no user.
+        """
+        from .user import User
+
+        if not cacheEnabled():
+            token = self.load(tokenStr, force=True, objectId=False)
+            if token is None or 'userId' not in token:
+                return token, None
+            return token, User().load(token['userId'], force=True)
+
+        key = self._cacheKey(tokenStr, field='resolution')
+        entry = cache.get(key)
+        if entry is not NO_VALUE and (entry['userMarker'] is None or cache.get(
+                User()._cacheKey(entry['token']['userId'], field='tokens')) ==
+                entry['userMarker']):
+            self.resolutionStats['hits'] += 1
+            return copy.deepcopy((entry['token'], entry['user']))
+
+        self.resolutionStats['misses'] += 1
+        token = self.load(tokenStr, force=True, objectId=False)
+        user = marker = None
+        if token is not None and 'userId' in token:
+            # The marker is read before loading the user, so that a change to
+            # the user after this point also invalidates this entry.
+            marker = cache.get_or_create(
+                User()._cacheKey(token['userId'], field='tokens'), lambda: str(ObjectId()))
+            user = User().load(token['userId'], force=True)
+        if token is not None:
+            cache.set(key, {'token': token, 'user': user, 'userMarker': marker})
+        return copy.deepcopy((token, user))
+
     def clearForApiKey(self, apiKey):
         """
         Delete all tokens corresponding to an API key.
@@ -18,12 +18,13 @@
 ###############################################################################
 
 import datetime
+import hashlib
 import six
 from bson.objectid import ObjectId
 
 from girder import events, logger
 from girder.api import rest
-from girder.constants import SettingKey
+from girder.constants import AccessType, SettingKey
 from .model_base import Model
 from girder.exceptions import GirderException, ValidationException
 from girder.utility import RequestBodyStream
@@ -235,7 +236,10 @@ class Upload(Model):
                     file['attachedToId'] = upload['parentId']
 
         adapter = assetstore_utilities.getAssetstoreAdapter(assetstore)
-        file = adapter.finalizeUpload(upload, file)
+        if 'duplicateOf' in upload:
+            file = self._copyContent(File().load(upload['duplicateOf'], force=True), file, adapter)
+        else:
+            file = adapter.finalizeUpload(upload, file)
 
         event_document = {'file': file, 'upload': upload}
         events.trigger('model.file.finalizeUpload.before', event_document)
@@ -245,7 +249,7 @@ class Upload(Model):
             self.remove(upload)
 
         logger.info('Upload complete. Upload=%s File=%s User=%s' % (
-            upload['_id'], file['_id'], upload['userId']))
+            upload.get('_id'), file['_id'], upload['userId']))
 
         # Add an async event for handlers that wish to process this file.
         eventParams = {
@@ -365,6 +369,16 @@ class Upload(Model):
 
         assetstore = self.getTargetAssetstore(parentType, parent, assetstore)
         adapter = assetstore_utilities.getAssetstoreAdapter(assetstore)
+        upload = self._newUpload(
+            user, name, parentType, parent, size, mimeType, reference, assetstore, attachParent)
+
+        upload = adapter.initUpload(upload)
+        if save:
+            upload = self.save(upload)
+        return upload
+
+    def _newUpload(self, user, name, parentType, parent, size, mimeType, reference, assetstore,
+                   attachParent):
         now = datetime.datetime.utcnow()
 
         if not mimeType:
@@ -394,12 +408,78 @@ class Upload(Model):
             upload['userId'] = user['_id']
         else:
             upload['userId'] = None
-
-        upload = adapter.initUpload(upload)
-        if save:
-            upload = self.save(upload)
         return upload
 
+    def uploadExistingContent(self, user, name, parentType, parent, size, sha512, mimeType=None,
+                              reference=None, assetstore=None, attachParent=False):
+        """
+        Create a file without transferring its contents, if the target
+        assetstore already stores content with the same SHA-512 hash and size
+        in a file that the user can read. The new file shares that content, as
+        a copied file would, and its MIME type if none is given. The content is
+        hashed again asynchronously, and the file is removed if it does not
+        match.
+
+        The parameters are the same as for :py:meth:`createUpload`, with the
+        addition of:
+
+        :param sha512: The SHA-512 hash of the file's contents, as a hex
+            string.
+        :type sha512: str
+        :returns: The file document that was created, or None if no matching
+            content was found. In that case, the contents must be uploaded.
+        """
+        from .file import File
+
+        assetstore = self.getTargetAssetstore(parentType, parent, assetstore)
+        fileModel = File()
+        source = next(fileModel.filterResultsByPermission(fileModel.find({
+            'assetstoreId': assetstore['_id'],
+            'sha512': sha512.lower(),
+            'size': size,
+            'itemId': {'$ne': None},
+            'imported': {'$ne': True}
+        }, fields=('_id', 'itemId', 'mimeType')), user, AccessType.READ, limit=1), None)
+        if source is None:
+            return None
+
+        upload = self._newUpload(
+            user, name, parentType, parent, size, mimeType, reference, assetstore, attachParent)
+        if not mimeType and source.get('mimeType'):
+            upload['mimeType'] = source['mimeType']
+        upload['received'] = size
+        upload['duplicateOf'] = source['_id']
+        file = self.finalizeUpload(upload, assetstore)
+        events.daemon.trigger(
+            'model.upload.verifyContent', {'fileId': file['_id']}, callback=self._verifyContent)
+        return file
+
+    def _copyContent(self, source, file, adapter):
+        """
+        Point a new file at the stored content of another file. Only the fields
+        that locate the content are copied, since the source may belong to
+        another user.
+        """
+        # These locate the content in filesystem, S3 and GridFS assetstores
+        for key in ('sha512', 'size', 'path', 'relpath', 's3Key', 'chunkUuid'):
+            if key in source:
+                file[key] = source[key]
+        return adapter.copyFile(source, file)
+
+    def _verifyContent(self, event):
+        from .file import File
+
+        file = File().load(event.info['fileId'], force=True)
+        if file is None:
+            return
+        checksum = hashlib.sha512()
+        for chunk in File().download(file, headers=False)():
+            checksum.update(chunk)
+        if checksum.hexdigest() != file['sha512']:
+            logger.error('Removing file %s, whose stored content does not match its hash %s.' % (
+                file['_id'], file['sha512']))
+            File().remove(file)
+
     def moveFileToAssetstore(self, file, user, assetstore, progress=noProgress):
         """
         Move a file from whatever assetstore it is located in to a different
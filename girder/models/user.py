@@ -29,7 +29,7 @@ from girder import events
 from girder.constants import AccessType, CoreEventHandler, SettingKey, TokenScope
 from girder.exceptions import AccessException, ValidationException
 from girder.utility import config, mail_utils
-from girder.utility._cache import rateLimitBuffer
+from girder.utility._cache import pathCacheKey, rateLimitBuffer
 
 
 class User(AccessControlledModel):
@@ -39,6 +39,8 @@ class User(AccessControlledModel):
 
     def initialize(self):
         self.name = 'user'
+        self._cacheLoads = True
+        self._cacheKeyFields = ('_id', 'login')
         self.ensureIndices(['login', 'email', 'groupInvites.groupId', 'size',
                             'created'])
         self.prefixSearchFields = (
@@ -69,6 +71,14 @@ class User(AccessControlledModel):
                     CoreEventHandler.USER_DEFAULT_FOLDERS,
                     self._addDefaultFolders)
 
+    def _cacheKeys(self, document):
+        # Changing a user also invalidates cached token resolutions for them
+        keys = super(User, self)._cacheKeys(document) + [
+            self._cacheKey(document['_id'], field='tokens')]
+        if 'login' in document:
+            keys.append(pathCacheKey('user', None, document['login']))
+        return keys
+
     def validate(self, doc):
         """
         Validate the user every time it is stored in the database.
@@ -270,16 +280,16 @@ class User(AccessControlledModel):
         :param sort: The sort structure to pass to pymongo.
         :returns: Iterable of users.
         """
-        # Perform the find; we'll do access-based filtering of the result set
-        # afterward.
         if text is not None:
+            # Perform the search; we'll do access-based filtering of the result
+            # set afterward.
             cursor = self.textSearch(text, sort=sort)
-        else:
-            cursor = self.find({}, sort=sort)
+            return self.filterResultsByPermission(
+                cursor=cursor, user=user, level=AccessType.READ, limit=limit,
+                offset=offset)
 
-        return self.filterResultsByPermission(
-            cursor=cursor, user=user, level=AccessType.READ, limit=limit,
-            offset=offset)
+        return self.findWithPermissions(
+            {}, sort=sort, user=user, level=AccessType.READ, limit=limit, offset=offset)
 
     def setPassword(self, user, password, save=True):
         """
@@ -553,14 +563,16 @@ class User(AccessControlledModel):
 
         count = 1
         folderModel = Folder()
-        folders = folderModel.find({
+        query = {
             'parentId': doc['_id'],
             'parentCollection': 'user'
-        }, fields=('access',))
+        }
 
-        if level is not None:
-            folders = self.filterResultsByPermission(
-                cursor=folders, user=user, level=level)
+        if level is None:
+            folders = folderModel.find(query, fields=('_id',))
+        else:
+            folders = folderModel.findWithPermissions(
+                query, fields=('_id',), user=user, level=level)
 
         count += sum(folderModel.subtreeCount(
             folder, includeItems=includeItems, user=user, level=level)
@@ -582,19 +594,16 @@ class User(AccessControlledModel):
         """
         from .folder import Folder
 
-        fields = () if level is None else ('access', 'public')
-
         folderModel = Folder()
-        folders = folderModel.find({
+        query = {
             'parentId': user['_id'],
             'parentCollection': 'user'
-        }, fields=fields)
+        }
 
         if level is None:
-            return folders.count()
+            return folderModel.find(query, fields=()).count()
         else:
-            return sum(1 for _ in folderModel.filterResultsByPermission(
-                cursor=folders, user=filterUser, level=level))
+            return folderModel.countWithPermissions(query, user=filterUser, level=level)
 
     def updateSize(self, doc):
         """
@@ -1,6 +1,16 @@
+import collections
 import cherrypy
+import pymongo
+import threading
+import time
+
+from bson.objectid import ObjectId
 from dogpile.cache import make_region, register_backend
+from dogpile.cache.api import CacheBackend, NO_VALUE
 from dogpile.cache.backends.memory import MemoryBackend
+from dogpile.cache.backends.null import NullBackend
+
+from girder.utility import config
 
 
 class CherrypyRequestBackend(MemoryBackend):
@@ -22,7 +32,68 @@ class CherrypyRequestBackend(MemoryBackend):
         return cherrypy.request._girderCache
 
 
+class LRUMemoryBackend(CacheBackend):
+    """
+    A thread-safe, process-local memory cache bounded in size and entry age.
+
+    Once the cache holds ``max_size`` entries, the least recently used entry
+    is evicted for each new one. If ``ttl`` is given, entries older than that
+    many seconds are treated as missing. The TTL bounds how stale an entry
+    can become if an invalidation from another process is lost.
+    """
+    def __init__(self, arguments):
+        self.maxSize = int(arguments.get('max_size', 10000))
+        self.ttl = arguments.get('ttl')
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return NO_VALUE
+        expires, value = entry
+        if expires is not None and expires < time.time():
+            return NO_VALUE
+        # Reinsert the entry to mark it as the most recently used
+        self._cache[key] = entry
+        return value
+
+    def _set(self, key, value):
+        self._cache.pop(key, None)
+        expires = time.time() + self.ttl if self.ttl else None
+        self._cache[key] = (expires, value)
+        while len(self._cache) > self.maxSize:
+            self._cache.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def get_multi(self, keys):
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def set_multi(self, mapping):
+        with self._lock:
+            for key, value in mapping.items():
+                self._set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def delete_multi(self, keys):
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+
 register_backend('cherrypy_request', 'girder.utility._cache', 'CherrypyRequestBackend')
+register_backend('lru_memory', 'girder.utility._cache', 'LRUMemoryBackend')
 
 # These caches must be configured with the null backend upon creation due to the fact
 # that user-based configuration of the regions doesn't happen until server start, which
@@ -34,3 +105,125 @@ requestCache = make_region(name='girder.request').configure(backend='dogpile.cac
 # It holds data for rate limiting, which is ephemeral, but must be persisted (i.e. it's not optional
 # or best-effort).
 rateLimitBuffer = make_region(name='girder.rate_limit')
+
+
+def pathCacheKey(parentType, parentId, name):
+    """
+    Return the key under which ``girder.utility.path`` caches the resource
+    with a given name within a parent. The users and collections at the root
+    of the hierarchy have no parent ID.
+    """
+    return 'girder.utility.path:%s|%s|%s' % (parentType, parentId, name)
+
+
+def cacheEnabled(region=cache):
+    """
+    Whether a cache region is configured with a backend that stores values.
+    """
+    return not isinstance(region.backend, NullBackend)
+
+
+class CacheInvalidationChannel(object):
+    """
+    Broadcasts invalidated cache keys between Girder processes that share a
+    database.
+
+    Messages are written to a capped collection that every process tails from
+    a background thread, deleting the named keys from its own copy of the
+    cache region. Messages published by this process are skipped, since the
+    keys were already deleted locally. If tailing fails, the whole region is
+    invalidated, as messages may have been missed.
+    """
+    def __init__(self, region, size=1024 * 1024, retryInterval=1.0):
+        self.collectionName = 'cache_invalidation'
+        self.region = region
+        self.size = size
+        self.retryInterval = retryInterval
+        self.sourceId = None
+        self._collection = None
+        self._thread = None
+        self._stopEvent = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """
+        Start listening for invalidations if the cache and the channel are
+        enabled in the configuration. This is a no-op if already running.
+        """
+        from girder.models import getDbConnection
+
+        cacheConfig = config.getConfig().get('cache', {})
+        if (self.running or not cacheConfig.get('enabled') or
+                not cacheConfig.get('invalidation_channel', True)):
+            return
+
+        db = getDbConnection().get_database()
+        if self.collectionName not in db.collection_names():
+            try:
+                db.create_collection(self.collectionName, capped=True, size=self.size)
+            except pymongo.errors.CollectionInvalid:
+                pass  # Another process created it first
+        self._collection = db[self.collectionName]
+        self.sourceId = ObjectId()
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._listen, name='cache-invalidation')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop listening for invalidations and stop publishing them.
+        """
+        if self._thread is not None:
+            self._stopEvent.set()
+            self._thread.join()
+            self._thread = None
+        self._collection = None
+
+    def publish(self, keys):
+        """
+        Notify other processes that the given cache keys are no longer valid.
+        This is a no-op when the channel is not running.
+
+        :param keys: The cache keys to invalidate.
+        :type keys: list of str
+        """
+        collection = self._collection
+        if collection is None or not keys:
+            return
+        try:
+            collection.insert_one({'keys': list(keys), 'source': self.sourceId})
+        except pymongo.errors.PyMongoError:
+            from girder import logger
+            logger.exception('Could not publish cache invalidation.')
+
+    def _receive(self, message):
+        if message.get('source') != self.sourceId:
+            self.region.delete_multi(message['keys'])
+
+    def _listen(self):
+        from girder import logger
+
+        last = next(self._collection.find(
+            {}, {'_id': True}).sort('$natural', -1).limit(1), {}).get('_id')
+        while not self._stopEvent.is_set():
+            try:
+                cursor = self._collection.find(
+                    {'_id': {'$gt': last}} if last is not None else {},
+                    cursor_type=pymongo.CursorType.TAILABLE_AWAIT)
+                while cursor.alive and not self._stopEvent.is_set():
+                    for message in cursor:
+                        last = message['_id']
+                        self._receive(message)
+                        if self._stopEvent.is_set():
+                            break
+            except pymongo.errors.PyMongoError:
+                logger.exception('Cache invalidation channel failed, clearing the cache.')
+                self.region.invalidate()
+            self._stopEvent.wait(self.retryInterval)
+
+
+cacheInvalidationChannel = CacheInvalidationChannel(cache)
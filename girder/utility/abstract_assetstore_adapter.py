@@ -14,7 +14,7 @@
 #  limitations under the License.
 ###############################################################################
 
-import itertools
+import collections
 import os
 import re
 import six
@@ -36,6 +36,13 @@ class FileHandle(object):
     abstract assetstore adapter, and does not leverage any details of the
     assetstore implementations.
 
+    Data is read in blocks of ``blockSize`` bytes, the most recently used
+    ``cacheBlocks`` of which are kept, so that random access to parts of the
+    file that were read recently does not read them again. While reads are
+    sequential, an increasing number of the following blocks is read ahead,
+    up to ``maxReadAhead``. Subclasses for assetstores that can read a range of
+    a file directly should override ``_readRange``.
+
     These file handles are stateful, and therefore not safe for concurrent
     access. If used by multiple threads, mutexes should be used.
 
@@ -43,16 +50,36 @@ class FileHandle(object):
     :type file: dict
     :param adapter: The assetstore adapter corresponding to this file.
     :type adapter: girder.utility.abstract_assetstore_adapter.AbstractAssetstoreAdapter
+    :param blockSize: The size of the blocks that are read and cached.
+    :type blockSize: int
+    :param cacheBlocks: The number of blocks to cache.
+    :type cacheBlocks: int
+    :param maxReadAhead: The most blocks to read ahead of sequential reads.
+    :type maxReadAhead: int
     """
-    def __init__(self, file, adapter):
+    BLOCK_SIZE = 256 * 1024
+    CACHE_BLOCKS = 64
+    MAX_READ_AHEAD = 32
+
+    def __init__(self, file, adapter, blockSize=None, cacheBlocks=None, maxReadAhead=None):
         self._file = file
         self._adapter = adapter
-        self._pos = None
+        self._pos = 0
         # If a read is requested that is longer than the specified size, raise
         # an exception.  This prevents unbounded memory use.
         self._maximumReadSize = 16 * 1024 * 1024
 
-        self.seek(0)
+        self._blockSize = blockSize or self.BLOCK_SIZE
+        self._cacheBlocks = cacheBlocks or self.CACHE_BLOCKS
+        self._maxReadAhead = self.MAX_READ_AHEAD if maxReadAhead is None else maxReadAhead
+        self._blocks = collections.OrderedDict()
+        self._readAhead = 0
+        self._lastEnd = None
+        # A stream of the file that is positioned for the next sequential read
+        self._stream = None
+        self._streamPos = None
+        self._streamEnd = None
+        self._prev = b''
 
     def __enter__(self):
         return self
@@ -76,50 +103,161 @@ class FileHandle(object):
             size = self._file['size'] - self._pos
         if size > self._maximumReadSize:
             raise GirderException('Read exceeds maximum allowed size.')
-        data = six.BytesIO()
-        length = 0
-        for chunk in itertools.chain(self._prev, self._stream):
-            chunkLen = len(chunk)
+        parts = self._read(size)
+        if len(parts) == 1 and isinstance(parts[0], six.binary_type):
+            return parts[0]
+        return b''.join(parts)
 
-            if chunkLen == 0:
-                break
+    def readinto(self, buffer):
+        """
+        Read bytes from the file data into a writable buffer, such as a
+        bytearray, filling as much of it as possible.
 
-            if length + chunkLen <= size:
-                data.write(chunk)
-                self._prev = []
-                length += chunkLen
+        :param buffer: The buffer to fill.
+        :returns: The number of bytes read, which is 0 at the end of the file.
+        :rtype: int
+        """
+        view = memoryview(buffer).cast('B') if six.PY3 else memoryview(buffer)
+        size = min(len(view), self._maximumReadSize)
+        length = 0
+        for part in self._read(size):
+            view[length:length + len(part)] = part
+            length += len(part)
+        return length
 
-                if length == size:
-                    break
-            else:
-                chunkLen = min(size - length, chunkLen)
-                data.write(chunk[:chunkLen])
-                self._prev = [chunk[chunkLen:]]
-                length += chunkLen
-                break
+    def readable(self):
+        return True
 
-        self._pos += length
-        return data.getvalue()
+    def seekable(self):
+        return True
 
     def tell(self):
         return self._pos
 
     def seek(self, offset, whence=os.SEEK_SET):
-        oldPos = self._pos
-
         if whence == os.SEEK_SET:
             self._pos = offset
         elif whence == os.SEEK_CUR:
             self._pos += offset
         elif whence == os.SEEK_END:
             self._pos = max(self._file['size'] + offset, 0)
-
-        if self._pos != oldPos:
-            self._prev = []
-            self._stream = self._adapter.downloadFile(self._file, offset=self._pos, headers=False)()
+        return self._pos
 
     def close(self):
-        pass
+        self._blocks.clear()
+        self._stream = None
+        self._prev = b''
+
+    def _read(self, size):
+        """
+        Read up to *size* bytes from the current position, returning them as a
+        list of bytes or memoryviews of cached blocks.
+        """
+        end = min(self._pos + size, self._file['size'])
+        if end <= self._pos:
+            return []
+
+        if self._pos == self._lastEnd:
+            self._readAhead = min(max(self._readAhead * 2, 1), self._maxReadAhead)
+        else:
+            self._readAhead = 0
+        first = self._pos // self._blockSize
+        last = (end - 1) // self._blockSize
+        blocks = self._loadBlocks(first, last)
+
+        parts = []
+        pos = self._pos
+        for index in six.moves.range(first, last + 1):
+            block = blocks[index]
+            start = pos - index * self._blockSize
+            stop = min(end - index * self._blockSize, len(block))
+            if stop <= start:
+                break
+            if start == 0 and stop == len(block):
+                parts.append(block)
+            elif six.PY3:
+                parts.append(memoryview(block)[start:stop])
+            else:
+                parts.append(block[start:stop])
+            pos += stop - start
+        self._pos = self._lastEnd = pos
+        return parts
+
+    def _loadBlocks(self, first, last):
+        """
+        Get blocks *first* through *last* from the cache. If any of them are
+        missing, they are read along with the blocks to read ahead that are
+        not cached, in as few ranges as possible.
+
+        :returns: A dict of the requested blocks by their index.
+        """
+        blocks = {}
+        for index in six.moves.range(first, last + 1):
+            if index in self._blocks:
+                # Mark the block as the most recently used
+                blocks[index] = self._blocks[index] = self._blocks.pop(index)
+        if len(blocks) == last - first + 1:
+            return blocks
+
+        lastBlock = (self._file['size'] - 1) // self._blockSize
+        missing = [index for index in six.moves.range(
+            first, min(last + self._readAhead, lastBlock) + 1) if index not in self._blocks]
+        while missing:
+            count = 1
+            while count < len(missing) and missing[count] == missing[0] + count:
+                count += 1
+            start = missing[0] * self._blockSize
+            data = self._readRange(
+                start, min(count * self._blockSize, self._file['size'] - start))
+            for offset in six.moves.range(0, len(data), self._blockSize):
+                index = missing[0] + offset // self._blockSize
+                self._blocks[index] = data[offset:offset + self._blockSize]
+                if index <= last:
+                    blocks[index] = self._blocks[index]
+            missing = missing[count:]
+
+        while len(self._blocks) > self._cacheBlocks:
+            self._blocks.popitem(last=False)
+        for index in six.moves.range(first, last + 1):
+            # The file is shorter than its size says
+            blocks.setdefault(index, b'')
+        return blocks
+
+    def _readRange(self, offset, length):
+        """
+        Read *length* bytes of the file starting at *offset*. This reads from
+        the assetstore's download stream, which is kept open for the next
+        sequential read. Random reads request just the range that is needed.
+
+        :param offset: The start byte of the range.
+        :type offset: int
+        :param length: The number of bytes to read.
+        :type length: int
+        :rtype: bytes
+        """
+        if self._stream is None or self._streamPos != offset:
+            # While reads are sequential, the stream continues past the range
+            self._streamEnd = None if self._readAhead else offset + length
+            self._stream = iter(self._adapter.downloadFile(
+                self._file, offset=offset, headers=False, endByte=self._streamEnd)())
+            self._streamPos = offset
+            self._prev = b''
+
+        data = [self._prev]
+        size = len(self._prev)
+        for chunk in self._stream:
+            if isinstance(chunk, six.text_type):
+                chunk = chunk.encode('utf8')
+            data.append(chunk)
+            size += len(chunk)
+            if size >= length:
+                break
+        data = b''.join(data)
+        self._prev = data[length:]
+        self._streamPos = offset + min(size, length)
+        if size < length or self._streamPos == self._streamEnd:
+            self._stream = None
+        return data[:length]
 
 
 class AbstractAssetstoreAdapter(ModelImporter):
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import collections
+import datetime
+import six
+import threading
+
+from bson.objectid import ObjectId
+from concurrent import futures
+from pymongo import UpdateOne
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.item import Item
+
+
+class BulkImport(object):
+    """
+    Imports a tree of existing data from an assetstore's underlying storage,
+    one directory at a time. Subclasses implement :py:meth:`importDirectory`,
+    which lists a directory, passes its files to :py:meth:`importFiles`, and
+    passes its subdirectories to :py:meth:`submit`.
+
+    Directories are imported on a pool of ``jobs`` threads, or one after
+    another in the calling thread if ``jobs`` is 1. Items and files are
+    written with bulk operations, so the per-document model save events are
+    not triggered for them. Files that were already imported with the same
+    size and fields are skipped, which makes importing again incremental.
+
+    :param adapter: The assetstore adapter to import into.
+    :param params: The import request parameters.
+    :type params: dict
+    :param progress: The progress context to report counts to.
+    :param user: The user to list as the creator of the new resources.
+    :type user: dict
+    :param jobs: The number of directories to import at once.
+    :type jobs: int
+    """
+
+    BATCH_SIZE = 1000  # Number of files to query and write at once
+
+    def __init__(self, adapter, params, progress, user, jobs=1):
+        self.adapter = adapter
+        self.params = params
+        self.progress = progress
+        self.user = user
+        self.jobs = jobs
+        self.failed = False
+        self.imported = 0
+        self.skipped = 0
+        self._pending = collections.deque()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def run(self, *args):
+        """
+        Import a directory and everything underneath it, returning once the
+        whole tree is done. The arguments are passed to
+        :py:meth:`importDirectory`.
+        """
+        if self.jobs > 1:
+            self._executor = futures.ThreadPoolExecutor(self.jobs)
+        try:
+            self.submit(*args)
+            # Directories queue their subdirectories before finishing, so
+            # this waits for the whole tree.
+            while self._pending:
+                if self._executor is None:
+                    self._importDirectory(*self._pending.popleft())
+                    self._updateProgress()
+                    continue
+                try:
+                    self._pending[0].result(timeout=1)
+                except futures.TimeoutError:
+                    self._updateProgress()
+                    continue
+                except Exception:
+                    self.failed = True
+                    raise
+                self._pending.popleft()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+        self._updateProgress()
+
+    def submit(self, *args):
+        """
+        Queue a directory to be imported with :py:meth:`importDirectory`.
+        """
+        if self._executor is None:
+            self._pending.append(args)
+        else:
+            self._pending.append(self._executor.submit(self._importDirectory, *args))
+
+    def importDirectory(self, *args):
+        """
+        Import one directory. This must be overridden. It is called, on a
+        worker thread if ``jobs`` is more than 1, with the arguments given to
+        :py:meth:`submit`, and should create the folder for the directory if
+        needed, pass the files directly in it to :py:meth:`importFiles`, and
+        call :py:meth:`submit` for each subdirectory rather than importing it
+        directly. Exceptions it raises stop the import and are raised from
+        :py:meth:`run`.
+        """
+        raise NotImplementedError('Must override importDirectory in %s.' %
+                                  self.__class__.__name__)
+
+    def _importDirectory(self, *args):
+        if not self.failed:
+            self.importDirectory(*args)
+
+    def _updateProgress(self):
+        if self.progress:
+            self.progress.update(message='Imported %d files, %d unchanged' % (
+                self.imported, self.skipped))
+
+    def importFiles(self, folder, files):
+        """
+        Create or update the items and files for some of the files directly
+        in a folder, with a few bulk queries and writes per batch.
+
+        :param folder: The folder containing the items.
+        :type folder: dict
+        :param files: The files to import, as ``(itemName, fileName, size,
+            fields)`` tuples, where ``fields`` is a dict of adapter-specific
+            fields to set on the file document. Files with the same item name
+            are put in the same item.
+        :type files: list
+        :returns: ``(itemName, item)`` pairs for the items that were created
+            or had files added or changed. The item may have been given a
+            different name than requested to keep it unique.
+        """
+        if 'baseParentType' not in folder:
+            root = Item().parentsToRoot({'folderId': folder['_id']}, self.user, force=True)[0]
+            folder['baseParentType'] = root['type']
+            folder['baseParentId'] = root['object']['_id']
+        changed = []
+        for start in six.moves.range(0, len(files), self.BATCH_SIZE):
+            changed.extend(self._importBatch(folder, files[start:start + self.BATCH_SIZE]))
+        return changed
+
+    def _importBatch(self, folder, files):
+        itemModel = Item()
+        fileModel = File()
+        names = [itemModel._validateString(file[0]) for file in files]
+        items = {item['name']: item for item in itemModel.find({
+            'folderId': folder['_id'],
+            'name': {'$in': names}
+        }, fields=('_id', 'name', 'folderId', 'baseParentType', 'baseParentId'))}
+        fieldNames = {name for file in files for name in file[3]}
+        existing = {(file['itemId'], file['name']): file for file in fileModel.find({
+            'itemId': {'$in': [item['_id'] for item in six.viewvalues(items)]}
+        }, fields=('_id', 'itemId', 'name', 'size') + tuple(fieldNames))}
+        folderNames = {doc['name'] for doc in Folder().find({
+            'parentId': folder['_id'],
+            'parentCollection': 'folder',
+            'name': {'$in': names}
+        }, fields=('name',))}
+
+        now = datetime.datetime.utcnow()
+        newItems, newFiles, itemUpdates, fileUpdates = [], [], [], []
+        newItemIds = set()
+        changed = collections.OrderedDict()
+        total = imported = skipped = 0
+        for (itemName, fileName, size, fields), name in zip(files, names):
+            item = items.get(name)
+            if item is None and (not name or name in folderNames):
+                # Let the item model reject or rename the item as usual
+                item = items[name] = itemModel.createItem(
+                    name=name, creator=self.user, folder=folder)
+            elif item is None:
+                item = items[name] = self._itemDocument(folder, name, now)
+                newItems.append(item)
+                newItemIds.add(item['_id'])
+            file = existing.get((item['_id'], fileName))
+
+            if file is None:
+                file = fileModel.createFile(
+                    name=fileName, creator=self.user, item=item, assetstore=self.adapter.assetstore,
+                    mimeType=None, size=size, saveFile=False)
+                file['_id'] = ObjectId()
+                file.update(fields)
+                newFiles.append(fileModel.validate(file))
+                delta = size
+            elif file['size'] == size and all(
+                    file.get(key) == value for key, value in six.viewitems(fields)):
+                skipped += 1
+                continue
+            else:
+                fileUpdates.append(UpdateOne({'_id': file['_id']}, {
+                    '$set': dict(fields, size=size, updated=now)}))
+                delta = size - file['size']
+
+            if item['_id'] in newItemIds:
+                item['size'] += delta
+            elif delta:
+                itemUpdates.append(UpdateOne({'_id': item['_id']}, {'$inc': {'size': delta}}))
+            changed[item['_id']] = (itemName, item)
+            total += delta
+            imported += 1
+
+        if newItems:
+            itemModel.collection.insert_many(newItems)
+            itemModel._invalidateCache(newItems)
+        if newFiles:
+            fileModel.collection.insert_many(newFiles)
+            fileModel._invalidateCache(newFiles)
+        if fileUpdates:
+            fileModel.collection.bulk_write(fileUpdates)
+        if itemUpdates:
+            itemModel.collection.bulk_write(itemUpdates)
+        if total:
+            itemModel.propagateSizeChange({
+                'folderId': folder['_id'],
+                'baseParentType': folder['baseParentType'],
+                'baseParentId': folder['baseParentId']
+            }, total)
+        with self._lock:
+            self.imported += imported
+            self.skipped += skipped
+        return list(six.viewvalues(changed))
+
+    def _itemDocument(self, folder, name, now):
+        return {
+            '_id': ObjectId(),
+            'name': name,
+            'lowerName': name.lower(),
+            'description': '',
+            'folderId': folder['_id'],
+            'ancestors': Folder()._childAncestors(folder),
+            'creatorId': self.user['_id'],
+            'baseParentType': folder['baseParentType'],
+            'baseParentId': folder['baseParentId'],
+            'created': now,
+            'updated': now,
+            'size': 0
+        }
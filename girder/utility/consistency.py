@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+"""
+Bulk consistency checks of the data hierarchy. Rather than loading each
+document and walking its parents, every check streams a ``$group`` aggregation
+of child documents keyed by their parent ID alongside the parent collection,
+both sorted by ``_id``, and compares them in a single merge pass. Corrections
+are written with ``bulk_write``.
+"""
+
+import collections
+import six
+
+from bson.objectid import ObjectId
+from pymongo import DeleteOne, UpdateOne
+
+from girder.constants import AssetstoreType
+from girder.models.assetstore import Assetstore
+from girder.models.collection import Collection
+from girder.models.file import File
+from girder.models.file_content import FileContent
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.user import User
+from girder.utility.model_importer import ModelImporter
+from girder.utility.progress import noProgress
+
+# The number of corrections to accumulate before writing them to the database
+BULK_BATCH_SIZE = 1000
+# The maximum number of individual differences returned by a dry run
+MAX_REPORTED_DIFFS = 1000
+
+
+class ConsistencyReport(object):
+    """
+    Collects the differences found by the consistency checks.
+
+    :param dryRun: If True, differences are only recorded, not corrected.
+    :type dryRun: bool
+    """
+
+    def __init__(self, dryRun=False):
+        self.dryRun = dryRun
+        self.diffs = []
+
+    def add(self, model, id, field, old, new):
+        if len(self.diffs) < MAX_REPORTED_DIFFS:
+            self.diffs.append({
+                'model': model.name,
+                '_id': id,
+                'field': field,
+                'old': old,
+                'new': new
+            })
+
+
+class _BulkUpdater(object):
+    """
+    Accumulates ``$set`` corrections for a model and writes them in batches.
+    """
+
+    def __init__(self, model, report):
+        self.model = model
+        self.report = report
+        self.operations = []
+        self.documents = []
+        self.count = 0
+
+    def set(self, doc, values):
+        """
+        Correct the fields of a document that differ from the given values.
+        """
+        changed = {k: v for k, v in six.viewitems(values) if doc.get(k) != v}
+        if not changed:
+            return
+        self.count += 1
+        for field, value in six.viewitems(changed):
+            self.report.add(self.model, doc['_id'], field, doc.get(field), value)
+        if self.report.dryRun:
+            return
+        self.operations.append(UpdateOne({'_id': doc['_id']}, {'$set': changed}))
+        self.documents.append(doc)
+        if len(self.operations) >= BULK_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.operations:
+            self.model.collection.bulk_write(self.operations)
+            self.model._invalidateCache(self.documents)
+            self.operations = []
+            self.documents = []
+
+
+def _groupByParent(model, field, match=None, sumField=None):
+    """
+    Aggregate the documents of a model by a parent ID field, sorted by that
+    ID. Each result has the parent ID as ``_id`` and, if ``sumField`` is
+    given, the sum of that field as ``total``.
+    """
+    group = {'_id': '$' + field}
+    if sumField:
+        group['total'] = {'$sum': '$' + sumField}
+    pipeline = [{'$group': group}, {'$sort': {'_id': 1}}]
+    if match:
+        pipeline.insert(0, {'$match': match})
+    return model.collection.aggregate(pipeline, allowDiskUse=True)
+
+
+def _mergeJoin(docs, groups):
+    """
+    Pair up documents and aggregation groups, both sorted by ``_id``. Yields
+    ``(doc, group)`` tuples where either member may be None if there is no
+    match on the other side. Groups whose key is not an ObjectId can never
+    match a document and are yielded without a document.
+    """
+    groups = iter(groups)
+    group = next(groups, None)
+    for doc in docs:
+        while group is not None and (
+                not isinstance(group['_id'], ObjectId) or group['_id'] < doc['_id']):
+            yield None, group
+            group = next(groups, None)
+        if group is not None and group['_id'] == doc['_id']:
+            yield doc, group
+            group = next(groups, None)
+        else:
+            yield doc, None
+    while group is not None:
+        yield None, group
+        group = next(groups, None)
+
+
+def _sortedDocs(model, fields=('_id',), query=None, progress=noProgress, sort=(('_id', 1),)):
+    progress.update(total=model.find(query, fields=()).count(), current=0)
+    for doc in model.find(query, fields=list(fields), sort=list(sort)):
+        progress.update(increment=1)
+        yield doc
+
+
+def _missingParents(parentModel, childModel, field, match=None, progress=noProgress):
+    """
+    Return the IDs referenced by a field of a child model that do not exist in
+    the parent model.
+    """
+    docs = _sortedDocs(parentModel, progress=progress)
+    return [group['_id'] for doc, group in _mergeJoin(
+        docs, _groupByParent(childModel, field, match)) if doc is None]
+
+
+def _removeChildren(model, field, parentIds, match, report):
+    """
+    Remove the documents of a model that reference any of the given parent
+    IDs. Each document is removed through its model so that its own children
+    and any assetstore data are removed too.
+    """
+    count = 0
+    for start in six.moves.range(0, len(parentIds), BULK_BATCH_SIZE):
+        query = dict(match or {})
+        query[field] = {'$in': parentIds[start:start + BULK_BATCH_SIZE]}
+        for doc in model.find(query):
+            if report.dryRun:
+                count += 1
+                report.add(model, doc['_id'], field, doc.get(field), None)
+            elif model.findOne({'_id': doc['_id']}, fields=()):
+                # Skip documents that were removed along with an earlier one
+                count += 1
+                report.add(model, doc['_id'], field, doc.get(field), None)
+                model.remove(doc)
+    return count
+
+
+def _attachedFileModels():
+    """
+    Yield ``(attachedToType, model)`` pairs for the types that files are
+    attached to. The model is None if the type cannot be resolved.
+    """
+    for group in File().collection.aggregate([
+            {'$match': {'attachedToId': {'$nin': [None, '']}}},
+            {'$group': {'_id': '$attachedToType'}}]):
+        attachedToType = group['_id']
+        try:
+            if isinstance(attachedToType, six.string_types):
+                model = ModelImporter.model(attachedToType)
+            elif isinstance(attachedToType, list) and len(attachedToType) == 2:
+                model = ModelImporter.model(*attachedToType)
+            else:
+                model = None
+        except Exception:
+            model = None
+        yield attachedToType, model
+
+
+def pruneOrphans(progress=noProgress, report=None):
+    """
+    Remove folders whose parent, items whose folder, and files whose item or
+    attached document no longer exists.
+
+    :param progress: Progress context to update.
+    :type progress: :py:class:`girder.utility.progress.ProgressContext`
+    :param report: Report to record differences in. In a dry run, documents
+        underneath an orphaned folder are not reported, since the folder is
+        not actually removed.
+    :type report: ConsistencyReport
+    :returns: The number of orphaned documents.
+    """
+    report = report or ConsistencyReport()
+    fileModel = File()
+    folderModel = Folder()
+    itemModel = Item()
+    count = 0
+
+    for parentType in ('collection', 'user', 'folder'):
+        match = {'parentCollection': parentType}
+        missing = _missingParents(
+            ModelImporter.model(parentType), folderModel, 'parentId', match, progress)
+        count += _removeChildren(folderModel, 'parentId', missing, match, report)
+
+    missing = _missingParents(folderModel, itemModel, 'folderId', progress=progress)
+    count += _removeChildren(itemModel, 'folderId', missing, None, report)
+
+    match = {'attachedToId': {'$in': [None, '']}}
+    missing = _missingParents(itemModel, fileModel, 'itemId', match, progress)
+    count += _removeChildren(fileModel, 'itemId', missing, match, report)
+
+    for attachedToType, model in _attachedFileModels():
+        match = {'attachedToId': {'$nin': [None, '']}, 'attachedToType': attachedToType}
+        if model is None:
+            missing = [group['_id'] for group in _groupByParent(
+                fileModel, 'attachedToId', match)]
+        else:
+            missing = _missingParents(model, fileModel, 'attachedToId', match, progress)
+        count += _removeChildren(fileModel, 'attachedToId', missing, match, report)
+
+    return count
+
+
+def fixBaseParents(progress=noProgress, report=None):
+    """
+    Correct the ``baseParentType`` and ``baseParentId`` of all folders and
+    items. This relies on the ``ancestors`` field being correct, since the
+    base parent of a document is the parent of its first ancestor.
+
+    :param progress: Progress context to update.
+    :type progress: :py:class:`girder.utility.progress.ProgressContext`
+    :param report: Report to record differences in.
+    :type report: ConsistencyReport
+    :returns: The number of documents corrected.
+    """
+    report = report or ConsistencyReport()
+    folderModel = Folder()
+    updaters = [_BulkUpdater(folderModel, report), _BulkUpdater(Item(), report)]
+
+    rootQuery = {'parentCollection': {'$in': ['user', 'collection']}}
+    for root in _sortedDocs(folderModel, ('parentId', 'parentCollection'), rootQuery, progress):
+        baseParent = {'baseParentType': root['parentCollection'], 'baseParentId': root['parentId']}
+        mismatch = {'$or': [{k: {'$ne': v}} for k, v in six.viewitems(baseParent)]}
+        for updater, subtree in (
+                (updaters[0], {'$or': [{'_id': root['_id']}, {'ancestors': root['_id']}]}),
+                (updaters[1], {'ancestors.0': root['_id']})):
+            for doc in updater.model.find(
+                    {'$and': [subtree, mismatch]}, fields=list(baseParent)):
+                updater.set(doc, baseParent)
+
+    for updater in updaters:
+        updater.flush()
+    return sum(updater.count for updater in updaters)
+
+
+def _fixSizes(updater, docs, groups, deltas):
+    """
+    Compare the recorded size of each document with the total of its
+    children, correcting it where they differ.
+
+    :param deltas: Maps document IDs to an amount to add to their children's
+        total, which accounts for corrections to the children that were not
+        written in a dry run.
+    :returns: A dict mapping the IDs of corrected documents to the change in
+        their size.
+    """
+    changes = {}
+    for doc, group in _mergeJoin(docs, groups):
+        if doc is None:
+            continue
+        size = (group['total'] if group else 0) + deltas.get(doc['_id'], 0)
+        if size != doc.get('size'):
+            changes[doc['_id']] = size - (doc.get('size') or 0)
+            updater.set(doc, {'size': size})
+    updater.flush()
+    return changes
+
+
+def recalculateSizes(progress=noProgress, report=None):
+    """
+    Recompute the size of every item from its files, every folder from its
+    direct child items, and every user and collection from all of the items
+    underneath it.
+
+    :param progress: Progress context to update.
+    :type progress: :py:class:`girder.utility.progress.ProgressContext`
+    :param report: Report to record differences in.
+    :type report: ConsistencyReport
+    :returns: The number of sizes corrected.
+    """
+    report = report or ConsistencyReport()
+    itemModel = Item()
+    count = 0
+
+    itemUpdater = _BulkUpdater(itemModel, report)
+    itemChanges = _fixSizes(itemUpdater, _sortedDocs(itemModel, ('size',), progress=progress),
+                            _groupByParent(File(), 'itemId', sumField='size'), {})
+    count += itemUpdater.count
+
+    # In a dry run the item sizes are not corrected, so carry the corrections
+    # forward to their folders and base parents.
+    folderDeltas = collections.defaultdict(int)
+    rootDeltas = collections.defaultdict(int)
+    if report.dryRun and itemChanges:
+        for item in itemModel.find({'_id': {'$in': list(itemChanges)}},
+                                   fields=['folderId', 'baseParentId']):
+            folderDeltas[item['folderId']] += itemChanges[item['_id']]
+            rootDeltas[item['baseParentId']] += itemChanges[item['_id']]
+
+    folderModel = Folder()
+    folderUpdater = _BulkUpdater(folderModel, report)
+    _fixSizes(folderUpdater, _sortedDocs(folderModel, ('size',), progress=progress),
+              _groupByParent(itemModel, 'folderId', sumField='size'), folderDeltas)
+    count += folderUpdater.count
+
+    for model in (Collection(), User()):
+        updater = _BulkUpdater(model, report)
+        _fixSizes(updater, _sortedDocs(model, ('size',), progress=progress), _groupByParent(
+            itemModel, 'baseParentId', {'baseParentType': model.name}, 'size'), rootDeltas)
+        count += updater.count
+
+    return count
+
+
+def _contentKey(doc):
+    return doc['assetstoreId'], doc['sha512']
+
+
+def fixContentReferences(progress=noProgress, report=None):
+    """
+    Rebuild the reference counts of the content stored in filesystem
+    assetstores from the files that refer to it. Counts for content that no
+    file refers to are removed; the content itself is left on disk.
+
+    :param progress: Progress context to update.
+    :type progress: :py:class:`girder.utility.progress.ProgressContext`
+    :param report: Report to record differences in.
+    :type report: ConsistencyReport
+    :returns: The number of reference counts corrected.
+    """
+    report = report or ConsistencyReport()
+    contentModel = FileContent()
+    assetstoreIds = [assetstore['_id'] for assetstore in Assetstore().find(
+        {'type': AssetstoreType.FILESYSTEM}, fields=())]
+    groups = (dict(group['_id'], refCount=group['refCount']) for group in
+              File().collection.aggregate([
+                  {'$match': {
+                      'assetstoreId': {'$in': assetstoreIds},
+                      'sha512': {'$exists': True},
+                      'path': {'$exists': True},
+                      'imported': {'$ne': True}
+                  }},
+                  {'$group': {
+                      '_id': {'assetstoreId': '$assetstoreId', 'sha512': '$sha512'},
+                      'refCount': {'$sum': 1}
+                  }},
+                  {'$sort': {'_id.assetstoreId': 1, '_id.sha512': 1}}
+              ], allowDiskUse=True))
+    docs = _sortedDocs(contentModel, ('assetstoreId', 'sha512', 'refCount'), progress=progress,
+                       sort=(('assetstoreId', 1), ('sha512', 1)))
+
+    count = 0
+    operations = []
+    doc, group = next(docs, None), next(groups, None)
+    while doc is not None or group is not None:
+        if group is None or (doc is not None and _contentKey(doc) < _contentKey(group)):
+            key, old, new, doc = _contentKey(doc), doc['refCount'], None, next(docs, None)
+        elif doc is None or _contentKey(group) < _contentKey(doc):
+            key, old, new, group = _contentKey(group), None, group['refCount'], next(groups, None)
+        else:
+            key, old, new = _contentKey(doc), doc['refCount'], group['refCount']
+            doc, group = next(docs, None), next(groups, None)
+        if old == new:
+            continue
+        count += 1
+        report.add(contentModel, key[1], 'refCount', old, new)
+        if report.dryRun:
+            continue
+        query = {'assetstoreId': key[0], 'sha512': key[1]}
+        if new is None:
+            operations.append(DeleteOne(query))
+        else:
+            operations.append(UpdateOne(query, {'$set': {'refCount': new}}, upsert=True))
+        if len(operations) >= BULK_BATCH_SIZE:
+            contentModel.collection.bulk_write(operations)
+            operations = []
+    if operations:
+        contentModel.collection.bulk_write(operations)
+    return count
+
+
+def checkConsistency(progress=noProgress, dryRun=False):
+    """
+    Run all of the consistency checks in order, recording progress on each.
+
+    :param progress: Progress context to update.
+    :type progress: :py:class:`girder.utility.progress.ProgressContext`
+    :param dryRun: If True, only report the inconsistencies that were found
+        without correcting them.
+    :type dryRun: bool
+    :returns: A dict of the number of corrections made by each check. In a
+        dry run, this also includes a list of the individual differences
+        found, up to ``MAX_REPORTED_DIFFS``.
+    """
+    report = ConsistencyReport(dryRun)
+    results = {}
+    progress.update(title='Checking for orphaned records (Step 1 of 5)')
+    results['orphansRemoved'] = pruneOrphans(progress, report)
+    progress.update(title='Checking for incorrect ancestors (Step 2 of 5)')
+    results['ancestorsFixed'] = Folder().rebuildAncestors(progress, dryRun=dryRun)
+    progress.update(title='Checking for incorrect base parents (Step 3 of 5)')
+    results['baseParentsFixed'] = fixBaseParents(progress, report)
+    progress.update(title='Checking for incorrect sizes (Step 4 of 5)')
+    results['sizesChanged'] = recalculateSizes(progress, report)
+    progress.update(title='Checking for incorrect content reference counts (Step 5 of 5)')
+    results['contentReferencesFixed'] = fixContentReferences(progress, report)
+    if dryRun:
+        results['diffs'] = report.diffs
+    return results
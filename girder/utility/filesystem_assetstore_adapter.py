@@ -17,6 +17,8 @@
 #  limitations under the License.
 ###############################################################################
 
+import cherrypy
+import contextlib
 import filelock
 from hashlib import sha512
 import os
@@ -28,17 +30,29 @@ import stat
 import tempfile
 
 from girder import events, logger
-from girder.api.rest import setResponseHeader
+from girder.api.rest import setContentDisposition, setResponseHeader
 from girder.exceptions import ValidationException, GirderException
 from girder.models.file import File
+from girder.models.file_content import FileContent
 from girder.models.folder import Folder
 from girder.models.item import Item
-from girder.models.upload import Upload
-from girder.utility import mkdir, progress
+from girder.utility import config, mkdir, progress
 from . import hash_state
-from .abstract_assetstore_adapter import AbstractAssetstoreAdapter
+from .abstract_assetstore_adapter import AbstractAssetstoreAdapter, FileHandle
+from .bulk_import import BulkImport
+
+try:
+    from os import scandir
+except ImportError:  # pragma: no cover
+    from scandir import scandir
 
 BUF_SIZE = 65536
+# Default size of the reads made when sending files from Girder
+DOWNLOAD_BUF_SIZE = 1024 * 1024
+
+# Ways to hand the sending of files to the web server in front of Girder
+SENDFILE_X_SENDFILE = 'x-sendfile'
+SENDFILE_X_ACCEL_REDIRECT = 'x-accel-redirect'
 
 # Default permissions for the files written to the filesystem
 DEFAULT_PERMS = stat.S_IRUSR | stat.S_IWUSR
@@ -54,6 +68,8 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
     :type assetstore: dict
     """
 
+    IMPORT_JOBS = 1  # Number of directories to list and import at once
+
     @staticmethod
     def validateInfo(doc):
         """
@@ -220,18 +236,13 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
         path = os.path.join(dir, hash)
         abspath = os.path.join(self.assetstore['root'], path)
 
-        # Store the hash in the upload so that deleting a file won't delete
-        # this file
-        if '_id' in upload:
-            upload['sha512'] = hash
-            Upload().update({'_id': upload['_id']}, update={'$set': {'sha512': hash}})
-
         mkdir(absdir)
 
-        # Only maintain the lock which checking if the file exists.  The only
-        # other place the lock is used is checking if an upload task has
-        # reserved the file, so this is sufficient.
+        # Only maintain the lock while counting the reference and checking if
+        # the file exists.  Once counted, the file will not be deleted until
+        # the reference is removed, so this is sufficient.
         with filelock.FileLock(abspath + '.deleteLock'):
+            FileContent().addReference(self.assetstore, hash, file.get('_id'))
             pathExists = os.path.exists(abspath)
         if pathExists:
             # Already have this file stored, just delete temp file.
@@ -280,16 +291,30 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
 
         if headers:
             setResponseHeader('Accept-Ranges', 'bytes')
+            sendfile = self._sendfileHeader(file, path, offset, endByte)
+            if sendfile is not None:
+                # The web server sends the file and applies any Range header,
+                # so only the headers describing the file are set here.
+                setResponseHeader(
+                    'Content-Type', file.get('mimeType') or 'application/octet-stream')
+                setContentDisposition(file['name'], contentDisposition or 'attachment')
+                setResponseHeader(*sendfile)
+                return lambda: iter(())
             self.setContentHeaders(file, offset, endByte, contentDisposition)
 
+        bufSize = config.getConfig().get('downloads', {}).get('buffer_size', DOWNLOAD_BUF_SIZE)
+
         def stream():
             bytesRead = offset
             with open(path, 'rb') as f:
+                if hasattr(os, 'posix_fadvise') and endByte - offset > bufSize:
+                    os.posix_fadvise(f.fileno(), offset, endByte - offset,
+                                     os.POSIX_FADV_SEQUENTIAL)
                 if offset > 0:
                     f.seek(offset)
 
                 while True:
-                    readLen = min(BUF_SIZE, endByte - bytesRead)
+                    readLen = min(bufSize, endByte - bytesRead)
                     if readLen <= 0:
                         break
 
@@ -302,30 +327,80 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
 
         return stream
 
-    def deleteFile(self, file):
+    def _sendfileHeader(self, file, path, offset, endByte):
+        """
+        If the ``sendfile`` option of the ``downloads`` config section is set,
+        return the header that has the web server in front of Girder send a
+        file, as a ``(name, value)`` pair. Otherwise, or if the web server would
+        not send the requested bytes, return None so Girder sends the file.
+
+        The web server applies the request's Range header itself, so requests
+        for a range given only by the ``offset`` and ``endByte`` parameters are
+        sent by Girder.
+        """
+        conf = config.getConfig().get('downloads', {})
+        mode = (conf.get('sendfile') or '').lower()
+        if mode not in (SENDFILE_X_SENDFILE, SENDFILE_X_ACCEL_REDIRECT):
+            return None
+
+        rangeHeader = cherrypy.request.headers.get('Range')
+        ranges = cherrypy.lib.httputil.get_ranges(rangeHeader, file['size']) if rangeHeader \
+            else None
+        if ranges is not None and len(ranges) != 1:
+            return None
+        if (offset, endByte) != (tuple(ranges[0]) if ranges else (0, file['size'])):
+            return None
+
+        if mode == SENDFILE_X_SENDFILE:
+            return 'X-Sendfile', path
+        # nginx needs the URI of an internal location that serves the directory
+        for root, location in six.iteritems(conf.get('sendfile_paths') or {}):
+            root = os.path.join(os.path.abspath(root), '')
+            if path.startswith(root):
+                uri = location.rstrip('/') + '/' + path[len(root):].replace(os.sep, '/')
+                return 'X-Accel-Redirect', six.moves.urllib.parse.quote(uri)
+        return None
+
+    @contextlib.contextmanager
+    def _lockContent(self, file):
         """
-        Deletes the file from disk if it is the only File in this assetstore
-        with the given sha512. Imported files are not actually deleted.
+        Hold the lock that serializes changes to the reference count of a
+        file's content with its deletion, if the content exists.
         """
-        from girder.models.file import File
+        path = os.path.join(self.assetstore['root'], file['path'])
+        if os.path.isfile(path):
+            with filelock.FileLock(path + '.deleteLock'):
+                yield path
+        else:
+            yield None
 
+    def deleteFile(self, file):
+        """
+        Removes the file's reference to its content, and deletes the content
+        from disk if no other File in this assetstore refers to it. Imported
+        files are not actually deleted.
+        """
         if file.get('imported') or 'path' not in file:
             return
 
-        q = {
-            'sha512': file['sha512'],
-            'assetstoreId': self.assetstore['_id']
-        }
-        path = os.path.join(self.assetstore['root'], file['path'])
-        if os.path.isfile(path):
-            with filelock.FileLock(path + '.deleteLock'):
-                matching = File().find(q, limit=2, fields=[])
-                matchingUpload = Upload().findOne(q)
-                if matching.count(True) == 1 and matchingUpload is None:
-                    try:
-                        os.unlink(path)
-                    except Exception:
-                        logger.exception('Failed to delete file %s' % path)
+        with self._lockContent(file) as path:
+            refCount = FileContent().removeReference(
+                self.assetstore, file['sha512'], file.get('_id'))
+            if path and not refCount:
+                try:
+                    os.unlink(path)
+                except Exception:
+                    logger.exception('Failed to delete file %s' % path)
+
+    def copyFile(self, srcFile, destFile):
+        """
+        Copies share the content of the original file, so this only counts
+        the new reference to it.
+        """
+        if not srcFile.get('imported') and 'path' in srcFile:
+            with self._lockContent(srcFile):
+                FileContent().addReference(self.assetstore, srcFile['sha512'])
+        return destFile
 
     def cancelUpload(self, upload):
         """
@@ -366,21 +441,6 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
                      path, item['_id'], self.assetstore['_id'])
         return file
 
-    def _importDataAsItem(self, name, user, folder, path, files, reuseExisting=True, params=None):
-        params = params or {}
-        item = Item().createItem(
-            name=name, creator=user, folder=folder, reuseExisting=reuseExisting)
-        events.trigger('filesystem_assetstore_imported',
-                       {'id': item['_id'], 'type': 'item',
-                        'importPath': path})
-        for fname in files:
-            fpath = os.path.join(path, fname)
-            if self.shouldImportFile(fpath, params):
-                self.importFile(item, fpath, user, name=fname)
-
-    def _hasOnlyFiles(self, path, files):
-        return all(os.path.isfile(os.path.join(path, name)) for name in files)
-
     def _importFileToFolder(self, name, user, parent, parentType, path):
         if parentType != 'folder':
             raise ValidationException(
@@ -395,6 +455,18 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
         self.importFile(item, path, user, name=name)
 
     def importData(self, parent, parentType, params, progress, user, leafFoldersAsItems):
+        """
+        Import a directory tree. Each directory becomes a folder (or an item,
+        if ``leafFoldersAsItems`` is set and it only contains files) and each
+        file an item containing a single file. Directories are listed with
+        ``scandir`` on a pool of ``jobs`` threads (``IMPORT_JOBS`` by
+        default), and their items and files are written in bulk, so the
+        per-document model save events are not triggered for them. Files that
+        were already imported with the same path, size and modification time
+        are skipped, so importing again only writes what changed, and the
+        ``filesystem_assetstore_imported`` event is only triggered for the
+        items that were created or changed.
+        """
         importPath = params['importPath']
 
         if not os.path.exists(importPath):
@@ -405,44 +477,10 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
             self._importFileToFolder(name, user, parent, parentType, importPath)
             return
 
-        listDir = os.listdir(importPath)
-
-        if parentType != 'folder' and any(
-                os.path.isfile(os.path.join(importPath, val)) for val in listDir):
-            raise ValidationException(
-                'Files cannot be imported directly underneath a %s.' % parentType)
-
-        if leafFoldersAsItems and self._hasOnlyFiles(importPath, listDir):
-            self._importDataAsItem(
-                os.path.basename(importPath.rstrip(os.sep)), user, parent, importPath,
-                listDir, params=params)
-            return
-
-        for name in listDir:
-            progress.update(message=name)
-            path = os.path.join(importPath, name)
-
-            if os.path.isdir(path):
-                localListDir = os.listdir(path)
-                if leafFoldersAsItems and self._hasOnlyFiles(path, localListDir):
-                    self._importDataAsItem(name, user, parent, path, localListDir, params=params)
-                else:
-                    folder = Folder().createFolder(
-                        parent=parent, name=name, parentType=parentType,
-                        creator=user, reuseExisting=True)
-                    events.trigger(
-                        'filesystem_assetstore_imported', {
-                            'id': folder['_id'],
-                            'type': 'folder',
-                            'importPath': path
-                        })
-                    nextPath = os.path.join(importPath, name)
-                    self.importData(
-                        folder, 'folder', params=dict(params, importPath=nextPath),
-                        progress=progress, user=user, leafFoldersAsItems=leafFoldersAsItems)
-            else:
-                if self.shouldImportFile(path, params):
-                    self._importFileToFolder(name, user, parent, parentType, path)
+        _FilesystemImport(
+            self, params, progress, user, jobs=params.get('jobs') or self.IMPORT_JOBS,
+            leafFoldersAsItems=leafFoldersAsItems
+        ).run(parent, parentType, importPath)
 
     def findInvalidFiles(self, progress=progress.noProgress, filters=None,
                          checkSize=True, **kwargs):
@@ -500,3 +538,115 @@ class FilesystemAssetstoreAdapter(AbstractAssetstoreAdapter):
         if path and os.path.exists(path):
             return path
         return super(FilesystemAssetstoreAdapter, self).getLocalFilePath(file)
+
+    def open(self, file):
+        """
+        Exposes a Girder file as a python file-like object, which reads the
+        file on disk directly.
+
+        :param file: A Girder file document.
+        :type file: dict
+        :return: A file-like object containing the bytes of the file.
+        :rtype: girder.utility.abstract_assetstore_adapter.FileHandle
+        """
+        path = self.fullPath(file)
+        if not os.path.isfile(path):
+            raise GirderException(
+                'File %s does not exist.' % path,
+                'girder.utility.filesystem_assetstore_adapter.'
+                'file-does-not-exist')
+        return _FilesystemFileHandle(file, self, path)
+
+
+class _FilesystemFileHandle(FileHandle):
+    """
+    A file handle that reads blocks of a file on disk with ``pread``, so no
+    stream has to be reopened when seeking. The file descriptor is closed when
+    the handle is closed or garbage collected, since callers may not close
+    the handles they open.
+    """
+    _fd = None
+
+    def __init__(self, file, adapter, path):
+        super(_FilesystemFileHandle, self).__init__(file, adapter)
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def __del__(self):
+        self._closeFd()
+
+    def close(self):
+        super(_FilesystemFileHandle, self).close()
+        self._closeFd()
+
+    def _closeFd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _readRange(self, offset, length):
+        data = []
+        while length > 0:
+            if hasattr(os, 'pread'):
+                chunk = os.pread(self._fd, length, offset)
+            else:  # pragma: no cover
+                os.lseek(self._fd, offset, os.SEEK_SET)
+                chunk = os.read(self._fd, length)
+            if not chunk:
+                break
+            data.append(chunk)
+            offset += len(chunk)
+            length -= len(chunk)
+        return data[0] if len(data) == 1 else b''.join(data)
+
+
+class _FilesystemImport(BulkImport):
+    """
+    Imports a directory tree of the local filesystem.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.leafFoldersAsItems = kwargs.pop('leafFoldersAsItems', False)
+        super(_FilesystemImport, self).__init__(*args, **kwargs)
+
+    def importDirectory(self, parent, parentType, path, name=None):
+        """
+        Import a directory into its parent. The top level directory, which
+        has no name, has its contents imported directly into the parent.
+        """
+        entries = list(scandir(path))
+        asItem = self.leafFoldersAsItems and all(entry.is_file() for entry in entries)
+        files = [entry for entry in entries if not entry.is_dir()]
+        if name is not None and not asItem:
+            parent = Folder().createFolder(
+                parent=parent, name=name, parentType=parentType, creator=self.user,
+                reuseExisting=True)
+            parentType = 'folder'
+            self._imported(parent, 'folder', path)
+        if (files or asItem) and parentType != 'folder':
+            raise ValidationException(
+                'Files cannot be imported directly underneath a %s.' % parentType)
+
+        if asItem:
+            itemName = name if name is not None else os.path.basename(path.rstrip(os.sep))
+        files = [(
+            itemName if asItem else entry.name, entry.name, entry.stat().st_size, {
+                'path': os.path.abspath(entry.path),
+                'mtime': entry.stat().st_mtime,
+                'imported': True
+            }) for entry in files if self.adapter.shouldImportFile(entry.path, self.params)]
+        if asItem and not files:
+            self._imported(Item().createItem(
+                name=itemName, creator=self.user, folder=parent, reuseExisting=True), 'item', path)
+        for itemName, item in self.importFiles(parent, files):
+            self._imported(item, 'item', path if asItem else os.path.join(path, itemName))
+
+        for entry in entries:
+            if entry.is_dir():
+                self.submit(parent, parentType, entry.path, entry.name)
+
+    def _imported(self, doc, type, path):
+        events.trigger('filesystem_assetstore_imported', {
+            'id': doc['_id'],
+            'type': type,
+            'importPath': path
+        })
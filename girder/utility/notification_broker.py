@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import collections
+import copy
+import datetime
+import six
+import threading
+
+from girder import events, logger
+
+# How often the broker looks for notifications written by other processes
+POLL_INTERVAL = 0.5
+# Notifications are written with the clock of the process that saved them, so
+# the broker looks back this far to tolerate clock differences between hosts.
+CLOCK_SKEW = datetime.timedelta(seconds=5)
+
+
+class Subscription(object):
+    """
+    Receives the notifications of one user or token session from a
+    :py:class:`NotificationBroker`. Notifications can either be collected with
+    :py:meth:`wait`, or handled as they arrive by passing a callback when
+    subscribing.
+    """
+
+    def __init__(self, broker, key, callback=None):
+        self.broker = broker
+        self.key = key
+        self.callback = callback
+        self._events = collections.deque()
+        self._condition = threading.Condition()
+
+    def deliver(self, notification):
+        if self.callback is not None:
+            self.callback(notification)
+            return
+        with self._condition:
+            self._events.append(notification)
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """
+        Wait until notifications are available and return them.
+
+        :param timeout: The maximum number of seconds to wait.
+        :type timeout: float
+        :returns: A list of notification documents, which is empty if none
+            arrived before the timeout.
+        """
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def close(self):
+        """
+        Stop receiving notifications.
+        """
+        self.broker.unsubscribe(self)
+
+
+class NotificationBroker(object):
+    """
+    Fans notifications out to the streams waiting for them in this process.
+
+    Notifications saved by this process are delivered as soon as they are
+    saved. A single background thread per process also queries for
+    notifications saved by other processes, so the number of database queries
+    does not grow with the number of connected clients. Each notification is
+    delivered once per change of its ``updated`` time.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self._subscriptions = collections.defaultdict(set)
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopEvent = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    @staticmethod
+    def _key(user=None, token=None):
+        if user:
+            return ('userId', user['_id'])
+        return ('tokenId', token['_id'])
+
+    def subscribe(self, user=None, token=None, callback=None):
+        """
+        Subscribe to the notifications of a user, or of a token session if the
+        user is None.
+
+        :param user: The user to receive notifications for.
+        :type user: dict or None
+        :param token: The token to receive notifications for if there is no user.
+        :type token: dict or None
+        :param callback: If given, a function called with each notification
+            from the broker's thread instead of queueing it for ``wait``.
+        :returns: A :py:class:`Subscription`.
+        """
+        subscription = Subscription(self, self._key(user, token), callback)
+        with self._lock:
+            self._subscriptions[subscription.key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.key]
+
+    def publish(self, notification):
+        """
+        Deliver a notification to the subscriptions of its user or token,
+        unless this version of it was already delivered.
+
+        :param notification: The notification document.
+        :type notification: dict
+        """
+        if 'userId' in notification:
+            key = ('userId', notification['userId'])
+        elif 'tokenId' in notification:
+            key = ('tokenId', notification['tokenId'])
+        else:
+            return
+
+        with self._lock:
+            if self._seen.get(notification['_id']) == notification['updated']:
+                return
+            self._seen[notification['_id']] = notification['updated']
+            subscriptions = list(self._subscriptions.get(key, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(copy.deepcopy(notification))
+            except Exception:
+                logger.exception('Notification subscriber failed.')
+
+    def start(self):
+        """
+        Start delivering notifications saved by this and other processes. This
+        is a no-op if already running.
+        """
+        if self.running:
+            return
+        events.bind('model.notification.save.after', 'notification_broker', self._saved)
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._poll, name='notification-broker')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            events.unbind('model.notification.save.after', 'notification_broker')
+            self._stopEvent.set()
+            self._thread.join()
+            self._thread = None
+
+    def _saved(self, event):
+        self.publish(event.info)
+
+    def _poll(self):
+        from girder.models.notification import Notification
+
+        since = datetime.datetime.utcnow()
+        while not self._stopEvent.wait(self.interval):
+            with self._lock:
+                idle = not self._subscriptions
+            try:
+                lookback = since - CLOCK_SKEW
+                if not idle:
+                    for notification in Notification().find({'updated': {'$gt': lookback}}):
+                        since = max(since, notification['updated'])
+                        self.publish(notification)
+                with self._lock:
+                    self._seen = {
+                        id: updated for id, updated in six.viewitems(self._seen)
+                        if updated > lookback}
+            except Exception:
+                logger.exception('Notification broker query failed.')
+            if idle:
+                since = datetime.datetime.utcnow()
+
+
+broker = NotificationBroker()
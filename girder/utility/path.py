@@ -20,12 +20,12 @@
 """This module contains utility methods for parsing girder path strings."""
 
 import re
+from dogpile.cache.api import NO_VALUE
 from ..constants import AccessType
 from ..exceptions import AccessException, GirderException, ValidationException
 from ..exceptions import ResourcePathNotFound
+from ._cache import cache, pathCacheKey
 from .model_importer import ModelImporter
-from girder.models.collection import Collection
-from girder.models.user import User
 
 
 # Expose the ResourcePathNotFound exception as its original name
@@ -91,6 +91,41 @@ def join(tokens):
     return '/'.join([encode(token) for token in tokens])
 
 
+def _lookUp(key, candidates):
+    """
+    Find the first document matching one of several filters. Which model and
+    document matched, or that none did, is kept in the shared cache under
+    ``key``, so that later lookups query only the matching document by its ID,
+    or nothing at all. Cached lookups are invalidated when a document with the
+    same key is saved or removed.
+
+    :param key: The cache key of the lookup, from ``pathCacheKey``.
+    :type key: str
+    :param candidates: ``(model name, filter)`` pairs to search in order.
+    :type candidates: list
+    :returns: A ``(document, model name)`` pair, or ``(None, None)``.
+    """
+    cached = cache.get(key)
+    if cached is None:
+        return None, None
+    if cached is not NO_VALUE:
+        cachedModel, cachedId = cached
+        for candidateModel, filterObject in candidates:
+            if candidateModel == cachedModel:
+                document = ModelImporter.model(candidateModel).findOne(
+                    dict(filterObject, _id=cachedId))
+                if document is not None:
+                    return document, candidateModel
+
+    for candidateModel, filterObject in candidates:
+        document = ModelImporter.model(candidateModel).findOne(filterObject)
+        if document is not None:
+            cache.set(key, (candidateModel, document['_id']))
+            return document, candidateModel
+    cache.set(key, None)
+    return None, None
+
+
 def lookUpToken(token, parentType, parent):
     """
     Find a particular child resource by name or throw an exception.
@@ -111,13 +146,12 @@ def lookUpToken(token, parentType, parent):
         ('file', parentType == 'item', {'name': token, 'itemId': parent['_id']}),
     )
 
-    for candidateModel, mask, filterObject in searchTable:
-        if not mask:
-            continue
-
-        candidateChild = ModelImporter.model(candidateModel).findOne(filterObject)
-        if candidateChild is not None:
-            return candidateChild, candidateModel
+    candidateChild, candidateModel = _lookUp(
+        pathCacheKey(parentType, parent['_id'], token),
+        [(candidateModel, filterObject)
+         for candidateModel, mask, filterObject in searchTable if mask])
+    if candidateChild is not None:
+        return candidateChild, candidateModel
 
     # if no folder, item, or file matches, give up
     raise ResourcePathNotFound('Child resource not found: %s(%s)->%s' % (
@@ -126,7 +160,8 @@ def lookUpToken(token, parentType, parent):
 
 def lookUpPath(path, user=None, test=False, filter=True, force=False):
     """
-    Look up a resource in the data hierarchy by path.
+    Look up a resource in the data hierarchy by path. If the shared cache is
+    enabled, the resolution of each part of the path is cached.
 
     :param path: path of the resource
     :param user: user with correct privileges to access path
@@ -145,7 +180,7 @@ def lookUpPath(path, user=None, test=False, filter=True, force=False):
 
     if model == 'user':
         username = pathArray[1]
-        parent = User().findOne({'login': username})
+        parent, _ = _lookUp(pathCacheKey('user', None, username), [('user', {'login': username})])
 
         if parent is None:
             if test:
@@ -158,7 +193,8 @@ def lookUpPath(path, user=None, test=False, filter=True, force=False):
 
     elif model == 'collection':
         collectionName = pathArray[1]
-        parent = Collection().findOne({'name': collectionName})
+        parent, _ = _lookUp(pathCacheKey('collection', None, collectionName),
+                            [('collection', {'name': collectionName})])
 
         if parent is None:
             if test:
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import cherrypy
+import collections
+import functools
+import six
+import sys
+import threading
+
+from concurrent import futures
+
+PREFETCH_FILES = 8  # The number of files to read at once
+PREFETCH_BYTES = 32 * 1024 * 1024  # The most data to hold for upcoming files
+
+
+def prefetchFiles(files, count=PREFETCH_FILES, maxBytes=PREFETCH_BYTES):
+    """
+    Read the contents of upcoming files ahead of a consumer that streams them
+    one after another, such as a zip archive. Up to ``count`` files are read at
+    once on threads, so that each file's time to first byte overlaps with the
+    streaming of earlier files. At most ``maxBytes`` of data are held for the
+    files after the current one.
+
+    Each generator that is yielded must be consumed, or abandoned, before the
+    next pair is requested. Event handlers triggered while reading a file see
+    the current request.
+
+    :param files: ``(path, generator)`` pairs like those listed by the
+        ``fileList`` method of models, where each generator is a function
+        returning an iterator over the contents of a file.
+    :type files: iterable
+    :param count: The number of files to read at once. If less than 2, the
+        files are read by the consumer as usual.
+    :type count: int
+    :param maxBytes: The most data to buffer for upcoming files.
+    :type maxBytes: int
+    :returns: A generator of ``(path, generator)`` pairs for the same files.
+    """
+    if count < 2:
+        for path, generator in files:
+            yield path, generator
+        return
+
+    prefetcher = _Prefetcher(count, maxBytes)
+    try:
+        for path, generator in prefetcher.run(files):
+            yield path, generator
+    finally:
+        prefetcher.close()
+
+
+class _Fetch(object):
+    """
+    The buffered contents of one file.
+    """
+    __slots__ = ('chunks', 'size', 'current', 'done', 'discarded', 'error')
+
+    def __init__(self):
+        self.chunks = collections.deque()
+        self.size = 0
+        self.current = False
+        self.done = False
+        self.discarded = False
+        self.error = None
+
+
+class _Prefetcher(object):
+    def __init__(self, count, maxBytes):
+        self.count = count
+        self.maxBytes = maxBytes
+        # The current file may buffer this much on its own
+        self.maxCurrentBytes = max(maxBytes // count, 1)
+        self.buffered = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self._pool = futures.ThreadPoolExecutor(count)
+        self._request = cherrypy.serving.request
+        self._response = cherrypy.serving.response
+
+    def run(self, files):
+        files = iter(files)
+        pending = collections.deque()
+        while True:
+            for path, generator in files:
+                fetch = _Fetch()
+                pending.append((path, fetch))
+                self._pool.submit(self._read, fetch, generator)
+                if len(pending) >= self.count:
+                    break
+            if not pending:
+                return
+            path, fetch = pending.popleft()
+            with self._cond:
+                fetch.current = True
+                self._cond.notify_all()
+            yield path, functools.partial(self._stream, fetch)
+            self._discard(fetch)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False)
+
+    def _read(self, fetch, generator):
+        cherrypy.serving.load(self._request, self._response)
+        try:
+            for chunk in generator():
+                with self._cond:
+                    while not (self.closed or fetch.discarded) and (
+                            fetch.size >= self.maxCurrentBytes if fetch.current
+                            else self.buffered >= self.maxBytes):
+                        self._cond.wait()
+                    if self.closed or fetch.discarded:
+                        return
+                    fetch.chunks.append(chunk)
+                    fetch.size += len(chunk)
+                    self.buffered += len(chunk)
+                    self._cond.notify_all()
+        except Exception:
+            fetch.error = sys.exc_info()
+        finally:
+            with self._cond:
+                fetch.done = True
+                self._cond.notify_all()
+
+    def _stream(self, fetch):
+        while True:
+            with self._cond:
+                while not fetch.chunks and not fetch.done:
+                    self._cond.wait()
+                if not fetch.chunks:
+                    break
+                chunk = fetch.chunks.popleft()
+                fetch.size -= len(chunk)
+                self.buffered -= len(chunk)
+                self._cond.notify_all()
+            yield chunk
+        if fetch.error is not None:
+            six.reraise(*fetch.error)
+
+    def _discard(self, fetch):
+        """
+        Drop whatever the consumer did not read of a file.
+        """
+        with self._cond:
+            fetch.discarded = True
+            self.buffered -= fetch.size
+            fetch.size = 0
+            fetch.chunks.clear()
+            self._cond.notify_all()
@@ -31,8 +31,8 @@ from girder.api.rest import setContentDisposition
 from girder.exceptions import GirderException, ValidationException
 from girder.models.file import File
 from girder.models.folder import Folder
-from girder.models.item import Item
 from .abstract_assetstore_adapter import AbstractAssetstoreAdapter
+from .bulk_import import BulkImport
 
 BUF_LEN = 65536  # Buffer size for download stream
 DEFAULT_REGION = 'us-east-1'
@@ -47,6 +47,8 @@ class S3AssetstoreAdapter(AbstractAssetstoreAdapter):
 
     CHUNK_LEN = 1024 * 1024 * 32  # Chunk size for uploading
     HMAC_TTL = 120  # Number of seconds each signed message is valid
+    IMPORT_JOBS = 8  # Number of prefixes to list and import at once
+    IMPORT_PAGE_SIZE = 1000  # Number of keys to list and write at once
 
     @staticmethod
     def _s3Client(connectParams):
@@ -385,53 +387,22 @@ class S3AssetstoreAdapter(AbstractAssetstoreAdapter):
             return stream
 
     def importData(self, parent, parentType, params, progress, user, **kwargs):
+        """
+        Import the keys under a path of the bucket. Each level of common
+        prefixes becomes a folder and each key an item containing a single
+        file. Prefixes are listed a page at a time on a pool of ``jobs``
+        threads (``IMPORT_JOBS`` by default), and the items and files of each
+        page are written in bulk, so the per-document model save events are
+        not triggered for them. Keys that were already imported with the same
+        size and ETag are skipped, so an interrupted import can be run again.
+        """
         importPath = params.get('importPath', '').strip().lstrip('/')
 
         if importPath and not importPath.endswith('/'):
             importPath += '/'
 
-        bucket = self.assetstore['bucket']
-        resp = self.client.list_objects(Bucket=bucket, Prefix=importPath, Delimiter='/')
-
-        # Start with objects
-        for obj in resp.get('Contents', []):
-            if progress:
-                progress.update(message=obj['Key'])
-
-            name = obj['Key'].rsplit('/', 1)[-1]
-            if not name:
-                continue
-
-            if parentType != 'folder':
-                raise ValidationException(
-                    'Keys cannot be imported directly underneath a %s.' % parentType)
-
-            if self.shouldImportFile(obj['Key'], params):
-                item = Item().createItem(
-                    name=name, creator=user, folder=parent, reuseExisting=True)
-                # Create a file record; delay saving it until we have added the
-                # import information.
-                file = File().createFile(
-                    name=name, creator=user, item=item, reuseExisting=True,
-                    assetstore=self.assetstore, mimeType=None, size=obj['Size'],
-                    saveFile=False)
-                file['s3Key'] = obj['Key']
-                file['imported'] = True
-                File().save(file)
-
-        # Now recurse into subdirectories
-        for obj in resp.get('CommonPrefixes', []):
-            if progress:
-                progress.update(message=obj['Prefix'])
-
-            name = obj['Prefix'].rstrip('/').rsplit('/', 1)[-1]
-
-            folder = Folder().createFolder(
-                parent=parent, name=name, parentType=parentType, creator=user,
-                reuseExisting=True)
-            self.importData(parent=folder, parentType='folder', params={
-                'importPath': obj['Prefix']
-            }, progress=progress, user=user, **kwargs)
+        _S3Import(self, params, progress, user, jobs=params.get('jobs') or self.IMPORT_JOBS).run(
+            parent, parentType, importPath)
 
     def deleteFile(self, file):
         """
@@ -568,6 +539,37 @@ class S3AssetstoreAdapter(AbstractAssetstoreAdapter):
         return False
 
 
+class _S3Import(BulkImport):
+    """
+    Imports the keys under a prefix of an S3 assetstore's bucket.
+    """
+
+    def importDirectory(self, parent, parentType, prefix):
+        paginator = self.adapter.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(
+                Bucket=self.adapter.assetstore['bucket'], Prefix=prefix, Delimiter='/',
+                PaginationConfig={'PageSize': self.adapter.IMPORT_PAGE_SIZE}):
+            if self.failed:
+                return
+            objs = [obj for obj in page.get('Contents', []) if obj['Key'].rsplit('/', 1)[-1]]
+            if objs and parentType != 'folder':
+                raise ValidationException(
+                    'Keys cannot be imported directly underneath a %s.' % parentType)
+            self.importFiles(parent, [(
+                obj['Key'].rsplit('/', 1)[-1], obj['Key'].rsplit('/', 1)[-1], obj['Size'], {
+                    's3Key': obj['Key'],
+                    's3ETag': obj.get('ETag'),
+                    'imported': True
+                }) for obj in objs if self.adapter.shouldImportFile(obj['Key'], self.params)])
+
+            for obj in page.get('CommonPrefixes', []):
+                name = obj['Prefix'].rstrip('/').rsplit('/', 1)[-1]
+                folder = Folder().createFolder(
+                    parent=parent, name=name, parentType=parentType, creator=self.user,
+                    reuseExisting=True)
+                self.submit(folder, 'folder', obj['Prefix'])
+
+
 def makeBotoConnectParams(accessKeyId, secret, service=None, region=None, inferCredentials=False):
     """
     Create a dictionary of values to pass to the boto connect_s3 function.
@@ -26,8 +26,11 @@ import six
 
 import girder.events
 from girder import constants, logprint, __version__, logStdoutStderr, _setupCache
+from girder.models.folder import Folder
 from girder.models.setting import Setting
 from girder.utility import plugin_utilities, config
+from girder.utility._cache import cacheInvalidationChannel
+from girder.utility.notification_broker import broker as notificationBroker
 from . import webroot
 
 with open(os.path.join(os.path.dirname(__file__), 'error.mako')) as f:
@@ -165,6 +168,13 @@ def configureServer(test=False, plugins=None, curConfig=None):
     girder.events.setupDaemon()
     cherrypy.engine.subscribe('start', girder.events.daemon.start)
     cherrypy.engine.subscribe('stop', girder.events.daemon.stop)
+    # Migrate databases from before folders and items stored their ancestors
+    # without delaying startup; subtree queries wait for it if they run first
+    girder.events.daemon.trigger(callback=lambda event: Folder().ensureAncestors())
+    cherrypy.engine.subscribe('start', cacheInvalidationChannel.start)
+    cherrypy.engine.subscribe('stop', cacheInvalidationChannel.stop)
+    cherrypy.engine.subscribe('start', notificationBroker.start)
+    cherrypy.engine.subscribe('stop', notificationBroker.stop)
 
     if plugins is None:
         plugins = getPlugins()
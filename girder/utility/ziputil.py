@@ -30,27 +30,129 @@ Example of creating and consuming a streaming zip:
         yield data
 
     yield zip.footer()
+
+Files are compressed in blocks, which are compressed on a shared pool of
+threads when there is more than one block to work on. Use ``addFiles`` to add
+several files at once, so that upcoming files are compressed while earlier ones
+are streamed.
 """
 
 import binascii
+import collections
+import mimetypes
+import multiprocessing
 import os
 import six
 import struct
 import sys
+import threading
 import time
 
+from concurrent import futures
+
 try:
     import zlib
 except ImportError:
     zlib = None
 
-__all__ = ('STORE', 'DEFLATE', 'ZipGenerator')
+__all__ = ('STORE', 'DEFLATE', 'AUTO', 'COMPRESSION', 'ZipGenerator', 'chooseCompression')
 
 
 Z64_LIMIT = (1 << 31) - 1
 Z_FILECOUNT_LIMIT = 1 << 16
 STORE = 0
 DEFLATE = 8
+# Choose STORE or DEFLATE for each file with chooseCompression
+AUTO = -1
+# The compression methods by the names used in the REST API
+COMPRESSION = {'store': STORE, 'deflate': DEFLATE, 'auto': AUTO}
+
+BLOCK_SIZE = 1 << 19  # Bytes of input compressed as a unit
+WORKERS = multiprocessing.cpu_count()  # Threads compressing blocks for all archives
+WINDOW_SIZE = 1 << 15  # The DEFLATE window, primed from the previous block
+MIN_DEFLATE_SIZE = 512  # Smaller files are stored when choosing automatically
+SAMPLE_SIZE = 1 << 16  # Bytes of unrecognized files to test compress
+DEFLATE_RATIO = 0.9  # Unrecognized files must compress at least this well
+
+# Extensions and MIME types of data that is compressed already, or compresses well
+_COMPRESSED_EXTENSIONS = {
+    '.7z', '.avi', '.bz2', '.docx', '.flac', '.gif', '.gz', '.jp2', '.jpeg', '.jpg', '.m4a',
+    '.mkv', '.mov', '.mp3', '.mp4', '.npz', '.ogg', '.png', '.pptx', '.rar', '.tgz', '.webm',
+    '.webp', '.xlsx', '.xz', '.zip', '.zst'
+}
+_TEXT_EXTENSIONS = {
+    '.csv', '.geojson', '.ipynb', '.json', '.md', '.ndjson', '.tsv', '.yaml', '.yml'
+}
+_TEXT_TYPES = {
+    'application/javascript', 'application/json', 'application/postscript', 'application/x-sh',
+    'application/x-tex', 'application/xml', 'image/svg+xml'
+}
+
+_pool = None
+_poolLock = threading.Lock()
+
+
+def _getPool():
+    """
+    Return the thread pool shared by all archives for compressing blocks. The
+    zlib module releases the GIL while compressing, so this uses every core.
+    """
+    global _pool
+    with _poolLock:
+        if _pool is None:
+            _pool = futures.ThreadPoolExecutor(WORKERS)
+        return _pool
+
+
+def _deflate(data, zdict, last):
+    """
+    Compress a block of a file as raw DEFLATE data. Blocks other than the last
+    end on a byte boundary without ending the stream, so the compressed blocks
+    of a file can be concatenated.
+
+    :param zdict: The data preceding this block, which later data may refer
+        to, or None.
+    :param last: Whether this is the last block of the file.
+    """
+    if zdict:
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY, zdict)
+    else:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def chooseCompression(path, data, complete):
+    """
+    Choose whether to store or compress a file, based on its name and the
+    start of its contents. Small files and files in compressed formats are
+    stored, and text is compressed. Other files are compressed if a sample
+    compresses well.
+
+    :param path: The path of the file in the archive.
+    :type path: str
+    :param data: The first bytes of the file.
+    :type data: bytes
+    :param complete: Whether ``data`` is the entire file.
+    :type complete: bool
+    :returns: STORE or DEFLATE.
+    """
+    if not zlib or (complete and len(data) < MIN_DEFLATE_SIZE):
+        return STORE
+    lowerPath = path.lower()
+    if any(lowerPath.endswith(ext) for ext in _COMPRESSED_EXTENSIONS):
+        return STORE
+    mimeType, encoding = mimetypes.guess_type(lowerPath)
+    if encoding:
+        return STORE
+    if (mimeType and (mimeType.startswith('text/') or mimeType in _TEXT_TYPES)) or \
+            os.path.splitext(lowerPath)[1] in _TEXT_EXTENSIONS:
+        return DEFLATE
+    sample = data[:SAMPLE_SIZE]
+    if sample and len(zlib.compress(sample, 1)) < len(sample) * DEFLATE_RATIO:
+        return DEFLATE
+    return STORE
 
 
 class ZipInfo(object):
@@ -118,13 +220,16 @@ class ZipGenerator(object):
     This class can be used to create a streaming zip file that consumes from
     one generator and writes to another.
     """
-    def __init__(self, rootPath='', compression=STORE):
+    def __init__(self, rootPath='', compression=STORE, parallel=True):
         """
         :param rootPath: The root path for all files within this archive.
         :type rootPath: str
-        :param compression: Whether files in this archive should be compressed.
-
-        :type
+        :param compression: Whether files in this archive should be compressed:
+            STORE, DEFLATE, or AUTO to choose for each file.
+        :type compression: int
+        :param parallel: Whether to compress blocks on the shared thread pool,
+            rather than in the calling thread.
+        :type parallel: bool
         """
         if compression == DEFLATE and not zlib:
             raise RuntimeError('Missing zlib module')
@@ -134,6 +239,10 @@ class ZipGenerator(object):
         self.useCRC = True
         self.rootPath = rootPath
         self.offset = 0
+        self.pool = _getPool() if parallel and compression != STORE and zlib else None
+        # The most input data to read ahead of the output
+        self.maxBuffered = BLOCK_SIZE * 2 * (WORKERS if self.pool else 1)
+        self._buffered = 0
 
     def _advanceOffset(self, data):
         """
@@ -151,46 +260,107 @@ class ZipGenerator(object):
         :param path: The path within the archive for this entry.
         :type path: str
         """
-        fullpath = os.path.join(self.rootPath, path)
-        header = ZipInfo(fullpath, time.localtime()[0:6])
-        header.externalAttr = (0o100644 & 0xFFFF) << 16
-        header.compressType = self.compression
-        header.headerOffset = self.offset
-
-        header.crc = crc = 0
-        header.compressSize = compressSize = 0
-        header.fileSize = fileSize = 0
-        yield self._advanceOffset(header.fileHeader())
-        if header.compressType == DEFLATE:
-            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
-                                          zlib.DEFLATED, -15)
-        else:
-            compressor = None
+        for data in self.addFiles([(path, generator)]):
+            yield data
 
+    def addFiles(self, files):
+        """
+        Generates data to add several files to the archive. While compressing,
+        the blocks of upcoming files are read and compressed ahead of the
+        output, up to ``maxBuffered`` bytes of input.
+
+        :param files: The files to add, as ``(path, generator)`` pairs like
+            those listed by the ``fileList`` method of models.
+        :type files: iterable
+        """
+        pending = collections.deque()
+        for path, generator in files:
+            for entry in self._readFile(generator, path):
+                pending.append(entry)
+                while self._buffered > self.maxBuffered:
+                    for data in self._writeEntry(pending.popleft()):
+                        yield data
+        while pending:
+            for data in self._writeEntry(pending.popleft()):
+                yield data
+
+    def _blocks(self, generator):
+        """
+        Split the contents of a file into blocks of at least BLOCK_SIZE bytes,
+        except for the last. Yields each block with whether it is the last.
+        """
+        chunks = []
+        size = 0
+        previous = None
         for buf in generator():
             if not buf:
                 break
             if isinstance(buf, six.text_type):
                 buf = buf.encode('utf8')
-            fileSize += len(buf)
+            chunks.append(buf)
+            size += len(buf)
+            if size >= BLOCK_SIZE:
+                if previous is not None:
+                    yield previous, False
+                previous = b''.join(chunks)
+                chunks = []
+                size = 0
+        if previous is not None and chunks:
+            yield previous, False
+            previous = None
+        yield previous if previous is not None else b''.join(chunks), True
+
+    def _readFile(self, generator, path):
+        """
+        Read a file, yielding entries for its header, its stored or compressed
+        blocks, and its data descriptor. Compressed blocks are futures if they
+        are compressed on the thread pool.
+        """
+        fullpath = os.path.join(self.rootPath, path)
+        header = ZipInfo(fullpath, time.localtime()[0:6])
+        header.externalAttr = (0o100644 & 0xFFFF) << 16
+        header.crc = 0
+        header.compressSize = 0
+        header.fileSize = 0
+
+        zdict = None
+        for index, (block, last) in enumerate(self._blocks(generator)):
+            if index == 0:
+                header.compressType = self.compression
+                if header.compressType == AUTO:
+                    header.compressType = chooseCompression(path, block, last)
+                yield ('header', header, None, 0)
+            header.fileSize += len(block)
             if self.useCRC:
-                crc = binascii.crc32(buf, crc) & 0xFFFFFFFF
-            if compressor:
-                buf = compressor.compress(buf)
-                compressSize += len(buf)
-            yield self._advanceOffset(buf)
-
-        if compressor:
-            buf = compressor.flush()
-            compressSize += len(buf)
-            yield self._advanceOffset(buf)
-            header.compressSize = compressSize
+                header.crc = binascii.crc32(block, header.crc) & 0xFFFFFFFF
+            if header.compressType == DEFLATE:
+                if self.pool is not None:
+                    data = self.pool.submit(_deflate, block, zdict, last)
+                else:
+                    data = _deflate(block, zdict, last)
+                if six.PY3:
+                    zdict = block[-WINDOW_SIZE:]
+            else:
+                data = block
+            self._buffered += len(block)
+            yield ('data', header, data, len(block))
+        yield ('end', header, None, 0)
+
+    def _writeEntry(self, entry):
+        kind, header, data, size = entry
+        if kind == 'header':
+            header.headerOffset = self.offset
+            yield self._advanceOffset(header.fileHeader())
+        elif kind == 'data':
+            self._buffered -= size
+            if isinstance(data, futures.Future):
+                data = data.result()
+            header.compressSize += len(data)
+            if data:
+                yield self._advanceOffset(data)
         else:
-            header.compressSize = fileSize
-        header.crc = crc
-        header.fileSize = fileSize
-        yield self._advanceOffset(header.dataDescriptor())
-        self.files.append(header)
+            yield self._advanceOffset(header.dataDescriptor())
+            self.files.append(header)
 
     def footer(self):
         """
@@ -1,30 +1,200 @@
 import cherrypy
+import collections
 import datetime
 import logging
-from girder import auditLogger
+import six
+import threading
+from girder import auditLogger, events, logger
+from girder.exceptions import ValidationException
 from girder.models.model_base import Model
+from girder.models.setting import Setting
 from girder.api.rest import getCurrentUser
+from girder.utility import setting_utilities
+
+
+class PluginSettings(object):
+    BATCH_SIZE = 'audit_logs.batch_size'
+    FLUSH_INTERVAL = 'audit_logs.flush_interval'
+    QUEUE_SIZE = 'audit_logs.queue_size'
+    OVERFLOW = 'audit_logs.overflow'
+    RETENTION_DAYS = 'audit_logs.retention_days'
+
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP = 'drop'
 
 
 class Record(Model):
     def initialize(self):
         self.name = 'audit_log_record'
+        self.ensureIndices([
+            ([('type', 1), ('when', -1)], {}),
+            ([('userId', 1), ('when', -1)], {})
+        ])
 
     def validate(self, doc):
         return doc
 
+    def setRetention(self, days):
+        """
+        Index the records by time, expiring them the given number of days
+        after they were written.
+
+        :param days: The number of days to keep records, or 0 to keep them
+            forever.
+        :type days: int
+        """
+        seconds = days * 86400 if days else None
+        index = self.collection.index_information().get('when_1')
+        if index is not None and index.get('expireAfterSeconds') == seconds:
+            return
+        if index is not None:
+            self.collection.drop_index('when_1')
+        if seconds:
+            self.collection.create_index('when', expireAfterSeconds=seconds)
+        else:
+            self.collection.create_index('when')
+
 
 class _AuditLogDatabaseHandler(logging.Handler):
+    """
+    Writes audit records to the database in batches. Records are queued by the
+    thread that logs them and inserted by a background thread once
+    ``batchSize`` records are waiting or the oldest has waited
+    ``flushInterval`` seconds. When ``queueSize`` records are waiting, new
+    records either block the thread logging them or are dropped, depending on
+    ``overflow``.
+    """
+    def __init__(self, batchSize=1000, flushInterval=1.0, queueSize=10000,
+                 overflow=OVERFLOW_BLOCK):
+        logging.Handler.__init__(self)
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.queueSize = queueSize
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._writeLock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
     def handle(self, record):
         user = getCurrentUser()
-        Record().save({
+        doc = {
             'type': record.msg,
             'details': record.details,
             'ip': cherrypy.request.remote.ip,
             'userId': user and user['_id'],
             'when': datetime.datetime.utcnow()
-        }, triggerEvents=False)
+        }
+        with self._cond:
+            if self._closed:
+                Record().collection.insert_one(doc)
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='AuditLogWriter')
+                self._thread.daemon = True
+                self._thread.start()
+            while len(self._queue) >= self.queueSize and not self._closed:
+                if self.overflow == OVERFLOW_DROP:
+                    self.dropped += 1
+                    return
+                self._cond.wait()
+            self._queue.append(doc)
+            if len(self._queue) in (1, self.batchSize):
+                self._cond.notify_all()
+
+    def flush(self):
+        """
+        Write all queued records before returning.
+        """
+        with self._writeLock:
+            while True:
+                with self._cond:
+                    batch = [self._queue.popleft()
+                             for _ in six.moves.range(min(self.batchSize, len(self._queue)))]
+                    dropped, self.dropped = self.dropped, 0
+                    self._cond.notify_all()
+                if dropped:
+                    logger.warning('Dropped %d audit log records.' % dropped)
+                if not batch:
+                    return
+                try:
+                    Record().collection.insert_many(batch, ordered=False)
+                except Exception:
+                    logger.exception('Failed to write %d audit log records.' % len(batch))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        logging.Handler.close(self)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                if len(self._queue) < self.batchSize:
+                    self._cond.wait(self.flushInterval)
+            self.flush()
+
+
+@setting_utilities.validator({
+    PluginSettings.BATCH_SIZE,
+    PluginSettings.QUEUE_SIZE
+})
+def _validatePositiveInteger(doc):
+    if not isinstance(doc['value'], six.integer_types) or doc['value'] < 1:
+        raise ValidationException('%s must be a positive integer.' % doc['key'], 'value')
+
+
+@setting_utilities.validator(PluginSettings.RETENTION_DAYS)
+def _validateRetentionDays(doc):
+    if not isinstance(doc['value'], six.integer_types) or doc['value'] < 0:
+        raise ValidationException(
+            'Audit log retention must be a non-negative number of days.', 'value')
+
+
+@setting_utilities.validator(PluginSettings.FLUSH_INTERVAL)
+def _validateFlushInterval(doc):
+    try:
+        doc['value'] = float(doc['value'])
+    except (TypeError, ValueError):
+        raise ValidationException('Audit log flush interval must be a number.', 'value')
+    if doc['value'] <= 0:
+        raise ValidationException('Audit log flush interval must be positive.', 'value')
+
+
+@setting_utilities.validator(PluginSettings.OVERFLOW)
+def _validateOverflow(doc):
+    if doc['value'] not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+        raise ValidationException(
+            'Audit log overflow must be "%s" or "%s".' % (OVERFLOW_BLOCK, OVERFLOW_DROP), 'value')
+
+
+def _settingSaved(event):
+    if event.info.get('key') == PluginSettings.RETENTION_DAYS:
+        Record().setRetention(event.info['value'])
 
 
 def load(info):
-    auditLogger.addHandler(_AuditLogDatabaseHandler())
+    setting = Setting()
+    handler = _AuditLogDatabaseHandler(
+        batchSize=setting.get(PluginSettings.BATCH_SIZE, default=1000),
+        flushInterval=setting.get(PluginSettings.FLUSH_INTERVAL, default=1.0),
+        queueSize=setting.get(PluginSettings.QUEUE_SIZE, default=10000),
+        overflow=setting.get(PluginSettings.OVERFLOW, default=OVERFLOW_BLOCK))
+    auditLogger.addHandler(handler)
+    # Queued records are written when the server stops, and when the process
+    # exits, which closes all logging handlers.
+    cherrypy.engine.subscribe('stop', handler.flush)
+
+    Record().setRetention(setting.get(PluginSettings.RETENTION_DAYS, default=0))
+    events.bind('model.setting.save.after', 'audit_logs', _settingSaved)
@@ -87,6 +87,10 @@ class DownloadStatisticsTestCase(base.TestCase):
             data
 
     def _checkDownloadsCount(self, fileId, started, requested, completed):
+        from girder.plugins.download_statistics import downloadCounter
+
+        # Write the buffered counts
+        downloadCounter.flush()
         # Downloads file info and asserts download statistics are accurate
         path = '/file/%s' % str(fileId)
         resp = self.request(path, isJson=True)
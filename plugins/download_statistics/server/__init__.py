@@ -18,34 +18,212 @@
 ###############################################################################
 
 
-from girder import events
+import collections
+import datetime
+import threading
+
+import cherrypy
+import six
+from pymongo import UpdateOne
+
+from girder import events, logger
+from girder.api import access
+from girder.api.describe import Description, autoDescribeRoute
 from girder.constants import AccessType
+from girder.exceptions import ValidationException
 from girder.models.file import File
+from girder.models.model_base import Model
+from girder.models.setting import Setting
+from girder.utility import setting_utilities
+
+
+class PluginSettings(object):
+    FLUSH_INTERVAL = 'download_statistics.flush_interval'
+
+
+FIELDS = ('started', 'requested', 'completed')
+HOUR = 'hour'
+DAY = 'day'
+# Hourly counts are kept for this long; daily counts are kept with the file
+HOURLY_RETENTION = datetime.timedelta(days=31)
+
+
+class DownloadHistory(Model):
+    """
+    Download counts of each file, summed per hour and per day. Each document
+    holds the counts of one file over the interval starting at ``start``.
+    """
+    def initialize(self):
+        self.name = 'download_statistics_history'
+        self.ensureIndices([
+            ([('fileId', 1), ('interval', 1), ('start', 1)], {'unique': True}),
+            ('expires', {'expireAfterSeconds': 0})
+        ])
+
+    def validate(self, doc):
+        return doc
+
+    def getHistory(self, file, interval=DAY, start=None, end=None):
+        """
+        List the download counts of a file in time order.
+
+        :param file: The file.
+        :type file: dict
+        :param interval: Either 'hour' or 'day'.
+        :type interval: str
+        :param start: If set, only list intervals starting at or after this
+            time.
+        :type start: datetime.datetime
+        :param end: If set, only list intervals starting before this time.
+        :type end: datetime.datetime
+        """
+        query = {'fileId': file['_id'], 'interval': interval}
+        if start is not None or end is not None:
+            query['start'] = {}
+            if start is not None:
+                query['start']['$gte'] = start
+            if end is not None:
+                query['start']['$lt'] = end
+        return self.find(query, sort=[('start', 1)], fields={'_id': False, 'fileId': False})
+
+
+class DownloadCounter(object):
+    """
+    Sums download counts in memory, and writes them to the files and their
+    download history with a single bulk write per collection every
+    ``flushInterval`` seconds. This turns the many range requests of a single
+    download into one update.
+    """
+    def __init__(self, flushInterval=10.0):
+        self.flushInterval = flushInterval
+        # Counts by (file ID, hour) and field name
+        self._counts = collections.defaultdict(collections.Counter)
+        self._lock = threading.Lock()
+        self._flushLock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, fileId, field):
+        now = datetime.datetime.utcnow()
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            self._counts[(fileId, hour)][field] += 1
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='DownloadCounter')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flushInterval):
+            self.flush()
+
+    def flush(self):
+        """
+        Write all pending counts before returning.
+        """
+        with self._flushLock:
+            with self._lock:
+                counts, self._counts = self._counts, collections.defaultdict(collections.Counter)
+            if counts:
+                try:
+                    self._write(counts)
+                except Exception:
+                    logger.exception('Failed to write download statistics.')
+
+    def _write(self, counts):
+        # Files may have been deleted since they were downloaded
+        fileIds = {doc['_id'] for doc in File().find({
+            '_id': {'$in': list({fileId for fileId, _ in counts})}
+        }, fields=('_id',))}
+        totals = collections.defaultdict(collections.Counter)
+        history = collections.defaultdict(collections.Counter)
+        for (fileId, hour), fields in six.viewitems(counts):
+            if fileId in fileIds:
+                totals[fileId].update(fields)
+                history[(fileId, HOUR, hour)].update(fields)
+                history[(fileId, DAY, hour.replace(hour=0))].update(fields)
+        if not totals:
+            return
+
+        File().collection.bulk_write([UpdateOne({'_id': fileId}, {'$inc': {
+            'downloadStatistics.%s' % field: amount for field, amount in six.viewitems(fields)
+        }}) for fileId, fields in six.viewitems(totals)])
+
+        updates = []
+        for (fileId, interval, start), fields in six.viewitems(history):
+            update = {'$inc': dict(fields)}
+            if interval == HOUR:
+                update['$setOnInsert'] = {'expires': start + HOURLY_RETENTION}
+            updates.append(UpdateOne(
+                {'fileId': fileId, 'interval': interval, 'start': start}, update, upsert=True))
+        DownloadHistory().collection.bulk_write(updates)
+
+
+downloadCounter = DownloadCounter()
+
+
+@setting_utilities.validator(PluginSettings.FLUSH_INTERVAL)
+def _validateFlushInterval(doc):
+    try:
+        doc['value'] = float(doc['value'])
+    except (TypeError, ValueError):
+        raise ValidationException('Download statistics flush interval must be a number.', 'value')
+    if doc['value'] <= 0:
+        raise ValidationException('Download statistics flush interval must be positive.', 'value')
+
+
+@access.public
+@autoDescribeRoute(
+    Description('Get the number of downloads of a file over time.')
+    .modelParam('id', model=File, level=AccessType.READ)
+    .param('interval', 'The length of the intervals the counts are summed over.',
+           required=False, enum=[HOUR, DAY], default=DAY)
+    .param('start', 'List intervals starting at or after this time, in ISO 8601 format.',
+           required=False, dataType='dateTime')
+    .param('end', 'List intervals starting before this time, in ISO 8601 format.',
+           required=False, dataType='dateTime')
+    .errorResponse('ID was invalid.')
+    .errorResponse('Read access was denied for the file.', 403)
+)
+def getDownloadHistory(file, interval, start, end):
+    return list(DownloadHistory().getHistory(file, interval, start, end))
 
 
 def _onDownloadFileRequest(event):
     if event.info['startByte'] == 0:
-        File().increment(
-            query={'_id': event.info['file']['_id']},
-            field='downloadStatistics.started',
-            amount=1)
-    File().increment(
-        query={'_id': event.info['file']['_id']},
-        field='downloadStatistics.requested',
-        amount=1)
+        downloadCounter.add(event.info['file']['_id'], 'started')
+    downloadCounter.add(event.info['file']['_id'], 'requested')
 
 
 def _onDownloadFileComplete(event):
-    File().increment(
-        query={'_id': event.info['file']['_id']},
-        field='downloadStatistics.completed',
-        amount=1)
+    downloadCounter.add(event.info['file']['_id'], 'completed')
+
+
+def _onFileRemove(event):
+    DownloadHistory().removeWithQuery({'fileId': event.info['_id']})
 
 
 def load(info):
     # Bind REST events
     events.bind('model.file.download.request', 'download_statistics', _onDownloadFileRequest)
     events.bind('model.file.download.complete', 'download_statistics', _onDownloadFileComplete)
+    events.bind('model.file.remove', 'download_statistics', _onFileRemove)
 
     # Add download count fields to file model
     File().exposeFields(level=AccessType.READ, fields='downloadStatistics')
+
+    info['apiRoot'].file.route('GET', (':id', 'download_history'), getDownloadHistory)
+
+    downloadCounter.flushInterval = Setting().get(PluginSettings.FLUSH_INTERVAL, default=10.0)
+    cherrypy.engine.subscribe('start', downloadCounter.start)
+    cherrypy.engine.subscribe('stop', downloadCounter.stop)
@@ -82,20 +82,21 @@ def server(db, request):
     Provides a started CherryPy embedded server with a request method for performing
     local requests against it. Note: this fixture requires the db fixture.
     """
-    # The event daemon cannot be restarted since it is a threading.Thread object, however
-    # all references to girder.events.daemon are a singular global daemon due to its side
-    # effect on import. We have to hack around this by creating a unique event daemon
-    # each time we startup the server and assigning it to the global.
+    # All references to girder.events.daemon are a singular global daemon due to its side
+    # effect on import. We create a unique event daemon each time we startup the server and
+    # assign it to the global, so no queued events or metrics leak between tests.
     import girder.events
     from girder.api import docs
     from girder.constants import SettingKey
     from girder.models.setting import Setting
     from girder.utility import plugin_utilities
+    from girder.utility._cache import cacheInvalidationChannel
+    from girder.utility.notification_broker import broker as notificationBroker
     from girder.utility.server import setup as setupServer
 
     oldPluginDir = plugin_utilities.getPluginDir
 
-    girder.events.daemon = girder.events.AsyncEventsThread()
+    girder.events.daemon = girder.events.AsyncEventsPool()
 
     enabledPlugins = []
     hasInstalledPluginMarkers = request.node.get_closest_marker('plugin') is not None
@@ -138,6 +139,10 @@ def server(db, request):
 
     cherrypy.engine.unsubscribe('start', girder.events.daemon.start)
     cherrypy.engine.unsubscribe('stop', girder.events.daemon.stop)
+    cherrypy.engine.unsubscribe('start', cacheInvalidationChannel.start)
+    cherrypy.engine.unsubscribe('stop', cacheInvalidationChannel.stop)
+    cherrypy.engine.unsubscribe('start', notificationBroker.start)
+    cherrypy.engine.unsubscribe('stop', notificationBroker.stop)
     cherrypy.engine.stop()
     cherrypy.engine.exit()
     cherrypy.tree.apps = {}
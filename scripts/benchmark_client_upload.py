@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure Python client upload throughput at different concurrency levels.
+
+Generates a tree of files (or uses an existing one), uploads it once per
+requested ``--jobs`` value into a new folder under the given parent folder,
+and reports the time taken and the resulting throughput, e.g.::
+
+    python benchmark_client_upload.py --api-key <key> --folder <id> --jobs 1 4 16
+
+Each run uploads into its own folder, which is left on the server.
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+
+import girder_client
+
+
+def makeTree(path, files, size, filesPerFolder=100):
+    for index in range(files):
+        folder = os.path.join(path, 'd%04d' % (index // filesPerFolder))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(os.path.join(folder, 'f%06d' % index), 'wb') as f:
+            f.write(os.urandom(size))
+
+
+def treeSize(path):
+    count = total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            count += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return count, total
+
+
+def run(client, parentId, path, jobs, chunkJobs):
+    folder = client.createFolder(
+        parentId, 'upload-benchmark-%d-jobs-%d' % (time.time(), jobs), reuseExisting=False)
+    start = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        client.upload(path, folder['_id'], jobs=jobs, chunkJobs=chunkJobs)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--url', default='http://localhost:8080/api/v1',
+                        help='The API root of the server')
+    parser.add_argument('--api-key', required=True, help='A Girder API key')
+    parser.add_argument('--folder', required=True, help='The folder to upload into')
+    parser.add_argument('--path', default=None,
+                        help='A directory to upload instead of generated files')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='The number of files to generate')
+    parser.add_argument('--size', type=int, default=64 * 1024,
+                        help='The size in bytes of each generated file')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 4, 16],
+                        help='The numbers of concurrent uploads to measure')
+    parser.add_argument('--chunk-jobs', type=int, default=1,
+                        help='The number of chunks per file to send at once to S3')
+    args = parser.parse_args()
+
+    client = girder_client.GirderClient(apiUrl=args.url)
+    client.authenticate(apiKey=args.api_key)
+
+    path = args.path
+    if path is None:
+        path = tempfile.mkdtemp()
+        makeTree(path, args.files, args.size)
+    try:
+        count, total = treeSize(path)
+        print('%d files, %.1f MB' % (count, total / 1024.0 ** 2))
+        for jobs in args.jobs:
+            elapsed = run(client, args.folder, path, jobs, args.chunk_jobs)
+            print('jobs=%-3d %7.2fs %8.1f files/s %8.2f MB/s' % (
+                jobs, elapsed, count / elapsed, total / 1024.0 ** 2 / elapsed))
+    finally:
+        if args.path is None:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
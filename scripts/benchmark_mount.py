@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure metadata and read performance of the Girder FUSE mount.
+
+Mounts the Girder database once per configuration, walks a path within the
+mount (e.g., a user's folders) with ``find``, ``find -ls`` (which stats every
+entry), and by reading every file, twice, and reports the time of the cold and
+the warm pass of each, e.g.::
+
+    python benchmark_mount.py --database mongodb://localhost/girder --block-cache /tmp/blocks
+
+Configurations without metadata caching, with metadata caching, and (when
+``--block-cache`` is given) with a block cache are compared.  The block cache
+directory is emptied before it is used.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def mount(mountPath, database, options):
+    cmd = [sys.executable, '-c', 'from girder.cli.mount import main; main()',
+           mountPath, '-d', database, '-q', '-o', 'foreground'] + options
+    process = subprocess.Popen(cmd)
+    start = time.time()
+    while not os.path.isdir(os.path.join(mountPath, 'user')):
+        if process.poll() is not None or time.time() - start > 60:
+            raise Exception('Failed to mount %s' % mountPath)
+        time.sleep(0.1)
+    return process
+
+
+def unmount(mountPath, process):
+    subprocess.call([sys.executable, '-c', 'from girder.cli.mount import main; main()',
+                     mountPath, '-u', '-q'])
+    process.wait()
+
+
+def catAll(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            with open(os.path.join(root, name), 'rb') as f:
+                while True:
+                    data = f.read(1024 * 1024)
+                    if not data:
+                        break
+                    total += len(data)
+    return total
+
+
+def timed(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+def run(mountPath, path, database, options):
+    process = mount(mountPath, database, options)
+    try:
+        target = os.path.join(mountPath, path)
+        results = []
+        with open(os.devnull, 'w') as devnull:
+            for name, func in (
+                    ('find', lambda: subprocess.check_call(['find', target], stdout=devnull)),
+                    ('find -ls', lambda: subprocess.check_call(
+                        ['find', target, '-ls'], stdout=devnull)),
+                    ('cat', lambda: catAll(target))):
+                results.append((name, timed(func), timed(func)))
+        return results
+    finally:
+        unmount(mountPath, process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--database', required=True, help='The database URI to mount')
+    parser.add_argument('--path', default='user',
+                        help='The path within the mount to walk and read')
+    parser.add_argument('--cache-timeout', type=float, default=60,
+                        help='The metadata cache timeout of the cached configurations')
+    parser.add_argument('--block-cache', default=None,
+                        help='A directory for the block cache; it is emptied before use')
+    args = parser.parse_args()
+
+    configurations = [
+        ('uncached', ['--cache-timeout', '0']),
+        ('metadata cache', ['--cache-timeout', str(args.cache_timeout)]),
+    ]
+    if args.block_cache:
+        configurations.append(('block cache', [
+            '--cache-timeout', str(args.cache_timeout), '--block-cache', args.block_cache]))
+    mountPath = tempfile.mkdtemp()
+    try:
+        for configuration, options in configurations:
+            if args.block_cache and os.path.isdir(args.block_cache):
+                shutil.rmtree(args.block_cache)
+            for name, cold, warm in run(mountPath, args.path, args.database, options):
+                print('%-16s %-10s cold %7.2fs warm %7.2fs' % (configuration, name, cold, warm))
+    finally:
+        os.rmdir(mountPath)
+
+
+if __name__ == '__main__':
+    main()
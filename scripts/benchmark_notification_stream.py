@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure how many concurrent notification streams a Girder server supports.
+
+Opens the requested number of ``/notification/stream`` connections, waits for
+each one to receive its response headers, holds them open, and reports how
+many were established and how many were still open at the end. Run it against
+either the main Girder server or ``girder notificationd``, e.g.::
+
+    python benchmark_notification_stream.py --token <token> --connections 1000
+
+The client process needs a file descriptor limit above the connection count
+(see ``ulimit -n``).
+"""
+
+import argparse
+import selectors
+import socket
+import time
+from urllib.parse import urlparse
+
+
+def _openStreams(address, request, connections, connectTimeout):
+    """
+    Open the streams, returning the established sockets, the sockets that had
+    not received headers by the timeout, and the number of failures.
+    """
+    selector = selectors.DefaultSelector()
+    pending = {}
+    failed = 0
+    for _ in range(connections):
+        sock = socket.socket()
+        sock.setblocking(False)
+        sock.connect_ex(address)
+        selector.register(sock, selectors.EVENT_WRITE)
+        pending[sock] = b''
+
+    established = []
+    deadline = time.time() + connectTimeout
+    while pending and time.time() < deadline:
+        for key, mask in selector.select(max(0, deadline - time.time())):
+            sock = key.fileobj
+            try:
+                if mask & selectors.EVENT_WRITE:
+                    sock.sendall(request)
+                    selector.modify(sock, selectors.EVENT_READ)
+                    continue
+                data = sock.recv(4096)
+            except OSError:
+                data = b''
+            pending[sock] += data
+            if data and b'\r\n\r\n' not in pending[sock]:
+                continue
+            if pending[sock].startswith(b'HTTP/1.1 200'):
+                established.append(sock)
+            else:
+                failed += 1
+                sock.close()
+            selector.unregister(sock)
+            del pending[sock]
+    return established, list(pending), failed
+
+
+def _isOpen(sock):
+    sock.setblocking(False)
+    try:
+        return sock.recv(4096, socket.MSG_PEEK) != b''
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+
+
+def run(url, token, connections, hold, connectTimeout):
+    parsed = urlparse(url)
+    address = (parsed.hostname, parsed.port or 80)
+    request = ('GET %s/notification/stream?timeout=%d&token=%s HTTP/1.1\r\n'
+               'Host: %s\r\nAccept: text/event-stream\r\n\r\n' % (
+                   parsed.path.rstrip('/'), hold * 2 + connectTimeout, token,
+                   parsed.netloc)).encode('utf8')
+
+    start = time.time()
+    established, timedOut, failed = _openStreams(address, request, connections, connectTimeout)
+    setupTime = time.time() - start
+
+    time.sleep(hold)
+    stillOpen = sum(_isOpen(sock) for sock in established)
+    for sock in established + timedOut:
+        sock.close()
+
+    print('requested:    %d' % connections)
+    print('established:  %d in %.2fs' % (len(established), setupTime))
+    print('failed:       %d' % failed)
+    print('timed out:    %d' % len(timedOut))
+    print('open after %ds: %d' % (hold, stillOpen))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--url', default='http://localhost:8080/api/v1',
+                        help='The API root of the server')
+    parser.add_argument('--token', required=True, help='A Girder authentication token')
+    parser.add_argument('--connections', type=int, default=300,
+                        help='The number of streams to open')
+    parser.add_argument('--hold', type=int, default=10,
+                        help='Seconds to hold the streams open')
+    parser.add_argument('--connect-timeout', type=int, default=30,
+                        help='Seconds to wait for all streams to be established')
+    args = parser.parse_args()
+    run(args.url, args.token, args.connections, args.hold, args.connect_timeout)
+
+
+if __name__ == '__main__':
+    main()
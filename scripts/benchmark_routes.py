@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the per-request overhead of REST route dispatch.
+
+Registers a resource with routes shaped like those of the item resource plus
+``--plugin-routes`` more of the kind plugins add, and reports the time per call
+of matching a path with the compiled route trie, of matching it by scanning
+the routes in order (as Girder used to), and of ``handleRoute`` with a handler
+that does nothing, e.g.::
+
+    python benchmark_routes.py --plugin-routes 50 --count 100000
+"""
+
+import argparse
+import six
+import time
+
+from girder.api import access
+from girder.api.rest import Resource
+
+CORE_ROUTES = [
+    ('GET', ()), ('POST', ()), ('GET', (':id', )), ('PUT', (':id', )), ('DELETE', (':id', )),
+    ('GET', (':id', 'files')), ('GET', (':id', 'download')), ('GET', (':id', 'rootpath')),
+    ('PUT', (':id', 'metadata')), ('DELETE', (':id', 'metadata')), ('POST', (':id', 'copy')),
+    ('GET', ('query', )), ('GET', ('search', )),
+]
+PATHS = [
+    ('GET', ()), ('GET', ('5a0b1c2d3e4f5a6b7c8d9e0f', )),
+    ('GET', ('5a0b1c2d3e4f5a6b7c8d9e0f', 'download')), ('GET', ('search', )),
+    ('PUT', ('5a0b1c2d3e4f5a6b7c8d9e0f', 'metadata')),
+]
+
+
+class BenchmarkResource(Resource):
+    def __init__(self, pluginRoutes):
+        super(BenchmarkResource, self).__init__()
+        self.resourceName = 'benchmark'
+        routes = list(CORE_ROUTES)
+        for index in range(pluginRoutes):
+            routes.append(('GET', (':id', 'plugin%d' % index)))
+            routes.append(('POST', ('plugin%d' % index, ':id', 'action')))
+        for method, route in routes:
+            self.route(method, route, self.handler, nodoc=True)
+
+    @access.public
+    def handler(self, **kwargs):
+        return kwargs
+
+    def linearMatch(self, method, path):
+        for route, handler in self._routes[method][len(path)]:
+            wildcards = {}
+            for routeComponent, pathComponent in six.moves.zip(route, path):
+                if routeComponent[0] == ':':
+                    wildcards[routeComponent[1:]] = pathComponent
+                elif routeComponent != pathComponent:
+                    break
+            else:
+                return route, handler, wildcards
+
+
+def timed(func, paths, count):
+    start = time.time()
+    for _ in range(count):
+        for method, path in paths:
+            func(method, path)
+    return (time.time() - start) / count / len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--plugin-routes', type=int, default=50,
+                        help='The number of pairs of plugin routes to add')
+    parser.add_argument('--count', type=int, default=20000,
+                        help='The number of times to dispatch each path')
+    args = parser.parse_args()
+
+    resource = BenchmarkResource(args.plugin_routes)
+    paths = list(PATHS)
+    if args.plugin_routes:
+        # Plugin routes registered halfway and last
+        for index in (args.plugin_routes // 2, args.plugin_routes - 1):
+            paths.append(('GET', ('5a0b1c2d3e4f5a6b7c8d9e0f', 'plugin%d' % index)))
+            paths.append(('POST', ('plugin%d' % index, '5a0b1c2d3e4f5a6b7c8d9e0f', 'action')))
+    for name, func in (
+            ('trie match', lambda method, path: resource._matchRoute(method.lower(), path)),
+            ('linear match', lambda method, path: resource.linearMatch(method.lower(), path)),
+            ('handleRoute', lambda method, path: resource.handleRoute(method, path, {}))):
+        print('%-14s %8.2f us per request' % (name, timed(func, paths, args.count) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the throughput of zip archive generation with each compression mode.
+
+Generates text and random files in memory (or reads the files in a directory),
+streams them through girder.utility.ziputil.ZipGenerator with STORE, DEFLATE
+in the calling thread, DEFLATE on the thread pool, and AUTO, and reports the
+time taken, the input throughput, and the size of each archive, e.g.::
+
+    python benchmark_ziputil.py --files 200 --size 1048576 --text 0.5
+"""
+
+import argparse
+import os
+import random
+import time
+
+from girder.utility import ziputil
+
+CHUNK_SIZE = 65536
+
+
+def makeFiles(count, size, textFraction):
+    words = [b'alpha', b'beta', b'gamma', b'delta', b'1234', b'5.678', b'\n']
+    rng = random.Random(0)
+    text = b','.join(rng.choice(words) for _ in range(size // 4))[:size]
+    files = []
+    for index in range(count):
+        if index < count * textFraction:
+            files.append(('f%05d.csv' % index, text))
+        else:
+            files.append(('f%05d.bin' % index, os.urandom(size)))
+    return files
+
+
+def readFiles(path):
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            with open(os.path.join(root, name), 'rb') as f:
+                files.append((os.path.relpath(os.path.join(root, name), path), f.read()))
+    return files
+
+
+def stream(data):
+    def generator():
+        for start in range(0, len(data), CHUNK_SIZE):
+            yield data[start:start + CHUNK_SIZE]
+    return generator
+
+
+def run(files, compression, parallel):
+    zip = ziputil.ZipGenerator('benchmark', compression=compression, parallel=parallel)
+    size = 0
+    start = time.time()
+    for data in zip.addFiles((path, stream(data)) for path, data in files):
+        size += len(data)
+    size += len(zip.footer())
+    return time.time() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--path', default=None,
+                        help='A directory of files to archive instead of generated files')
+    parser.add_argument('--files', type=int, default=100,
+                        help='The number of files to generate')
+    parser.add_argument('--size', type=int, default=1024 * 1024,
+                        help='The size in bytes of each generated file')
+    parser.add_argument('--text', type=float, default=0.5,
+                        help='The fraction of generated files that are compressible text')
+    args = parser.parse_args()
+
+    files = readFiles(args.path) if args.path else makeFiles(args.files, args.size, args.text)
+    total = sum(len(data) for _, data in files)
+    print('%d files, %.1f MB, %d compression threads' % (
+        len(files), total / 1024.0 ** 2, ziputil.WORKERS))
+    for name, compression, parallel in (
+            ('store', ziputil.STORE, False),
+            ('deflate (1 thread)', ziputil.DEFLATE, False),
+            ('deflate', ziputil.DEFLATE, True),
+            ('auto', ziputil.AUTO, True)):
+        elapsed, size = run(files, compression, parallel)
+        print('%-20s %7.2fs %8.2f MB/s %8.1f MB (%.0f%%)' % (
+            name, elapsed, total / 1024.0 ** 2 / elapsed, size / 1024.0 ** 2,
+            100.0 * size / total))
+
+
+if __name__ == '__main__':
+    main()
@@ -69,6 +69,7 @@ installReqs = [
     'dogpile.cache',
     'filelock',
     'funcsigs ; python_version < \'3\'',
+    'futures ; python_version < \'3\'',
     'jsonschema',
     'Mako',
     'passlib [bcrypt,totp]',
@@ -78,6 +79,7 @@ installReqs = [
     'python-dateutil<2.7',  # required for compatibility with botocore=1.9.8
     'pytz',
     'requests',
+    'scandir ; python_version < \'3.5\'',
     'shutilwhich ; python_version < \'3\'',
     'six>=1.9',
 ]
@@ -168,6 +170,7 @@ setup(
             'girder-server = girder.cli.serve:main',
             'girder-install = girder.utility.install:main',
             'girder-sftpd = girder.cli.sftpd:main',
+            'girder-notificationd = girder.cli.notificationd:main',
             'girder-shell = girder.cli.shell:main',
             'girder = girder.cli:main'
         ],
@@ -175,7 +178,8 @@ setup(
             'serve = girder.cli.serve:main',
             'mount = girder.cli.mount:main',
             'shell = girder.cli.shell:main',
-            'sftpd = girder.cli.sftpd:main'
+            'sftpd = girder.cli.sftpd:main',
+            'notificationd = girder.cli.notificationd:main'
         ]
     }
 )
@@ -1,9 +1,13 @@
 import datetime
+import mock
 import pytest
 import six
+import time
 from girder import auditLogger
+from girder.exceptions import ValidationException
 from girder.models.file import File
 from girder.models.folder import Folder
+from girder.models.setting import Setting
 from girder.models.upload import Upload
 from girder.models.user import User
 
@@ -18,16 +22,24 @@ def recordModel():
 def freshLog():
     yield auditLogger
 
-    for handler in auditLogger.handlers:
+    for handler in list(auditLogger.handlers):
+        handler.close()
         auditLogger.removeHandler(handler)
 
 
+def _flush():
+    for handler in auditLogger.handlers:
+        handler.flush()
+
+
 @pytest.mark.plugin('audit_logs')
 def testAnonymousRestRequestLogging(server, recordModel, freshLog):
+    _flush()
     assert list(recordModel.find()) == []
 
     server.request('/user/me')
 
+    _flush()
     records = recordModel.find()
     assert records.count() == 1
     record = records[0]
@@ -48,6 +60,7 @@ def testFailedRestRequestLogging(server, recordModel, freshLog):
         'name': 'Foo',
         'parentId': 'foo'
     })
+    _flush()
     records = recordModel.find()
 
     assert records.count() == 1
@@ -64,8 +77,10 @@ def testFailedRestRequestLogging(server, recordModel, freshLog):
 
 @pytest.mark.plugin('audit_logs')
 def testAuthenticatedRestRequestLogging(server, recordModel, freshLog, admin):
+    _flush()
     recordModel.collection.remove({})  # Clear existing records
     server.request('/user/me', user=admin)
+    _flush()
     records = recordModel.find()
     assert records.count() == 1
     record = records[0]
@@ -82,10 +97,12 @@ def testDownloadLogging(server, recordModel, freshLog, admin, fsAssetstore):
         six.BytesIO(b'hello'), size=5, name='test', parentType='folder', parent=folder,
         user=admin, assetstore=fsAssetstore)
 
+    _flush()
     recordModel.collection.remove({})  # Clear existing records
 
     File().download(file, headers=False, offset=2, endByte=4)
 
+    _flush()
     records = recordModel.find()
 
     assert records.count() == 1
@@ -100,6 +117,7 @@ def testDownloadLogging(server, recordModel, freshLog, admin, fsAssetstore):
 @pytest.mark.plugin('audit_logs')
 def testDocumentCreationLogging(server, recordModel, freshLog):
     user = User().createUser('admin', 'password', 'first', 'last', 'a@a.com')
+    _flush()
     records = recordModel.find(sort=[('when', 1)])
     assert records.count() == 3
 
@@ -108,3 +126,61 @@ def testDocumentCreationLogging(server, recordModel, freshLog):
     assert records[1]['details']['collection'] == 'folder'
     assert records[2]['details']['collection'] == 'folder'
 
+
+@pytest.mark.plugin('audit_logs')
+def testRecordsAreBatched(server, recordModel, freshLog):
+    handler = freshLog.handlers[0]
+    _flush()
+    recordModel.collection.remove({})
+    with mock.patch.object(handler, 'batchSize', 3), \
+            mock.patch.object(handler, 'flushInterval', 60), \
+            mock.patch.object(recordModel.collection, 'insert_many',
+                              wraps=recordModel.collection.insert_many) as insertMany:
+        for _ in range(2):
+            server.request('/user/me')
+        assert recordModel.find().count() == 0
+
+        # A full batch is written by the background thread
+        server.request('/user/me')
+        for _ in range(50):
+            if recordModel.find().count():
+                break
+            time.sleep(0.1)
+        assert recordModel.find().count() == 3
+        insertMany.assert_called_once()
+
+    # Closing the handler writes what is queued
+    server.request('/user/me')
+    handler.close()
+    assert recordModel.find().count() == 4
+
+
+@pytest.mark.plugin('audit_logs')
+def testRecordsAreDropped(server, recordModel, freshLog):
+    handler = freshLog.handlers[0]
+    _flush()
+    recordModel.collection.remove({})
+    with mock.patch.object(handler, 'queueSize', 2), \
+            mock.patch.object(handler, 'flushInterval', 60), \
+            mock.patch.object(handler, 'overflow', 'drop'):
+        for _ in range(4):
+            server.request('/user/me')
+        assert handler.dropped == 2
+        _flush()
+    assert recordModel.find().count() == 2
+    assert handler.dropped == 0
+
+
+@pytest.mark.plugin('audit_logs')
+def testRetentionSetting(server, recordModel, freshLog):
+    assert 'when_1' in recordModel.collection.index_information()
+
+    with mock.patch.object(recordModel.collection, 'create_index') as createIndex:
+        Setting().set('audit_logs.retention_days', 30)
+    createIndex.assert_called_with('when', expireAfterSeconds=30 * 86400)
+
+    for key, value in (
+            ('audit_logs.retention_days', -1), ('audit_logs.batch_size', 0),
+            ('audit_logs.flush_interval', 'soon'), ('audit_logs.overflow', 'spill')):
+        with pytest.raises(ValidationException):
+            Setting().set(key, value)
@@ -0,0 +1,91 @@
+import datetime
+import mock
+import pytest
+import pytz
+import six
+
+from girder import events
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.upload import Upload
+from pytest_girder.assertions import assertStatus, assertStatusOk
+
+
+@pytest.fixture
+def counter():
+    from girder.plugins.download_statistics import downloadCounter
+    yield downloadCounter
+
+    # Each test loads the plugin again
+    for eventName in ('model.file.download.request', 'model.file.download.complete',
+                      'model.file.remove'):
+        events.unbind(eventName, 'download_statistics')
+
+
+@pytest.fixture
+def file(server, admin, fsAssetstore):
+    folder = Folder().find({'parentId': admin['_id'], 'name': 'Public'})[0]
+    yield Upload().uploadFromFile(
+        six.BytesIO(b'hello'), size=5, name='test', parentType='folder', parent=folder,
+        user=admin, assetstore=fsAssetstore)
+
+
+def _iso(dt):
+    return dt.replace(tzinfo=pytz.UTC).isoformat()
+
+
+def _download(server, file, **params):
+    resp = server.request('/file/%s/download' % file['_id'], params=params, isJson=False)
+    assertStatus(resp, 206 if params else 200)
+    for _ in resp.body:
+        pass
+
+
+@pytest.mark.plugin('download_statistics')
+def testDownloadCountsAreBuffered(server, admin, file, counter):
+    with mock.patch.object(File().collection, 'bulk_write',
+                           wraps=File().collection.bulk_write) as bulkWrite:
+        _download(server, file)
+        for offset in range(5):
+            _download(server, file, offset=offset, endByte=offset + 1)
+        assert 'downloadStatistics' not in File().load(file['_id'], force=True)
+
+        counter.flush()
+    bulkWrite.assert_called_once()
+
+    resp = server.request('/file/%s' % file['_id'], user=admin)
+    assertStatusOk(resp)
+    assert resp.json['downloadStatistics'] == {'started': 2, 'requested': 6, 'completed': 2}
+
+    _download(server, file)
+    counter.flush()
+    stats = File().load(file['_id'], force=True)['downloadStatistics']
+    assert stats == {'started': 3, 'requested': 7, 'completed': 3}
+
+
+@pytest.mark.plugin('download_statistics')
+def testDownloadHistory(server, admin, file, counter):
+    hour = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    day = hour.replace(hour=0)
+    counter._counts[(file['_id'], hour - datetime.timedelta(days=1))]['requested'] += 4
+    _download(server, file)
+    counter.flush()
+
+    resp = server.request('/file/%s/download_history' % file['_id'], user=admin)
+    assertStatusOk(resp)
+    assert [(doc['start'], doc.get('completed'), doc['requested']) for doc in resp.json] == [
+        (_iso(day - datetime.timedelta(days=1)), None, 4), (_iso(day), 1, 1)]
+
+    resp = server.request('/file/%s/download_history' % file['_id'], user=admin, params={
+        'interval': 'hour', 'start': _iso(hour)})
+    assertStatusOk(resp)
+    assert len(resp.json) == 1
+    assert resp.json[0]['start'] == _iso(hour)
+    assert resp.json[0]['expires'] == _iso(hour + datetime.timedelta(days=31))
+
+    # Counts of deleted files are discarded along with their history
+    _download(server, file)
+    File().remove(file)
+    counter.flush()
+    from girder.plugins.download_statistics import DownloadHistory
+    assert DownloadHistory().find({'fileId': file['_id']}).count() == 0
@@ -19,11 +19,19 @@
 import mock
 import pytest
 
+from bson.objectid import ObjectId
+from dogpile.cache.api import NO_VALUE
 from girder import _setupCache
-from girder.constants import SettingKey
+from girder.constants import AccessType, SettingKey, TokenScope
+from girder.exceptions import AccessException
+from girder.models.api_key import ApiKey
+from girder.models.collection import Collection
 from girder.models.setting import Setting
+from girder.models.token import Token
+from girder.models.user import User
 from girder.utility import config
-from girder.utility._cache import cache, requestCache
+from girder.utility._cache import cache, requestCache, cacheInvalidationChannel, \
+    CacheInvalidationChannel, LRUMemoryBackend
 
 
 @pytest.fixture
@@ -77,3 +85,146 @@ def testSettingsCache(db, enabledCache):
         setting.get(SettingKey.BRAND_NAME)
 
         findOneMock.assert_called_once()
+
+
+def testLRUMemoryBackend():
+    backend = LRUMemoryBackend({'max_size': 2})
+    backend.set('a', 1)
+    backend.set('b', 2)
+    assert backend.get('a') == 1
+    # 'b' is now the least recently used entry
+    backend.set('c', 3)
+    assert backend.get('b') is NO_VALUE
+    assert backend.get_multi(['a', 'c']) == [1, 3]
+    backend.delete_multi(['a'])
+    assert backend.get('a') is NO_VALUE
+
+    backend = LRUMemoryBackend({'ttl': 10})
+    with mock.patch('time.time', return_value=1000):
+        backend.set('a', 1)
+    with mock.patch('time.time', return_value=1005):
+        assert backend.get('a') == 1
+    with mock.patch('time.time', return_value=1011):
+        assert backend.get('a') is NO_VALUE
+
+
+def testModelLoadCache(db, enabledCache, admin):
+    user = User().load(admin['_id'], force=True)
+    user['firstName'] = 'mutated'
+
+    # Loads are served from the cache, and callers get their own copy
+    with mock.patch.object(User(), 'findOne') as findOneMock:
+        assert User().load(admin['_id'], force=True)['firstName'] == admin['firstName']
+        findOneMock.assert_not_called()
+
+    # Writes through the model invalidate the cached document
+    User().update({'_id': admin['_id']}, {'$set': {'firstName': 'Updated'}})
+    assert User().load(admin['_id'], force=True)['firstName'] == 'Updated'
+
+    user = User().load(admin['_id'], force=True)
+    user['firstName'] = 'Saved'
+    User().save(user)
+    assert User().load(admin['_id'], force=True)['firstName'] == 'Saved'
+
+    User().remove(user)
+    assert User().load(admin['_id'], force=True) is None
+
+
+def testWritesByIdDoNotReadDocuments(db, enabledCache, admin, user):
+    ids = [admin['_id'], user['_id']]
+    for id in ids:
+        User().load(id, force=True)
+    token = Token().createToken(user)
+    Token().load(token['_id'], force=True, objectId=False)
+
+    # Writes that select documents by _id and leave the other key fields alone
+    # take the affected documents from the query
+    with mock.patch.object(User().collection, 'find') as userFind, \
+            mock.patch.object(Token().collection, 'find') as tokenFind:
+        User().update({'_id': {'$in': ids}}, {'$set': {'firstName': 'Same'}})
+        Token().removeWithQuery({'_id': token['_id']})
+    userFind.assert_not_called()
+    tokenFind.assert_not_called()
+    for id in ids:
+        assert User().load(id, force=True)['firstName'] == 'Same'
+    assert Token().load(token['_id'], force=True, objectId=False) is None
+
+    # Other writes still read the fields their cache keys are computed from
+    assert User()._cachedDocuments({'_id': user['_id']}, {'$set': {'login': 'x'}}) == [
+        {'_id': user['_id'], 'login': user['login']}]
+    assert User()._cachedDocuments({'_id': user['_id']}) == [
+        {'_id': user['_id'], 'login': user['login']}]
+    setting = Setting().set(SettingKey.BRAND_NAME, 'Brand')
+    assert Setting()._cachedDocuments({'_id': setting['_id']}, {'$set': {'value': 'x'}}) == [
+        {'_id': setting['_id'], 'key': SettingKey.BRAND_NAME}]
+
+
+def testAclChangesInvalidateCache(db, enabledCache, admin, user):
+    collection = Collection().createCollection('shared', creator=admin, public=True)
+    Collection().setUserAccess(collection, user, AccessType.READ, save=True)
+    collection = Collection().load(collection['_id'], user=user, level=AccessType.READ)
+    assert collection['public'] is True
+
+    # Revoking access through the ACL methods is seen by the next load
+    with mock.patch.object(cacheInvalidationChannel, 'publish') as publishMock:
+        Collection().setUserAccess(collection, user, None, save=True)
+        Collection().setPublic(collection, False, save=True)
+    assert publishMock.call_count == 2
+    assert Collection()._cacheKey(collection['_id']) in publishMock.call_args[0][0]
+    collection = Collection().load(collection['_id'], force=True)
+    assert collection['public'] is False
+    assert user['_id'] not in [entry['id'] for entry in collection['access']['users']]
+    with pytest.raises(AccessException):
+        Collection().load(collection['_id'], user=user, level=AccessType.READ)
+
+
+def testCacheInvalidationChannel(db, enabledCache):
+    setting = Setting()
+    setting.set(SettingKey.BRAND_NAME, 'foo')
+    key = setting._cacheKey(SettingKey.BRAND_NAME, field='key')
+    channel = CacheInvalidationChannel(cache)
+    channel.sourceId = ObjectId()
+
+    # Messages published by this process are ignored
+    channel._receive({'keys': [key], 'source': channel.sourceId})
+    assert cache.get(key) is not NO_VALUE
+
+    channel._receive({'keys': [key], 'source': ObjectId()})
+    assert cache.get(key) is NO_VALUE
+
+    with mock.patch.object(cacheInvalidationChannel, 'publish') as publishMock:
+        setting.set(SettingKey.BRAND_NAME, 'bar')
+        publishMock.assert_called_once()
+        assert key in publishMock.call_args[0][0]
+
+
+def testTokenResolutionCache(db, enabledCache, admin):
+    tokenModel = Token()
+    token = tokenModel.createToken(admin)
+    stats = tokenModel.resolutionStats
+    hits, misses = stats['hits'], stats['misses']
+
+    assert tokenModel.loadWithUser(token['_id'])[1]['_id'] == admin['_id']
+    with mock.patch.object(tokenModel, 'findOne') as findOneMock:
+        resolved, user = tokenModel.loadWithUser(token['_id'])
+        findOneMock.assert_not_called()
+    assert resolved['_id'] == token['_id']
+    assert user['login'] == admin['login']
+    assert (stats['hits'], stats['misses']) == (hits + 1, misses + 1)
+
+    # Changing the user or the token invalidates the cached resolution
+    User().update({'_id': admin['_id']}, {'$set': {'firstName': 'Updated'}})
+    assert tokenModel.loadWithUser(token['_id'])[1]['firstName'] == 'Updated'
+    tokenModel.addScope(token, TokenScope.DATA_READ)
+    assert TokenScope.DATA_READ in tokenModel.loadWithUser(token['_id'])[0]['scope']
+    assert stats['misses'] == misses + 3
+
+    tokenModel.remove(token)
+    assert tokenModel.loadWithUser(token['_id']) == (None, None)
+
+    # Revoking an API key removes the resolutions of its tokens
+    apiKey = ApiKey().createApiKey(admin, name='test')
+    token = tokenModel.createToken(admin, apiKey=apiKey)
+    assert tokenModel.loadWithUser(token['_id'])[0] is not None
+    ApiKey().remove(apiKey)
+    assert tokenModel.loadWithUser(token['_id']) == (None, None)
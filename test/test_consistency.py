@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import pytest
+
+from girder.models.collection import Collection
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.user import User
+from girder.utility import consistency
+
+
+@pytest.fixture
+def hierarchy(admin):
+    collection = Collection().createCollection('c1', admin)
+    f1 = Folder().createFolder(collection, 'f1', parentType='collection')
+    f2 = Folder().createFolder(f1, 'f2')
+    f3 = Folder().createFolder(admin, 'f3', parentType='user')
+    i1 = Item().createItem('i1', admin, f1)
+    i2 = Item().createItem('i2', admin, f2)
+    i3 = Item().createItem('i3', admin, f3)
+    assetstore = {'_id': 0}
+    File().createFile(admin, i1, 'foo', 7, assetstore)
+    File().createFile(admin, i1, 'foo', 13, assetstore)
+    File().createFile(admin, i2, 'foo', 19, assetstore)
+    File().createFile(admin, i3, 'foo', 23, assetstore)
+    yield {
+        'collection': collection, 'f1': f1, 'f2': f2, 'f3': f3, 'i1': i1, 'i2': i2, 'i3': i3
+    }
+
+
+def _sizes(hierarchy, admin):
+    return {
+        'collection': Collection().load(hierarchy['collection']['_id'], force=True)['size'],
+        'user': User().load(admin['_id'], force=True)['size'],
+        'f1': Folder().load(hierarchy['f1']['_id'], force=True)['size'],
+        'f2': Folder().load(hierarchy['f2']['_id'], force=True)['size'],
+        'i1': Item().load(hierarchy['i1']['_id'], force=True)['size']
+    }
+
+
+def testConsistentDatabase(hierarchy):
+    assert consistency.checkConsistency() == {
+        'orphansRemoved': 0,
+        'ancestorsFixed': 0,
+        'baseParentsFixed': 0,
+        'sizesChanged': 0,
+        'contentReferencesFixed': 0
+    }
+
+
+def testRecalculateSizes(hierarchy, admin):
+    expected = _sizes(hierarchy, admin)
+    assert expected == {'collection': 39, 'user': 23, 'f1': 20, 'f2': 19, 'i1': 20}
+
+    Collection().update({}, {'$set': {'size': 0}})
+    Folder().update({'_id': hierarchy['f2']['_id']}, {'$set': {'size': 1}})
+    Item().update({'_id': hierarchy['i1']['_id']}, {'$set': {'size': 0}})
+    Folder().update({'_id': hierarchy['f1']['_id']}, {'$set': {'size': 0}})
+
+    # A dry run reports the differences, accounting for the item it would fix
+    results = consistency.checkConsistency(dryRun=True)
+    assert results['sizesChanged'] == 4
+    diffs = {(diff['model'], diff['_id']): diff['new'] for diff in results['diffs']}
+    assert diffs == {
+        ('item', hierarchy['i1']['_id']): 20,
+        ('folder', hierarchy['f1']['_id']): 20,
+        ('folder', hierarchy['f2']['_id']): 19,
+        ('collection', hierarchy['collection']['_id']): 39
+    }
+    assert _sizes(hierarchy, admin)['collection'] == 0
+
+    assert consistency.recalculateSizes() == 4
+    assert _sizes(hierarchy, admin) == expected
+    assert consistency.recalculateSizes() == 0
+
+
+def testFixBaseParents(hierarchy):
+    Item().update({'_id': hierarchy['i2']['_id']}, {'$set': {'baseParentId': None}})
+    Folder().update({'_id': hierarchy['f2']['_id']}, {'$set': {'baseParentType': 'user'}})
+
+    assert consistency.fixBaseParents(report=consistency.ConsistencyReport(True)) == 2
+    assert consistency.fixBaseParents() == 2
+    assert Item().load(hierarchy['i2']['_id'], force=True)['baseParentId'] == \
+        hierarchy['collection']['_id']
+    assert Folder().load(hierarchy['f2']['_id'], force=True)['baseParentType'] == 'collection'
+    assert consistency.fixBaseParents() == 0
+
+
+def testPruneOrphans(hierarchy, admin):
+    Folder().collection.delete_one({'_id': hierarchy['f1']['_id']})
+
+    report = consistency.ConsistencyReport(dryRun=True)
+    assert consistency.pruneOrphans(report=report) == 2
+    assert {diff['_id'] for diff in report.diffs} == {
+        hierarchy['f2']['_id'], hierarchy['i1']['_id']}
+
+    # Removing the orphaned folder and item also removes their descendants
+    assert consistency.pruneOrphans() == 2
+    assert Item().findOne({'_id': hierarchy['i2']['_id']}) is None
+    assert File().find({'itemId': {'$in': [
+        hierarchy['i1']['_id'], hierarchy['i2']['_id']]}}).count() == 0
+    assert consistency.pruneOrphans() == 0
+
+    File().collection.insert_one({'itemId': hierarchy['f1']['_id'], 'name': 'foo', 'size': 1})
+    assert consistency.pruneOrphans() == 1
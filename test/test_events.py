@@ -19,6 +19,7 @@
 
 import mock
 import pytest
+import threading
 import time
 
 from girder import events
@@ -162,3 +163,82 @@ def testForegroundDaemon(eventsHelper):
     assert eventsHelper.responses == ['foo']
 
     events.daemon.stop()
+
+
+def _waitFor(condition, timeout=15):
+    startTime = time.time()
+    while not condition() and time.time() - startTime < timeout:
+        time.sleep(0.05)
+    assert condition()
+
+
+def testAsyncEventsPool(eventsHelper):
+    pool = events.AsyncEventsPool(workers=3, concurrency={'_test.slow': 1})
+    release = threading.Event()
+    slowRunning = []
+
+    def slow(event):
+        slowRunning.append(event.info)
+        release.wait(15)
+
+    with events.bound('_test.slow', '_test.handler', slow), \
+            events.bound('_test.event', '_test.handler', eventsHelper._increment), \
+            events.bound('_test.failure', '_test.handler', eventsHelper._raiseException):
+        pool.start()
+        pool.trigger('_test.slow', 1)
+        pool.trigger('_test.slow', 2)
+        pool.trigger('_test.failure')
+        for _ in range(5):
+            pool.trigger('_test.event', {'amount': 1})
+
+        # Other events are handled while the slow one holds its only slot
+        _waitFor(lambda: eventsHelper.ctr == 5 and pool.stats()['failed'])
+        stats = pool.stats()
+        assert slowRunning == [1]
+        assert stats['running'] == {'_test.slow': 1}
+        assert stats['queued'] == {'_test.slow': 1}
+        assert stats['failed'] == {'_test.failure': 1}
+        assert stats['latency']['_test.event']['count'] == 5
+
+        release.set()
+        _waitFor(lambda: pool.stats()['handled'].get('_test.slow') == 2)
+        assert slowRunning == [1, 2]
+        pool.stop()
+        assert pool.stats()['workers'] == 0
+
+
+def testAsyncEventsPoolOverflow(db, eventsHelper):
+    pool = events.AsyncEventsPool(workers=1, queueSize=2, overflow=events.OVERFLOW_DROP)
+    for _ in range(3):
+        pool.trigger('_test.event', {'amount': 1})
+    assert pool.stats()['queued'] == {'_test.event': 2}
+    assert pool.stats()['dropped'] == {'_test.event': 1}
+
+    pool = events.AsyncEventsPool(workers=1, queueSize=2, overflow=events.OVERFLOW_SPILL)
+    for _ in range(5):
+        pool.trigger('_test.event', {'amount': 1})
+    assert pool.stats()['queued'] == {'_test.event': 2}
+    assert pool.stats()['spilled'] == {'_test.event': 3}
+
+    with events.bound('_test.event', '_test.handler', eventsHelper._increment):
+        pool.start()
+        _waitFor(lambda: eventsHelper.ctr == 5)
+        pool.stop()
+    assert pool.stats()['spilled'] == {}
+
+    # Events spilled by an earlier run are handled by a new pool once started
+    pool = events.AsyncEventsPool(workers=1, queueSize=2, overflow=events.OVERFLOW_SPILL)
+    for _ in range(5):
+        pool.trigger('_test.event', {'amount': 1})
+    pool = events.AsyncEventsPool(workers=1, queueSize=2, overflow=events.OVERFLOW_SPILL)
+    with events.bound('_test.event', '_test.handler', eventsHelper._increment):
+        pool.start()
+        _waitFor(lambda: eventsHelper.ctr == 8)
+        pool.stop()
+    assert pool.stats()['spilled'] == {}
+
+    # Without workers, blocking triggers queue past the limit rather than hang
+    pool = events.AsyncEventsPool(workers=1, queueSize=2)
+    for _ in range(3):
+        pool.trigger('_test.event', {'amount': 1})
+    assert pool.stats()['queued'] == {'_test.event': 3}
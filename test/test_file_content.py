@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import os
+import pytest
+import six
+
+from girder.models.file import File
+from girder.models.file_content import FileContent
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.upload import Upload
+from girder.utility import consistency
+
+
+@pytest.fixture
+def item(admin):
+    folder = Folder().createFolder(admin, 'folder', parentType='user', creator=admin)
+    yield Item().createItem('item', admin, folder)
+
+
+def _upload(item, user, data=b'data'):
+    return Upload().uploadFromFile(six.BytesIO(data), len(data), 'data.txt', 'item', item, user)
+
+
+def _refCount(file):
+    doc = FileContent().findOne({'assetstoreId': file['assetstoreId'], 'sha512': file['sha512']})
+    return doc and doc['refCount']
+
+
+def testFileContentReferences(fsAssetstore, admin, item):
+    first = _upload(item, admin)
+    second = _upload(item, admin)
+    path = File().getAssetstoreAdapter(first).fullPath(first)
+    assert second['path'] == first['path']
+    assert _refCount(first) == 2
+
+    copy = File().copyFile(first, admin)
+    assert _refCount(first) == 3
+
+    File().remove(first)
+    File().remove(second)
+    assert _refCount(copy) == 1
+    assert os.path.isfile(path)
+    assert b''.join(File().download(copy, headers=False)()) == b'data'
+
+    File().remove(copy)
+    assert _refCount(copy) is None
+    assert not os.path.isfile(path)
+
+    # Replacing the contents of a file moves its reference
+    file = _upload(item, admin)
+    upload = Upload().createUploadToFile(file, admin, 4)
+    file = Upload().handleChunk(upload, six.BytesIO(b'atad'))
+    assert _refCount(file) == 1
+    assert not os.path.isfile(path)
+
+
+def testFileContentWithoutCounts(fsAssetstore, admin, item):
+    # Content stored before references were counted is counted from its files
+    first = _upload(item, admin)
+    second = _upload(item, admin)
+    path = File().getAssetstoreAdapter(first).fullPath(first)
+    FileContent().collection.delete_many({})
+
+    File().remove(first)
+    assert _refCount(second) == 1
+    assert os.path.isfile(path)
+
+    FileContent().collection.delete_many({})
+    File().remove(second)
+    assert not os.path.isfile(path)
+
+
+def testFixContentReferences(fsAssetstore, admin, item):
+    first = _upload(item, admin)
+    _upload(item, admin)
+    other = _upload(item, admin, b'other')
+    FileContent().update({'sha512': first['sha512']}, {'$set': {'refCount': 5}})
+    FileContent().collection.delete_one({'sha512': other['sha512']})
+    FileContent().collection.insert_one({
+        'assetstoreId': fsAssetstore['_id'], 'sha512': 'missing', 'refCount': 1})
+
+    report = consistency.ConsistencyReport(dryRun=True)
+    assert consistency.fixContentReferences(report=report) == 3
+    assert sorted((diff['_id'], diff['old'], diff['new']) for diff in report.diffs) == sorted([
+        (first['sha512'], 5, 2), (other['sha512'], None, 1), ('missing', 1, None)])
+    assert _refCount(first) == 5
+
+    assert consistency.fixContentReferences() == 3
+    assert _refCount(first) == 2
+    assert _refCount(other) == 1
+    assert FileContent().findOne({'sha512': 'missing'}) is None
+    assert consistency.fixContentReferences() == 0
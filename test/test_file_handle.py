@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import mock
+import os
+import pytest
+import random
+import six
+
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.upload import Upload
+from girder.utility.abstract_assetstore_adapter import FileHandle
+
+DATA = os.urandom(1024 * 1024 + 123)
+
+
+class _Adapter(object):
+    def __init__(self):
+        self.requests = []
+
+    def downloadFile(self, file, offset=0, headers=True, endByte=None, **kwargs):
+        self.requests.append((offset, endByte))
+        end = file['size'] if endByte is None else endByte
+
+        def stream():
+            for start in range(offset, end, 10000):
+                yield DATA[start:min(start + 10000, end)]
+        return stream
+
+
+def testRandomAccess():
+    adapter = _Adapter()
+    handle = FileHandle({'size': len(DATA)}, adapter, blockSize=65536, cacheBlocks=4)
+    rng = random.Random(0)
+    for _ in range(500):
+        handle.seek(rng.randrange(len(DATA) + 10))
+        pos, size = handle.tell(), rng.randrange(-1, 200000)
+        expected = DATA[pos:] if size < 0 else DATA[pos:pos + size]
+        assert handle.read(size) == expected
+        assert handle.tell() == max(pos, min(pos + len(expected), len(DATA)))
+
+    buffer = bytearray(1000)
+    handle.seek(100)
+    assert handle.readinto(buffer) == 1000
+    assert buffer == DATA[100:1100]
+
+    # Random reads request only the blocks that they need, and cached blocks
+    # are not read again
+    adapter.requests = []
+    handle.seek(65536 * 3 + 10)
+    handle.read(10)
+    assert adapter.requests == [(65536 * 3, 65536 * 4)]
+    handle.seek(65536 * 3 + 100)
+    handle.read(10)
+    assert len(adapter.requests) == 1
+
+
+def testSequentialReadAhead():
+    adapter = _Adapter()
+    handle = FileHandle({'size': len(DATA)}, adapter, blockSize=65536)
+    data = []
+    while True:
+        chunk = handle.read(50000)
+        if not chunk:
+            break
+        data.append(chunk)
+    assert b''.join(data) == DATA
+    # After the first read, one stream is read for the rest of the file
+    assert adapter.requests == [(0, 65536), (65536, None)]
+
+
+def testFilesystemPread(server, admin, fsAssetstore):
+    folder = Folder().find({'parentId': admin['_id'], 'name': 'Public'})[0]
+    file = Upload().uploadFromFile(
+        six.BytesIO(DATA), size=len(DATA), name='data', parentType='folder',
+        parent=folder, user=admin, assetstore=fsAssetstore)
+
+    with mock.patch.object(File().getAssetstoreAdapter(file).__class__, 'downloadFile') as \
+            downloadFile, File().open(file) as handle:
+        handle.seek(-1000, os.SEEK_END)
+        assert handle.read() == DATA[-1000:]
+        handle.seek(500000)
+        assert handle.read(10) == DATA[500000:500010]
+    downloadFile.assert_not_called()
+    assert handle._fd is None
+
+    # Handles that are never closed do not leak their file descriptor
+    handle = File().open(file)
+    fd = handle._fd
+    os.fstat(fd)
+    del handle
+    with pytest.raises(OSError):
+        os.fstat(fd)
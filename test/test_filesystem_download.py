@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import mock
+import os
+import pytest
+import six
+
+from girder import events
+from girder.models.folder import Folder
+from girder.models.upload import Upload
+from girder.utility import config
+from pytest_girder.assertions import assertStatus
+
+DATA = b''.join(b'%08d' % i for i in range(1000))
+
+
+@pytest.fixture
+def file(server, admin, fsAssetstore):
+    folder = Folder().find({'parentId': admin['_id'], 'name': 'Public'})[0]
+    yield Upload().uploadFromFile(
+        six.BytesIO(DATA), size=len(DATA), name='data.txt', parentType='folder',
+        parent=folder, user=admin, assetstore=fsAssetstore, mimeType='text/plain')
+
+
+def _download(server, file, status=200, headers=None, **params):
+    resp = server.request('/file/%s/download' % file['_id'], params=params, isJson=False,
+                          additionalHeaders=headers or [])
+    assertStatus(resp, status)
+    return resp, b''.join(resp.body)
+
+
+def _downloads(**options):
+    return mock.patch.dict(config.getConfig(), {'downloads': options})
+
+
+def testBufferSize(server, file):
+    with _downloads(buffer_size=1000):
+        resp = server.request('/file/%s/download' % file['_id'], isJson=False)
+        assert [len(chunk) for chunk in resp.body] == [1000] * 8
+
+    resp, body = _download(server, file, 206, headers=[('Range', 'bytes=100-2099')])
+    assert body == DATA[100:2100]
+    assert resp.headers['Content-Range'] == 'bytes 100-2099/8000'
+
+
+def testXSendfile(server, file, fsAssetstore):
+    path = os.path.join(fsAssetstore['root'], file['path'])
+    handler = mock.MagicMock()
+    with _downloads(sendfile='x-sendfile'), \
+            events.bound('model.file.download.complete', 'test', handler):
+        resp, body = _download(server, file)
+        assert body == b''
+        assert resp.headers['X-Sendfile'] == path
+        assert resp.headers['Content-Type'].startswith('text/plain')
+        assert 'filename="data.txt"' in resp.headers['Content-Disposition']
+        assert handler.call_count == 1
+
+        # The web server applies a single range
+        resp, body = _download(server, file, headers=[('Range', 'bytes=100-199')])
+        assert body == b''
+        assert resp.headers['X-Sendfile'] == path
+        assert 'Content-Range' not in resp.headers
+
+        # Ranges given by parameters are sent by Girder
+        resp, body = _download(server, file, 206, offset=100, endByte=200)
+        assert body == DATA[100:200]
+        assert 'X-Sendfile' not in resp.headers
+        resp, body = _download(server, file, 206, headers=[('Range', 'bytes=0-9,20-29')])
+        assert body == DATA[:10]
+        assert 'X-Sendfile' not in resp.headers
+
+
+def testXAccelRedirect(server, file, fsAssetstore):
+    with _downloads(sendfile='x-accel-redirect', sendfile_paths={
+            fsAssetstore['root']: '/protected/assetstore/'}):
+        resp, body = _download(server, file)
+        assert body == b''
+        assert resp.headers['X-Accel-Redirect'] == '/protected/assetstore/' + file['path']
+
+    # Files outside the mapped directories are sent by Girder
+    with _downloads(sendfile='x-accel-redirect', sendfile_paths={'/elsewhere': '/protected'}):
+        resp, body = _download(server, file)
+        assert body == DATA
+        assert 'X-Accel-Redirect' not in resp.headers
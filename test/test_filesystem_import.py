@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import mock
+import os
+import pytest
+
+from girder import events
+from girder.exceptions import ValidationException
+from girder.models.assetstore import Assetstore
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.user import User
+from girder.utility.bulk_import import BulkImport
+from girder.utility.progress import noProgress
+
+
+@pytest.fixture
+def tree(tmpdir):
+    root = tmpdir.mkdir('tree')
+    root.join('top').write('1')
+    a = root.mkdir('a')
+    a.join('skip.tmp').write('')
+    for i in range(5):
+        a.join('k%d' % i).write('abc')
+    a.mkdir('b').join('deep').write('22')
+    yield root
+
+
+def _import(assetstore, parent, user, path, parentType='folder', leafFoldersAsItems=False,
+            **params):
+    imported = []
+    # Small batches exercise the splitting of large directories
+    with mock.patch.object(BulkImport, 'BATCH_SIZE', 2), events.bound(
+            'filesystem_assetstore_imported', 'test',
+            lambda event: imported.append((event.info['type'], event.info['importPath']))):
+        Assetstore().importData(
+            assetstore, parent=parent, parentType=parentType, params=dict(params, importPath=path),
+            progress=noProgress, user=user, leafFoldersAsItems=leafFoldersAsItems)
+    return imported
+
+
+@pytest.mark.parametrize('jobs', [None, 4])
+def testFilesystemImport(fsAssetstore, admin, tree, jobs):
+    dest = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+
+    imported = _import(
+        fsAssetstore, dest, admin, str(tree), fileExcludeRegex=r'.*\.tmp$', jobs=jobs)
+
+    a = Folder().findOne({'parentId': dest['_id'], 'name': 'a'})
+    b = Folder().findOne({'parentId': a['_id'], 'name': 'b'})
+    assert b['ancestors'] == [dest['_id'], a['_id']]
+    assert sorted(item['name'] for item in Folder().childItems(a)) == [
+        'k0', 'k1', 'k2', 'k3', 'k4']
+    item = Item().findOne({'folderId': b['_id']})
+    assert item['name'] == 'deep'
+    assert item['size'] == 2
+    file = File().findOne({'itemId': item['_id']})
+    assert file['path'] == str(tree.join('a', 'b', 'deep'))
+    assert file['mtime'] == tree.join('a', 'b', 'deep').mtime()
+    assert file['imported']
+    assert b''.join(File().download(file, headers=False)()) == b'22'
+    assert Folder().load(a['_id'], force=True)['size'] == 15
+    assert Folder().load(dest['_id'], force=True)['size'] == 1
+    assert User().load(admin['_id'], force=True)['size'] == 18
+    assert sorted(imported) == sorted(
+        [('folder', str(tree.join('a'))), ('folder', str(tree.join('a', 'b')))] +
+        [('item', str(tree.join(name))) for name in ('top', 'a/b/deep')] +
+        [('item', str(tree.join('a', 'k%d' % i))) for i in range(5)])
+
+    # Importing again only writes the files that changed
+    tree.join('a', 'k0').write('abcdef')
+    fileCount = File().find().count()
+    with mock.patch.object(File().collection, 'insert_many') as insertMany:
+        imported = _import(
+            fsAssetstore, dest, admin, str(tree), fileExcludeRegex=r'.*\.tmp$', jobs=jobs)
+    insertMany.assert_not_called()
+    assert File().find().count() == fileCount
+    assert sorted(imported) == [
+        ('folder', str(tree.join('a'))), ('folder', str(tree.join('a', 'b'))),
+        ('item', str(tree.join('a', 'k0')))]
+    item = Item().findOne({'folderId': a['_id'], 'name': 'k0'})
+    assert item['size'] == 6
+    assert File().findOne({'itemId': item['_id']})['size'] == 6
+    assert Folder().load(a['_id'], force=True)['size'] == 18
+
+
+def testFilesystemImportLeafFoldersAsItems(fsAssetstore, admin, tree):
+    dest = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+    tree.mkdir('empty')
+
+    _import(fsAssetstore, dest, admin, str(tree), leafFoldersAsItems=True)
+
+    a = Folder().findOne({'parentId': dest['_id'], 'name': 'a'})
+    assert sorted(item['name'] for item in Folder().childItems(a)) == [
+        'b', 'k0', 'k1', 'k2', 'k3', 'k4', 'skip.tmp']
+    b = Item().findOne({'folderId': a['_id'], 'name': 'b'})
+    assert [file['name'] for file in Item().childFiles(b)] == ['deep']
+    assert b['size'] == 2
+    empty = Item().findOne({'folderId': dest['_id'], 'name': 'empty'})
+    assert empty['size'] == 0
+
+    # A directory of files is imported as a single item
+    leaf = Folder().createFolder(admin, 'leaf', parentType='user', creator=admin)
+    _import(fsAssetstore, leaf, admin, str(tree.join('a', 'b')), leafFoldersAsItems=True)
+    items = list(Folder().childItems(leaf))
+    assert [item['name'] for item in items] == ['b']
+    assert [file['name'] for file in Item().childFiles(items[0])] == ['deep']
+
+
+def testFilesystemImportErrors(fsAssetstore, admin, tree):
+    with pytest.raises(ValidationException, match='Not found'):
+        _import(fsAssetstore, admin, admin, str(tree.join('missing')), parentType='user')
+    with pytest.raises(ValidationException, match='directly underneath a user'):
+        _import(fsAssetstore, admin, admin, str(tree), parentType='user')
+
+    # Files with the same name as a folder get a unique item name
+    dest = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+    Folder().createFolder(dest, 'top', creator=admin)
+    _import(fsAssetstore, dest, admin, str(tree))
+    assert [item['name'] for item in Folder().childItems(dest)] == ['top (1)']
+    assert os.path.basename(File().findOne({'name': 'top'})['path']) == 'top'
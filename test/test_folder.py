@@ -17,6 +17,7 @@
 #  limitations under the License.
 ###############################################################################
 
+import mock
 import pytest
 from bson.objectid import ObjectId
 
@@ -149,3 +150,142 @@ def testGetResourcePathForNoneUser(server, parentChain):
                           method='GET', user=None,
                           params={'type': 'folder'})
     assertStatus(resp, 401)
+
+
+def testAncestorsMaintained(parentChain, admin):
+    from girder.models.item import Item
+
+    F1, F2, F3, F4 = (parentChain[key] for key in (
+        'folder1', 'folder2', 'privateFolder', 'folder4'))
+    assert F1['ancestors'] == []
+    assert F4['ancestors'] == [F1['_id'], F2['_id'], F3['_id']]
+    item = Item().createItem('item', admin, F4)
+    assert item['ancestors'] == F4['ancestors'] + [F4['_id']]
+
+    # Moving a folder rewrites the ancestors of its whole subtree
+    F3 = Folder().move(F3, admin, 'user')
+    assert F3['ancestors'] == []
+    assert Folder().load(F4['_id'], force=True)['ancestors'] == [F3['_id']]
+    assert Item().load(item['_id'], force=True)['ancestors'] == [F3['_id'], F4['_id']]
+
+    item = Item().move(item, F1)
+    assert item['ancestors'] == [F1['_id']]
+
+
+def testAncestorQueries(parentChain, admin, user):
+    from girder.constants import AccessType
+    from girder.models.item import Item
+
+    F1, F2, F3, F4 = (parentChain[key] for key in (
+        'folder1', 'folder2', 'privateFolder', 'folder4'))
+    for folder in (F1, F2, F3, F4):
+        Item().createItem('item', admin, folder)
+
+    assert Folder()._isAncestor(F1, F4)
+    assert not Folder()._isAncestor(F4, F1)
+    assert Folder().subtreeCount(F1) == 8
+    assert Folder().subtreeCount(F1, includeItems=False) == 4
+    # The private folder hides itself and everything underneath it
+    assert Folder().subtreeCount(F1, user=user, level=AccessType.READ) == 4
+
+    Folder().update({'_id': {'$in': [F1['_id'], F4['_id']]}}, {'$set': {'size': 5}})
+    assert Folder().getSizeRecursive(F1) == 10
+
+
+def testRebuildAncestors(parentChain, admin):
+    from girder.models.item import Item
+
+    F4 = parentChain['folder4']
+    item = Item().createItem('item', admin, F4)
+    Folder().update({}, {'$unset': {'ancestors': ''}})
+    Item().update({}, {'$set': {'ancestors': []}})
+
+    # Every folder and the item are fixed
+    assert Folder().rebuildAncestors() == Folder().find().count() + 1
+    assert Folder().findOne({'_id': F4['_id']})['ancestors'] == F4['ancestors']
+    assert Item().findOne({'_id': item['_id']})['ancestors'] == F4['ancestors'] + [F4['_id']]
+    assert Folder().rebuildAncestors() == 0
+
+
+def testSubtreeOperationsMigrateAncestors(parentChain, admin):
+    from girder.constants import SettingKey
+    from girder.models.collection import Collection
+    from girder.models.item import Item
+    from girder.models.setting import Setting
+
+    F1, F4 = parentChain['folder1'], parentChain['folder4']
+    item = Item().createItem('item', admin, F4)
+    collection = Collection().createCollection('target', creator=admin)
+    # An upgraded database whose folders and items have not been loaded
+    Folder().update({}, {'$unset': {'ancestors': ''}})
+    Item().update({}, {'$unset': {'ancestors': ''}})
+    Folder()._ancestorsMigrated = False
+    Setting().unset(SettingKey.ANCESTORS_MIGRATED)
+
+    assert Folder().subtreeCount(F1) == 5
+    assert Setting().get(SettingKey.ANCESTORS_MIGRATED) is True
+    Folder().move(Folder().findOne({'_id': F1['_id']}), collection, 'collection')
+    for model, doc in ((Folder(), F4), (Item(), item)):
+        doc = model.findOne({'_id': doc['_id']})
+        assert doc['baseParentType'] == 'collection'
+        assert doc['baseParentId'] == collection['_id']
+        assert doc['ancestors'][0] == F1['_id']
+
+    # Once the migration is recorded, documents the rebuild cannot reach, such
+    # as orphans, do not make later processes run it again
+    Item().update({'_id': item['_id']}, {'$unset': {'ancestors': ''}})
+    Folder()._ancestorsMigrated = False
+    with mock.patch.object(Folder, 'rebuildAncestors') as rebuildAncestors:
+        Folder().subtreeCount(F1)
+    rebuildAncestors.assert_not_called()
+
+
+def testFolderManifest(server, parentChain, admin, user, fsAssetstore):
+    import datetime
+    import json
+    import six
+    import time
+    from girder.models.item import Item
+    from girder.models.upload import Upload
+    from pytest_girder.utils import getResponseBody
+
+    F1, F2, F3, F4 = (parentChain[key] for key in (
+        'folder1', 'folder2', 'privateFolder', 'folder4'))
+    for folder in (F1, F2, F3, F4):
+        item = Item().createItem('item', admin, folder)
+        Upload().uploadFromFile(six.BytesIO(b'data'), 4, 'data.txt', 'item', item, admin)
+
+    def manifest(user, **params):
+        resp = server.request(path='/folder/%s/manifest' % F1['_id'], user=user,
+                              params=params, isJson=False)
+        assertStatusOk(resp)
+        assert resp.headers['Content-Type'] == 'application/x-ndjson'
+        return [json.loads(line) for line in getResponseBody(resp).splitlines()]
+
+    records = manifest(admin)
+    assert [(r['type'], r['path']) for r in records[:4]] == [
+        ('folder', ''), ('folder', 'F2'), ('folder', 'F2/F3'), ('folder', 'F2/F3/F4')]
+    assert records[1]['parentId'] == str(F1['_id'])
+    # Each item is followed by its files
+    assert sorted((r['path'], n['path'], n['size']) for r, n in zip(records[4::2], records[5::2])
+                  if r['_id'] == n['itemId']) == [
+        ('F2/F3/F4/item', 'F2/F3/F4/item/data.txt', 4),
+        ('F2/F3/item', 'F2/F3/item/data.txt', 4),
+        ('F2/item', 'F2/item/data.txt', 4),
+        ('item', 'item/data.txt', 4)]
+
+    # The private folder is omitted with everything underneath it
+    records = manifest(user)
+    assert sorted(r['path'] for r in records) == [
+        '', 'F2', 'F2/item', 'F2/item/data.txt', 'item', 'item/data.txt']
+
+    # Only changed folders and items are listed, along with the root
+    since = datetime.datetime.utcnow()
+    # The database stores times to the millisecond
+    time.sleep(0.01)
+    Folder().updateFolder(F4)
+    item = Item().findOne({'folderId': F2['_id']})
+    Upload().uploadFromFile(six.BytesIO(b'new data'), 8, 'new.txt', 'item', item, admin)
+    records = manifest(admin, modifiedSince=since.isoformat() + 'Z')
+    assert [r['path'] for r in records] == [
+        '', 'F2/F3/F4', 'F2/item', 'F2/item/data.txt', 'F2/item/new.txt']
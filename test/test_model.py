@@ -333,3 +333,59 @@ class TestAccessControlCleanup(object):
         assert len(doc1['access']['users']) == 2
         assert len(doc1['access']['groups']) == 0
         assert doc1.get('creatorId') is not None
+
+
+@pytest.fixture
+def permissionDocs(admin, user, group, FakeAcModel):
+    model = FakeAcModel()
+    docs = []
+    for i in range(4):
+        docs.append(model.save({'index': i}))
+    model.setPublic(docs[0], True, save=True)
+    model.setUserAccess(docs[1], user, level=AccessType.READ, flags='flag1', save=True)
+    model.setGroupAccess(docs[2], group, level=AccessType.WRITE, save=True)
+    model.setPublicFlags(docs[2], ['flag1'], user=admin, save=True)
+    yield docs
+
+
+class TestPermissionQueries(object):
+    def _expected(self, model, docs, user, level, flags=None):
+        return [doc['index'] for doc in docs
+                if model.hasAccess(doc, user=user, level=level) and
+                model.hasAccessFlags(doc, user=user, flags=flags)]
+
+    @pytest.mark.parametrize('level', [AccessType.READ, AccessType.WRITE, AccessType.ADMIN])
+    @pytest.mark.parametrize('flags', [None, 'flag1'])
+    def testQueryMatchesHasAccess(self, admin, user, permissionDocs, FakeAcModel, level, flags):
+        model = FakeAcModel()
+        user = User().load(user['_id'], force=True)
+        for checkUser in (None, user, admin):
+            docs = list(model.find({}, sort=[('index', 1)]))
+            expected = self._expected(model, docs, checkUser, level, flags)
+            results = model.findWithPermissions(
+                {}, sort=[('index', 1)], user=checkUser, level=level, flags=flags)
+            assert [doc['index'] for doc in results] == expected
+            assert model.countWithPermissions(
+                {}, user=checkUser, level=level, flags=flags) == len(expected)
+
+    def testOffsetAndLimit(self, user, permissionDocs, FakeAcModel):
+        model = FakeAcModel()
+        user = User().load(user['_id'], force=True)
+        results = model.findWithPermissions(
+            {}, sort=[('index', 1)], user=user, offset=1, limit=1)
+        assert [doc['index'] for doc in results] == [1]
+        results = model.findWithPermissions(
+            {'index': {'$gt': 0}}, sort=[('index', 1)], user=user)
+        assert [doc['index'] for doc in results] == [1, 2]
+
+    def testFallbackForOverriddenHasAccess(self, user, permissionDocs, FakeAcModel):
+        class OverrideModel(FakeAcModel):
+            def hasAccess(self, doc, user=None, level=AccessType.READ):
+                return doc['index'] % 2 == 1
+
+        model = OverrideModel()
+        assert not model._canQueryPermissions()
+        assert FakeAcModel()._canQueryPermissions()
+        results = model.findWithPermissions({}, sort=[('index', 1)], user=user)
+        assert [doc['index'] for doc in results] == [1, 3]
+        assert model.countWithPermissions({}, user=user) == 2
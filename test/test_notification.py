@@ -17,10 +17,17 @@
 #  limitations under the License.
 ###############################################################################
 
+import calendar
 import datetime
+import json
 import pytest
+import socket
+import threading
 from pytest_girder.assertions import assertStatus, assertStatusOk
+from pytest_girder.utils import getResponseBody
 from girder.models.notification import Notification
+from girder.models.token import Token
+from girder.utility.notification_broker import NotificationBroker
 
 OLD_TIME = datetime.datetime.utcnow() - datetime.timedelta(days=3)
 SINCE = OLD_TIME + datetime.timedelta(days=1)
@@ -56,3 +63,97 @@ def testListNotificationsSinceTime(server, user, notifications):
 def testListNotificationsAuthError(server):
     resp = server.request(path='/notification')
     assertStatus(resp, 401)
+
+
+def _sseMessages(resp):
+    body = getResponseBody(resp).strip()
+    return [json.loads(m[len('data: '):]) for m in body.split('\n\n')] if body else []
+
+
+def testStreamReturnsBacklog(server, user, notifications):
+    resp = server.request(path='/notification/stream', user=user, isJson=False,
+                          params={'timeout': 0})
+    assertStatusOk(resp)
+    assert {m['_id'] for m in _sseMessages(resp)} == {str(n['_id']) for n in notifications}
+
+
+def testStreamPushesNewNotifications(server, user):
+    timer = threading.Timer(0.2, Notification().createNotification, ('pushed', {}, user))
+    timer.start()
+    resp = server.request(path='/notification/stream', user=user, isJson=False,
+                          params={'timeout': 1})
+    assertStatusOk(resp)
+    messages = _sseMessages(resp)
+    timer.join()
+    assert [m['type'] for m in messages] == ['pushed']
+
+
+def testBrokerFanOut(db, user, admin):
+    broker = NotificationBroker()
+    first = broker.subscribe(user)
+    second = broker.subscribe(user)
+    other = broker.subscribe(admin)
+
+    notification = Notification().initProgress(user, 'title')
+    broker.publish(notification)
+    # The same version of a notification is only delivered once
+    broker.publish(notification)
+    assert [n['_id'] for n in first.wait(0)] == [notification['_id']]
+    assert [n['_id'] for n in second.wait(0)] == [notification['_id']]
+    assert other.wait(0) == []
+
+    notification = Notification().updateProgress(notification, message='changed')
+    second.close()
+    broker.publish(notification)
+    assert first.wait(0)[0]['updated'] == notification['updated']
+    assert second.wait(0) == []
+
+
+@pytest.fixture
+def streamServer(server):
+    from girder.api.notification_stream import NotificationStreamServer
+
+    streamServer = NotificationStreamServer(('127.0.0.1', 0))
+    thread = threading.Thread(target=streamServer.serve_forever)
+    thread.start()
+
+    yield streamServer
+
+    streamServer.shutdown()
+    thread.join()
+    streamServer.server_close()
+
+
+def _streamRequest(streamServer, query):
+    sock = socket.create_connection(streamServer.address)
+    sock.sendall(('GET /api/v1/notification/stream?%s HTTP/1.1\r\n\r\n' % query).encode('utf8'))
+    return sock
+
+
+def _readAll(sock):
+    data = b''
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            return data.decode('utf8')
+        data += chunk
+
+
+def testStreamServer(streamServer, user, notifications):
+    token = Token().createToken(user)
+
+    sock = _streamRequest(streamServer, 'timeout=0')
+    assert _readAll(sock).startswith('HTTP/1.1 401')
+
+    sock = _streamRequest(streamServer, 'timeout=0&token=%s' % token['_id'])
+    head, body = _readAll(sock).split('\r\n\r\n', 1)
+    assert head.startswith('HTTP/1.1 200')
+    assert 'Content-Type: text/event-stream' in head
+    assert body.count('data: ') == len(notifications)
+
+    since = calendar.timegm(SINCE.timetuple())
+    sock = _streamRequest(streamServer, 'timeout=1&since=%d&token=%s' % (since, token['_id']))
+    threading.Timer(0.2, Notification().createNotification, ('pushed', {}, user)).start()
+    messages = [json.loads(m[len('data: '):])
+                for m in _readAll(sock).split('\r\n\r\n', 1)[1].strip().split('\n\n')]
+    assert [m['type'] for m in messages] == ['type', 'pushed']
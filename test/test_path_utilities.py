@@ -1,5 +1,10 @@
+import mock
 import pytest
-from girder.utility import path
+
+from girder import _setupCache
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.utility import config, path
 
 
 @pytest.mark.parametrize('raw,encoded', [
@@ -33,3 +38,78 @@ def testCodec(raw, encoded):
 def testSplitAndJoin(pth, tokens):
     assert path.split(pth) == tokens
     assert path.join(tokens) == pth
+
+
+@pytest.fixture
+def enabledCache():
+    cfg = config.getConfig()
+    cfg['cache']['enabled'] = True
+    _setupCache()
+
+    yield
+
+    cfg['cache']['enabled'] = False
+    _setupCache()
+
+
+@pytest.fixture
+def hierarchy(admin):
+    folder = Folder().createFolder(admin, 'folder', parentType='user', creator=admin)
+    item = Item().createItem('item', admin, folder)
+    yield folder, item
+
+
+def testLookUpPathCache(admin, hierarchy, enabledCache):
+    folder, item = hierarchy
+    itemPath = '/user/%s/folder/item' % admin['login']
+    assert path.lookUpPath(itemPath, admin)['document']['_id'] == item['_id']
+
+    # Each part of a cached path is loaded by its ID from its own collection
+    with mock.patch.object(Folder(), 'findOne', wraps=Folder().findOne) as folderFind, \
+            mock.patch.object(Item(), 'findOne', wraps=Item().findOne) as itemFind:
+        assert path.lookUpPath(itemPath, admin)['document']['_id'] == item['_id']
+    folderFind.assert_any_call(
+        {'name': 'folder', 'parentId': admin['_id'], 'parentCollection': 'user',
+         '_id': folder['_id']})
+    itemFind.assert_called_once_with(
+        {'name': 'item', 'folderId': folder['_id'], '_id': item['_id']})
+    # The item is not searched for among the folders
+    assert all('_id' in call[0][0] for call in folderFind.call_args_list)
+
+    # Missing paths are cached, until something is created there
+    newPath = '/user/%s/folder/new' % admin['login']
+    assert path.lookUpPath(newPath, admin, test=True)['document'] is None
+    with mock.patch.object(Item(), 'findOne') as itemFind:
+        assert path.lookUpPath(newPath, admin, test=True)['document'] is None
+    itemFind.assert_not_called()
+    newItem = Item().createItem('new', admin, folder)
+    assert path.lookUpPath(newPath, admin)['document']['_id'] == newItem['_id']
+
+
+def testLookUpPathCacheInvalidation(admin, hierarchy, enabledCache):
+    folder, item = hierarchy
+    root = '/user/%s/' % admin['login']
+    other = Folder().createFolder(admin, 'other', parentType='user', creator=admin)
+    assert path.lookUpPath(root + 'folder/item', admin)['document']['_id'] == item['_id']
+    assert path.lookUpPath(root + 'other/item', admin, test=True)['document'] is None
+
+    Item().move(item, other)
+    assert path.lookUpPath(root + 'folder/item', admin, test=True)['document'] is None
+    assert path.lookUpPath(root + 'other/item', admin)['document']['_id'] == item['_id']
+
+    Folder().updateFolder(dict(folder, name='renamed'))
+    assert path.lookUpPath(root + 'folder', admin, test=True)['document'] is None
+    assert path.lookUpPath(root + 'renamed', admin)['document']['_id'] == folder['_id']
+
+    assert path.lookUpPath(root + 'other/sub', admin, test=True)['document'] is None
+    sub = Folder().createFolder(other, 'sub', creator=admin)
+    assert path.lookUpPath(root + 'other/sub', admin)['document']['_id'] == sub['_id']
+
+    Folder().remove(other)
+    assert path.lookUpPath(root + 'other', admin, test=True)['document'] is None
+
+    # Updates that don't change names or parents don't look up documents
+    assert Folder()._cachedDocuments({}, {'$inc': {'size': 1}}) == []
+    assert Folder()._cachedDocuments({'_id': folder['_id']}, {'$set': {'name': 'x'}}) == [
+        {'_id': folder['_id'], 'parentCollection': 'user', 'parentId': admin['_id'],
+         'name': 'renamed'}]
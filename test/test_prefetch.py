@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import io
+import pytest
+import six
+import threading
+import time
+import zipfile
+
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.upload import Upload
+from girder.utility import prefetch
+from pytest_girder.assertions import assertStatusOk
+
+
+def _file(data, delay=0, chunkSize=10, log=None):
+    def stream():
+        time.sleep(delay)
+        for start in range(0, len(data), chunkSize):
+            if log is not None:
+                log.append(data[start:start + chunkSize])
+            yield data[start:start + chunkSize]
+    return stream
+
+
+def _read(files, **kwargs):
+    return [(path, b''.join(generator()))
+            for path, generator in prefetch.prefetchFiles(files, **kwargs)]
+
+
+def testOrderAndContents():
+    files = [('f%d' % i, b'%d' % i * (i * 7)) for i in range(20)]
+    # Earlier files take longer to start than later ones
+    assert _read([(path, _file(data, delay=(20 - i) * 0.002))
+                  for i, (path, data) in enumerate(files)], count=4) == files
+    assert _read([(path, _file(data)) for path, data in files], count=1) == files
+
+
+def testLatencyOverlaps():
+    files = [('f%d' % i, _file(b'data', delay=0.2)) for i in range(8)]
+    start = time.time()
+    assert len(_read(files, count=8)) == 8
+    assert time.time() - start < 0.2 * 4
+
+
+def testBufferLimit():
+    log = []
+    files = [('f%d' % i, _file(b'x' * 1000, log=log)) for i in range(4)]
+    pairs = prefetch.prefetchFiles(files, count=4, maxBytes=100)
+    path, generator = next(pairs)
+    time.sleep(0.1)
+    # Each chunk is added once there is room, so one more than fits is read
+    assert sum(len(chunk) for chunk in log) <= 100 + 4 * 10
+    assert b''.join(generator()) == b'x' * 1000
+    assert [len(b''.join(generator())) for _, generator in pairs] == [1000] * 3
+
+
+def testErrorsAndAbandonedFiles():
+    def failing():
+        yield b'partial'
+        raise ValueError('read failed')
+
+    started = threading.Event()
+
+    def endless():
+        started.set()
+        while True:
+            yield b'more'
+
+    pairs = prefetch.prefetchFiles(
+        [('endless', endless), ('failing', failing), ('last', _file(b'last'))], count=3)
+    path, generator = next(pairs)
+    assert path == 'endless'
+    assert next(generator()) == b'more'
+    path, generator = next(pairs)
+    chunks = []
+    with pytest.raises(ValueError, match='read failed'):
+        for chunk in generator():
+            chunks.append(chunk)
+    assert chunks == [b'partial']
+    assert [(path, b''.join(generator())) for path, generator in pairs] == [('last', b'last')]
+    assert started.is_set()
+
+
+def testDownloadFolder(server, admin, fsAssetstore):
+    folder = Folder().createFolder(admin, 'folder', parentType='user', creator=admin)
+    files = {'f%d.txt' % i: b'content %d' % i * 1000 for i in range(12)}
+    for name, data in six.iteritems(files):
+        item = Item().createItem(name, admin, folder)
+        Upload().uploadFromFile(six.BytesIO(data), len(data), name, 'item', item, admin)
+
+    resp = server.request('/folder/%s/download' % folder['_id'], user=admin, isJson=False)
+    assertStatusOk(resp)
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(resp.body)))
+    assert {name: archive.read('folder/' + name) for name in files} == files
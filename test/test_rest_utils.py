@@ -19,10 +19,11 @@
 
 import datetime
 import json
+import mock
 import pytest
 import pytz
 
-from girder.api import rest
+from girder.api import access, rest
 from girder.exceptions import GirderException
 import girder.events
 
@@ -150,3 +151,60 @@ def testSetContentDisposition(name, disp, expected):
         assert rest.setContentDisposition(name, setHeader=False) == expected
     else:
         assert rest.setContentDisposition(name, disp, setHeader=False) == expected
+
+
+class RoutedResource(rest.Resource):
+    def __init__(self):
+        super(RoutedResource, self).__init__()
+        self.resourceName = 'routed'
+        self.route('GET', (':id', 'literal1'), self.handler, nodoc=True)
+        self.route('GET', (':id', ':other'), self.handler, nodoc=True)
+        self.route('GET', ('literal1', 'literal2'), self.handler, nodoc=True)
+        self.route('GET', ('literal1', 'literal2', ':third'), self.handler, nodoc=True)
+        self.route('GET', (), self.handler, nodoc=True)
+
+    @access.public
+    def handler(self, **kwargs):
+        return kwargs
+
+
+@pytest.mark.parametrize('path,route,wildcards', [
+    ((), (), {}),
+    (('literal1', 'literal2'), ('literal1', 'literal2'), {}),
+    (('literal1', 'literal1'), (':id', 'literal1'), {'id': 'literal1'}),
+    # Wildcards are used when the literal branch has no match
+    (('literal1', 'other'), (':id', ':other'), {'id': 'literal1', 'other': 'other'}),
+    (('literal1', 'literal2', 'x'), ('literal1', 'literal2', ':third'), {'third': 'x'})
+])
+def testMatchRoute(path, route, wildcards):
+    assert RoutedResource()._matchRoute('get', path)[::2] == (route, wildcards)
+
+
+def testMatchRouteUpdates():
+    resource = RoutedResource()
+    with pytest.raises(rest.RestException, match='No matching route'):
+        resource._matchRoute('get', ('a', 'b', 'c'))
+    with pytest.raises(rest.RestException, match='No matching route'):
+        resource._matchRoute('put', ('a', ))
+
+    resource.route('GET', (':id', ':other', 'c'), resource.handler, nodoc=True)
+    assert resource._matchRoute('get', ('a', 'b', 'c'))[2] == {'id': 'a', 'other': 'b'}
+    resource.removeRoute('GET', (':id', ':other', 'c'))
+    with pytest.raises(rest.RestException, match='No matching route'):
+        resource._matchRoute('get', ('a', 'b', 'c'))
+    resource.removeRoute('GET', ('literal1', 'literal2'))
+    assert resource._matchRoute('get', ('literal1', 'literal2'))[0] == (':id', ':other')
+
+
+def testHandleRouteEvents():
+    resource = RoutedResource()
+    with mock.patch.object(girder.events, 'trigger') as trigger:
+        result = resource.handleRoute('GET', ('a', 'b'), {})
+    assert result == {'id': 'a', 'other': 'b', 'params': {}}
+    trigger.assert_not_called()
+
+    def override(event):
+        event.preventDefault().addResponse({'overridden': event.info['id']})
+
+    with girder.events.bound('rest.get.routed/:id/:other.after', 'test', override):
+        assert resource.handleRoute('GET', ('a', 'b'), {}) == {'overridden': 'a'}
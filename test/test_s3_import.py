@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import boto3
+import mock
+import moto
+import pytest
+
+from girder.exceptions import ValidationException
+from girder.models.assetstore import Assetstore
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.user import User
+from girder.utility.progress import noProgress
+from girder.utility.s3_assetstore_adapter import S3AssetstoreAdapter
+
+
+@pytest.fixture
+def bucket(db):
+    with moto.mock_s3():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='bucketname')
+        assetstore = Assetstore().createS3Assetstore(
+            name='s3', bucket='bucketname', prefix='', accessKeyId='key', secret='secret',
+            service='', region='us-east-1', readOnly=True)
+        yield client, assetstore
+
+
+def _import(assetstore, parent, user, parentType='folder', **params):
+    # Small pages exercise the continuation of listings
+    with mock.patch.object(S3AssetstoreAdapter, 'IMPORT_PAGE_SIZE', 2):
+        Assetstore().importData(
+            assetstore, parent=parent, parentType=parentType, params=params,
+            progress=noProgress, user=user)
+
+
+def testS3Import(bucket, admin):
+    client, assetstore = bucket
+    for key, body in (('top', b'1'), ('a/b/deep', b'22'), ('a/skip.tmp', b'')):
+        client.put_object(Bucket='bucketname', Key=key, Body=body)
+    for i in range(5):
+        client.put_object(Bucket='bucketname', Key='a/k%d' % i, Body=b'abc')
+    dest = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+
+    _import(assetstore, dest, admin, fileExcludeRegex=r'.*\.tmp$')
+
+    a = Folder().findOne({'parentId': dest['_id'], 'name': 'a'})
+    b = Folder().findOne({'parentId': a['_id'], 'name': 'b'})
+    assert b['ancestors'] == [dest['_id'], a['_id']]
+    assert sorted(item['name'] for item in Folder().childItems(a)) == [
+        'k0', 'k1', 'k2', 'k3', 'k4']
+    item = Item().findOne({'folderId': b['_id']})
+    assert item['name'] == 'deep'
+    assert item['size'] == 2
+    file = File().findOne({'itemId': item['_id']})
+    assert file['s3Key'] == 'a/b/deep'
+    assert file['imported']
+    assert file['s3ETag'] == client.head_object(Bucket='bucketname', Key='a/b/deep')['ETag']
+    assert file['exts'] == []
+    assert Folder().load(a['_id'], force=True)['size'] == 15
+    assert Folder().load(dest['_id'], force=True)['size'] == 1
+    assert User().load(admin['_id'], force=True)['size'] == 18
+
+    # Importing again only writes the keys that changed
+    client.put_object(Bucket='bucketname', Key='a/k0', Body=b'abcdef')
+    fileCount = File().find().count()
+    with mock.patch.object(File().collection, 'insert_many') as insertMany:
+        _import(assetstore, dest, admin, fileExcludeRegex=r'.*\.tmp$')
+    insertMany.assert_not_called()
+    assert File().find().count() == fileCount
+    item = Item().findOne({'folderId': a['_id'], 'name': 'k0'})
+    assert item['size'] == 6
+    assert File().findOne({'itemId': item['_id']})['size'] == 6
+    assert Folder().load(a['_id'], force=True)['size'] == 18
+
+
+def testS3ImportNameConflicts(bucket, admin):
+    client, assetstore = bucket
+    for key in ('x/sub/k', 'x/sub'):
+        client.put_object(Bucket='bucketname', Key=key, Body=b'data')
+    dest = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+    x = Folder().createFolder(dest, 'x', creator=admin)
+    Folder().createFolder(x, 'sub', creator=admin)
+
+    _import(assetstore, dest, admin)
+
+    # The key with the same name as a folder gets a unique item name
+    assert [item['name'] for item in Folder().childItems(x)] == ['sub (1)']
+    assert Folder().load(x['_id'], force=True)['size'] == 4
+
+    # Keys cannot be imported directly into a user or collection
+    with pytest.raises(ValidationException, match='directly underneath a user'):
+        _import(assetstore, admin, admin, parentType='user', importPath='x')
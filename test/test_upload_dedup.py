@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import hashlib
+import mock
+import pytest
+import six
+
+from girder import events
+from girder.models.file import File
+from girder.models.file_content import FileContent
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.upload import Upload
+from pytest_girder.assertions import assertStatus, assertStatusOk
+
+DATA = b'reference data'
+SHA512 = hashlib.sha512(DATA).hexdigest()
+
+
+@pytest.fixture
+def stored(fsAssetstore, admin):
+    folder = Folder().createFolder(admin, 'private', parentType='user', public=False, creator=admin)
+    item = Item().createItem('item', admin, folder)
+    yield Upload().uploadFromFile(six.BytesIO(DATA), len(DATA), 'data', 'item', item, admin)
+
+
+def _initUpload(server, user, folder, sha512=SHA512, size=len(DATA)):
+    with mock.patch.object(events.daemon, 'trigger') as trigger:
+        resp = server.request('/file', method='POST', user=user, params={
+            'parentType': 'folder', 'parentId': folder['_id'], 'name': 'copy',
+            'size': size, 'sha512': sha512})
+    return resp, trigger
+
+
+def _verify(trigger):
+    # The contents are verified asynchronously
+    calls = [c for c in trigger.call_args_list if c[0][0] == 'model.upload.verifyContent']
+    assert len(calls) == 1
+    calls[0][1]['callback'](events.Event(calls[0][0][0], calls[0][0][1]))
+
+
+def testUploadExistingContent(server, stored, admin, user):
+    folder = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+    File().update({'_id': stored['_id']}, {'$set': {
+        'mimeType': 'text/plain', 'exts': ['secret'], 'private': 'field'}})
+
+    resp, trigger = _initUpload(server, admin, folder)
+    assertStatusOk(resp)
+    assert resp.json['_modelType'] == 'file'
+    file = File().load(resp.json['_id'], force=True)
+    assert (file['sha512'], file['path'], file['size']) == (
+        stored['sha512'], stored['path'], len(DATA))
+    # Only the fields that locate the content, and a MIME type the caller did not
+    # give, are copied
+    assert file['mimeType'] == 'text/plain'
+    assert file['exts'] == [] and 'private' not in file
+    assert Item().load(file['itemId'], force=True)['name'] == 'copy'
+    assert Folder().load(folder['_id'], force=True)['size'] == len(DATA)
+    assert FileContent().findOne({'sha512': SHA512})['refCount'] == 2
+
+    _verify(trigger)
+    assert File().load(file['_id'], force=True) is not None
+
+    # Contents that the user cannot read, or that do not match, must be uploaded
+    userFolder = Folder().createFolder(user, 'dest', parentType='user', creator=user)
+    for user_, sha512, size in (
+            (user, SHA512, len(DATA)), (admin, SHA512, 1), (admin, '0' * 128, len(DATA))):
+        resp, _ = _initUpload(
+            server, user_, userFolder if user_ is user else folder, sha512, size)
+        assertStatusOk(resp)
+        assert '_modelType' not in resp.json
+        assert resp.json['received'] == 0
+
+    resp, _ = _initUpload(server, admin, folder, sha512='abc')
+    assertStatus(resp, 400)
+
+
+def testUploadExistingContentMismatch(server, stored, admin):
+    folder = Folder().createFolder(admin, 'dest', parentType='user', creator=admin)
+    with open(File().getAssetstoreAdapter(stored).fullPath(stored), 'wb') as f:
+        f.write(b'x' * len(DATA))
+
+    resp, trigger = _initUpload(server, admin, folder)
+    assertStatusOk(resp)
+    _verify(trigger)
+    assert File().load(resp.json['_id'], force=True) is None
+    assert Folder().load(folder['_id'], force=True)['size'] == 0
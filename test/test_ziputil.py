@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import io
+import mock
+import os
+import pytest
+import six
+import zipfile
+
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.upload import Upload
+from girder.utility import ziputil
+from pytest_girder.assertions import assertStatusOk
+
+TEXT = b''.join(b'%d,value %d,%f\n' % (i, i % 7, i / 3.0) for i in range(60000))
+BINARY = os.urandom(ziputil.BLOCK_SIZE + 1000)
+FILES = [
+    ('table.csv', TEXT),
+    ('random.bin', BINARY),
+    ('photo.jpg', TEXT[:2000]),
+    ('empty.txt', b''),
+    ('small.txt', b'small')
+]
+
+
+def _chunks(data, size=65536):
+    def stream():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+    return stream
+
+
+def _zip(compression, parallel=True, files=FILES):
+    zip = ziputil.ZipGenerator('root', compression=compression, parallel=parallel)
+    data = b''.join(zip.addFiles((path, _chunks(data)) for path, data in files)) + zip.footer()
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    for path, expected in files:
+        assert archive.read('root/' + path) == expected
+    return {os.path.basename(info.filename): info.compress_type for info in archive.infolist()}
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+def testCompressionModes(parallel):
+    assert set(_zip(ziputil.STORE, parallel).values()) == {zipfile.ZIP_STORED}
+    assert set(_zip(ziputil.DEFLATE, parallel).values()) == {zipfile.ZIP_DEFLATED}
+    assert _zip(ziputil.AUTO, parallel) == {
+        'table.csv': zipfile.ZIP_DEFLATED,
+        'random.bin': zipfile.ZIP_STORED,
+        'photo.jpg': zipfile.ZIP_STORED,
+        'empty.txt': zipfile.ZIP_STORED,
+        'small.txt': zipfile.ZIP_STORED
+    }
+
+
+def testChooseCompression():
+    assert ziputil.chooseCompression('a/data.json', b'{}' * 1000, True) == ziputil.DEFLATE
+    assert ziputil.chooseCompression('data.tar.gz', TEXT, False) == ziputil.STORE
+    # Unrecognized files are compressed if a sample compresses well
+    assert ziputil.chooseCompression('data', TEXT, False) == ziputil.DEFLATE
+    assert ziputil.chooseCompression('data', BINARY, False) == ziputil.STORE
+
+
+def testZip64():
+    with mock.patch.object(ziputil, 'Z64_LIMIT', 1000):
+        _zip(ziputil.AUTO)
+    # Force the ZIP64 end of central directory record
+    with mock.patch.object(ziputil, 'Z_FILECOUNT_LIMIT', 3):
+        _zip(ziputil.DEFLATE)
+
+
+def testDownloadFolderCompression(server, admin, fsAssetstore):
+    folder = Folder().createFolder(admin, 'folder', parentType='user', creator=admin)
+    files = [(path, data) for path, data in FILES if data]
+    for path, data in files:
+        item = Item().createItem(path, admin, folder)
+        Upload().uploadFromFile(six.BytesIO(data), len(data), path, 'item', item, admin)
+
+    resp = server.request('/folder/%s/download' % folder['_id'], user=admin, isJson=False,
+                          params={'compression': 'auto'})
+    assertStatusOk(resp)
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(resp.body)))
+    assert archive.getinfo('folder/table.csv').compress_type == zipfile.ZIP_DEFLATED
+    assert archive.getinfo('folder/random.bin').compress_type == zipfile.ZIP_STORED
+    for path, data in files:
+        assert archive.read('folder/' + path) == data
@@ -5,6 +5,7 @@ import datetime
 import fuse
 import mock
 import os
+import shutil
 import six
 import stat
 import tempfile
@@ -430,3 +431,121 @@ class ServerFuseTestCase(base.TestCase):
     def testFunctionDestroy(self):
         op = mount.ServerFuse()
         self.assertIsNone(op.destroy('/'))
+
+    def testFunctionCache(self):
+        op = mount.ServerFuse(cacheTimeout=60)
+        path = os.path.dirname(self.publicFileName)
+        self.assertIn(os.path.basename(self.publicFileName), op.readdir(path, 0))
+        # Listing a directory caches its contents
+        with mock.patch.object(op, '_getPath') as getPath:
+            attr = op.getattr(self.publicFileName)
+            self.assertIn(os.path.basename(self.publicFileName), op.readdir(path, 0))
+            getPath.assert_not_called()
+        self.assertEqual(attr['st_mode'], 0o400 | stat.S_IFREG)
+        # Missing paths are cached
+        with self.assertRaises(fuse.FuseOSError):
+            op.getattr('/user/nosuchuser')
+        with mock.patch.object(op, '_getPath') as getPath, \
+                self.assertRaises(fuse.FuseOSError):
+            op.getattr('/user/nosuchuser')
+        getPath.assert_not_called()
+
+        # Changes are seen when the cache expires
+        op = mount.ServerFuse(cacheTimeout=0.05)
+        attr = op.getattr(self.publicFileName)
+        file = File().findOne({'name': os.path.basename(self.publicFileName)})
+        file['updated'] = datetime.datetime.utcnow() + datetime.timedelta(seconds=10)
+        File().save(file)
+        self.assertEqual(op.getattr(self.publicFileName)['st_mtime'], attr['st_mtime'])
+        time.sleep(0.1)
+        self.assertGreater(op.getattr(self.publicFileName)['st_mtime'], attr['st_mtime'])
+
+        # A timeout of 0 disables caching
+        op = mount.ServerFuse(cacheTimeout=0)
+        op.getattr(self.publicFileName)
+        with mock.patch.object(op, '_getPath', wraps=op._getPath) as getPath:
+            op.getattr(self.publicFileName)
+        getPath.assert_called_once()
+
+    def testBlockCache(self):
+        cachePath = tempfile.mkdtemp()
+        try:
+            blockCache = mount.DiskBlockCache(cachePath, 10, blockSize=4)
+            op = mount.ServerFuse(blockCache=blockCache)
+            # Local files are not cached
+            op._localPath = lambda doc: None
+            fh = op.open(self.publicFileName, os.O_RDONLY)
+            self.assertEqual(op.read(self.publicFileName, 6, 1, fh), b'ile 3\n')
+            op.release(self.publicFileName, fh)
+            self.assertEqual(len(os.listdir(cachePath)), 2)
+            self.assertEqual(blockCache.size, 7)
+
+            # Cached blocks are read without opening the file
+            fh = op.open(self.publicFileName, os.O_RDONLY)
+            with mock.patch.object(File, 'open') as open:
+                self.assertEqual(op.read(self.publicFileName, 4, 2, fh), b'le 3')
+                self.assertEqual(op.read(self.publicFileName, 100, 0, fh), b'File 3\n')
+            open.assert_not_called()
+            op.release(self.publicFileName, fh)
+
+            # The least recently used blocks are removed when the cache is full
+            file = File().findOne({'name': os.path.basename(self.publicFileName)})
+            blockCache.get(file, 0)
+            other = {'_id': 'other', 'size': 4, 'created': file['created']}
+            blockCache.put(other, 0, b'data')
+            self.assertEqual(blockCache.size, 8)
+            self.assertEqual(len(os.listdir(cachePath)), 2)
+            self.assertIsNone(blockCache.get(file, 1))
+            self.assertEqual(blockCache.get(file, 0), b'File')
+            self.assertEqual(blockCache.get(other, 0), b'data')
+
+            # Blocks are keyed by a file's contents, not its name or update time
+            self.assertEqual(blockCache.get(dict(other, name='renamed', updated='later'), 0),
+                             b'data')
+            self.assertIsNone(blockCache.get(dict(other, created='later'), 0))
+            self.assertIsNone(blockCache.get(dict(other, assetstoreId='elsewhere'), 0))
+
+            # Existing blocks are found when the cache is reopened
+            self.assertEqual(mount.DiskBlockCache(cachePath, 10, blockSize=4).size, 8)
+        finally:
+            shutil.rmtree(cachePath)
+
+    def testFunctionParallelRead(self):
+        op = mount.ServerFuse()
+        data = op.read(self.publicFileName, 100, 0, op.open(self.publicFileName, os.O_RDONLY))
+        results = {}
+
+        def read(fh, offset):
+            results[(fh, offset)] = op.read(self.publicFileName, 2, offset, fh)
+
+        # Local files are read directly
+        with mock.patch.object(File, 'open') as open:
+            fh = op.open(self.publicFileName, os.O_RDONLY)
+            self.assertIsInstance(op.openFiles[fh]['handle'], mount._LocalFile)
+            threads = [threading.Thread(target=read, args=(fh, offset))
+                       for offset in range(len(data))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            op.release(self.publicFileName, fh)
+        open.assert_not_called()
+        for offset in range(len(data)):
+            self.assertEqual(results[(fh, offset)], data[offset:offset + 2])
+
+        # Other files are read with a file handle per concurrent read
+        op._localPath = lambda doc: None
+        fh = op.open(self.publicFileName, os.O_RDONLY)
+        handle = op.openFiles[fh]['handle']
+        self.assertIsInstance(handle, mount._PositionalFile)
+        threads = [threading.Thread(target=read, args=(fh, offset))
+                   for offset in range(len(data))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for offset in range(len(data)):
+            self.assertEqual(results[(fh, offset)], data[offset:offset + 2])
+        self.assertGreater(len(handle._idle), 0)
+        op.release(self.publicFileName, fh)
+        self.assertEqual(handle._idle, [])
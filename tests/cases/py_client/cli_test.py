@@ -265,7 +265,7 @@ class PythonCliTestCase(base.TestCase):
                         username='mylogin', password='password')
         self.assertEqual(ret['exitVal'], 0)
         for downloaded in os.listdir(downloadDir):
-            if downloaded == '.girder_metadata':
+            if downloaded in ('.girder_metadata', '.girder_manifest'):
                 continue
             self.assertIn(downloaded, toUpload)
 
@@ -279,6 +279,14 @@ class PythonCliTestCase(base.TestCase):
                          downloadDir), username='mylogin', password='password')
         self.assertEqual(ret['exitVal'], 0)
 
+        # Download concurrently and resumably
+        parallelDir = os.path.join(os.path.dirname(localDir), '_testDownloadParallel')
+        ret = invokeCli(('download', str(subfolder['_id']), parallelDir, '--jobs=4', '--resume'),
+                        username='mylogin', password='password')
+        self.assertEqual(ret['exitVal'], 0)
+        self.assertEqual(sorted(os.listdir(parallelDir)), sorted(toUpload))
+        shutil.rmtree(parallelDir)
+
         # Test uploading with reference
         queryList = []
 
@@ -405,7 +413,7 @@ class PythonCliTestCase(base.TestCase):
         self.assertEqual(ret['exitVal'], 0)
 
         for fname in os.listdir(downloadDir):
-            if fname == '.girder_metadata':
+            if fname in ('.girder_metadata', '.girder_manifest'):
                 continue
             filename = os.path.join(downloadDir, fname)
             self.assertEqual(os.path.getmtime(filename), old_mtimes[fname])
@@ -436,6 +444,22 @@ class PythonCliTestCase(base.TestCase):
         self.assertEqual(ret['exitVal'], 0)
         self.assertIn('File hello.txt already exists in parent Item', ret['stdout'])
 
+    def testUploadJobs(self):
+        localDir = os.path.join(os.path.dirname(__file__), 'testdata')
+        args = ['upload', str(self.publicFolder['_id']), localDir, '--parent-type=folder',
+                '--jobs=4', '--file-retries=2']
+        ret = invokeCli(args, username='mylogin', password='password')
+        self.assertEqual(ret['exitVal'], 0)
+        self.assertIn('Uploading Item from hello.txt', ret['stdout'])
+
+        subfolder = six.next(Folder().childFolders(
+            parent=self.publicFolder, parentType='folder', limit=1))
+        items = list(Folder().childItems(folder=subfolder))
+        self.assertEqual(len(os.listdir(localDir)), len(items))
+
+        ret = invokeCli(args + ['--jobs=0'], username='mylogin', password='password')
+        self.assertNotEqual(ret['exitVal'], 0)
+
     def testVerboseLoggingLevel0(self):
         args = ['localsync', '--help']
         ret = invokeCli(args, username='mylogin', password='password')
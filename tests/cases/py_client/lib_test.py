@@ -366,6 +366,106 @@ class PythonClientTestCase(base.TestCase):
                 size=size, parentType='folder')
             self.assertEqual(file['mimeType'], 'text/plain')
 
+    def testUploadConcurrently(self):
+        folderCallbacks = []
+        itemCallbacks = []
+        self.client.addFolderUploadCallback(lambda folder, path: folderCallbacks.append(path))
+        self.client.addItemUploadCallback(lambda item, path: itemCallbacks.append(path))
+        self.client.upload(self.libTestDir, self.publicFolder['_id'], jobs=4)
+
+        self.assertEqual(len(folderCallbacks), 4)
+        self.assertEqual(len(itemCallbacks), 8)
+        topFolder = six.next(Folder().childFolders(
+            parentType='folder', parent=self.publicFolder, user=self.user, limit=1))
+        subfolders = list(Folder().childFolders(
+            parentType='folder', parent=topFolder, user=self.user, limit=0))
+        self.assertEqual(sorted(f['name'] for f in subfolders), ['sub0', 'sub1', 'sub2'])
+        for folder in subfolders:
+            items = sorted(Folder().childItems(folder=folder), key=lambda item: item['name'])
+            self.assertEqual([item['name'] for item in items], ['f', 'f1'])
+            path = os.path.join(self.libTestDir, folder['name'], 'f1')
+            self.assertEqual(items[1]['size'], os.path.getsize(path))
+
+        # The first failure stops the upload and is raised
+        with mock.patch.object(self.client, 'uploadFileToItem', side_effect=ValueError('bad')):
+            with self.assertRaises(ValueError):
+                self.client.upload(self.libTestDir, self.publicFolder['_id'], jobs=4)
+
+    def testUploadRetries(self):
+        path = os.path.join(self.libTestDir, 'sub0', 'f')
+        attempts = []
+        original = self.client.uploadFileToFolder
+
+        def failOnce(*args, **kwargs):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise girder_client.HttpError(500, 'error', 'url', 'POST')
+            return original(*args, **kwargs)
+
+        with mock.patch.object(self.client, 'MAX_RETRY_DELAY', 0), \
+                mock.patch.object(self.client, 'uploadFileToFolder', side_effect=failOnce):
+            with self.assertRaises(girder_client.HttpError):
+                self.client.upload(path, self.publicFolder['_id'])
+            del attempts[:]
+            self.client.upload(path, self.publicFolder['_id'], retries=2)
+
+        self.assertEqual(len(attempts), 2)
+        items = list(Folder().childItems(folder=self.publicFolder))
+        self.assertEqual([item['name'] for item in items], ['f'])
+
+        # Client errors are not retried
+        del attempts[:]
+        with mock.patch.object(self.client, 'uploadFileToFolder', side_effect=(
+                girder_client.HttpError(400, 'error', 'url', 'POST'))) as upload:
+            with self.assertRaises(girder_client.HttpError):
+                self.client.upload(path, self.publicFolder['_id'], retries=2)
+        self.assertEqual(upload.call_count, 1)
+
+        # An upload whose chunk fails is removed before it is retried
+        path = os.path.join(self.libTestDir, 'retried')
+        with open(path, 'wb') as f:
+            f.write(b'retried contents')
+        chunks = []
+
+        @httmock.urlmatch(path=r'.*/file/chunk$')
+        def failChunkOnce(url, request):
+            chunks.append(url)
+            if len(chunks) == 1:
+                return httmock.response(503, 'error', request=request)
+
+        with mock.patch.object(self.client, 'MAX_RETRY_DELAY', 0), \
+                httmock.HTTMock(failChunkOnce):
+            self.client.upload(path, self.publicFolder['_id'], retries=1)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(Upload().find().count(), 0)
+        self.assertIn('retried', [
+            item['name'] for item in Folder().childItems(folder=self.publicFolder)])
+
+    def testUploadExistingContent(self):
+        path = os.path.join(self.libTestDir, 'sub0', 'f')
+        self.client.MIN_DEDUP_SIZE = 1
+        first = self.client.uploadFileToFolder(self.publicFolder['_id'], path, filename='first')
+
+        # Contents the server already has are not sent again
+        with mock.patch.object(self.client, '_uploadContents') as uploadContents:
+            second = self.client.uploadFileToFolder(
+                self.publicFolder['_id'], path, filename='second')
+            with open(path, 'rb') as f:
+                third = self.client.uploadStreamToFolder(
+                    self.publicFolder['_id'], f, 'third', os.path.getsize(path))
+        uploadContents.assert_not_called()
+        first = File().load(first['_id'], force=True)
+        for file in (second, third):
+            file = File().load(file['_id'], force=True)
+            self.assertEqual(file['sha512'], first['sha512'])
+            self.assertEqual(file['path'], first['path'])
+
+        # Small files are always uploaded
+        self.client.MIN_DEDUP_SIZE = os.path.getsize(path) + 1
+        with mock.patch.object(self.client, 'post', wraps=self.client.post) as post:
+            self.client.uploadFileToFolder(self.publicFolder['_id'], path, filename='fourth')
+        self.assertTrue(all('sha512' not in call[0][1] for call in post.call_args_list))
+
     def testUploadNonMultipartVersionGreaterOrEqual22(self):
         for version in ['2.2.0', '2.2.1', '2.3', '3.0', '3.1']:
             with mock.patch.object(
@@ -659,6 +759,156 @@ class PythonClientTestCase(base.TestCase):
             with self.assertRaises(requests.HTTPError):
                 self.client.downloadFile(file['_id'], obj)
 
+    def testDownloadParallelAndResume(self):
+        item = self.client.createItem(self.publicFolder['_id'], 'Segmented')
+        path = os.path.join(self.libTestDir, 'sub0', 'f')
+        file = self.client.uploadFileToItem(item['_id'], path)
+        with open(path, 'rb') as f:
+            expected = f.read()
+        downloadDir = os.path.join(self.libTestDir, 'parallel')
+        ranges = []
+
+        @httmock.urlmatch(path=r'.*/file/.+/download$')
+        def recordRange(url, request):
+            ranges.append(request.headers.get('Range'))
+
+        # Small segments make even this file download in concurrent ranges
+        self.client.DOWNLOAD_SEGMENT_SIZE = 4
+        with httmock.HTTMock(recordRange):
+            self.client.downloadItem(item['_id'], downloadDir, jobs=4)
+        del self.client.DOWNLOAD_SEGMENT_SIZE
+        outPath = os.path.join(downloadDir, 'Segmented', 'f')
+        with open(outPath, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertGreater(len(ranges), 1)
+        self.assertIn('bytes=0-3', ranges)
+        self.assertEqual(os.listdir(os.path.dirname(outPath)), ['f'])
+
+        # A failed resumable download leaves its partial file behind ...
+        @httmock.urlmatch(path=r'.*/file/.+/download$')
+        def fail(url, request):
+            return httmock.response(503, 'error', request=request)
+
+        outPath = os.path.join(downloadDir, 'resumed')
+        self.client.MAX_DOWNLOAD_RETRIES = 1
+        with httmock.HTTMock(fail), mock.patch('time.sleep') as sleep:
+            with self.assertRaises(requests.HTTPError):
+                self.client.downloadFile(file['_id'], outPath, resume=True)
+        del self.client.MAX_DOWNLOAD_RETRIES
+        self.assertEqual(sleep.call_count, 1)
+        self.assertFalse(os.path.exists(outPath))
+        partialPath = outPath + girder_client.PARTIAL_DOWNLOAD_SUFFIX
+        self.assertTrue(os.path.isfile(partialPath))
+        self.assertTrue(os.path.isfile(partialPath + '.json'))
+
+        # ... which the next resumable download completes
+        self.client.downloadFile(file['_id'], outPath, resume=True)
+        with open(outPath, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertFalse(os.path.exists(partialPath))
+        self.assertFalse(os.path.exists(partialPath + '.json'))
+
+        # Without resume, nothing is left behind after a failure
+        outPath = os.path.join(downloadDir, 'failed')
+        with httmock.HTTMock(fail):
+            with self.assertRaises(requests.HTTPError):
+                self.client.downloadItem(item['_id'], outPath, jobs=2)
+        self.assertEqual(os.listdir(os.path.join(outPath, 'Segmented')), [])
+
+        # An empty file has no ranges to request, in parallel or resumed
+        emptyFile = self.client.uploadFile(item['_id'], six.BytesIO(b''), 'empty', 0)
+        outPath = os.path.join(downloadDir, 'withEmpty')
+        self.client.DOWNLOAD_SEGMENT_SIZE = 4
+        self.client.downloadItem(item['_id'], outPath, jobs=4)
+        del self.client.DOWNLOAD_SEGMENT_SIZE
+        self.assertEqual(sorted(os.listdir(os.path.join(outPath, 'Segmented'))), ['empty', 'f'])
+        self.assertEqual(os.path.getsize(os.path.join(outPath, 'Segmented', 'empty')), 0)
+        outPath = os.path.join(downloadDir, 'resumedEmpty')
+        self.client.downloadFile(emptyFile['_id'], outPath, resume=True)
+        self.assertEqual(os.path.getsize(outPath), 0)
+        self.assertFalse(os.path.exists(outPath + girder_client.PARTIAL_DOWNLOAD_SUFFIX))
+
+    def testSyncManifest(self):
+        folder = self.client.createFolder(self.publicFolder['_id'], 'synced')
+        self.client.upload(self.libTestDir + '/sub0', folder['_id'])
+        downloadDir = os.path.join(self.libTestDir, 'synced')
+        self.client.downloadFolderRecursive(folder['_id'], downloadDir, sync=True, jobs=2)
+        self.client.saveLocalMetadata(downloadDir)
+        with open(os.path.join(downloadDir, '.girder_manifest')) as f:
+            manifest = json.load(f)
+        self.assertEqual(len(manifest), 2)
+        self.assertEqual(
+            sorted(entry['path'] for entry in six.viewvalues(manifest)),
+            [os.path.join('sub0', 'f'), os.path.join('sub0', 'f1')])
+
+        hits = []
+
+        @httmock.urlmatch(path=r'.*/(file/.+/download|item/.+/files)$')
+        def record(url, request):
+            hits.append(url.path)
+
+        # Unchanged items are neither listed nor downloaded again
+        client = girder_client.GirderClient(port=os.environ['GIRDER_PORT'])
+        client.authenticate(self.user['login'], self.password)
+        client.loadLocalMetadata(downloadDir)
+        with httmock.HTTMock(record):
+            client.downloadFolderRecursive(folder['_id'], downloadDir, sync=True)
+        self.assertEqual(hits, [])
+        # Nor are their files listed when the folders are listed one by one
+        with httmock.HTTMock(record), mock.patch.object(
+                girder_client.GirderClient, '_serverHasRoute', return_value=False):
+            client.downloadFolderRecursive(folder['_id'], downloadDir, sync=True)
+        self.assertEqual(hits, [])
+
+        # A deleted local file is downloaded again
+        os.remove(os.path.join(downloadDir, 'sub0', 'f'))
+        with httmock.HTTMock(record):
+            client.downloadFolderRecursive(folder['_id'], downloadDir, sync=True)
+        self.assertEqual(len([hit for hit in hits if hit.endswith('/download')]), 1)
+        self.assertTrue(os.path.isfile(os.path.join(downloadDir, 'sub0', 'f')))
+
+        # A file whose contents changed on the server is downloaded again,
+        # even though its item and size are unchanged
+        client.saveLocalMetadata(downloadDir)
+        client.loadLocalMetadata(downloadDir)
+        path = os.path.join(downloadDir, 'sub0', 'f1')
+        fileId = next(fileId for fileId, entry in six.viewitems(manifest)
+                      if entry['path'] == os.path.join('sub0', 'f1'))
+        with open(path, 'rb') as f:
+            contents = f.read()
+        client.uploadFileContents(fileId, six.BytesIO(contents[::-1]), len(contents))
+        del hits[:]
+        with httmock.HTTMock(record):
+            client.downloadFolderRecursive(folder['_id'], downloadDir, sync=True)
+        self.assertEqual(len([hit for hit in hits if hit.endswith('/download')]), 1)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), contents[::-1])
+
+    def testFolderManifest(self):
+        folder = self.client.createFolder(self.publicFolder['_id'], 'listed')
+        self.client.upload(self.libTestDir + '/sub0', folder['_id'])
+        records = list(self.client.getFolderManifest(folder['_id']))
+        self.assertEqual([(r['type'], r['path']) for r in records[:2]], [
+            ('folder', ''), ('folder', 'sub0')])
+        self.assertEqual(sorted(r['path'] for r in records if r['type'] == 'file'), [
+            'sub0/f/f', 'sub0/f1/f1'])
+
+        # Folders are downloaded from the manifest, or listed folder by folder
+        # when the server does not provide it
+        hits = []
+
+        @httmock.urlmatch(path=r'.*/(folder|item|item/.+/files)$')
+        def record(url, request):
+            hits.append(url.path)
+
+        for hasRoute in (True, False):
+            downloadDir = os.path.join(self.libTestDir, 'listed-%s' % hasRoute)
+            with httmock.HTTMock(record), mock.patch.object(
+                    girder_client.GirderClient, '_serverHasRoute', return_value=hasRoute):
+                self.client.downloadFolderRecursive(folder['_id'], downloadDir)
+            self.assertEqual(bool(hits), not hasRoute)
+            self.assertEqual(sorted(os.listdir(os.path.join(downloadDir, 'sub0'))), ['f', 'f1'])
+
     def testAddMetadataToItem(self):
         item = self.client.createItem(self.publicFolder['_id'],
                                       'Itemty McItemFace', '')
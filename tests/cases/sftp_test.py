@@ -17,16 +17,19 @@
 #  limitations under the License.
 ###############################################################################
 
+import mock
 import paramiko
 import six
 import socket
 import stat
 import threading
+import time
 
 from .. import base
 from girder.api import sftp
 from girder.models.collection import Collection
 from girder.models.folder import Folder
+from girder.models.item import Item
 from girder.models.upload import Upload
 from girder.models.user import User
 from six.moves import StringIO
@@ -267,3 +270,78 @@ class SftpTestCase(base.TestCase):
 
         sftpClient.close()
         client.close()
+
+    def testListingBatchesAndStatCache(self):
+        admin = User().createUser(
+            email='admin@email.com', login='admin', firstName='First', lastName='Last',
+            password='passwd')
+        folder = Folder().createFolder(admin, 'big', parentType='user', creator=admin)
+        for i in range(40):
+            Item().createItem('item%02d' % i, admin, folder)
+
+        # Listings are generated as they are sent
+        generated = []
+
+        def entries():
+            for i in range(40):
+                generated.append(i)
+                yield i
+
+        listing = sftp._Listing(entries())
+        self.assertEqual(listing[:16], list(range(16)))
+        self.assertEqual(len(generated), 16)
+        listing = listing[16:]
+        self.assertEqual(listing[:16], list(range(16, 32)))
+        self.assertEqual(len(generated), 32)
+        self.assertEqual(list(listing[16:]), list(range(32, 40)))
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            'localhost', TEST_PORT, username='admin', password='passwd', look_for_keys=False,
+            allow_agent=False)
+        sftpClient = client.open_sftp()
+        self.assertEqual(
+            sorted(sftpClient.listdir('/user/admin/big')), ['item%02d' % i for i in range(40)])
+
+        # Listed resources are cached
+        with mock.patch.object(sftp, 'lookUpPath') as lookUpPath:
+            for i in range(40):
+                info = sftpClient.stat('/user/admin/big/item%02d' % i)
+                self.assertTrue(stat.S_ISDIR(info.st_mode))
+        lookUpPath.assert_not_called()
+
+        sftpClient.close()
+        client.close()
+
+    def testConnectionLimit(self):
+        User().createUser(
+            email='admin@email.com', login='admin', firstName='First', lastName='Last',
+            password='passwd')
+        limitedServer = sftp.SftpServer(
+            ('localhost', TEST_PORT + 1), TEST_KEY, maxConnections=1, workers=2)
+        serverThread = threading.Thread(target=limitedServer.serve_forever)
+        serverThread.daemon = True
+        serverThread.start()
+
+        def connect():
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(
+                'localhost', TEST_PORT + 1, username='admin', password='passwd',
+                look_for_keys=False, allow_agent=False)
+            return client
+
+        try:
+            client = connect()
+            with self.assertRaises(Exception):
+                connect()
+            client.close()
+            # Closed connections no longer count against the limit
+            time.sleep(0.5)
+            client = connect()
+            self.assertEqual(client.open_sftp().listdir('/'), ['collection', 'user'])
+            client.close()
+        finally:
+            limitedServer.shutdown()
+            limitedServer.server_close()
@@ -413,16 +413,20 @@ class SystemTestCase(base.TestCase):
         resp = self.request(path='/system/check', user=user, method='PUT')
         self.assertStatusOk(resp)
         self.assertEqual(resp.json['baseParentsFixed'], 0)
+        self.assertEqual(resp.json['ancestorsFixed'], 0)
         self.assertEqual(resp.json['orphansRemoved'], 0)
         self.assertEqual(resp.json['sizesChanged'], 0)
 
         Item().update({'_id': i1['_id']}, update={'$set': {'baseParentId': None}})
+        Item().update({'_id': i2['_id']}, update={'$unset': {'ancestors': ''}})
 
         resp = self.request(path='/system/check', user=user, method='PUT')
         self.assertStatusOk(resp)
         self.assertEqual(resp.json['baseParentsFixed'], 1)
+        self.assertEqual(resp.json['ancestorsFixed'], 1)
         self.assertEqual(resp.json['orphansRemoved'], 0)
         self.assertEqual(resp.json['sizesChanged'], 0)
+        self.assertEqual(Item().load(i2['_id'], force=True)['ancestors'], [f1['_id']])
 
         Collection().update({'_id': c1['_id']}, update={'$set': {'size': 0}})
         Folder().update({'_id': f1['_id']}, update={'$set': {'size': 0}})